@@ -0,0 +1,225 @@
+'''
+Benchmark of writing the channels parsed from many source files to hdf5. A
+synthetic day of csv and json data is split into consecutive segments, as if
+each segment had been read from its own source file, and written:
+
+per-file:
+    one hdf5 file per segment, with channels_to_h5py, as bulk_store writes
+    without an archive.
+archive:
+    to a consolidated archive, appending each segment's channels as they
+    come, with DailyArchive.
+batched:
+    to a consolidated archive, coalescing the segments of each channel into
+    chunk-aligned appends, with BatchedArchive.
+
+For each case, reports the wall time, the metadata operations issued through
+h5py (files opened, groups and datasets created, datasets resized and
+attributes written), the writes to datasets, and the bytes written. The
+segments are parsed before timing starts, so only writing is measured.
+
+usage: python -m benchmarks.bench_batch_writer [-h] [-f FILES] [-n ROWS]
+                                              [-c CHANNELS] [-j JSON]
+                                              [-z PROFILE]
+
+  -h, --help            show this help message and exit
+  -f FILES, --files FILES
+                        Segments the day is split into. Default: 24
+  -n ROWS, --rows ROWS  Rows per csv channel for the whole day.
+                        Default: 864000
+  -c CHANNELS, --channels CHANNELS
+                        Csv channels. Default: 6
+  -j JSON, --json JSON  Json channels. Default: 60
+  -z PROFILE, --profile PROFILE
+                        Compression profile. Default: gzip9
+
+Run from the root of the repository.
+'''
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import h5py
+import numpy as np
+from latencyconverter.utilities.archive import BatchedArchive, DailyArchive
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.csv_to_hdf5 import csv_channels
+from latencyconverter.utilities.json_to_hdf5 import stream_json
+from latencyconverter.utilities.writer import channels_to_h5py
+from benchmarks.generators import (
+    channel_ids, synthetic_availability, synthetic_day)
+
+# h5py calls counted, and what they are counted as. Attributes written with
+# attrs[name] = value go through attrs.create, and require_group through
+# create_group when the group is new. Only files opened by name are counted
+# as opens, not the File objects h5py makes for the .file of an object.
+COUNTED = [
+    (h5py.File, '__init__', 'opens'),
+    (h5py.Group, 'create_group', 'groups'),
+    (h5py.Group, 'create_dataset', 'datasets'),
+    (h5py.Dataset, 'resize', 'resizes'),
+    (h5py.AttributeManager, 'create', 'attrs'),
+    (h5py.Dataset, '__setitem__', 'writes')
+]
+
+METADATA = ('opens', 'groups', 'datasets', 'resizes', 'attrs')
+
+Segment = List[Tuple[str, Dict]]
+
+
+@contextmanager
+def counting(counts: Counter):
+    '''
+    Counts the calls to the methods in COUNTED within a with block.
+    '''
+    originals = []
+    for cls, name, key in COUNTED:
+        original = getattr(cls, name)
+
+        def wrapper(*args, _original=original, _key=key, **kwargs):
+            if _key != 'opens' or isinstance(args[1], (str, os.PathLike)):
+                counts[_key] += 1
+            return _original(*args, **kwargs)
+
+        setattr(cls, name, wrapper)
+        originals.append((cls, name, original))
+    try:
+        yield
+    finally:
+        for cls, name, original in originals:
+            setattr(cls, name, original)
+
+
+def split_channels(
+    channels: Segment,
+    files: int
+) -> List[Segment]:
+    '''
+    Splits the packets of each channel into consecutive segments.
+    '''
+    segments: List[Segment] = [[] for _ in range(files)]
+    for channel, columns in channels:
+        rows = len(columns['timestamp'])
+        bounds = np.linspace(0, rows, files + 1).astype(int)
+        for segment, start, stop in zip(segments, bounds[:-1], bounds[1:]):
+            segment.append((channel, {
+                name: (value[start:stop]
+                       if isinstance(value, np.ndarray) and len(value) == rows
+                       else value)
+                for name, value in columns.items()}))
+    return segments
+
+
+def make_segments(args) -> List[Segment]:
+    '''
+    Parses a synthetic day of csv and json data and splits it into segments,
+    each holding the csv segment and then the json segment of a source file.
+    '''
+    csv_segments = split_channels(
+        list(csv_channels(synthetic_day(args.rows,
+                                        tuple(channel_ids(args.channels))))),
+        args.files)
+    document = json.dumps(synthetic_availability(
+        channel_ids(args.json, 'NM'), 1440))
+    json_segments = split_channels(
+        list(stream_json(io.StringIO(document))), args.files)
+    return [csv_segment + json_segment
+            for csv_segment, json_segment in zip(csv_segments,
+                                                 json_segments)]
+
+
+def per_file(segments: List[Segment], tmpdir: str, profile: str):
+    for index, segment in enumerate(segments):
+        channels_to_h5py(f'{tmpdir}/segment{index}.hdf5', segment, profile)
+
+
+def archive(segments: List[Segment], tmpdir: str, profile: str):
+    with DailyArchive(f'{tmpdir}/archive.hdf5', profile=profile) as daily:
+        for segment in segments:
+            for channel, columns in segment:
+                daily.append(channel, columns)
+
+
+def batched(segments: List[Segment], tmpdir: str, profile: str):
+    with BatchedArchive(f'{tmpdir}/batched.hdf5', profile=profile) as daily:
+        for segment in segments:
+            for channel, columns in segment:
+                daily.append(channel, columns)
+
+
+CASES = {
+    'per-file': per_file,
+    'archive': archive,
+    'batched': batched
+}
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-f',
+        '--files',
+        help='Segments the day is split into. Default: 24',
+        default=24,
+        type=int
+    )
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Rows per csv channel for the whole day. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-c',
+        '--channels',
+        help='Csv channels. Default: 6',
+        default=6,
+        type=int
+    )
+    argsparser.add_argument(
+        '-j',
+        '--json',
+        help='Json channels. Default: 60',
+        default=60,
+        type=int
+    )
+    argsparser.add_argument(
+        '-z',
+        '--profile',
+        help=f'Compression profile. Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    args = argsparser.parse_args()
+
+    segments = make_segments(args)
+
+    print(f'{"case":<10}{"time s":>9}{"metadata":>10}' +
+          ''.join(f'{key:>9}' for key in METADATA) +
+          f'{"writes":>9}{"MiB":>8}')
+    for name, case in CASES.items():
+        counts: Counter = Counter()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            start = time.perf_counter()
+            with counting(counts):
+                case(segments, tmpdir, args.profile)
+            elapsed = time.perf_counter() - start
+            size = sum(entry.stat().st_size
+                       for entry in os.scandir(tmpdir)) / 2**20
+
+        print(f'{name:<10}{elapsed:>9.2f}' +
+              f'{sum(counts[key] for key in METADATA):>10}' +
+              ''.join(f'{counts[key]:>9}' for key in METADATA) +
+              f'{counts["writes"]:>9}{size:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+'''
+Benchmark of the parquet output format against hdf5. Converts several days of
+synthetic csv files into both formats, then reports the time to convert them,
+the bytes stored, the time to scan every channel of every day back into a
+DataFrame, and the time of a selective query for one channel over one hour.
+
+The hdf5 files are read with read_dataframe, and the parquet dataset with
+read_columnar, so both scans return the same rows in the same order.
+
+usage: python -m benchmarks.bench_columnar [-h] [-d DAYS] [-c CHANNELS]
+                                          [-n ROWS] [-r REPEAT]
+
+  -h, --help            show this help message and exit
+  -d DAYS, --days DAYS  Days of synthetic data. Default: 3
+  -c CHANNELS, --channels CHANNELS
+                        Csv channels per day. Default: 6
+  -n ROWS, --rows ROWS  Rows per channel per day. Default: 864000
+  -r REPEAT, --repeat REPEAT
+                        Runs of each query, the fastest is reported.
+                        Default: 3
+
+Run from the root of the repository.
+'''
+
+from datetime import timedelta
+import argparse
+import os
+import tempfile
+import time
+from latencyconverter.utilities.columnar import read_columnar
+from latencyconverter.utilities.daily_store import store_days
+from latencyconverter.utilities.reader import read_dataframe
+from benchmarks.generators import DAY, channel_ids, make_source_day
+
+
+def folder_size(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(folder) for name in names
+               if name.endswith(('.hdf5', '.parquet')))
+
+
+def fastest(repeat: int, query, *args) -> tuple:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = query(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), len(df)
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-d',
+        '--days',
+        help='Days of synthetic data. Default: 3',
+        default=3,
+        type=int
+    )
+    argsparser.add_argument(
+        '-c',
+        '--channels',
+        help='Csv channels per day. Default: 6',
+        default=6,
+        type=int
+    )
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Rows per channel per day. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-r',
+        '--repeat',
+        help='Runs of each query, the fastest is reported. Default: 3',
+        default=3,
+        type=int
+    )
+    args = argsparser.parse_args()
+
+    end_date = DAY + timedelta(days=args.days - 1)
+    start, end = DAY, end_date + timedelta(days=1)
+    hour = (f'{DAY.isoformat()}T00:00:00', f'{DAY.isoformat()}T01:00:00')
+    channel = channel_ids(args.channels)[-1]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = f'{tmpdir}/source'
+        for offset in range(args.days):
+            make_source_day(source, args.channels, args.rows,
+                            working_date=DAY + timedelta(days=offset))
+
+        print(f'{"format":<10}{"convert s":>11}{"MiB":>9}{"scan s":>10}' +
+              f'{"rows":>11}{"query s":>10}{"rows":>9}')
+        for output_format, query in [('hdf5', read_dataframe),
+                                     ('parquet', read_columnar)]:
+            destination = f'{tmpdir}/{output_format}'
+
+            begin = time.perf_counter()
+            store_days(DAY, end_date, source, destination,
+                       output_format=output_format)
+            convert_time = time.perf_counter() - begin
+
+            scan_time, scan_rows = fastest(args.repeat, query, destination,
+                                           '*', start, end)
+            query_time, query_rows = fastest(args.repeat, query, destination,
+                                             channel, *hour)
+
+            size = folder_size(destination) / 2**20
+            print(f'{output_format:<10}{convert_time:>11.2f}{size:>9.1f}' +
+                  f'{scan_time:>10.3f}{scan_rows:>11}{query_time:>10.4f}' +
+                  f'{query_rows:>9}')
+
+
+if __name__ == '__main__':
+    main()
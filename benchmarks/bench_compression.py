@@ -0,0 +1,102 @@
+'''
+Benchmark of the hdf5 compression profiles. For each profile, reports the time
+to write a set of latency csv files to hdf5, the time to read every dataset
+back, and the number of stored bytes per sample.
+
+usage: python -m benchmarks.bench_compression [-h] [-c CSV [CSV ...]]
+                                             [-n ROWS] [-p PROFILE]
+                                             [-l {1,2}]
+
+  -h, --help            show this help message and exit
+  -c CSV [CSV ...], --csv CSV [CSV ...]
+                        Guralp latency csv files to benchmark with. Defaults
+                        to a synthetic day of data for three channels.
+  -n ROWS, --rows ROWS  Rows per channel of synthetic data. Default: 864000
+  -p PROFILE, --profile PROFILE
+                        Only benchmark this profile. Can be repeated.
+  -l {1,2}, --layout {1,2}
+                        Storage layout version to write. Default: 1
+'''
+
+import argparse
+import os
+import tempfile
+import time
+import h5py
+from latencyconverter.utilities.compression import PROFILES
+from latencyconverter.utilities.csv_to_hdf5 import csv_to_h5py, load_csv
+from latencyconverter.utilities.encoding import DEFAULT_LAYOUT, LAYOUTS
+from benchmarks.generators import synthetic_day
+
+
+def read_all(filename: str):
+    with h5py.File(filename, 'r') as hdf5file:
+        for channel_group in hdf5file.values():
+            for dataset in channel_group.values():
+                dataset[()]
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-c',
+        '--csv',
+        help='Guralp latency csv files to benchmark with. Defaults to a ' +
+             'synthetic day of data for three channels.',
+        nargs='+',
+        default=None
+    )
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Rows per channel of synthetic data. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-p',
+        '--profile',
+        help='Only benchmark this profile. Can be repeated.',
+        choices=list(PROFILES),
+        action='append',
+        default=None
+    )
+    argsparser.add_argument(
+        '-l',
+        '--layout',
+        help='Storage layout version to write. Default: 1',
+        choices=list(LAYOUTS),
+        default=DEFAULT_LAYOUT,
+        type=int
+    )
+    args = argsparser.parse_args()
+
+    if args.csv is None:
+        frames = [synthetic_day(args.rows)]
+    else:
+        frames = [load_csv(filename) for filename in args.csv]
+    samples = sum(len(df) for df in frames)
+
+    print(f'{"profile":<20}{"write s":>10}{"read s":>10}{"bytes/sample":>14}')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for profile in args.profile or PROFILES:
+            filenames = [f'{tmpdir}/{profile}.{i}.hdf5'
+                         for i in range(len(frames))]
+
+            start = time.perf_counter()
+            for filename, df in zip(filenames, frames):
+                csv_to_h5py(filename, df, profile, args.layout)
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for filename in filenames:
+                read_all(filename)
+            read_time = time.perf_counter() - start
+
+            size = sum(os.path.getsize(filename) for filename in filenames)
+            print(f'{profile:<20}{write_time:>10.3f}{read_time:>10.3f}' +
+                  f'{size / samples:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+'''
+Benchmark suite of the conversion throughput of the csv and json converters at
+several scales, on synthetic data from the generators module.
+
+Each case runs in a fresh process, so its peak memory isn't hidden by an
+earlier case. For each case and scale, reports the rows converted per
+second, the MB of source data read per second, the peak resident memory of
+the process and how much the case added to it, and the bytes of hdf5 written.
+Results can be saved as json and compared against an earlier run.
+
+usage: python -m benchmarks.bench_conversion [-h] [-s SCALE] [-c CASE]
+                                             [-w WORKERS] [-r REPEAT]
+                                             [-o OUTPUT] [--compare BASELINE]
+
+  -h, --help            show this help message and exit
+  -s SCALE, --scale SCALE
+                        Scale to run, one of small, medium or full. Can be
+                        repeated. Default: small and medium
+  -c CASE, --case CASE  Case to run, one of load_csv, json_to_table,
+                        csv_to_h5py, json_to_h5py or bulk_store. Can be
+                        repeated. Default: every case
+  -w WORKERS, --workers WORKERS
+                        Worker processes for the bulk_store case. Default: 1
+  -r REPEAT, --repeat REPEAT
+                        Runs of each case, the fastest is reported.
+                        Default: 1
+  -o OUTPUT, --output OUTPUT
+                        Save the results to this json file.
+  --compare BASELINE    Print the change in rows/s against the results saved
+                        by an earlier run.
+
+Run from the root of the repository.
+'''
+
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+import h5py
+import numpy as np
+import pandas as pd
+from latencyconverter.utilities.bulk_store import bulk_store
+from latencyconverter.utilities.csv_to_hdf5 import csv_to_h5py, load_csv
+from latencyconverter.utilities.json_to_hdf5 import (
+    json_to_h5py, json_to_table, load_json)
+from benchmarks.generators import make_source_day
+from benchmarks.memory import peak_rss
+
+
+class Scale(NamedTuple):
+    '''
+    The size of the synthetic day a case runs on.
+
+    Attributes
+    ----------
+    csv_channels: int
+        The number of Guralp channels, one csv file each.
+    rows: int
+        The rows of each csv file.
+    json_channels: int
+        The number of channels in the availability json file.
+    intervals: int
+        The intervals per json channel.
+    '''
+    csv_channels: int
+    rows: int
+    json_channels: int
+    intervals: int
+
+
+SCALES = {
+    # A tenth of an hour at the Guralp packet rate
+    'small': Scale(3, 3600, 30, 144),
+    # A tenth of a day
+    'medium': Scale(3, 86400, 150, 1440),
+    # A full day at 10 packets/s
+    'full': Scale(6, 864000, 300, 1440)
+}
+
+
+def _csv_file(files: List[str]) -> str:
+    return next(filename for filename in files if filename.endswith('.csv'))
+
+
+def _json_file(files: List[str]) -> str:
+    return next(filename for filename in files if filename.endswith('.json'))
+
+
+# Each case takes the source files and an output directory, does any setup
+# that isn't measured, and returns the function to time along with the
+# source files it reads
+def case_load_csv(files: List[str], output: str) -> Tuple[Callable, list]:
+    filename = _csv_file(files)
+    return lambda: len(load_csv(filename)), [filename]
+
+
+def case_json_to_table(files: List[str], output: str) -> Tuple[Callable, list]:
+    filename = _json_file(files)
+    document = load_json(filename)
+    return lambda: len(json_to_table(document)), [filename]
+
+
+def case_csv_to_h5py(files: List[str], output: str) -> Tuple[Callable, list]:
+    filename = _csv_file(files)
+    df = load_csv(filename)
+    return (lambda: csv_to_h5py(f'{output}/csv.hdf5', df), [filename])
+
+
+def case_json_to_h5py(files: List[str], output: str) -> Tuple[Callable, list]:
+    filename = _json_file(files)
+    df = json_to_table(load_json(filename))
+    return (lambda: json_to_h5py(f'{output}/json.hdf5', df), [filename])
+
+
+def case_bulk_store(files: List[str], output: str,
+                    workers: int = 1) -> Tuple[Callable, list]:
+    def run():
+        results = bulk_store(files, output, workers=workers)
+        return sum(result.rows for result in results)
+    return run, files
+
+
+CASES = {
+    'load_csv': case_load_csv,
+    'json_to_table': case_json_to_table,
+    'csv_to_h5py': case_csv_to_h5py,
+    'json_to_h5py': case_json_to_h5py,
+    'bulk_store': case_bulk_store
+}
+
+
+def _output_bytes(output: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(output)
+               if entry.is_file())
+
+
+def run_case(
+    name: str,
+    files: List[str],
+    output: str,
+    workers: int,
+    results
+):
+    '''
+    Sets up and times a single case, in its own process, putting the
+    measurements on a queue.
+    '''
+    if name == 'bulk_store':
+        function, sources = case_bulk_store(files, output, workers)
+    else:
+        function, sources = CASES[name](files, output)
+    baseline = peak_rss()
+
+    start = time.perf_counter()
+    rows = function()
+    seconds = time.perf_counter() - start
+
+    results.put({
+        'rows': int(rows),
+        'seconds': seconds,
+        'input_bytes': sum(os.path.getsize(filename) for filename in sources),
+        'output_bytes': _output_bytes(output),
+        'peak_rss_mb': peak_rss(),
+        'peak_increase_mb': peak_rss() - baseline
+    })
+
+
+def measure(
+    name: str,
+    scale: str,
+    files: List[str],
+    workers: int,
+    repeat: int
+) -> Dict:
+    '''
+    Runs a case repeat times, each in a fresh process and output directory,
+    and returns the fastest run.
+    '''
+    context = multiprocessing.get_context('spawn')
+    runs = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as output:
+            queue = context.Queue()
+            process = context.Process(target=run_case,
+                                      args=(name, files, output, workers,
+                                            queue))
+            process.start()
+            runs.append(queue.get())
+            process.join()
+
+    best = min(runs, key=lambda run: run['seconds'])
+    seconds = max(best['seconds'], 1e-9)
+    return dict(
+        best,
+        case=name,
+        scale=scale,
+        rows_per_s=best['rows'] / seconds,
+        mb_per_s=best['input_bytes'] / 2**20 / seconds,
+        # Memory is reported for the worst run
+        peak_rss_mb=max(run['peak_rss_mb'] for run in runs),
+        peak_increase_mb=max(run['peak_increase_mb'] for run in runs))
+
+
+def environment() -> Dict:
+    '''
+    Describes the machine and library versions the benchmarks ran with.
+    '''
+    return {
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'h5py': h5py.version.version,
+        'hdf5': h5py.version.hdf5_version
+    }
+
+
+def compare(
+    results: List[Dict],
+    baseline_file: str
+):
+    '''
+    Prints the change in rows/s of each case against an earlier run.
+    '''
+    with open(baseline_file) as baseline:
+        earlier = {(result['case'], result['scale']): result
+                   for result in json.load(baseline)['results']}
+
+    print(f'\nChange against {baseline_file}')
+    for result in results:
+        previous = earlier.get((result['case'], result['scale']))
+        if previous is None:
+            continue
+        change = result['rows_per_s'] / previous['rows_per_s'] - 1
+        print(f'{result["case"]:<16}{result["scale"]:<8}{change:>+10.1%}')
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-s',
+        '--scale',
+        help='Scale to run. Can be repeated. Default: small and medium',
+        choices=list(SCALES),
+        action='append',
+        default=None
+    )
+    argsparser.add_argument(
+        '-c',
+        '--case',
+        help='Case to run. Can be repeated. Default: every case',
+        choices=list(CASES),
+        action='append',
+        default=None
+    )
+    argsparser.add_argument(
+        '-w',
+        '--workers',
+        help='Worker processes for the bulk_store case. Default: 1',
+        default=1,
+        type=int
+    )
+    argsparser.add_argument(
+        '-r',
+        '--repeat',
+        help='Runs of each case, the fastest is reported. Default: 1',
+        default=1,
+        type=int
+    )
+    argsparser.add_argument(
+        '-o',
+        '--output',
+        help='Save the results to this json file.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '--compare',
+        help='Print the change in rows/s against the results saved by an ' +
+             'earlier run.',
+        default=None,
+        type=str
+    )
+    args = argsparser.parse_args()
+
+    print(f'{"case":<16}{"scale":<8}{"rows":>10}{"rows/s":>12}' +
+          f'{"MB/s":>8}{"peak MB":>9}{"+MB":>7}{"out bytes":>12}')
+    results = []
+    for scale in args.scale or ['small', 'medium']:
+        with tempfile.TemporaryDirectory() as source:
+            files = make_source_day(source, *SCALES[scale])
+            for name in args.case or CASES:
+                result = measure(name, scale, files, args.workers,
+                                 args.repeat)
+                results.append(result)
+                print(f'{name:<16}{scale:<8}{result["rows"]:>10}' +
+                      f'{result["rows_per_s"]:>12,.0f}' +
+                      f'{result["mb_per_s"]:>8.1f}' +
+                      f'{result["peak_rss_mb"]:>9.0f}' +
+                      f'{result["peak_increase_mb"]:>7.0f}' +
+                      f'{result["output_bytes"]:>12,}')
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump({'environment': environment(),
+                       'workers': args.workers,
+                       'results': results}, output, indent=1)
+
+    if args.compare is not None:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+'''
+Benchmark comparing the vectorized Guralp 'data latency' parser against the
+per-row lambdas previously used by csv_to_h5py, which only extracted the
+samples of each packet and the sample rate of the first.
+
+usage: python benchmarks/bench_data_latency.py [-h] [-n ROWS] [-r REPEAT]
+
+  -h, --help            show this help message and exit
+  -n ROWS, --rows ROWS  Number of values to parse. Default: 864000
+  -r REPEAT, --repeat REPEAT
+                        Number of timed repetitions. Default: 3
+'''
+
+import argparse
+import timeit
+import numpy as np
+from latencyconverter.utilities.data_latency import parse_data_latency
+
+
+def make_values(rows: int) -> np.ndarray:
+    '''
+    Generates Guralp-style data latency values: 556-560 samples per packet at
+    100 samples/s, with latencies around 2.3s.
+    '''
+    rng = np.random.default_rng(0)
+    samples = rng.integers(556, 561, rows)
+    latency = np.round(rng.normal(2.3, 0.2, rows), 1)
+    return np.array([f'={n}/100+{lat}' for n, lat in zip(samples, latency)],
+                    dtype=object)
+
+
+def per_row(values: np.ndarray) -> tuple:
+    sample_rates = list(map(
+        lambda item: item.strip('=').split('/')[1].split('+')[0], values))
+    samples = list(map(
+        lambda item: item.strip('=').split('/')[0], values))
+    return np.asarray(samples, dtype='uint16'), int(sample_rates[0])
+
+
+def report(label: str, rows: int, seconds: float):
+    print(f'{label:<24}{seconds:>10.4f} s{rows / seconds:>16,.0f} rows/s')
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Number of values to parse. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-r',
+        '--repeat',
+        help='Number of timed repetitions. Default: 3',
+        default=3,
+        type=int
+    )
+    args = argsparser.parse_args()
+
+    values = make_values(args.rows)
+    exponent = values.copy()
+    exponent[-1] = '=556/100+2.3e-01'
+
+    # Sanity check: both paths agree on the fields the lambdas extract
+    samples, sample_rate = per_row(values[:1000])
+    parsed = parse_data_latency(values[:1000])
+    assert np.array_equal(samples, parsed[0])
+    assert sample_rate == parsed[1][0]
+
+    cases = [
+        ('per-row lambdas', lambda: per_row(values)),
+        ('vectorized', lambda: parse_data_latency(values)),
+        # A single value in exponent notation sends the whole array down the
+        # slower regular expression path
+        ('vectorized fallback', lambda: parse_data_latency(exponent)),
+    ]
+    for label, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        report(label, args.rows, best)
+
+
+if __name__ == '__main__':
+    main()
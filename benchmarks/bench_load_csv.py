@@ -0,0 +1,126 @@
+'''
+Benchmark of loading a Guralp latency csv file into per-channel arrays. For
+each way of reading the file, reports the time to load and split it by
+channel, and the peak resident memory of a process doing only that.
+
+The untyped baseline is the plain pd.read_csv previously used by load_csv,
+which reads every column as strings or float64 and parses the timestamps
+afterwards.
+
+The pages of the file mapped by the mmap case count towards its peak
+resident memory, although they are clean file pages the kernel can drop,
+whereas the other cases read the file through buffers they allocate.
+
+usage: python -m benchmarks.bench_load_csv [-h] [-c CSV] [-n ROWS]
+                                          [-k CHUNKSIZE]
+
+  -h, --help            show this help message and exit
+  -c CSV, --csv CSV     Guralp latency csv file to benchmark with. Defaults
+                        to a synthetic day of data for three channels.
+  -n ROWS, --rows ROWS  Rows per channel of synthetic data. Default: 864000
+  -k CHUNKSIZE, --chunksize CHUNKSIZE
+                        Rows per chunk of the chunked case. Default: 200000
+'''
+
+import argparse
+import importlib.util
+import multiprocessing
+import os
+import tempfile
+import time
+import pandas as pd
+from latencyconverter.utilities.csv_to_hdf5 import (
+    csv_channels, read_csv_channels)
+from benchmarks.generators import synthetic_day
+from benchmarks.memory import peak_rss
+
+
+def untyped(filename: str, chunksize: int) -> list:
+    return list(csv_channels(pd.read_csv(filename)))
+
+
+def typed(filename: str, chunksize: int) -> list:
+    return list(read_csv_channels(filename))
+
+
+def typed_pyarrow(filename: str, chunksize: int) -> list:
+    return list(read_csv_channels(filename, engine='pyarrow'))
+
+
+def typed_mmap(filename: str, chunksize: int) -> list:
+    return list(read_csv_channels(filename, engine='mmap'))
+
+
+def typed_chunked(filename: str, chunksize: int) -> list:
+    return list(read_csv_channels(filename, chunksize=chunksize))
+
+
+def measure(case, filename: str, chunksize: int, results):
+    '''
+    Runs a case in a fresh process, so its peak memory isn't hidden by the
+    peak of an earlier case.
+    '''
+    start = time.perf_counter()
+    case(filename, chunksize)
+    elapsed = time.perf_counter() - start
+    results.put((elapsed, peak_rss()))
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-c',
+        '--csv',
+        help='Guralp latency csv file to benchmark with. Defaults to a ' +
+             'synthetic day of data for three channels.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Rows per channel of synthetic data. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-k',
+        '--chunksize',
+        help='Rows per chunk of the chunked case. Default: 200000',
+        default=200000,
+        type=int
+    )
+    args = argsparser.parse_args()
+
+    cases = [
+        ('untyped read_csv', untyped),
+        ('typed', typed),
+        ('typed chunked', typed_chunked),
+    ]
+    if importlib.util.find_spec('pyarrow') is not None:
+        cases[2:2] = [('typed pyarrow', typed_pyarrow),
+                      ('typed mmap', typed_mmap)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        filename = args.csv
+        if filename is None:
+            filename = os.path.join(workdir, 'synthetic.csv')
+            synthetic_day(args.rows).to_csv(filename, index=False)
+        size = os.path.getsize(filename) / 2**20
+
+        print(f'{filename}: {size:.1f} MiB')
+        print(f'{"case":<20}{"load":>10}{"peak RSS":>14}')
+        context = multiprocessing.get_context('spawn')
+        for label, case in cases:
+            results = context.Queue()
+            process = context.Process(
+                target=measure,
+                args=(case, filename, args.chunksize, results))
+            process.start()
+            elapsed, peak = results.get()
+            process.join()
+            print(f'{label:<20}{elapsed:>8.2f} s{peak:>10.0f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+'''
+Benchmark of the startup time of the command line tools. For each tool,
+reports the wall time of printing its help, which is what any run pays before
+it starts converting, the cumulative import time of its module from
+python -X importtime, and whether numpy, pandas or h5py were imported. The
+slowest imports of each tool are listed so regressions can be traced to the
+module that introduced them.
+
+usage: python -m benchmarks.bench_startup [-h] [-t TOOL] [-r REPEAT]
+                                          [-n TOP] [-o OUTPUT]
+
+  -h, --help            show this help message and exit
+  -t TOOL, --tool TOOL  Tool to measure, e.g. lat_to_hdf5. Can be repeated.
+                        Default: every tool
+  -r REPEAT, --repeat REPEAT
+                        Runs of each measurement, the fastest is reported.
+                        Default: 5
+  -n TOP, --top TOP     Number of the slowest imports to list for each tool.
+                        Default: 5
+  -o OUTPUT, --output OUTPUT
+                        Save the results to this json file.
+
+Run from the root of the repository.
+'''
+
+from typing import Dict, List, Tuple
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Module of each command line tool, as in the console_scripts of setup.py
+TOOLS = {
+    'lat_to_hdf5': 'latencyconverter.bin.lat_to_hdf5',
+    'lat_batch': 'latencyconverter.bin.lat_batch',
+    'daily_lat_store': 'latencyconverter.bin.daily_lat_storage',
+    'lat_pyramid': 'latencyconverter.bin.lat_pyramid',
+    'lat_follow': 'latencyconverter.bin.lat_follow',
+    'lat_query': 'latencyconverter.bin.lat_query'
+}
+
+HEAVY_MODULES = ('numpy', 'pandas', 'h5py')
+
+
+def help_time(
+    module: str,
+    repeat: int
+) -> float:
+    '''
+    Returns the fastest wall time, in seconds, of starting a Python process
+    that prints the help of a tool, or of doing nothing if module is None.
+    '''
+    if module is None:
+        code = 'pass'
+    else:
+        code = (f'import sys; sys.argv = ["{module}", "--help"]; ' +
+                f'from {module} import main; main()')
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=False,
+                       stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def import_times(
+    module: str
+) -> List[Tuple[str, int, int]]:
+    '''
+    Imports a module in a fresh process with -X importtime, returning the
+    name, own time and cumulative time in microseconds of every module
+    imported.
+    '''
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        check=True, capture_output=True, text=True)
+
+    imports = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(own), int(cumulative)))
+    return imports
+
+
+def measure(
+    tool: str,
+    repeat: int,
+    top: int
+) -> Dict:
+    '''
+    Measures the startup of a single tool.
+    '''
+    module = TOOLS[tool]
+    imports = import_times(module)
+    names = {name for name, _, _ in imports}
+    cumulative = next(total for name, _, total in imports if name == module)
+
+    # Only top-level packages, so pandas isn't listed under all of its
+    # submodules
+    packages: Dict[str, int] = {}
+    for name, own, _ in imports:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+    return {
+        'tool': tool,
+        'help_s': help_time(module, repeat),
+        'import_ms': cumulative / 1000,
+        'heavy': [name for name in HEAVY_MODULES if name in names],
+        'slowest': [{'package': package, 'ms': own / 1000}
+                    for package, own in slowest]
+    }
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-t',
+        '--tool',
+        help='Tool to measure. Can be repeated. Default: every tool',
+        choices=list(TOOLS),
+        action='append',
+        default=None
+    )
+    argsparser.add_argument(
+        '-r',
+        '--repeat',
+        help='Runs of each measurement, the fastest is reported. Default: 5',
+        default=5,
+        type=int
+    )
+    argsparser.add_argument(
+        '-n',
+        '--top',
+        help='Number of the slowest imports to list for each tool. ' +
+             'Default: 5',
+        default=5,
+        type=int
+    )
+    argsparser.add_argument(
+        '-o',
+        '--output',
+        help='Save the results to this json file.',
+        default=None,
+        type=str
+    )
+    args = argsparser.parse_args()
+
+    interpreter = help_time(None, args.repeat)
+    print(f'python -c pass: {interpreter:.3f} s')
+    print(f'{"tool":<18}{"--help":>9}{"import":>10}  heavy modules')
+
+    results = []
+    for tool in args.tool or TOOLS:
+        result = measure(tool, args.repeat, args.top)
+        results.append(result)
+        print(f'{tool:<18}{result["help_s"]:>7.3f} s' +
+              f'{result["import_ms"]:>7.0f} ms  ' +
+              (', '.join(result['heavy']) or 'none'))
+
+    print('\nSlowest imports, by top-level package')
+    for result in results:
+        print(f'{result["tool"]:<18}' + ', '.join(
+            f'{entry["package"]} {entry["ms"]:.0f} ms'
+            for entry in result['slowest']))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump({'python': interpreter, 'results': results}, output,
+                      indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+'''
+Benchmark comparing the vectorized timestamp parser against the per-row
+strptime conversion previously used by csv_to_h5py and json_to_h5py.
+
+usage: python benchmarks/bench_timestamps.py [-h] [-n ROWS] [-r REPEAT]
+
+  -h, --help            show this help message and exit
+  -n ROWS, --rows ROWS  Number of timestamps to convert. Default: 864000
+  -r REPEAT, --repeat REPEAT
+                        Number of timed repetitions. Default: 3
+'''
+
+import argparse
+import datetime
+import timeit
+import numpy as np
+from latencyconverter.utilities.timestamps import (
+    parse_csv_timestamps, parse_json_timestamps, to_seconds)
+
+
+def make_csv_timestamps(rows: int) -> list:
+    '''
+    Generates a day's worth of Guralp-style timestamps at 10 packets/s.
+    '''
+    start = datetime.datetime(2022, 2, 13)
+    step = datetime.timedelta(milliseconds=100)
+    return [(start + step * i).strftime('%Y/%m/%d %H:%M:%S.%f')
+            for i in range(rows)]
+
+
+def make_json_timestamps(rows: int) -> list:
+    '''
+    Generates Nanometrics-style timestamps with nanosecond precision.
+    '''
+    start = datetime.datetime(2022, 2, 13)
+    step = datetime.timedelta(seconds=1)
+    return [(start + step * i).strftime('%Y-%m-%dT%H:%M:%S.%f') + '426Z'
+            for i in range(rows)]
+
+
+def per_row_csv(values: list) -> list:
+    return list(map(lambda item: datetime.datetime.strptime(
+        item, "%Y/%m/%d %H:%M:%S.%f").timestamp(), values))
+
+
+def per_row_json(values: list) -> list:
+    return list(map(lambda item: datetime.datetime.strptime(
+        item[:26], "%Y-%m-%dT%H:%M:%S.%f").timestamp(), values))
+
+
+def report(label: str, rows: int, seconds: float):
+    print(f'{label:<24}{seconds:>10.4f} s{rows / seconds:>16,.0f} rows/s')
+
+
+def main():
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-n',
+        '--rows',
+        help='Number of timestamps to convert. Default: 864000',
+        default=864000,
+        type=int
+    )
+    argsparser.add_argument(
+        '-r',
+        '--repeat',
+        help='Number of timed repetitions. Default: 3',
+        default=3,
+        type=int
+    )
+    args = argsparser.parse_args()
+
+    csv_values = make_csv_timestamps(args.rows)
+    json_values = make_json_timestamps(args.rows)
+
+    # Sanity check: both paths agree to within the float64 resolution
+    # (the per-row path interprets times in the local timezone)
+    offset = (datetime.datetime(2022, 2, 13).timestamp() -
+              datetime.datetime(2022, 2, 13, tzinfo=datetime.timezone.utc)
+              .timestamp())
+    np.testing.assert_allclose(
+        np.array(per_row_csv(csv_values[:1000])) - offset,
+        to_seconds(parse_csv_timestamps(csv_values[:1000])), atol=1e-6)
+
+    cases = [
+        ('csv per-row strptime', lambda: per_row_csv(csv_values)),
+        ('csv vectorized',
+         lambda: to_seconds(parse_csv_timestamps(csv_values))),
+        ('json per-row strptime', lambda: per_row_json(json_values)),
+        ('json vectorized',
+         lambda: to_seconds(parse_json_timestamps(json_values))),
+    ]
+    for label, case in cases:
+        best = min(timeit.repeat(case, number=1, repeat=args.repeat))
+        report(label, args.rows, best)
+
+
+if __name__ == '__main__':
+    main()
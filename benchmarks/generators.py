@@ -0,0 +1,226 @@
+'''
+Generators of synthetic latency data in the shape of the files the converters
+read, for benchmarking at realistic scales.
+
+Functions
+---------
+
+synthetic_day:
+    Generates a DataFrame of Guralp-style latency data for a day.
+
+write_guralp_csv:
+    Writes a day of Guralp latency data for one channel to a csv file named
+    like the files Guralp devices produce.
+
+synthetic_availability:
+    Generates a Nanometrics availability document.
+
+write_availability_json:
+    Writes a Nanometrics availability document to a json file.
+
+make_source_day:
+    Creates the YYYY/MM/DD source folder of a date, filled with csv and json
+    files.
+'''
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Sequence
+import json
+import os
+import numpy as np
+import pandas as pd
+from latencyconverter.utilities.file_search import day_directory
+
+DAY = date(2022, 2, 13)
+
+# Packets every 100ms, the rate Guralp devices report latencies at
+ROWS_PER_DAY = 864000
+
+
+def channel_ids(
+    count: int,
+    network: str = 'QW'
+) -> List[str]:
+    '''
+    Returns channel ids for a number of channels, three components per
+    station, e.g. QW.QCN00.9J.HNZ, QW.QCN00.9J.HNN, QW.QCN00.9J.HNE.
+    '''
+    return [f'{network}.QCN{index // 3:02d}.9J.HN{"ZNE"[index % 3]}'
+            for index in range(count)]
+
+
+def synthetic_day(
+    rows: int,
+    channels: tuple = ('QW.QCN08.9J.HNZ', 'QW.QCN08.9J.HNN',
+                       'QW.QCN08.9J.HNE'),
+    working_date: date = DAY,
+    seed: int = 0
+) -> pd.DataFrame:
+    '''
+    Generates Guralp-style latency data: packets every 100ms with a little
+    jitter, latencies around 2s and 556-560 samples per packet.
+    '''
+    rng = np.random.default_rng(seed)
+    frames = []
+    for channel in channels:
+        offsets = (np.arange(rows) * 100_000 +
+                   rng.integers(0, 1000, rows)).astype('timedelta64[us]')
+        timestamps = np.datetime64(working_date, 'us') + offsets
+        samples = rng.integers(556, 561, rows)
+        latency = np.round(rng.normal(2.3, 0.2, rows), 1)
+        frames.append(pd.DataFrame({
+            'timestamp': pd.to_datetime(timestamps).strftime(
+                '%Y/%m/%d %H:%M:%S.%f'),
+            'channel': channel,
+            'network latency': latency,
+            'data latency': [f'={n}/100+{lat}'
+                             for n, lat in zip(samples, latency)]
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_guralp_csv(
+    directory: str,
+    channel: str,
+    rows: int = ROWS_PER_DAY,
+    working_date: date = DAY,
+    seed: int = 0
+) -> str:
+    '''
+    Writes a day of Guralp latency data for one channel to a csv file in a
+    directory, named like NET_STA_LOC_CHA_YYYY_DOY.csv so that it matches the
+    '*_HN*.csv' pattern get_files looks for.
+
+    Returns
+    -------
+    str
+        The path to the csv file.
+    '''
+    filename = os.path.join(
+        directory,
+        f'{channel.replace(".", "_")}_{working_date.strftime("%Y_%j")}.csv')
+    df = synthetic_day(rows, (channel,), working_date, seed)
+    df.to_csv(filename, index=False)
+    return filename
+
+
+def synthetic_availability(
+    channels: Sequence[str],
+    intervals: int = 1440,
+    working_date: date = DAY,
+    seed: int = 0
+) -> Dict:
+    '''
+    Generates a Nanometrics availability document for a day, with the same
+    number of evenly spaced intervals for every channel.
+
+    Parameters
+    ----------
+    channels: Sequence[str]
+        The channel ids.
+    intervals: int
+        The number of intervals per channel. Default: 1440, one a minute
+    working_date: date
+        The day the intervals cover. Default: 2022-02-13
+    seed: int
+        Seed of the random latencies. Default: 0
+
+    Returns
+    -------
+    Dict
+        The availability document.
+    '''
+    rng = np.random.default_rng(seed)
+    start = datetime.combine(working_date, datetime.min.time(),
+                             tzinfo=timezone.utc)
+    step = timedelta(days=1) / intervals
+    times = [(start + step * index).strftime('%Y-%m-%dT%H:%M:%S.%f000Z')
+             for index in range(intervals + 1)]
+
+    availability = []
+    for channel in channels:
+        latencies = np.round(rng.gamma(4.0, 0.5, (intervals, 3)), 3)
+        latencies.sort(axis=1)
+        availability.append({
+            'id': channel,
+            'intervals': [{
+                'startTime': times[index],
+                'endTime': times[index + 1],
+                'availability': 100.0,
+                'latency': {
+                    'minimum': float(latencies[index, 0]),
+                    'average': float(latencies[index, 1]),
+                    'maximum': float(latencies[index, 2])
+                }
+            } for index in range(intervals)]
+        })
+    return {'availability': availability}
+
+
+def write_availability_json(
+    filename: str,
+    channels: Sequence[str],
+    intervals: int = 1440,
+    working_date: date = DAY,
+    seed: int = 0
+) -> str:
+    '''
+    Writes a Nanometrics availability document to a json file, as generated
+    by synthetic_availability.
+
+    Returns
+    -------
+    str
+        The path to the json file.
+    '''
+    with open(filename, 'w') as json_file:
+        json.dump(synthetic_availability(channels, intervals, working_date,
+                                         seed), json_file)
+    return filename
+
+
+def make_source_day(
+    source: str,
+    csv_channels: int = 3,
+    rows: int = ROWS_PER_DAY,
+    json_channels: int = 0,
+    intervals: int = 1440,
+    working_date: date = DAY
+) -> List[str]:
+    '''
+    Creates the YYYY/MM/DD source folder of a date, with one Guralp csv file
+    per channel and a single Nanometrics availability json file, laid out
+    the way get_files expects.
+
+    Parameters
+    ----------
+    source: str
+        The source directory to create the date folder in.
+    csv_channels: int
+        The number of Guralp channels, each written to its own csv file.
+        Default: 3
+    rows: int
+        The number of rows of each csv file. Default: 864000, a full day
+    json_channels: int
+        The number of channels in the json file, or 0 for no json file.
+        Default: 0
+    intervals: int
+        The number of intervals per json channel. Default: 1440
+    working_date: date
+        The date of the folder. Default: 2022-02-13
+
+    Returns
+    -------
+    List[str]
+        The paths of the files written.
+    '''
+    directory = day_directory(source, working_date)
+    os.makedirs(directory, exist_ok=True)
+
+    files = [write_guralp_csv(directory, channel, rows, working_date, seed)
+             for seed, channel in enumerate(channel_ids(csv_channels))]
+    if json_channels > 0:
+        files.append(write_availability_json(
+            os.path.join(directory, 'availability.json'),
+            channel_ids(json_channels, 'NM'), intervals, working_date))
+    return files
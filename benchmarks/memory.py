@@ -0,0 +1,32 @@
+'''
+Measurement of the peak memory of a benchmark process.
+
+Functions
+---------
+
+peak_rss:
+    Returns the peak resident memory of the current process in MB.
+'''
+
+import resource
+
+
+def peak_rss() -> float:
+    '''
+    Returns the peak resident memory of the current process in MB.
+
+    On Linux this is the VmHWM of the process, which starts over when a
+    process is executed. ru_maxrss is only used where /proc isn't available:
+    it carries over across exec, so a benchmark process spawned by a parent
+    that has generated a lot of data would report the parent's peak.
+    '''
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    # Reported in kB
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux, and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -1,23 +1,91 @@
 '''
-This command line tool collects a list of all csv and json files for a day and
-stores the contained latency data in a compressed hdf5 formatted file for each.
+This command line tool collects a list of all csv and json files for a day, or
+for each day of a date range, and stores the contained latency data in a
+compressed hdf5 formatted file for each.
 
-usage: daily_lat_store [-h] [-t DATE] [-s SOURCE] -d DESTINATION
+usage: daily_lat_store [-h] [-t DATE] [--start START] [--end END] [-s SOURCE]
+                       -d DESTINATION [-w WORKERS] [-a] [-z PROFILE]
+                       [-l {1,2}] [--format {hdf5,parquet}] [-c] [-f] [-p]
+                       [--metrics-file METRICS_FILE]
+                       [--metrics-format {jsonl,prometheus}] [-v]
 
   -h, --help            show this help message and exit
   -t DATE, --date DATE  The date to find latency files for.
+  --start START         The first date of a range of dates to backfill, in
+                        YYYY-MM-DD format. Can't be combined with --date.
+  --end END             The last date of the range to backfill, inclusive.
+                        Default: yesterday
   -s SOURCE, --source SOURCE
                         Source directory to search for latency files in.
   -d DESTINATION, --destination DESTINATION
                         The destination folder in which to store compressed
                         hdf5 files.
+  -w WORKERS, --workers WORKERS
+                        Number of worker processes to convert files with.
+                        When backfilling a range, whole days are spread
+                        across the workers. Default: 1
+  -a, --archive         Store the day's latency data in a single consolidated
+                        hdf5 archive instead of one hdf5 file per source file.
+  -z PROFILE, --compression PROFILE
+                        Compression profile to store the hdf5 datasets with.
+                        One of gzip9, gzip6, gzip4, lzf, gzip4-scaleoffset or
+                        none. Default: gzip9
+  -l {1,2}, --layout {1,2}
+                        Storage layout version of the hdf5 datasets: 1 for raw
+                        float timestamps and latencies, 2 for delta encoded
+                        integer timestamps and fixed-point latencies.
+                        Ignored with --archive, which always uses
+                        layout 1. Default: 1
+  --format {hdf5,parquet}
+                        Format to store the latency data in: hdf5, or parquet
+                        for a dataset partitioned by network, station and
+                        date in the parquet folder of the destination, for
+                        scanning many channels and days. parquet needs
+                        pyarrow, which must be installed separately, and
+                        can't be combined with --archive. Default: hdf5
+  -c, --catalog         Record which hdf5 files and rows hold each channel,
+                        along with their time range, sample rate and latency
+                        range, in the catalog.sqlite database of the
+                        destination, for lat_catalog and lat_query --catalog
+                        to look them up in. Can't be combined with --format
+                        parquet.
+  -f, --force           Convert every file, even those the manifest shows are
+                        unchanged since they were last converted.
+  -p, --pipeline        Convert files with the pipelined engine, which reads
+                        files ahead and overlaps parsing with writing. Stage
+                        timings and queue depths are logged with --verbose.
+  --metrics-file METRICS_FILE
+                        Record the time spent in each stage of converting
+                        each file, and the rows and bytes converted, and
+                        write them to this file.
+  --metrics-format {jsonl,prometheus}
+                        Format of the metrics file. jsonl appends a record
+                        for each file and one for the totals of the run.
+                        prometheus replaces the file with the totals, for
+                        the node exporter's textfile collector. Default:
+                        prometheus for .prom files, otherwise jsonl
+  -v, --verbose         Sets logging level to DEBUG.
+
+A manifest.json file in each destination date folder records the files that
+have been converted. Files that are unchanged since they were last converted
+are skipped on later runs.
+
+Days without any latency files are logged and skipped when backfilling a
+range. Progress is logged as each day completes, with the overall throughput in
+files and rows per second.
+
+Exits with status 0 if every file was converted or skipped, and 1 if any file
+failed to convert or no latency files were found at all.
 '''
 
 import logging
 import argparse
-from latencyconverter.utilities.file_search import get_date, get_files
-from latencyconverter.utilities.bulk_store import bulk_store
-import os
+import time
+from latencyconverter.utilities.file_search import get_date
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.metrics import METRICS_FORMATS, write_metrics
+from latencyconverter.utilities.options import (
+    DEFAULT_LAYOUT, DEFAULT_OUTPUT_FORMAT, LAYOUTS, OUTPUT_FORMATS)
 
 
 def main():
@@ -31,6 +99,20 @@ def main():
         default=None,
         type=str
     )
+    argsparser.add_argument(
+        '--start',
+        help='The first date of a range of dates to backfill, in ' +
+             'YYYY-MM-DD format. Can\'t be combined with --date.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '--end',
+        help='The last date of the range to backfill, inclusive. ' +
+             'Default: yesterday',
+        default=None,
+        type=str
+    )
 
     argsparser.add_argument(
         '-s',
@@ -46,6 +128,96 @@ def main():
         required=True,
         type=str
     )
+    argsparser.add_argument(
+        '-w',
+        '--workers',
+        help='Number of worker processes to convert files with. When ' +
+             'backfilling a range, whole days are spread across the ' +
+             'workers. Default: 1',
+        default=1,
+        type=int
+    )
+    argsparser.add_argument(
+        '-a',
+        '--archive',
+        action='store_true',
+        help='Store the day\'s latency data in a single consolidated hdf5 ' +
+             'archive instead of one hdf5 file per source file.'
+    )
+    argsparser.add_argument(
+        '-z',
+        '--compression',
+        help='Compression profile to store the hdf5 datasets with. ' +
+             f'Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-l',
+        '--layout',
+        help='Storage layout version of the hdf5 datasets: 1 for raw ' +
+             'float timestamps and latencies, 2 for delta encoded integer ' +
+             'timestamps and fixed-point latencies. ' +
+             f'Default: {DEFAULT_LAYOUT}',
+        choices=list(LAYOUTS),
+        default=DEFAULT_LAYOUT,
+        type=int
+    )
+    argsparser.add_argument(
+        '--format',
+        help='Format to store the latency data in: hdf5, or parquet for a ' +
+             'dataset partitioned by network, station and date in the ' +
+             'parquet folder of the destination, for scanning many ' +
+             'channels and days. parquet needs pyarrow, which must be ' +
+             'installed separately, and can\'t be combined with --archive. ' +
+             f'Default: {DEFAULT_OUTPUT_FORMAT}',
+        choices=list(OUTPUT_FORMATS),
+        default=DEFAULT_OUTPUT_FORMAT,
+        type=str
+    )
+    argsparser.add_argument(
+        '-c',
+        '--catalog',
+        action='store_true',
+        help='Record which hdf5 files and rows hold each channel, along ' +
+             'with their time range, sample rate and latency range, in the ' +
+             'catalog.sqlite database of the destination, for lat_catalog ' +
+             'and lat_query --catalog to look them up in. Can\'t be ' +
+             'combined with --format parquet.'
+    )
+    argsparser.add_argument(
+        '-f',
+        '--force',
+        action='store_true',
+        help='Convert every file, even those the manifest shows are ' +
+             'unchanged since they were last converted.'
+    )
+    argsparser.add_argument(
+        '-p',
+        '--pipeline',
+        action='store_true',
+        help='Convert files with the pipelined engine, which reads files ' +
+             'ahead and overlaps parsing with writing. Stage timings and ' +
+             'queue depths are logged with --verbose.'
+    )
+    argsparser.add_argument(
+        '--metrics-file',
+        help='Record the time spent in each stage of converting each file, ' +
+             'and the rows and bytes converted, and write them to this file.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '--metrics-format',
+        help='Format of the metrics file. jsonl appends a record for each ' +
+             'file and one for the totals of the run. prometheus replaces ' +
+             'the file with the totals, for the node exporter\'s textfile ' +
+             'collector. Default: prometheus for .prom files, otherwise jsonl',
+        choices=list(METRICS_FORMATS),
+        default=None,
+        type=str
+    )
     argsparser.add_argument(
         '-v',
         '--verbose',
@@ -55,21 +227,61 @@ def main():
 
     args = argsparser.parse_args()
 
+    if args.date is not None and (args.start or args.end):
+        argsparser.error('--date can\'t be combined with --start or --end')
+    if args.end is not None and args.start is None:
+        argsparser.error('--end requires --start')
+    if args.metrics_format is not None and args.metrics_file is None:
+        argsparser.error('--metrics-format requires --metrics-file')
+    if args.format != DEFAULT_OUTPUT_FORMAT and args.archive:
+        argsparser.error(f'--format {args.format} can\'t be combined with ' +
+                         '--archive')
+    if args.format != DEFAULT_OUTPUT_FORMAT and args.catalog:
+        argsparser.error(f'--format {args.format} can\'t be combined with ' +
+                         '--catalog')
+
     # Set logging parameters
     logging.basicConfig(
         format='%(asctime)s:%(levelname)s:%(message)s',
         datefmt="%Y-%m-%d %H:%M:%S",
         level=logging.DEBUG if args.verbose else logging.INFO)
 
-    # Collect files that need to be stored in hdf5 format
-    working_date = get_date(args.date)
-    files = get_files(working_date, args.source)
+    if args.start is not None:
+        start_date = get_date(args.start)
+        end_date = get_date(args.end)
+    else:
+        start_date = end_date = get_date(args.date)
+
+    # The converters import pandas and h5py, which take longer to load than
+    # parsing the arguments, so they are only imported once there is work
+    from latencyconverter.utilities.bulk_store import summarize
+    from latencyconverter.utilities.daily_store import store_days
+
+    # Convert the files of each day
+    start = time.perf_counter()
+    day_results = store_days(start_date, end_date, source=args.source,
+                             destination=args.destination,
+                             workers=args.workers, archive=args.archive,
+                             profile=args.compression, layout=args.layout,
+                             force=args.force, pipelined=args.pipeline,
+                             metrics=args.metrics_file is not None,
+                             output_format=args.format,
+                             catalog=args.catalog)
+    results = [result for day_result in day_results
+               for result in day_result.results]
+
+    if args.metrics_file is not None:
+        write_metrics(args.metrics_file, results,
+                      time.perf_counter() - start, args.metrics_format)
 
-    # Create subdirectory structure for date
-    destination_folder = (f'{args.destination}/' +
-                          f'{working_date.strftime("%Y/%m/%d/")}')
+    if all(day_result.missing for day_result in day_results):
+        logging.error(f'No latency files found between {start_date} and ' +
+                      f'{end_date}')
+        return 1
 
-    os.makedirs(destination_folder, mode=0o775, exist_ok=True)
+    missing = sum(day_result.missing for day_result in day_results)
+    if missing:
+        logging.info(f'{missing} of {len(day_results)} days had no latency ' +
+                     'files.')
 
-    # Convert the files
-    bulk_store(files, destination_folder)
+    return summarize(results)
@@ -0,0 +1,254 @@
+'''
+This command line tool converts many csv and json latency files in a single
+run, so starting Python and loading the converters is paid for once rather
+than for every file, as it is when lat_to_hdf5 is run for each file.
+
+usage: lat_batch [-h] [-i INPUT] -d DESTINATION [-a ARCHIVE] [-w WORKERS]
+                 [-z PROFILE] [-l {1,2}] [--format {hdf5,parquet}] [-m]
+                 [-f] [-p]
+                 [--metrics-file METRICS_FILE]
+                 [--metrics-format {jsonl,prometheus}] [-v]
+                 [files ...]
+
+positional arguments:
+  files                 csv and json latency files to convert.
+
+  -h, --help            show this help message and exit
+  -i INPUT, --input INPUT
+                        File listing more latency files to convert, one path
+                        per line, or - to read them from standard input.
+  -d DESTINATION, --destination DESTINATION
+                        The folder in which to store compressed hdf5 files.
+  -a ARCHIVE, --archive ARCHIVE
+                        Store the latency data of every file in this single
+                        consolidated hdf5 archive instead of one hdf5 file
+                        per source file.
+  -w WORKERS, --workers WORKERS
+                        Number of worker processes to convert files with.
+                        Default: 1
+  -z PROFILE, --compression PROFILE
+                        Compression profile to store the hdf5 datasets with.
+                        One of gzip9, gzip6, gzip4, lzf, gzip4-scaleoffset or
+                        none. Default: gzip9
+  -l {1,2}, --layout {1,2}
+                        Storage layout version of the hdf5 datasets: 1 for raw
+                        float timestamps and latencies, 2 for delta encoded
+                        integer timestamps and fixed-point latencies.
+                        Ignored with --archive, which always uses
+                        layout 1. Default: 1
+  --format {hdf5,parquet}
+                        Format to store the latency data in: hdf5, or parquet
+                        for a dataset partitioned by network, station and
+                        date in the parquet folder of the destination, for
+                        scanning many channels and days. parquet needs
+                        pyarrow, which must be installed separately, and
+                        can't be combined with --archive. Default: hdf5
+  -m, --manifest        Record the files converted in a manifest.json file in
+                        the destination folder, and skip files that are
+                        unchanged since they were last converted.
+  -f, --force           Convert every file, even those the manifest shows are
+                        unchanged since they were last converted.
+  -p, --pipeline        Convert files with the pipelined engine, which reads
+                        files ahead and overlaps parsing with writing.
+  --metrics-file METRICS_FILE
+                        Record the time spent in each stage of converting
+                        each file, and the rows and bytes converted, and
+                        write them to this file.
+  --metrics-format {jsonl,prometheus}
+                        Format of the metrics file. Default: prometheus for
+                        .prom files, otherwise jsonl
+  -v, --verbose         Sets logging level to DEBUG.
+
+pandas and h5py are only loaded once there is a file to convert, so a run in
+which the manifest shows every file is unchanged finishes quickly.
+
+Exits with status 0 if every file was converted, skipped or unchanged, and 1
+if any file failed to convert or no files were given.
+'''
+
+import logging
+import argparse
+import sys
+import time
+from typing import List
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.manifest import Manifest, manifest_path
+from latencyconverter.utilities.metrics import METRICS_FORMATS, write_metrics
+from latencyconverter.utilities.options import (
+    DEFAULT_LAYOUT, DEFAULT_OUTPUT_FORMAT, LAYOUTS, OUTPUT_FORMATS)
+
+
+def read_file_list(
+    source: str
+) -> List[str]:
+    '''
+    Reads a list of files, one path per line, from a file or from standard
+    input if source is '-'. Blank lines are ignored.
+    '''
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source) as file_list:
+            lines = file_list.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def main():
+
+    # Define arguments
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        'files',
+        help='csv and json latency files to convert.',
+        nargs='*'
+    )
+    argsparser.add_argument(
+        '-i',
+        '--input',
+        help='File listing more latency files to convert, one path per ' +
+             'line, or - to read them from standard input.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-d',
+        '--destination',
+        help='The folder in which to store compressed hdf5 files.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-a',
+        '--archive',
+        help='Store the latency data of every file in this single ' +
+             'consolidated hdf5 archive instead of one hdf5 file per ' +
+             'source file.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-w',
+        '--workers',
+        help='Number of worker processes to convert files with. Default: 1',
+        default=1,
+        type=int
+    )
+    argsparser.add_argument(
+        '-z',
+        '--compression',
+        help='Compression profile to store the hdf5 datasets with. ' +
+             f'Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-l',
+        '--layout',
+        help='Storage layout version of the hdf5 datasets: 1 for raw ' +
+             'float timestamps and latencies, 2 for delta encoded integer ' +
+             'timestamps and fixed-point latencies. ' +
+             f'Default: {DEFAULT_LAYOUT}',
+        choices=list(LAYOUTS),
+        default=DEFAULT_LAYOUT,
+        type=int
+    )
+    argsparser.add_argument(
+        '--format',
+        help='Format to store the latency data in: hdf5, or parquet for a ' +
+             'dataset partitioned by network, station and date in the ' +
+             'parquet folder of the destination, for scanning many ' +
+             'channels and days. parquet needs pyarrow, which must be ' +
+             'installed separately, and can\'t be combined with --archive. ' +
+             f'Default: {DEFAULT_OUTPUT_FORMAT}',
+        choices=list(OUTPUT_FORMATS),
+        default=DEFAULT_OUTPUT_FORMAT,
+        type=str
+    )
+    argsparser.add_argument(
+        '-m',
+        '--manifest',
+        action='store_true',
+        help='Record the files converted in a manifest.json file in the ' +
+             'destination folder, and skip files that are unchanged since ' +
+             'they were last converted.'
+    )
+    argsparser.add_argument(
+        '-f',
+        '--force',
+        action='store_true',
+        help='Convert every file, even those the manifest shows are ' +
+             'unchanged since they were last converted.'
+    )
+    argsparser.add_argument(
+        '-p',
+        '--pipeline',
+        action='store_true',
+        help='Convert files with the pipelined engine, which reads files ' +
+             'ahead and overlaps parsing with writing.'
+    )
+    argsparser.add_argument(
+        '--metrics-file',
+        help='Record the time spent in each stage of converting each file, ' +
+             'and the rows and bytes converted, and write them to this file.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '--metrics-format',
+        help='Format of the metrics file. Default: prometheus for .prom ' +
+             'files, otherwise jsonl',
+        choices=list(METRICS_FORMATS),
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-v',
+        '--verbose',
+        action='store_true',
+        help='Sets logging level to DEBUG.'
+    )
+
+    args = argsparser.parse_args()
+
+    if args.metrics_format is not None and args.metrics_file is None:
+        argsparser.error('--metrics-format requires --metrics-file')
+    if args.format != DEFAULT_OUTPUT_FORMAT and args.archive:
+        argsparser.error(f'--format {args.format} can\'t be combined with ' +
+                         '--archive')
+
+    # Set logging parameters
+    logging.basicConfig(
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    files = list(args.files)
+    if args.input is not None:
+        files += read_file_list(args.input)
+    if not files:
+        logging.error('No latency files given.')
+        return 1
+
+    # The converters import pandas and h5py, so they are only loaded by
+    # bulk_store once a file needs converting
+    from latencyconverter.utilities.bulk_store import bulk_store, summarize
+
+    start = time.perf_counter()
+    results = bulk_store(
+        files, args.destination, workers=args.workers, archive=args.archive,
+        profile=args.compression, layout=args.layout,
+        manifest=(Manifest.load(manifest_path(args.destination))
+                  if args.manifest else None),
+        force=args.force, pipelined=args.pipeline,
+        metrics=args.metrics_file is not None, output_format=args.format)
+
+    if args.metrics_file is not None:
+        write_metrics(args.metrics_file, results,
+                      time.perf_counter() - start, args.metrics_format)
+
+    return summarize(results)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+'''
+This command line tool lists which hdf5 files, and which rows of them, hold
+the latency data of a set of channels within a time window, as recorded in
+the catalog daily_lat_store keeps with --catalog, and writes them as csv.
+
+usage: lat_catalog [-h] -s SOURCE [-c CHANNEL] [-b START] [-e END] [-i]
+                   [-o OUTPUT] [-v]
+
+  -h, --help            show this help message and exit
+  -s SOURCE, --source SOURCE
+                        The destination folder daily_lat_store stored the
+                        hdf5 files and catalog in.
+  -c CHANNEL, --channel CHANNEL
+                        Shell-style pattern of the channel ids to look up,
+                        e.g. 'QW.*.HN?'. Can be repeated. Default: every
+                        channel
+  -b START, --start START
+                        The start of the time window, inclusive, e.g.
+                        2022-02-13 or 2022-02-13T06:00:00. Times are UTC.
+                        Default: no lower bound
+  -e END, --end END     The end of the time window, exclusive. Default: no
+                        upper bound
+  -i, --index           Index every hdf5 file of the source into the
+                        catalog first, e.g. to catalog files stored before
+                        the catalog was kept. Files that no longer exist are
+                        removed from the catalog.
+  -o OUTPUT, --output OUTPUT
+                        Path to the csv file to write. Default: standard
+                        output
+
+Each row of the csv is an extent: the rows of a channel converted from one
+source file, with the file and row range they are stored at, their time
+range, sample rate and network latency range. Exits with status 1 if the
+source has no catalog.
+'''
+
+from datetime import datetime, timezone
+import argparse
+import csv
+import logging
+import os
+import sys
+from latencyconverter.utilities.catalog import (
+    Catalog, catalog_path, index_destination)
+
+COLUMNS = ['channel', 'source', 'file', 'start row', 'stop row',
+           'first timestamp', 'last timestamp', 'sample rate', 'latency min',
+           'latency max']
+
+
+def _isoformat(timestamp):
+    if timestamp is None:
+        return ''
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def main():
+
+    # Define arguments
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-s',
+        '--source',
+        help='The destination folder daily_lat_store stored the hdf5 files ' +
+             'and catalog in.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-c',
+        '--channel',
+        help='Shell-style pattern of the channel ids to look up, e.g. ' +
+             '\'QW.*.HN?\'. Can be repeated. Default: every channel',
+        action='append',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-b',
+        '--start',
+        help='The start of the time window, inclusive, e.g. 2022-02-13 or ' +
+             '2022-02-13T06:00:00. Times are UTC. Default: no lower bound',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-e',
+        '--end',
+        help='The end of the time window, exclusive. Default: no upper bound',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-i',
+        '--index',
+        action='store_true',
+        help='Index every hdf5 file of the source into the catalog first, ' +
+             'e.g. to catalog files stored before the catalog was kept. ' +
+             'Files that no longer exist are removed from the catalog.'
+    )
+    argsparser.add_argument(
+        '-o',
+        '--output',
+        help='Path to the csv file to write. Default: standard output',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-v',
+        '--verbose',
+        action='store_true',
+        help='Sets logging level to DEBUG.'
+    )
+
+    args = argsparser.parse_args()
+
+    # Set logging parameters
+    logging.basicConfig(
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    path = catalog_path(args.source)
+    if args.index:
+        files = index_destination(args.source)
+        logging.info(f'Indexed {files} files.')
+    elif not os.path.exists(path):
+        logging.error(f'No catalog found at {path}')
+        return 1
+
+    start = end = None
+    if args.start is not None or args.end is not None:
+        # pandas parses the many formats times can be given in, but is slow
+        # to import, so it is only imported for a time window
+        from latencyconverter.utilities.reader import to_timestamp
+        start, end = to_timestamp(args.start), to_timestamp(args.end)
+
+    with Catalog(path) as catalog:
+        extents = catalog.find(args.channel or '*', start, end)
+    logging.info(f'Found {len(extents)} extents in ' +
+                 f'{len({extent.output for extent in extents})} files.')
+
+    output = (open(args.output, 'w', newline='') if args.output is not None
+              else sys.stdout)
+    try:
+        writer = csv.writer(output)
+        writer.writerow(COLUMNS)
+        for extent in extents:
+            writer.writerow([
+                extent.channel, extent.source or '', extent.output,
+                extent.start_row, extent.stop_row,
+                _isoformat(extent.first_timestamp),
+                _isoformat(extent.last_timestamp),
+                '' if extent.sample_rate is None else extent.sample_rate,
+                '' if extent.latency_min is None else extent.latency_min,
+                '' if extent.latency_max is None else extent.latency_max])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
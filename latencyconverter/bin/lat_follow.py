@@ -0,0 +1,147 @@
+'''
+This command line tool follows the csv and json latency files of the current
+day while they are still being written, and appends their new rows to the
+day's consolidated hdf5 archive every few minutes.
+
+usage: lat_follow [-h] [-s SOURCE] -d DESTINATION [-t DATE] [-i INTERVAL]
+                  [-k CHECKPOINT] [-z PROFILE] [-e {c,pyarrow}] [-n POLLS]
+                  [-v]
+
+  -h, --help            show this help message and exit
+  -s SOURCE, --source SOURCE
+                        Source directory to search for latency files in.
+  -d DESTINATION, --destination DESTINATION
+                        The destination folder in which to store the hdf5
+                        archives.
+  -t DATE, --date DATE  Follow the files of this date, in YYYY-MM-DD format,
+                        instead of the current UTC day.
+  -i INTERVAL, --interval INTERVAL
+                        Seconds to wait between polls of the source files.
+                        Default: 60
+  -k CHECKPOINT, --checkpoint CHECKPOINT
+                        Seconds between updates of the archive's index,
+                        summary statistics and downsampled levels.
+                        Default: 900
+  -z PROFILE, --compression PROFILE
+                        Compression profile to store the hdf5 datasets with.
+                        One of gzip9, gzip6, gzip4, lzf, gzip4-scaleoffset or
+                        none. Default: gzip9
+  -e {c,pyarrow,mmap}, --engine {c,pyarrow,mmap}
+                        Parser to read csv files with. Default: c
+  -n POLLS, --polls POLLS
+                        Stop after this many polls. Default: run until
+                        interrupted
+  -v, --verbose         Sets logging level to DEBUG.
+
+The archive is written in SWMR mode, so it can be read with lat_query while
+it is being followed. Only the rows written since the previous poll are
+parsed, and the read position in each file is kept in follow_state.json next
+to the archive, so following resumes where it left off after a restart.
+'''
+
+import logging
+import argparse
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.file_search import get_date
+from latencyconverter.utilities.options import (
+    CSV_ENGINES, DEFAULT_CHECKPOINT, DEFAULT_CSV_ENGINE, DEFAULT_INTERVAL)
+
+
+def main():
+
+    # Define arguments
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-s',
+        '--source',
+        help='Source directory to search for latency files in.',
+        default='.',
+        type=str
+    )
+    argsparser.add_argument(
+        '-d',
+        '--destination',
+        help='The destination folder in which to store the hdf5 archives.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-t',
+        '--date',
+        help='Follow the files of this date, in YYYY-MM-DD format, instead ' +
+             'of the current UTC day.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-i',
+        '--interval',
+        help='Seconds to wait between polls of the source files. ' +
+             f'Default: {DEFAULT_INTERVAL}',
+        default=DEFAULT_INTERVAL,
+        type=float
+    )
+    argsparser.add_argument(
+        '-k',
+        '--checkpoint',
+        help='Seconds between updates of the archive\'s index, summary ' +
+             'statistics and downsampled levels. Default: ' +
+             f'{DEFAULT_CHECKPOINT}',
+        default=DEFAULT_CHECKPOINT,
+        type=float
+    )
+    argsparser.add_argument(
+        '-z',
+        '--compression',
+        help='Compression profile to store the hdf5 datasets with. ' +
+             f'Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-e',
+        '--engine',
+        help=f'Parser to read csv files with. Default: {DEFAULT_CSV_ENGINE}',
+        choices=list(CSV_ENGINES),
+        default=DEFAULT_CSV_ENGINE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-n',
+        '--polls',
+        help='Stop after this many polls. Default: run until interrupted',
+        default=None,
+        type=int
+    )
+    argsparser.add_argument(
+        '-v',
+        '--verbose',
+        action='store_true',
+        help='Sets logging level to DEBUG.'
+    )
+
+    args = argsparser.parse_args()
+
+    # Set logging parameters
+    logging.basicConfig(
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    working_date = get_date(args.date) if args.date is not None else None
+
+    # The follower imports numpy, pandas and h5py, which take longer to load
+    # than parsing the arguments, so it is only imported once there is work
+    from latencyconverter.utilities.follow import follow
+
+    try:
+        rows = follow(args.source, args.destination, working_date,
+                      args.interval, args.checkpoint, args.compression,
+                      args.engine, args.polls)
+    except KeyboardInterrupt:
+        logging.info('Stopped following.')
+        return 0
+
+    logging.info(f'Appended {rows} rows.')
+    return 0
@@ -0,0 +1,111 @@
+'''
+This command line tool aggregates the downsampled network latency levels of
+the hdf5 files stored by daily_lat_store for a range of days into a single
+pyramid file, latency_pyramid.hdf5, at the root of the destination folder.
+Long time ranges can then be read at a coarse resolution from that one file,
+e.g. with lat_query --resolution.
+
+usage: lat_pyramid [-h] -s SOURCE -b START [-e END] [-c CHANNEL] [-z PROFILE]
+                   [-v]
+
+  -h, --help            show this help message and exit
+  -s SOURCE, --source SOURCE
+                        The destination folder daily_lat_store stored the
+                        hdf5 files in.
+  -b START, --start START
+                        The first date to aggregate, in YYYY-MM-DD format.
+  -e END, --end END     The last date to aggregate, inclusive. Default: the
+                        start date
+  -c CHANNEL, --channel CHANNEL
+                        Shell-style pattern of the channel ids to aggregate,
+                        e.g. 'QW.*.HN?'. Can be repeated. Default: every
+                        channel
+  -z PROFILE, --compression PROFILE
+                        Compression profile to store the hdf5 datasets with.
+                        One of gzip9, gzip6, gzip4, lzf, gzip4-scaleoffset or
+                        none. Default: gzip9
+  -v, --verbose         Sets logging level to DEBUG.
+
+Days that were aggregated before are replaced. Exits with status 1 if no
+latency data was found for any of the days.
+'''
+
+import logging
+import argparse
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.file_search import get_date
+
+
+def main():
+
+    # Define arguments
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-s',
+        '--source',
+        help='The destination folder daily_lat_store stored the hdf5 files ' +
+             'in.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-b',
+        '--start',
+        help='The first date to aggregate, in YYYY-MM-DD format.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-e',
+        '--end',
+        help='The last date to aggregate, inclusive. Default: the start date',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-c',
+        '--channel',
+        help='Shell-style pattern of the channel ids to aggregate, e.g. ' +
+             '\'QW.*.HN?\'. Can be repeated. Default: every channel',
+        action='append',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-z',
+        '--compression',
+        help='Compression profile to store the hdf5 datasets with. ' +
+             f'Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-v',
+        '--verbose',
+        action='store_true',
+        help='Sets logging level to DEBUG.'
+    )
+
+    args = argsparser.parse_args()
+
+    # Set logging parameters
+    logging.basicConfig(
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    start_date = get_date(args.start)
+    end_date = get_date(args.end) if args.end is not None else start_date
+
+    # Only import h5py and numpy once the arguments are known to be valid
+    from latencyconverter.utilities.aggregate import aggregate_pyramid
+    days = aggregate_pyramid(args.source, start_date, end_date,
+                             args.channel or '*', args.compression)
+    if days == 0:
+        logging.error(f'No latency data found between {start_date} and ' +
+                      f'{end_date}')
+        return 1
+
+    logging.info(f'Aggregated {days} days.')
+    return 0
@@ -0,0 +1,194 @@
+'''
+This command line tool reads the latency data of a set of channels within a
+time window back out of the hdf5 files or parquet dataset stored by
+daily_lat_store, and writes it as csv.
+
+usage: lat_query [-h] -s SOURCE [-c CHANNEL] -b START [-e END] [-o OUTPUT]
+                 [-m] [-r {1m,10m,1h}] [--format {hdf5,parquet}] [-k] [-v]
+
+  -h, --help            show this help message and exit
+  -s SOURCE, --source SOURCE
+                        The destination folder daily_lat_store stored the
+                        hdf5 files in.
+  -c CHANNEL, --channel CHANNEL
+                        Shell-style pattern of the channel ids to read, e.g.
+                        'QW.*.HN?'. Can be repeated. Default: every channel
+  -b START, --start START
+                        The start of the time window, inclusive, e.g.
+                        2022-02-13 or 2022-02-13T06:00:00. Times are UTC.
+  -e END, --end END     The end of the time window, exclusive. Default: the
+                        end of the day the window starts on.
+  -o OUTPUT, --output OUTPUT
+                        Path to the csv file to write. Default: standard
+                        output
+  -m, --summary         Write the summary statistics stored for each channel
+                        and day instead of the latency data. Only reads the
+                        attributes of the hdf5 files.
+  -r {1m,10m,1h}, --resolution {1m,10m,1h}
+                        Write the count, min, mean and max network latency
+                        of each bucket of this width instead of every
+                        packet, read from the downsampled levels.
+  --format {hdf5,parquet}
+                        The format the latency data was stored in. parquet
+                        reads the partitioned dataset in the parquet folder
+                        of the source, and can't be combined with --summary
+                        or --resolution. Default: hdf5
+  -k, --catalog         Look up the files and rows holding the channels
+                        within the time window in the catalog daily_lat_store
+                        kept with --catalog, instead of opening every hdf5
+                        file of each day. Can't be combined with --summary,
+                        --resolution or --format parquet.
+  -v, --verbose         Sets logging level to DEBUG.
+'''
+
+import logging
+import argparse
+import sys
+from latencyconverter.utilities.options import (
+    DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, PARQUET_FORMAT, PYRAMID_LEVELS)
+
+
+def main():
+
+    # Define arguments
+    argsparser = argparse.ArgumentParser()
+    argsparser.add_argument(
+        '-s',
+        '--source',
+        help='The destination folder daily_lat_store stored the hdf5 files ' +
+             'in.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-c',
+        '--channel',
+        help='Shell-style pattern of the channel ids to read, e.g. ' +
+             '\'QW.*.HN?\'. Can be repeated. Default: every channel',
+        action='append',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-b',
+        '--start',
+        help='The start of the time window, inclusive, e.g. 2022-02-13 or ' +
+             '2022-02-13T06:00:00. Times are UTC.',
+        required=True,
+        type=str
+    )
+    argsparser.add_argument(
+        '-e',
+        '--end',
+        help='The end of the time window, exclusive. Default: the end of ' +
+             'the day the window starts on.',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-o',
+        '--output',
+        help='Path to the csv file to write. Default: standard output',
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '-m',
+        '--summary',
+        action='store_true',
+        help='Write the summary statistics stored for each channel and day ' +
+             'instead of the latency data. Only reads the attributes of ' +
+             'the hdf5 files.'
+    )
+    argsparser.add_argument(
+        '-r',
+        '--resolution',
+        help='Write the count, min, mean and max network latency of each ' +
+             'bucket of this width instead of every packet, read from the ' +
+             'downsampled levels.',
+        choices=list(PYRAMID_LEVELS),
+        default=None,
+        type=str
+    )
+    argsparser.add_argument(
+        '--format',
+        help='The format the latency data was stored in. parquet reads the ' +
+             'partitioned dataset in the parquet folder of the source, and ' +
+             'can\'t be combined with --summary or --resolution. Default: ' +
+             f'{DEFAULT_OUTPUT_FORMAT}',
+        choices=list(OUTPUT_FORMATS),
+        default=DEFAULT_OUTPUT_FORMAT,
+        type=str
+    )
+    argsparser.add_argument(
+        '-k',
+        '--catalog',
+        action='store_true',
+        help='Look up the files and rows holding the channels within the ' +
+             'time window in the catalog daily_lat_store kept with ' +
+             '--catalog, instead of opening every hdf5 file of each day. ' +
+             'Can\'t be combined with --summary, --resolution or --format ' +
+             'parquet.'
+    )
+    argsparser.add_argument(
+        '-v',
+        '--verbose',
+        action='store_true',
+        help='Sets logging level to DEBUG.'
+    )
+
+    args = argsparser.parse_args()
+
+    if args.format == PARQUET_FORMAT and (args.summary or
+                                          args.resolution is not None):
+        argsparser.error('--format parquet can\'t be combined with ' +
+                         '--summary or --resolution')
+    if args.catalog and (args.summary or args.resolution is not None or
+                         args.format == PARQUET_FORMAT):
+        argsparser.error('--catalog can\'t be combined with --summary, ' +
+                         '--resolution or --format parquet')
+
+    # Set logging parameters
+    logging.basicConfig(
+        format='%(asctime)s:%(levelname)s:%(message)s',
+        datefmt="%Y-%m-%d %H:%M:%S",
+        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    # The readers import numpy, pandas and h5py, which take longer to load
+    # than parsing the arguments, so they are only imported once there is
+    # work
+    import numpy as np
+    import pandas as pd
+    from latencyconverter.utilities.pyramid import PYRAMID_DTYPE
+    from latencyconverter.utilities.reader import (
+        _window_days, read_dataframe, read_pyramid, read_summary)
+
+    channels = args.channel or '*'
+    if args.summary:
+        df = read_summary(args.source, channels, args.start, args.end)
+    elif args.resolution is not None:
+        levels = read_pyramid(args.source, channels, args.start, args.end,
+                              args.resolution)
+        df = pd.DataFrame(
+            np.concatenate(list(levels.values())) if levels
+            else np.empty(0, dtype=PYRAMID_DTYPE))
+        df.insert(0, 'channel', np.repeat(
+            np.array(list(levels), dtype=object),
+            [len(level) for level in levels.values()]))
+        df['start'] = pd.to_datetime(df['start'], unit='s', utc=True)
+    elif args.format == PARQUET_FORMAT:
+        from latencyconverter.utilities.columnar import read_columnar
+
+        # The end defaults to the end of the start day, as for hdf5, rather
+        # than scanning to the end of the dataset
+        start, end, _ = _window_days(args.start, args.end)
+        df = read_columnar(args.source, channels, start, end)
+    else:
+        df = read_dataframe(args.source, channels, args.start, args.end,
+                            catalog=args.catalog)
+    logging.info(f'Read {len(df)} rows from {df["channel"].nunique()} ' +
+                 'channels.')
+
+    df.to_csv(args.output if args.output is not None else sys.stdout,
+              index=False)
+    return 0
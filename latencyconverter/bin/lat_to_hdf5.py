@@ -2,19 +2,40 @@
 This command line tool is used to convert a single json or csv file to a
 compressed HDF5 format.
 
-usage: lat_to_hdf5 [-h] [-c CSV] [-j JSON] -d DESTINATION
+usage: lat_to_hdf5 [-h] [-c CSV] [-j JSON] -d DESTINATION [-z PROFILE]
+                   [-l {1,2}] [-e {c,pyarrow}] [-k CHUNKSIZE] [-v]
 
   -h, --help            show this help message and exit
   -c CSV, --csv CSV     Specify path to source csv file
   -j JSON, --json JSON  Specify path to source json file
   -d DESTINATION, --destination DESTINATION
                         Specify path to destination hdf5 file.
+  -z PROFILE, --compression PROFILE
+                        Compression profile to store the hdf5 datasets with.
+                        One of gzip9, gzip6, gzip4, lzf, gzip4-scaleoffset or
+                        none. Default: gzip9
+  -l {1,2}, --layout {1,2}
+                        Storage layout version of the hdf5 datasets: 1 for raw
+                        float timestamps and latencies, 2 for delta encoded
+                        integer timestamps and fixed-point latencies.
+                        Default: 1
+  -e {c,pyarrow,mmap}, --engine {c,pyarrow,mmap}
+                        Parser to read csv files with. pyarrow is faster on
+                        large files, and mmap parses the memory-mapped file
+                        with pyarrow, which is faster still. Both need
+                        pyarrow, which must be installed separately.
+                        Default: c
+  -k CHUNKSIZE, --chunksize CHUNKSIZE
+                        Read csv files this many rows at a time to bound
+                        memory use. Requires the c engine. Default: whole file
+  -v, --verbose         Sets logging level to DEBUG.
 
 '''
 import logging
 import argparse
-from latencyconverter.utilities.csv_to_hdf5 import store_csv
-from latencyconverter.utilities.json_to_hdf5 import store_json
+from latencyconverter.utilities.compression import DEFAULT_PROFILE, PROFILES
+from latencyconverter.utilities.options import (
+    CSV_ENGINES, DEFAULT_CSV_ENGINE, DEFAULT_LAYOUT, LAYOUTS)
 
 
 def main():
@@ -47,6 +68,46 @@ def main():
         required=True,
         type=str
     )
+    argsparser.add_argument(
+        '-z',
+        '--compression',
+        help='Compression profile to store the hdf5 datasets with. ' +
+             f'Default: {DEFAULT_PROFILE}',
+        choices=list(PROFILES),
+        default=DEFAULT_PROFILE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-l',
+        '--layout',
+        help='Storage layout version of the hdf5 datasets: 1 for raw ' +
+             'float timestamps and latencies, 2 for delta encoded integer ' +
+             'timestamps and fixed-point latencies. ' +
+             f'Default: {DEFAULT_LAYOUT}',
+        choices=list(LAYOUTS),
+        default=DEFAULT_LAYOUT,
+        type=int
+    )
+    argsparser.add_argument(
+        '-e',
+        '--engine',
+        help='Parser to read csv files with. pyarrow is faster on large ' +
+             'files, and mmap parses the memory-mapped file with pyarrow, ' +
+             'which is faster still. Both need pyarrow, which must be ' +
+             'installed separately. ' +
+             f'Default: {DEFAULT_CSV_ENGINE}',
+        choices=list(CSV_ENGINES),
+        default=DEFAULT_CSV_ENGINE,
+        type=str
+    )
+    argsparser.add_argument(
+        '-k',
+        '--chunksize',
+        help='Read csv files this many rows at a time to bound memory use. ' +
+             'Requires the c engine. Default: whole file',
+        default=None,
+        type=int
+    )
     argsparser.add_argument(
         '-v',
         '--verbose',
@@ -67,9 +128,15 @@ def main():
     if args.csv is not None and args.json is not None:
         raise ValueError("Can't specify csv file AND json file. Pick one!")
     elif args.csv is not None:
-        store_csv(args.csv, args.destination)
+        # The converters are only imported once there is a file to convert,
+        # as they import pandas and h5py
+        from latencyconverter.utilities.csv_to_hdf5 import store_csv
+        store_csv(args.csv, args.destination, args.compression, args.layout,
+                  args.engine, args.chunksize)
     elif args.json is not None:
-        store_json(args.json, args.destination)
+        from latencyconverter.utilities.json_to_hdf5 import store_json
+        store_json(args.json, args.destination, args.compression,
+                   args.layout)
     else:
         raise FileNotFoundError("No source file specified!")
 
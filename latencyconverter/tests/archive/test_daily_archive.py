@@ -0,0 +1,177 @@
+from latencyconverter.utilities import archive
+from latencyconverter.utilities.file_search import archive_path
+from latencyconverter.utilities.reader import read_channels
+from datetime import date
+import h5py
+import numpy as np
+import os
+import pytest
+
+SECOND = 10**9
+
+
+def test_channel_group_name():
+    assert archive.channel_group_name('QW.QCN08.9J.HNZ') == 'QW/QCN08/9J.HNZ'
+    assert archive.channel_group_name('QW.QWCC01.HNN') == 'QW/QWCC01/HNN'
+
+
+# Data from several source files should be appended to the same channel, and
+# the index should cover every channel
+def test_daily_archive(tmp_path, make_columns):
+    filename = f'{tmp_path}/latency.hdf5'
+    with archive.DailyArchive(filename) as daily_archive:
+        daily_archive.append('QW.QCN08.9J.HNZ', make_columns(10 * SECOND, 2))
+        daily_archive.append('QW.QWCC01.HNN', make_columns(5 * SECOND, 1))
+        daily_archive.append('QW.QCN08.9J.HNZ', make_columns(12 * SECOND, 1))
+
+    with h5py.File(filename, 'r') as f:
+        assert list(f['QW/QCN08/9J.HNZ/timestamp']) == [10.0, 11.0, 12.0]
+        assert len(f['QW/QCN08/9J.HNZ/samples']) == 3
+        assert f['QW/QCN08/9J.HNZ'].attrs['sample rate'] == 100
+
+        index = {row['channel'].decode(): row for row in f['index'][()]}
+        assert set(index) == {'QW.QCN08.9J.HNZ', 'QW.QWCC01.HNN'}
+        assert index['QW.QCN08.9J.HNZ']['count'] == 3
+        assert index['QW.QCN08.9J.HNZ']['first timestamp'] == 10.0
+        assert index['QW.QCN08.9J.HNZ']['last timestamp'] == 12.0
+
+
+def compare_groups(expected: h5py.Group, actual: h5py.Group):
+    assert sorted(expected) == sorted(actual)
+    for name, item in expected.items():
+        if isinstance(item, h5py.Group):
+            compare_groups(item, actual[name])
+        else:
+            assert np.array_equal(item[()], actual[name][()]), item.name
+    assert sorted(expected.attrs) == sorted(actual.attrs)
+    for name, value in expected.attrs.items():
+        assert np.array_equal(value, actual.attrs[name]), name
+
+
+# Batching the appends of many files stores the same archive, writing the
+# datasets in whole chunks until it is closed
+def test_batched_archive(tmp_path, make_columns):
+    rows = 10000
+    files = []
+    for index in range(3):
+        seconds = np.arange(index * rows, (index + 1) * rows)
+        csv_columns = make_columns(index * rows * SECOND, rows)
+        csv_columns['data latency'] = np.full(rows, 3.5, dtype='float32')
+        csv_columns['sample rates'] = np.where(
+            seconds % 7000 < 100, 50, 100).astype('uint16')
+        json_columns = make_columns(index * rows * SECOND, rows // 10,
+                                    seconds=10)
+        json_columns['samples'] = np.empty(0, dtype='uint16')
+        files.append([('QW.QCN08.9J.HNZ', csv_columns),
+                      ('QW.QWCC01.HNN', json_columns)])
+    # A change of sample rate can't be joined to the packets held back
+    json_columns = make_columns(rows * 3 * SECOND, 1)
+    json_columns['samples'] = np.empty(0, dtype='uint16')
+    json_columns['sample rate'] = 200
+    files.append([('QW.QWCC01.HNN', json_columns)])
+
+    with archive.DailyArchive(f'{tmp_path}/daily.hdf5') as daily_archive:
+        for channels in files:
+            for channel, columns in channels:
+                daily_archive.append(channel, columns)
+
+    filename = f'{tmp_path}/batched.hdf5'
+    with archive.BatchedArchive(filename,
+                                flush_rows=archive.CHUNK_ROWS) as batched:
+        for channels in files:
+            for channel, columns in channels:
+                batched.append(channel, columns)
+        stored = batched.hdf5file['QW/QCN08/9J.HNZ/timestamp'].shape[0]
+        assert stored == 1 * archive.CHUNK_ROWS
+        assert batched.pending_rows['QW.QCN08.9J.HNZ'] == 3 * rows - stored
+
+    with h5py.File(f'{tmp_path}/daily.hdf5', 'r') as expected, \
+            h5py.File(filename, 'r') as actual:
+        compare_groups(expected, actual)
+        # Created with the latest file format, so lat_follow can use SWMR
+        assert actual.id.get_create_plist().get_version()[0] >= 3
+        assert len(actual['QW/QWCC01/HNN/samples']) == 0
+
+    with pytest.raises(ValueError):
+        archive.BatchedArchive(f'{tmp_path}/invalid.hdf5').append(
+            'QW', make_columns(SECOND, 1))
+
+
+# Packets of source files that overlap in time are merged by timestamp when
+# the archive is closed, so windows can be binary searched, and the rows of
+# each source cover where its packets went
+@pytest.mark.parametrize('archive_class', [archive.DailyArchive,
+                                           archive.BatchedArchive])
+def test_archive_overlapping_sources(tmp_path, archive_class,
+                                     make_columns):
+    filename = archive_path(str(tmp_path), date(1970, 1, 1))
+    os.makedirs(os.path.dirname(filename))
+    with archive_class(filename) as daily_archive:
+        for source, seconds in [('even.csv', range(0, 100, 2)),
+                                ('odd.csv', range(1, 100, 2)),
+                                ('late.csv', range(100, 102))]:
+            columns = make_columns(seconds.start * SECOND, len(seconds),
+                                   seconds.step)
+            columns['samples'] = np.array(seconds, dtype='uint16')
+            daily_archive.append('QW.QCN08.9J.HNZ', columns, source)
+
+    with h5py.File(filename, 'r') as f:
+        assert np.array_equal(f['QW/QCN08/9J.HNZ/timestamp'][()],
+                              np.arange(102))
+        assert np.array_equal(f['QW/QCN08/9J.HNZ/samples'][()],
+                              np.arange(102))
+        assert [(row['source'].decode(), row['start'], row['count'])
+                for row in f['sources'][()]] == [
+            ('even.csv', 0, 99), ('odd.csv', 1, 99), ('late.csv', 100, 2)]
+
+    channels = read_channels(str(tmp_path), '*', '1970-01-01T00:00:30',
+                             '1970-01-01T00:01:00')
+    assert list(channels['QW.QCN08.9J.HNZ']['samples']) == list(range(30, 60))
+
+
+# Only the channels appended to since the index was last written are
+# summarized again, so appending to an archive doesn't read every channel
+def test_archive_summarizes_touched(tmp_path, monkeypatch, make_columns):
+    filename = f'{tmp_path}/latency.hdf5'
+    with archive.DailyArchive(filename) as daily_archive:
+        daily_archive.append('QW.QCN08.9J.HNZ', make_columns(10 * SECOND, 2))
+        daily_archive.append('QW.QWCC01.HNN', make_columns(5 * SECOND, 1))
+
+    summarized = []
+    summarize = archive.DailyArchive._summarize
+
+    def record(self, channel_group):
+        summarized.append(channel_group.name)
+        summarize(self, channel_group)
+
+    monkeypatch.setattr(archive.DailyArchive, '_summarize', record)
+    with archive.DailyArchive(filename, 'a') as daily_archive:
+        daily_archive.append('QW.QCN08.9J.HNZ', make_columns(9 * SECOND, 1))
+
+    assert summarized == ['/QW/QCN08/9J.HNZ']
+    with h5py.File(filename, 'r') as f:
+        assert f['QW/QCN08/9J.HNZ'].attrs['latency count'] == 3
+        assert f['QW/QWCC01/HNN'].attrs['latency count'] == 1
+        assert list(f['QW/QCN08/9J.HNZ/timestamp']) == [9.0, 10.0, 11.0]
+        assert {row['channel'].decode(): row['count']
+                for row in f['index'][()]} == {'QW.QCN08.9J.HNZ': 3,
+                                               'QW.QWCC01.HNN': 1}
+
+
+# Appends stay chunk-aligned between flushes whatever the chunking of the
+# compression profile
+def test_batched_archive_profile(tmp_path, make_columns):
+    filename = f'{tmp_path}/batched.hdf5'
+    with archive.BatchedArchive(filename, profile='gzip6',
+                                flush_rows=archive.CHUNK_ROWS) as batched:
+        for index in range(5):
+            batched.append('QW.QCN08.9J.HNZ',
+                           make_columns(index * 10000 * SECOND, 10000))
+            dataset = batched.hdf5file.get('QW/QCN08/9J.HNZ/timestamp')
+            if dataset is not None:
+                assert dataset.chunks == (archive.CHUNK_ROWS,)
+                assert dataset.shape[0] % dataset.chunks[0] == 0
+        assert dataset.shape[0] == 3 * archive.CHUNK_ROWS
+
+    with h5py.File(filename, 'r') as f:
+        assert len(f['QW/QCN08/9J.HNZ/timestamp']) == 50000
@@ -0,0 +1,55 @@
+from latencyconverter.utilities import bulk_store
+import h5py
+import numpy as np
+
+
+# Converting with a process pool should produce the same output as converting
+# serially, and failures should be reported rather than raised
+def test_bulk_store_workers(tmp_path, write_csv):
+    files = []
+    for station in ['QCN08', 'QCN09']:
+        files.append(f'{tmp_path}/QW_{station}_9J_HNZ.csv')
+        write_csv(files[-1], f'QW.{station}.9J.HNZ')
+
+    bad_file = f'{tmp_path}/QW_QCN10_9J_HNZ.csv'
+    with open(bad_file, 'w') as f:
+        f.write('not,a,latency\nfile,at,all\n')
+    files.append(bad_file)
+    files.append(f'{tmp_path}/QW_QCN08_TimingError.csv')
+
+    (tmp_path / 'serial').mkdir()
+    (tmp_path / 'parallel').mkdir()
+    serial = bulk_store.bulk_store(files, f'{tmp_path}/serial')
+    parallel = bulk_store.bulk_store(files, f'{tmp_path}/parallel',
+                                     workers=2)
+
+    assert [result.status for result in serial] == [
+        'converted', 'converted', 'failed', 'skipped']
+    assert ([result.status for result in parallel] ==
+            [result.status for result in serial])
+    assert bulk_store.summarize(parallel) == 1
+
+    for station in ['QCN08', 'QCN09']:
+        name = f'QW_{station}_9J_HNZ.csv.hdf5'
+        with h5py.File(f'{tmp_path}/serial/{name}', 'r') as s, \
+                h5py.File(f'{tmp_path}/parallel/{name}', 'r') as p:
+            group = f'QW.{station}.9J.HNZ'
+            for dataset in ['timestamp', 'network latency', 'samples']:
+                assert np.array_equal(s[group][dataset][()],
+                                      p[group][dataset][()])
+
+
+# In archive mode every file's channels end up in the one archive
+def test_bulk_store_archive(tmp_path, write_csv):
+    files = []
+    for station in ['QCN08', 'QCN09']:
+        files.append(f'{tmp_path}/QW_{station}_9J_HNZ.csv')
+        write_csv(files[-1], f'QW.{station}.9J.HNZ')
+
+    results = bulk_store.bulk_store(files, str(tmp_path), workers=2,
+                                    archive=f'{tmp_path}/latency.hdf5')
+
+    assert bulk_store.summarize(results) == 0
+    with h5py.File(f'{tmp_path}/latency.hdf5', 'r') as f:
+        assert len(f['index']) == 2
+        assert len(f['QW/QCN09/9J.HNZ/timestamp']) == 2
@@ -0,0 +1,133 @@
+from latencyconverter.utilities import catalog, daily_store, reader
+from latencyconverter.utilities.archive import BatchedArchive
+from latencyconverter.utilities.file_search import archive_path
+from datetime import date
+import numpy as np
+import os
+import pytest
+
+HOUR = 3600 * 10**9
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+
+
+# Daily runs record the channels of each output, are idempotent, and fill in
+# outputs missing from the catalog
+def test_store_days_catalog(tmp_path, write_csv):
+    source = tmp_path / 'source'
+    for day in ['2021/01/01', '2021/01/02']:
+        (source / day).mkdir(parents=True)
+        for station in ['QCN08', 'QCN09']:
+            write_csv(f'{source}/{day}/QW_{station}_9J_HNZ.csv',
+                      f'QW.{station}.9J.HNZ')
+    destination = f'{tmp_path}/out'
+    path = catalog.catalog_path(destination)
+
+    def store():
+        daily_store.store_days(date(2021, 1, 1), date(2021, 1, 2),
+                               str(source), destination, workers=2,
+                               catalog=True)
+        with catalog.Catalog(path) as day_catalog:
+            return day_catalog.find('QW.QCN08.*')
+
+    extents = store()
+    assert [(os.path.relpath(extent.output, destination), extent.start_row,
+             extent.stop_row) for extent in extents] == [
+        ('2021/01/01/QW_QCN08_9J_HNZ.csv.hdf5', 0, 2),
+        ('2021/01/02/QW_QCN08_9J_HNZ.csv.hdf5', 0, 2)]
+    assert extents[0].source == f'{source}/2021/01/01/QW_QCN08_9J_HNZ.csv'
+    assert extents[0].sample_rate == 100
+    assert extents[0].latency_min == pytest.approx(2.3)
+    assert extents[0].latency_max == pytest.approx(2.4)
+    assert extents[0].last_timestamp - extents[0].first_timestamp == (
+        pytest.approx(0.1))
+
+    assert store() == extents
+    os.remove(path)
+    assert store() == extents
+
+    with pytest.raises(ValueError):
+        daily_store.store_day(date(2021, 1, 1), str(source), destination,
+                              output_format='parquet', catalog=True)
+
+
+# The rows appended to an archive from each source file are cataloged, and
+# reads only open the files and rows that cover the window
+def test_archive_extents(tmp_path, make_columns):
+    day = archive_path(str(tmp_path), date(2021, 2, 13))
+    os.makedirs(os.path.dirname(day))
+    with BatchedArchive(day, flush_rows=1) as archive:
+        for hour in range(3):
+            archive.append('QW.QCN08.9J.HNZ',
+                           make_columns(START + hour * HOUR, 3600,
+                                        latency=hour),
+                           f'hour{hour}.csv')
+        archive.append('QW.QCN09.9J.HNZ', make_columns(START, 10))
+
+    path = catalog.catalog_path(str(tmp_path))
+    with catalog.Catalog(path) as archive_catalog:
+        assert archive_catalog.index_archive(day) == 4
+        extents = archive_catalog.find('QW.QCN08.*', START / 1e9 + 3600,
+                                       START / 1e9 + 7200)
+        assert [(extent.source, extent.start_row, extent.stop_row,
+                 extent.latency_max) for extent in extents] == [
+            ('hour1.csv', 3600, 7200, 1.0)]
+        assert [extent.source for extent in archive_catalog.find(
+            'QW.QCN0[!8].*')] == [None]
+
+    window = ('2021-02-13T00:59:00', '2021-02-13T02:00:30')
+    expected = reader.read_channels(str(tmp_path), '*', *window)
+    actual = reader.read_channels(str(tmp_path), '*', *window, catalog=True)
+    assert list(actual) == list(expected) == ['QW.QCN08.9J.HNZ']
+    for name in expected['QW.QCN08.9J.HNZ']:
+        assert np.array_equal(actual['QW.QCN08.9J.HNZ'][name],
+                              expected['QW.QCN08.9J.HNZ'][name])
+    assert len(actual['QW.QCN08.9J.HNZ']['timestamp']) == 60 + 3600 + 30
+
+
+# Rows without a source file that sorting put between the rows of source
+# files, such as those lat_follow appends late, are still cataloged
+def test_archive_extents_uncovered(tmp_path, make_columns):
+    day = archive_path(str(tmp_path), date(2021, 2, 13))
+    os.makedirs(os.path.dirname(day))
+    with BatchedArchive(day) as archive:
+        for hour in [0, 2]:
+            archive.append('QW.QCN08.9J.HNZ',
+                           make_columns(START + hour * HOUR, 3600),
+                           f'hour{hour}.csv')
+        archive.append('QW.QCN08.9J.HNZ', make_columns(START + HOUR, 3600))
+
+    assert [(extent.source, extent.start_row, extent.stop_row)
+            for extent in catalog.file_extents(day)] == [
+        ('hour0.csv', 0, 3600), ('hour2.csv', 7200, 10800),
+        (None, 3600, 7200)]
+
+    path = catalog.catalog_path(str(tmp_path))
+    with catalog.Catalog(path) as archive_catalog:
+        archive_catalog.index_archive(day)
+    window = ('2021-02-13T01:00:00', '2021-02-13T01:30:00')
+    expected = reader.read_channels(str(tmp_path), '*', *window)
+    actual = reader.read_channels(str(tmp_path), '*', *window, catalog=True)
+    assert len(expected['QW.QCN08.9J.HNZ']['timestamp']) > 0
+    assert np.array_equal(actual['QW.QCN08.9J.HNZ']['timestamp'],
+                          expected['QW.QCN08.9J.HNZ']['timestamp'])
+
+
+# Existing destination folders can be indexed after the fact, with missing
+# files removed from the catalog
+def test_index_destination(tmp_path, write_csv):
+    source = tmp_path / 'source' / '2021' / '01' / '01'
+    source.mkdir(parents=True)
+    write_csv(f'{source}/QW_QCN08_9J_HNZ.csv', 'QW.QCN08.9J.HNZ')
+    destination = f'{tmp_path}/out'
+    daily_store.store_day(date(2021, 1, 1), f'{tmp_path}/source',
+                          destination)
+    path = catalog.catalog_path(destination)
+    with catalog.Catalog(path) as destination_catalog:
+        destination_catalog.replace(f'{destination}/gone.hdf5', [
+            catalog.Extent('QW.QCN09.9J.HNZ', None, '', 0, 1, 0.0, 1.0, 1)])
+
+    assert catalog.index_destination(destination) == 1
+    with catalog.Catalog(path) as destination_catalog:
+        extents = destination_catalog.find()
+    assert [extent.channel for extent in extents] == ['QW.QCN08.9J.HNZ']
+    assert extents[0].source == f'{source}/QW_QCN08_9J_HNZ.csv'
@@ -0,0 +1,20 @@
+from latencyconverter.utilities import channels
+from pandas import DataFrame
+
+
+def test_partition_channels():
+    df = DataFrame({
+        'channel': ['B', 'A', 'B', 'A', 'B'],
+        'value': [0, 1, 2, 3, 4]
+    })
+    groups = dict(channels.partition_channels(df, ['value']))
+
+    assert list(groups.keys()) == ['A', 'B']
+    # Rows keep their original order within a channel
+    assert list(groups['A']['value']) == [1, 3]
+    assert list(groups['B']['value']) == [0, 2, 4]
+
+
+def test_partition_channels_empty():
+    df = DataFrame({'channel': [], 'value': []})
+    assert list(channels.partition_channels(df, ['value'])) == []
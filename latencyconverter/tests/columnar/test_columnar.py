@@ -0,0 +1,114 @@
+from latencyconverter.bin import lat_query
+from latencyconverter.utilities import bulk_store
+from latencyconverter.tests.pipeline.test_run_pipeline import make_files
+import glob
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+columnar = pytest.importorskip('latencyconverter.utilities.columnar')
+
+DAY = 86400 * 10**9
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+
+
+# Channels are split by station and day, and read back filtered by channel
+# pattern and time window
+def test_read_columnar(tmp_path, make_columns):
+    rows = columnar.write_columnar(f'{tmp_path}/a.csv', [
+        ('QW.QCN08.9J.HNZ', make_columns(START + DAY - 100 * 10**9, 200,
+                                         data_latency=3.5)),
+        ('QW.QCN08.9J.LHZ', make_columns(START, 100, data_latency=3.5)),
+        ('QW.QCN09.9J.HNZ', make_columns(START, 100, data_latency=3.5))],
+        str(tmp_path))
+
+    assert rows == 400
+    assert sorted(os.path.relpath(path, f'{tmp_path}/parquet')
+                  for path in glob.glob(f'{tmp_path}/parquet/*/*/*')) == [
+        'network=QW/station=QCN08/date=2021-02-13',
+        'network=QW/station=QCN08/date=2021-02-14',
+        'network=QW/station=QCN09/date=2021-02-13']
+
+    df = columnar.read_columnar(str(tmp_path))
+    assert len(df) == 400
+    assert list(df['channel'].cat.categories) == [
+        'QW.QCN08.9J.HNZ', 'QW.QCN08.9J.LHZ', 'QW.QCN09.9J.HNZ']
+
+    df = columnar.read_columnar(str(tmp_path), 'QW.*.HNZ',
+                                '2021-02-13T23:59:30', '2021-02-14T00:00:10')
+    assert list(df['channel'].cat.categories) == ['QW.QCN08.9J.HNZ']
+    assert len(df) == 40
+    assert np.all(np.diff(df['timestamp'].astype('int64')) > 0)
+    assert str(df['timestamp'][0]) == '2021-02-13 23:59:30+00:00'
+
+    df = columnar.read_columnar(str(tmp_path), ['QW.QCN0[9].*'], '2021-02-13',
+                                '2021-02-13T00:00:05', columns=['samples'])
+    assert list(df.columns) == ['channel', 'timestamp', 'samples']
+    assert list(df['samples']) == [0, 1, 2, 3, 4]
+
+    with pytest.raises(ValueError):
+        columnar.read_columnar(str(tmp_path), columns=['latency'])
+    assert len(columnar.read_columnar(f'{tmp_path}/missing')) == 0
+
+
+# Converting a file again replaces the data it stored before, even in
+# partitions it no longer has data for
+def test_write_columnar_replaces(tmp_path, make_columns):
+    columnar.write_columnar(f'{tmp_path}/a.csv', [
+        ('QW.QCN08.9J.HNZ', make_columns(START, 100))], str(tmp_path))
+    columnar.write_columnar(f'{tmp_path}/b.csv', [
+        ('QW.QCN08.9J.HNZ', make_columns(START + 100 * 10**9, 10))],
+        str(tmp_path))
+    columnar.write_columnar(f'{tmp_path}/a.csv', [
+        ('QW.QCN08.9J.HNZ', make_columns(START + DAY, 50))], str(tmp_path))
+
+    df = columnar.read_columnar(str(tmp_path))
+    assert len(df) == 60
+    assert len(glob.glob(f'{tmp_path}/parquet/*/*/*/.*')) == 0
+
+
+# Both engines store the same rows as parquet, with the data latency and
+# samples of json channels left null
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_bulk_store_parquet(tmp_path, write_csv, pipelined):
+    files = make_files(tmp_path, write_csv)
+    (tmp_path / 'out').mkdir()
+    results = bulk_store.bulk_store(files, f'{tmp_path}/out', workers=2,
+                                    pipelined=pipelined,
+                                    output_format='parquet')
+
+    assert [result.status for result in results] == [
+        'converted', 'converted', 'converted', 'failed', 'skipped', 'failed']
+    assert [result.rows for result in results] == [2, 2, 1, 0, 0, 0]
+    assert not glob.glob(f'{tmp_path}/out/*.hdf5')
+
+    df = columnar.read_columnar(f'{tmp_path}/out')
+    assert len(df) == 5
+    json_rows = df[df['channel'] == 'QW.QCC02.HNZ']
+    assert json_rows['samples'].isna().all()
+    assert json_rows['network latency'].tolist() == [1.5]
+    assert df['samples'].dropna().tolist() == [556, 560, 556, 560]
+
+
+def test_bulk_store_parquet_archive(tmp_path):
+    with pytest.raises(ValueError):
+        bulk_store.bulk_store([], str(tmp_path), archive=f'{tmp_path}/a.h5',
+                              output_format='parquet')
+    with pytest.raises(ValueError):
+        bulk_store.bulk_store([], str(tmp_path), output_format='csv')
+
+
+# lat_query reads parquet up to the end of the start day without --end, as
+# it does hdf5
+def test_lat_query_parquet(tmp_path, make_columns, monkeypatch):
+    columnar.write_columnar(f'{tmp_path}/a.csv', [
+        ('QW.QCN08.9J.HNZ', make_columns(START + DAY - 100 * 10**9, 200))],
+        str(tmp_path))
+
+    output = f'{tmp_path}/query.csv'
+    monkeypatch.setattr('sys.argv', [
+        'lat_query', '-s', str(tmp_path), '-b', '2021-02-13T23:59:00',
+        '--format', 'parquet', '-o', output])
+    assert lat_query.main() == 0
+    assert len(pd.read_csv(output)) == 60
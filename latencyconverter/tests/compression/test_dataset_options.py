@@ -0,0 +1,49 @@
+from latencyconverter.utilities import compression
+from latencyconverter.utilities import csv_to_hdf5
+from pandas import DataFrame
+import h5py
+import pytest
+
+
+def test_dataset_options():
+    assert compression.dataset_options('gzip9', 'timestamp', 10) == {
+        'compression': 'gzip', 'compression_opts': 9}
+
+    options = compression.dataset_options('gzip4-scaleoffset', 'timestamp',
+                                          10)
+    assert options['scaleoffset'] == 6
+    assert options['shuffle']
+    # Chunks can't be larger than a fixed-size dataset
+    assert options['chunks'] == (10,)
+
+    # Only timestamps get the scale-offset filter
+    assert 'scaleoffset' not in compression.dataset_options(
+        'gzip4-scaleoffset', 'samples')
+
+    # Empty datasets can't be chunked, so are stored without filters
+    assert compression.dataset_options('lzf', 'samples', 0) == {}
+
+
+def test_dataset_options_fail():
+    with pytest.raises(ValueError):
+        compression.dataset_options('zstd', 'timestamp')
+
+
+# Every profile should round trip the data it is given
+@pytest.mark.parametrize('profile', list(compression.PROFILES))
+def test_profiles_round_trip(tmp_path, profile):
+    data = {
+        'timestamp': ['2022/02/13 00:00:05.430000',
+                      '2022/02/13 00:00:05.530000'],
+        'channel': ['QW.QCN08.9J.HNZ', 'QW.QCN08.9J.HNZ'],
+        'network latency': [2.5, 2.25],
+        'data latency': ['=556/100+2.3', '=560/100+2.4']
+    }
+    csv_to_hdf5.csv_to_h5py(f'{tmp_path}/test.hdf5', DataFrame(data),
+                            profile)
+
+    with h5py.File(f'{tmp_path}/test.hdf5', mode='r') as f:
+        assert list(f['QW.QCN08.9J.HNZ/network latency']) == [2.5, 2.25]
+        assert list(f['QW.QCN08.9J.HNZ/samples']) == [556, 560]
+        timestamps = f['QW.QCN08.9J.HNZ/timestamp']
+        assert timestamps[1] - timestamps[0] == pytest.approx(0.1)
@@ -0,0 +1,51 @@
+from pandas import DataFrame
+from typing import Optional
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def write_csv():
+    '''
+    Returns a function writing a small latency csv file of a channel.
+    '''
+    def write(path: str, channel: str):
+        DataFrame({
+            'timestamp': ['2022/02/13 00:00:05.430000',
+                          '2022/02/13 00:00:05.530000'],
+            'channel': [channel, channel],
+            'network latency': [2.3, 2.4],
+            'data latency': ['=556/100+2.3', '=560/100+2.4']
+        }).to_csv(path, index=False)
+
+    return write
+
+
+@pytest.fixture
+def make_columns():
+    '''
+    Returns a function making the columns of a channel, with rows packets
+    every seconds seconds from the first timestamp, in nanoseconds. The
+    network latency is either constant or given for each packet, and a
+    constant data latency is only included when given.
+    '''
+    def make(
+        first: int,
+        rows: int,
+        seconds: int = 1,
+        latency=2.5,
+        data_latency: Optional[float] = None
+    ) -> dict:
+        columns = {
+            'timestamp': (first +
+                          np.arange(rows, dtype='int64') * seconds * 10**9),
+            'network latency': np.array(np.broadcast_to(latency, rows),
+                                        dtype='float64'),
+            'samples': np.arange(rows, dtype='uint16'),
+            'sample rate': 100
+        }
+        if data_latency is not None:
+            columns['data latency'] = np.full(rows, data_latency)
+        return columns
+
+    return make
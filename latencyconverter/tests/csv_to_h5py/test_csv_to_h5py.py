@@ -22,6 +22,30 @@ def test_csv_to_h5py():
         assert 'sample rate' in list(f['QW.QCN08.9J.HNZ'].attrs.keys())
 
         expected_timestamp = datetime.datetime.strptime(
-            '2022/02/13 00:00:05.430000', "%Y/%m/%d %H:%M:%S.%f").timestamp()
+            '2022/02/13 00:00:05.430000', "%Y/%m/%d %H:%M:%S.%f").replace(
+                tzinfo=datetime.timezone.utc).timestamp()
 
         assert f['/QW.QCN08.9J.HNZ/timestamp'][0] == expected_timestamp
+
+
+# Each channel group must only hold that channel's rows
+def test_csv_to_h5py_channel_lengths(tmp_path):
+    data = {
+                'timestamp': ['2022/02/13 00:00:05.430000',
+                              '2022/02/13 00:00:05.530000',
+                              '2022/02/13 00:00:05.630000'],
+                'channel': ['QW.QCN08.9J.HNZ', 'QW.QCN08.9J.HNN',
+                            'QW.QCN08.9J.HNZ'],
+                'network latency': ['2.3', '4.5', '2.4'],
+                'data latency': ['=556/100+2.3', '=560/100+4.5',
+                                 '=556/100+2.4']
+           }
+    csv_to_hdf5.csv_to_h5py(f'{tmp_path}/test.hdf5', DataFrame(data))
+
+    with h5py.File(f'{tmp_path}/test.hdf5', mode='r') as f:
+        for dataset in ['timestamp', 'network latency', 'samples']:
+            assert len(f[f'QW.QCN08.9J.HNZ/{dataset}']) == 2
+            assert len(f[f'QW.QCN08.9J.HNN/{dataset}']) == 1
+
+        assert list(f['QW.QCN08.9J.HNN/network latency']) == [4.5]
+        assert list(f['QW.QCN08.9J.HNN/samples']) == [560]
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from latencyconverter.utilities import csv_to_hdf5
+
+CSV = '''timestamp,channel,network latency,data latency,extra
+2022/02/13 00:00:00.100000,QW.QCN08.9J.HNZ,2.3,=556/100+2.3,a
+2022/02/13 00:00:00.200000,QW.QCN08.9J.HNN,1.5,=560/100+1.5,b
+2022/02/13 00:00:00.300000,QW.QCN08.9J.HNZ,2.5,=558/100+2.5,c
+2022/02/13 00:00:00.400000,QW.QCN08.9J.HNN,,=557/200-0.5,d
+2022/02/13 00:00:00.500000,QW.QCN08.9J.HNZ,3.0,=560/100+3.0,e
+'''
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    filename = tmp_path / 'QW_QCN08_9J_2022_43.csv'
+    filename.write_text(CSV)
+    return str(filename)
+
+
+# Test that only the known columns are read, with their declared types
+def test_load_csv_types(csv_file):
+    df = csv_to_hdf5.load_csv(csv_file)
+    assert list(df.columns) == csv_to_hdf5.CSV_COLUMNS
+    assert df['timestamp'].dtype.kind == 'M'
+    assert df['channel'].dtype == 'category'
+    assert df['network latency'].dtype == 'float32'
+
+
+def test_load_csv_unknown_engine(csv_file):
+    with pytest.raises(ValueError):
+        csv_to_hdf5.load_csv(csv_file, engine='python')
+
+
+def _assert_expected(channels):
+    assert [channel for channel, _ in channels] == [
+        'QW.QCN08.9J.HNN', 'QW.QCN08.9J.HNZ']
+    hnn, hnz = channels[0][1], channels[1][1]
+    assert hnz['timestamp'].dtype == 'int64'
+    assert list(hnz['timestamp'] - hnz['timestamp'][0]) == [
+        0, 200_000_000, 400_000_000]
+    assert hnz['timestamp'][0] == 1644710400_100_000_000
+    assert np.allclose(hnz['network latency'], [2.3, 2.5, 3.0])
+    assert list(hnz['samples']) == [556, 558, 560]
+    assert hnz['sample rate'] == 100
+    assert np.isnan(hnn['network latency'][1])
+    assert list(hnn['sample rates']) == [100, 200]
+    assert np.allclose(hnn['data latency'], [1.5, -0.5])
+
+
+def test_read_csv_channels(csv_file):
+    _assert_expected(list(csv_to_hdf5.read_csv_channels(csv_file)))
+
+
+def test_read_csv_channels_pyarrow(csv_file):
+    pytest.importorskip('pyarrow')
+    _assert_expected(list(csv_to_hdf5.read_csv_channels(
+        csv_file, engine='pyarrow')))
+
+
+# Test that reading in chunks joins each channel's rows back in file order
+def test_read_csv_channels_chunked(csv_file):
+    _assert_expected(list(csv_to_hdf5.read_csv_channels(
+        csv_file, chunksize=2)))
+
+
+def test_read_csv_channels_pyarrow_chunked(csv_file):
+    with pytest.raises(ValueError):
+        csv_to_hdf5.load_csv(csv_file, engine='pyarrow', chunksize=2)
+
+
+# The mmap engine parses the data latency values while loading the file
+def test_load_csv_mmap(csv_file):
+    pytest.importorskip('pyarrow')
+    df = csv_to_hdf5.load_csv(csv_file, engine='mmap')
+    assert df['timestamp'].dtype.kind == 'M'
+    assert df['channel'].dtype == 'category'
+    assert df['network latency'].dtype == 'float32'
+    assert df['samples'].dtype == 'uint16'
+    assert df['sample rates'].dtype == 'uint16'
+    assert df['data latency'].dtype == 'float64'
+
+
+def test_read_csv_channels_mmap(csv_file):
+    pytest.importorskip('pyarrow')
+    _assert_expected(list(csv_to_hdf5.read_csv_channels(
+        csv_file, engine='mmap')))
+
+
+def test_read_csv_channels_mmap_malformed(tmp_path):
+    pytest.importorskip('pyarrow')
+    filename = tmp_path / 'QW_QCN08_9J_2022_43.csv'
+    filename.write_text(CSV.replace('=560/100+3.0', '=560/100'))
+    with pytest.raises(ValueError, match='560/100'):
+        csv_to_hdf5.load_csv(str(filename), engine='mmap')
+
+
+def test_read_csv_channels_mmap_chunked(csv_file):
+    with pytest.raises(ValueError):
+        csv_to_hdf5.load_csv(csv_file, engine='mmap', chunksize=2)
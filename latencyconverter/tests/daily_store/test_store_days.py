@@ -0,0 +1,29 @@
+from latencyconverter.utilities import daily_store
+from datetime import date
+import os
+
+
+# Every day of a range is converted, with days scheduled across workers, and
+# a day without any files is reported as missing rather than failing the run
+def test_store_days(tmp_path, write_csv):
+    source = tmp_path / 'source'
+    for day in ['2021/01/01', '2021/01/03']:
+        (source / day).mkdir(parents=True)
+        write_csv(f'{source}/{day}/QW_QCN08_9J_HNZ.csv', 'QW.QCN08.9J.HNZ')
+
+    serial = daily_store.store_days(date(2021, 1, 1), date(2021, 1, 3),
+                                    str(source), f'{tmp_path}/serial')
+    parallel = daily_store.store_days(date(2021, 1, 1), date(2021, 1, 3),
+                                      str(source), f'{tmp_path}/parallel',
+                                      workers=2)
+
+    for day_results in [serial, parallel]:
+        assert [d.working_date for d in day_results] == [
+            date(2021, 1, 1), date(2021, 1, 2), date(2021, 1, 3)]
+        assert [d.missing for d in day_results] == [False, True, False]
+        assert [r.rows for r in day_results[0].results] == [2]
+        assert day_results[2].results[0].status == 'converted'
+
+    for day in ['2021/01/01', '2021/01/03']:
+        assert os.path.exists(f'{tmp_path}/parallel/{day}/' +
+                              'QW_QCN08_9J_HNZ.csv.hdf5')
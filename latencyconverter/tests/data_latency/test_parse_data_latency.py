@@ -0,0 +1,64 @@
+from latencyconverter.utilities import csv_to_hdf5, data_latency
+from pandas import DataFrame
+import h5py
+import numpy as np
+import pytest
+
+
+def test_parse_data_latency():
+    samples, rates, latency = data_latency.parse_data_latency(
+        ['=556/100+2.3', '=560/200+4.5', '=1/50+0'])
+
+    assert samples.dtype == 'uint16' and rates.dtype == 'uint16'
+    assert list(samples) == [556, 560, 1]
+    assert list(rates) == [100, 200, 50]
+    assert list(latency) == [2.3, 4.5, 0.0]
+
+
+# Negative latencies are parsed, and malformed values raise
+def test_parse_data_latency_fallback():
+    _, _, latency = data_latency.parse_data_latency(
+        ['=556/100+2.3', '=556/100-0.5'])
+    assert list(latency) == [2.3, -0.5]
+
+    with pytest.raises(ValueError, match='556/100'):
+        data_latency.parse_data_latency(['=556/100+2.3', '556/100'])
+    with pytest.raises(ValueError):
+        data_latency.parse_data_latency(['=556/100+2.3', np.nan])
+
+
+# The pyarrow parser agrees with the pandas one, and reports bad values
+def test_parse_arrow_data_latency():
+    pa = pytest.importorskip('pyarrow')
+    values = ['=556/100+2.3', '=560/200-0.5', '1/50+1e-2']
+    for expected, parsed in zip(
+            data_latency.parse_data_latency(values),
+            data_latency.parse_arrow_data_latency(pa.array(values))):
+        assert parsed.dtype == expected.dtype
+        assert list(parsed) == list(expected)
+
+    with pytest.raises(ValueError, match='556/100'):
+        data_latency.parse_arrow_data_latency(
+            pa.array(['=556/100+2.3', '556/100']))
+
+
+# The data latency is stored, and sample rate changes are recorded
+def test_csv_to_h5py_data_latency(tmp_path):
+    data = {
+        'timestamp': ['2022/02/13 00:00:05.430000',
+                      '2022/02/13 00:00:05.530000',
+                      '2022/02/13 00:00:05.630000'],
+        'channel': ['QW.QCN08.9J.HNZ'] * 3,
+        'network latency': [2.3, 2.4, 2.5],
+        'data latency': ['=556/100+2.3', '=556/200+2.4', '=556/200+2.5']
+    }
+    csv_to_hdf5.csv_to_h5py(f'{tmp_path}/test.hdf5', DataFrame(data),
+                            layout=2)
+
+    with h5py.File(f'{tmp_path}/test.hdf5', mode='r') as f:
+        group = f['QW.QCN08.9J.HNZ']
+        assert list(group['data latency']) == [2300000, 2400000, 2500000]
+        assert group.attrs['sample rate'] == 100
+        assert list(group.attrs['sample rate change values']) == [200]
+        assert np.isclose(group.attrs['sample rate change times'][0],
+                          1644710405.53)
@@ -0,0 +1,73 @@
+from latencyconverter.utilities import encoding
+from latencyconverter.utilities import json_to_hdf5
+from pandas import DataFrame
+import h5py
+import numpy as np
+import pytest
+
+
+def encoding_columns() -> dict:
+    return {
+        'timestamp': np.array([1644710400999988426, 1644710401999988427,
+                               1644710402999988425], dtype='int64'),
+        'network latency': np.array([2.408992, 2.5, 300000.25]),
+        'samples': np.array([556, 560, 556], dtype='uint16'),
+        'sample rate': 100
+    }
+
+
+def test_encode_channel():
+    datasets, attrs = encoding.encode_channel(encoding_columns(),
+                                              encoding.ENCODED_LAYOUT)
+
+    assert attrs['layout version'] == 2
+    assert attrs['timestamp encoding'] == 'delta'
+    assert list(datasets['timestamp'][1:]) == [1000000001, 999999998]
+    assert list(datasets['network latency']) == [2408992, 2500000,
+                                                 300000250000]
+
+
+def test_encode_channel_fail():
+    with pytest.raises(ValueError):
+        encoding.encode_channel(encoding_columns(), 3)
+
+
+# Both layouts should decode back to the values that were stored, with the
+# encoded layout keeping full precision
+@pytest.mark.parametrize('layout', encoding.LAYOUTS)
+def test_decode_channel(tmp_path, layout):
+    columns = encoding_columns()
+    datasets, attrs = encoding.encode_channel(columns, layout)
+    with h5py.File(f'{tmp_path}/test.hdf5', 'w') as f:
+        group = f.create_group('channel')
+        group.attrs.update(attrs)
+        for name, data in datasets.items():
+            group.create_dataset(name, data=data)
+
+    with h5py.File(f'{tmp_path}/test.hdf5', 'r') as f:
+        decoded = encoding.decode_channel(f['channel'])
+
+    assert np.allclose(decoded['timestamp'],
+                       columns['timestamp'] / 1e9, rtol=0, atol=1e-6)
+    assert np.array_equal(decoded['samples'], columns['samples'])
+    if layout == encoding.ENCODED_LAYOUT:
+        assert np.array_equal(decoded['timestamp_ns'], columns['timestamp'])
+        assert np.allclose(decoded['network latency'],
+                           columns['network latency'], rtol=0, atol=1e-9)
+
+
+# Fractional json latencies must no longer be truncated to integers
+def test_json_latency_precision(tmp_path):
+    data = {
+        'channel': ['QW.QWCC01.HNN'],
+        'starttime': ['2022-02-13T00:00:00.999988426Z'],
+        'latency': [2.408992]
+    }
+    json_to_hdf5.json_to_h5py(f'{tmp_path}/test.hdf5', DataFrame(data),
+                              layout=encoding.ENCODED_LAYOUT)
+
+    with h5py.File(f'{tmp_path}/test.hdf5', 'r') as f:
+        decoded = encoding.decode_channel(f['QW.QWCC01.HNN'])
+
+    assert decoded['timestamp_ns'][0] == 1644710400999988426
+    assert decoded['network latency'][0] == pytest.approx(2.408992)
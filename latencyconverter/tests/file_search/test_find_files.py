@@ -0,0 +1,38 @@
+from latencyconverter.utilities import file_search
+from datetime import date
+
+
+def make_day(source, day: str, names: list):
+    directory = source / day
+    directory.mkdir(parents=True)
+    for name in names:
+        (directory / name).write_text('data')
+
+
+# Files are found across a date range, in paths containing spaces, and days
+# without a directory are skipped
+def test_find_files(tmp_path):
+    source = tmp_path / 'latency archive'
+    make_day(source, '2021/01/01', ['QW_QCN08_9J_HNZ_2022_43.csv',
+                                    'QW_QCN08_9J_LHZ_2022_43.csv',
+                                    'QW.QCC01.2022.043.json',
+                                    'notes.txt'])
+    make_day(source, '2021/01/03', ['QW_QCN09_9J_HNN_2022_45.csv'])
+
+    files = file_search.find_files(date(2021, 1, 1), date(2021, 1, 3),
+                                   str(source))
+
+    assert [f.file_type for f in files] == ['csv', 'json', 'csv']
+    assert files[0].path == (f'{source}/2021/01/01/' +
+                             'QW_QCN08_9J_HNZ_2022_43.csv')
+    assert files[0].size == 4
+    assert files[2].date == date(2021, 1, 3)
+    assert file_search.count_by_type(files) == {'csv': 2, 'json': 1}
+
+
+def test_get_files_spaces(tmp_path):
+    source = tmp_path / 'latency archive'
+    make_day(source, '2021/01/01', ['QW.QCC01.2022.043.json'])
+
+    assert file_search.get_files(date(2021, 1, 1), str(source)) == [
+        f'{source}/2021/01/01/QW.QCC01.2022.043.json']
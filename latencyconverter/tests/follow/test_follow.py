@@ -0,0 +1,107 @@
+from datetime import date
+import json
+import os
+import h5py
+import numpy as np
+from latencyconverter.utilities import follow
+from latencyconverter.utilities.file_search import (
+    archive_path, day_directory)
+from latencyconverter.utilities.reader import read_channels
+
+DAY = date(2022, 2, 13)
+HEADER = 'timestamp,channel,network latency,data latency\n'
+
+
+def csv_line(second: int, latency: float = 2.5) -> str:
+    return (f'2022/02/13 00:00:{second:02d}.000000,QW.QCN08.9J.HNZ,' +
+            f'{latency},=556/100+{latency}\n')
+
+
+def make_source(tmp_path) -> str:
+    directory = day_directory(f'{tmp_path}/source', DAY)
+    os.makedirs(directory)
+    return f'{directory}/QW_QCN08_9J_HNZ_2022_44.csv'
+
+
+# Only complete lines are parsed, and a partial line is picked up once it is
+# finished
+def test_tail_csv(tmp_path):
+    filename = make_source(tmp_path)
+    with open(filename, 'w') as source:
+        source.write(HEADER + csv_line(1) + csv_line(2) + csv_line(3)[:20])
+
+    channels, offset, header = follow.tail_csv(filename)
+    assert header == HEADER
+    assert len(channels[0][1]['timestamp']) == 2
+
+    with open(filename, 'a') as source:
+        source.write(csv_line(3)[20:])
+    channels, offset, header = follow.tail_csv(filename, offset, header)
+    assert len(channels[0][1]['timestamp']) == 1
+    assert offset == os.path.getsize(filename)
+
+    assert follow.tail_csv(filename, offset, header)[0] == []
+
+
+# New rows are appended to the archive on each poll, and can be read while it
+# is still open for writing
+def test_follow_appends(tmp_path):
+    filename = make_source(tmp_path)
+    destination = f'{tmp_path}/destination'
+    archive = archive_path(destination, DAY)
+    with open(filename, 'w') as source:
+        source.write(HEADER + csv_line(1) + csv_line(2))
+
+    state = follow.FollowState.load(follow.state_path(archive))
+    with follow.LiveArchive(archive) as live:
+        assert follow.poll_day(f'{tmp_path}/source', DAY, live, state) == 2
+
+        with open(filename, 'a') as source:
+            source.write(csv_line(3, 4.0))
+        assert follow.poll_day(f'{tmp_path}/source', DAY, live, state) == 1
+        assert follow.poll_day(f'{tmp_path}/source', DAY, live, state) == 0
+
+        with h5py.File(archive, 'r', swmr=True) as hdf5file:
+            dataset = hdf5file['QW/QCN08/9J.HNZ/network latency']
+            assert list(dataset[()]) == [2.5, 2.5, 4.0]
+
+    channels = read_channels(destination, '*', DAY)
+    assert list(channels['QW.QCN08.9J.HNZ']['samples']) == [556] * 3
+
+    with h5py.File(archive, 'r') as hdf5file:
+        channel_group = hdf5file['QW/QCN08/9J.HNZ']
+        assert hdf5file['index'][0]['count'] == 3
+        assert list(channel_group.attrs['sample rate counts']) == [3]
+        assert 'network latency 1m' in channel_group
+
+    # A restart resumes from the saved offset
+    with open(filename, 'a') as source:
+        source.write(csv_line(4))
+    assert follow.follow(f'{tmp_path}/source', destination, DAY,
+                         interval=0, polls=1) == 1
+
+
+# Json files are read again when they change, keeping only new intervals
+def test_reread_json(tmp_path):
+    filename = f'{tmp_path}/availability.json'
+    intervals = [{'startTime': f'2022-02-13T00:00:0{second}.000Z',
+                  'latency': {'maximum': 1.5}} for second in range(3)]
+
+    def write(count):
+        with open(filename, 'w') as json_file:
+            json.dump({'availability': [{'id': 'QW.QCC02.HNZ',
+                                         'intervals': intervals[:count]}]},
+                      json_file)
+
+    write(2)
+    channels, last = follow.reread_json(filename, {})
+    assert len(channels[0][1]['timestamp']) == 2
+
+    write(3)
+    channels, last = follow.reread_json(filename, last)
+    assert len(channels[0][1]['timestamp']) == 1
+    assert np.array_equal(channels[0][1]['network latency'], [1.5])
+
+    with open(filename, 'w') as json_file:
+        json_file.write('{"availability": [')
+    assert follow.reread_json(filename, last) == ([], last)
@@ -0,0 +1,132 @@
+from latencyconverter.utilities import bulk_store, file_search, formats
+from datetime import date
+from importlib import metadata
+import h5py
+import io
+import numpy as np
+import pytest
+
+
+def parse_lines(source):
+    '''
+    Parses files of 'channel timestamp latency' lines.
+    '''
+    if isinstance(source, str):
+        with open(source, 'rb') as lines_file:
+            data = lines_file.read()
+    else:
+        data = source.read()
+
+    channels = {}
+    for line in io.StringIO(data.decode()):
+        try:
+            channel, timestamp, latency = line.split()
+        except ValueError:
+            raise ValueError(f'Invalid line: {line!r}') from None
+        columns = channels.setdefault(channel, ([], []))
+        columns[0].append(int(timestamp))
+        columns[1].append(float(latency))
+
+    for channel, (timestamps, latencies) in channels.items():
+        yield channel, {
+            'timestamp': np.array(timestamps, dtype='int64'),
+            'network latency': np.array(latencies),
+            'samples': np.zeros(0, dtype='uint16'),
+            'sample rate': 0
+        }
+
+
+LINES_SOURCE = formats.SourceFormat(
+    name='lines',
+    patterns=('*.lat',),
+    extensions=('.lat',),
+    parser='latencyconverter.tests.formats.test_formats:parse_lines',
+    exclude=('*_draft*',),
+    lenient=True)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    '''
+    Gives each test its own copy of the registry, with entry points found.
+    '''
+    formats.source_formats()
+    monkeypatch.setattr(formats, '_REGISTRY', dict(formats._REGISTRY))
+    return formats
+
+
+def write_lines(path, rows):
+    with open(path, 'w') as lines_file:
+        for row in rows:
+            lines_file.write(' '.join(str(value) for value in row) + '\n')
+
+
+def test_match_format():
+    assert formats.match_format('a/QW_QCN08_9J_HNZ.csv').name == 'csv'
+    assert formats.match_format('a/availability.json').name == 'json'
+    assert formats.match_format('a/notes.csv.txt') is None
+    assert formats.CSV_SOURCE.excludes('a/QW_QCN08_TimingError.csv')
+    assert not formats.CSV_SOURCE.excludes('TimingError/QW_QCN08.csv')
+    assert formats.get_format('json').lenient
+    with pytest.raises(KeyError):
+        formats.get_format('lines')
+
+
+# A registered format is found by get_files, and converted through its
+# parser by both engines, with invalid files skipped
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_registered_format(tmp_path, registry, pipelined):
+    registry.register_format(LINES_SOURCE)
+    with pytest.raises(ValueError):
+        registry.register_format(LINES_SOURCE)
+
+    directory = tmp_path / 'source' / '2022' / '02' / '13'
+    directory.mkdir(parents=True)
+    write_lines(directory / 'QCN08.lat', [
+        ('QW.QCN08.9J.HNZ', 1644710400 * 10**9, 2.5),
+        ('QW.QCN08.9J.HNZ', 1644710401 * 10**9, 2.75),
+        ('QW.QCN08.9J.HNN', 1644710400 * 10**9, 3.0)])
+    write_lines(directory / 'QCN09.lat', [('not a latency line',)])
+    write_lines(directory / 'QCN10_draft.lat', [])
+
+    files = file_search.get_files(date(2022, 2, 13), f'{tmp_path}/source')
+    assert [path.split('/')[-1] for path in files] == [
+        'QCN08.lat', 'QCN09.lat', 'QCN10_draft.lat']
+
+    (tmp_path / 'out').mkdir()
+    results = bulk_store.bulk_store(files, f'{tmp_path}/out',
+                                    pipelined=pipelined)
+    assert [(result.status, result.rows) for result in results] == [
+        ('converted', 3), ('skipped', 0), ('skipped', 0)]
+    assert results[1].error is not None and results[2].error is None
+    assert not (tmp_path / 'out' / 'QCN09.lat.hdf5').exists()
+
+    with h5py.File(f'{tmp_path}/out/QCN08.lat.hdf5', 'r') as hdf5file:
+        assert sorted(hdf5file) == ['QW.QCN08.9J.HNN', 'QW.QCN08.9J.HNZ']
+        assert np.allclose(
+            hdf5file['QW.QCN08.9J.HNZ']['network latency'][()], [2.5, 2.75])
+
+
+# Formats are discovered through entry points, and broken entry points are
+# ignored
+def test_entry_points(monkeypatch, registry):
+    group = formats.ENTRY_POINT_GROUP
+    found = metadata.EntryPoints([
+        metadata.EntryPoint(
+            'lines', 'latencyconverter.tests.formats.test_formats:' +
+            'LINES_SOURCE', group),
+        metadata.EntryPoint(
+            'csv', 'latencyconverter.tests.formats.test_formats:' +
+            'LINES_SOURCE', group),
+        metadata.EntryPoint(
+            'broken', 'latencyconverter.tests.formats.missing:FORMAT', group),
+        metadata.EntryPoint(
+            'wrong', 'latencyconverter.tests.formats.test_formats:' +
+            'write_lines', group)])
+    monkeypatch.setattr(metadata, 'entry_points', lambda: found)
+    monkeypatch.setattr(formats, '_entry_points_loaded', False)
+
+    assert [source_format.name for source_format in
+            formats.source_formats()] == ['csv', 'json', 'lines']
+    assert formats.match_format('QCN08.lat') == LINES_SOURCE
+    assert file_search.file_patterns()['lines'] == ('*.lat',)
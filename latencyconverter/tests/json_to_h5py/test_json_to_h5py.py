@@ -1 +1,22 @@
-# from latencyconverter.utilities import json_to_hdf5
+from latencyconverter.utilities import json_to_hdf5
+from pandas import DataFrame
+import h5py
+
+
+# Each channel group must only hold that channel's rows
+def test_json_to_h5py_channel_lengths(tmp_path):
+    data = {
+        'channel': ['QW.QWCC01.HNN', 'QW.QWCC01.HNZ', 'QW.QWCC01.HNN'],
+        'starttime': ['2022-02-13T00:00:00.000000000Z',
+                      '2022-02-13T00:00:00.000000000Z',
+                      '2022-02-13T00:00:01.000000000Z'],
+        'latency': [2, 3, 4]
+    }
+    json_to_hdf5.json_to_h5py(f'{tmp_path}/test.hdf5', DataFrame(data))
+
+    with h5py.File(f'{tmp_path}/test.hdf5', mode='r') as f:
+        for dataset in ['timestamp', 'network latency']:
+            assert len(f[f'QW.QWCC01.HNN/{dataset}']) == 2
+            assert len(f[f'QW.QWCC01.HNZ/{dataset}']) == 1
+
+        assert list(f['QW.QWCC01.HNZ/network latency']) == [3]
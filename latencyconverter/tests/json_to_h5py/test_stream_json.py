@@ -0,0 +1,102 @@
+from latencyconverter.utilities import json_to_hdf5
+from latencyconverter.utilities.encoding import decode_channel
+from latencyconverter.utilities.json_stream import JsonStream
+from latencyconverter.utilities.timestamps import to_seconds
+import h5py
+import io
+import json
+import numpy as np
+import pytest
+
+
+def make_availability(intervals: int) -> dict:
+    return {
+        'availability': [
+            {
+                'id': f'QW.QWCC01.{component}',
+                'intervals': [
+                    {
+                        'startTime': f'2022-02-13T00:00:{i:02d}.999988426Z',
+                        'endTime': f'2022-02-13T00:00:{i:02d}.999988426Z',
+                        'latency': {
+                            'minimum': 1.5,
+                            'average': 2.0,
+                            'maximum': 2.408992 + i
+                        }
+                    } for i in range(intervals)
+                ]
+            } for component in ['HNN', 'HNZ']
+        ],
+        'totalChannels': 2
+    }
+
+
+# The streaming parser must agree with loading the whole document, including
+# when values, such as a number cut off right after its '.', straddle the
+# boundaries between chunks read from the file
+@pytest.mark.parametrize('chunk_size', list(range(1, 33)) + [65536])
+def test_stream_json(tmp_path, chunk_size):
+    source = f'{tmp_path}/availability.json'
+    with open(source, 'w') as f:
+        json.dump(make_availability(20), f, indent=2)
+
+    streamed = list(json_to_hdf5.stream_json(source, batch_size=6,
+                                             chunk_size=chunk_size))
+    loaded = list(json_to_hdf5.json_channels(json_to_hdf5.json_to_table(
+        json_to_hdf5.load_json(source))))
+
+    assert [channel for channel, _ in streamed] == ['QW.QWCC01.HNN',
+                                                    'QW.QWCC01.HNZ']
+    for (_, stream_columns), (_, load_columns) in zip(streamed, loaded):
+        for name in ['timestamp', 'network latency', 'samples']:
+            assert np.array_equal(stream_columns[name], load_columns[name])
+            assert stream_columns[name].dtype == load_columns[name].dtype
+
+
+# Numbers decoded on their own must not stop at a chunk boundary that falls
+# inside them, such as right after the '.' of '2.408992'
+@pytest.mark.parametrize('chunk_size', range(1, 33))
+def test_json_stream_numbers(chunk_size):
+    document = '[2.408992, 10.5, 300000.25, -1.5e-3, 7]'
+    stream = JsonStream(io.StringIO(document), chunk_size)
+
+    values = [stream.value() for _ in stream.elements()]
+    assert values == json.loads(document)
+
+
+def test_stream_json_fail(tmp_path):
+    source = f'{tmp_path}/dummy.json'
+    with open(source, 'w') as f:
+        json.dump({'something': [1, 2, 3]}, f)
+
+    with pytest.raises(ValueError):
+        list(json_to_hdf5.stream_json(source))
+
+
+# Entries are yielded as soon as they are read, so an entry repeating a
+# channel id is yielded again and merged into the channel's group when
+# written, and an entry without an id only loses that entry
+def test_stream_json_repeated_id(tmp_path):
+    availability = make_availability(4)
+    repeated = make_availability(8)['availability'][1]
+    repeated['intervals'] = repeated['intervals'][4:]
+    availability['availability'] += [
+        repeated, {'intervals': repeated['intervals']}]
+    # The repeated entry is placed before the entry it continues in time
+    availability['availability'][1:3] = availability['availability'][2:0:-1]
+    source = f'{tmp_path}/availability.json'
+    with open(source, 'w') as f:
+        json.dump(availability, f)
+
+    streamed = list(json_to_hdf5.stream_json(source))
+    assert [channel for channel, _ in streamed] == [
+        'QW.QWCC01.HNN', 'QW.QWCC01.HNZ', 'QW.QWCC01.HNZ']
+
+    assert json_to_hdf5.store_json(source, str(tmp_path)) == 12
+    with h5py.File(f'{tmp_path}/availability.json.hdf5', 'r') as hdf5file:
+        channel = decode_channel(hdf5file['QW.QWCC01.HNZ'])
+        assert np.array_equal(
+            channel['timestamp'],
+            to_seconds(np.sort(np.concatenate(
+                [columns['timestamp'] for _, columns in streamed[1:]]))))
+        assert hdf5file['QW.QWCC01.HNZ'].attrs['latency count'] == 8
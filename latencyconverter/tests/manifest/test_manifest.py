@@ -0,0 +1,103 @@
+from latencyconverter.utilities import bulk_store, manifest
+import os
+import pytest
+
+
+def run(files: list, destination: str, force: bool = False) -> list:
+    results = bulk_store.bulk_store(
+        files, destination,
+        manifest=manifest.Manifest.load(manifest.manifest_path(destination)),
+        force=force)
+    return [result.status for result in results]
+
+
+# Only new or modified files are converted again on later runs
+def test_manifest(tmp_path, write_csv):
+    files = []
+    for station in ['QCN08', 'QCN09']:
+        files.append(f'{tmp_path}/QW_{station}_9J_HNZ.csv')
+        write_csv(files[-1], f'QW.{station}.9J.HNZ')
+    (tmp_path / 'out').mkdir()
+    destination = f'{tmp_path}/out'
+
+    assert run(files, destination) == ['converted', 'converted']
+    assert run(files, destination) == ['unchanged', 'unchanged']
+
+    # A touched file with the same contents is still unchanged
+    os.utime(files[0], (0, 0))
+    assert run(files, destination) == ['unchanged', 'unchanged']
+
+    write_csv(files[1], 'QW.QCN10.9J.HNZ')
+    assert run(files, destination) == ['unchanged', 'converted']
+
+    # Outputs that went missing are converted again
+    os.remove(f'{destination}/QW_QCN08_9J_HNZ.csv.hdf5')
+    assert run(files, destination) == ['converted', 'unchanged']
+
+    assert run(files, destination, force=True) == ['converted', 'converted']
+
+
+# Invalid files skipped by lenient formats aren't recorded, so they are tried
+# again on later runs
+def test_manifest_invalid(tmp_path):
+    source = f'{tmp_path}/QW_QCN08_9J_HNZ.json'
+    with open(source, 'w') as f:
+        f.write('{"something": [1, 2, 3]}')
+    (tmp_path / 'out').mkdir()
+    destination = f'{tmp_path}/out'
+
+    assert run([source], destination) == ['skipped']
+    assert run([source], destination) == ['skipped']
+    assert manifest.Manifest.load(
+        manifest.manifest_path(destination)).entries == {}
+    assert not os.path.exists(f'{destination}/QW_QCN08_9J_HNZ.json.hdf5')
+
+
+# Invalid files are skipped the same way when converting into an archive,
+# whether or not the conversion is pipelined
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_manifest_invalid_archive(tmp_path, write_csv, pipelined):
+    files = [f'{tmp_path}/QW_QCN08_9J_HNZ.csv',
+             f'{tmp_path}/QW_QCN08_9J_HNZ.json']
+    write_csv(files[0], 'QW.QCN08.9J.HNZ')
+    with open(files[1], 'w') as f:
+        f.write('{"something": [1, 2, 3]}')
+    (tmp_path / 'out').mkdir()
+    destination = f'{tmp_path}/out'
+
+    results = bulk_store.bulk_store(
+        files, destination, archive=f'{destination}/latency.hdf5',
+        manifest=manifest.Manifest.load(manifest.manifest_path(destination)),
+        pipelined=pipelined)
+    assert [result.status for result in results] == ['converted', 'skipped']
+    assert bulk_store.summarize(results) == 0
+    assert list(manifest.Manifest.load(
+        manifest.manifest_path(destination)).entries) == [files[0]]
+
+
+# A file modified while it is converted is recorded as it was before, so it
+# is converted again on the next run
+@pytest.mark.parametrize('pipelined', [False, True])
+def test_manifest_modified(tmp_path, write_csv, monkeypatch, pipelined):
+    source = f'{tmp_path}/QW_QCN08_9J_HNZ.csv'
+    write_csv(source, 'QW.QCN08.9J.HNZ')
+    (tmp_path / 'out').mkdir()
+    destination = f'{tmp_path}/out'
+
+    def modify(filename):
+        state = manifest.file_state(filename)
+        write_csv(filename, 'QW.QCN10.9J.HNZ')
+        return state
+
+    module = 'pipeline' if pipelined else 'bulk_store'
+    monkeypatch.setattr(f'latencyconverter.utilities.{module}.file_state',
+                        modify)
+    results = bulk_store.bulk_store(
+        [source], destination,
+        manifest=manifest.Manifest.load(manifest.manifest_path(destination)),
+        pipelined=pipelined)
+    assert [result.status for result in results] == ['converted']
+
+    monkeypatch.undo()
+    assert run([source], destination) == ['converted']
+    assert run([source], destination) == ['unchanged']
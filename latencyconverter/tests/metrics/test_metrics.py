@@ -0,0 +1,60 @@
+from latencyconverter.utilities import bulk_store, metrics
+import json
+import time
+
+
+# Nested stages only record their own time, and nothing is recorded without
+# an active recorder
+def test_stage():
+    with metrics.stage('outer'):
+        pass
+
+    recorder = metrics.Metrics()
+    with metrics.recording(recorder):
+        with metrics.stage('outer'):
+            time.sleep(0.02)
+            with metrics.stage('inner'):
+                time.sleep(0.05)
+        for _ in metrics.timed_iter('items', range(3)):
+            metrics.count('items')
+
+    assert recorder.stages['inner'][0] >= 0.05
+    assert 0.02 <= recorder.stages['outer'][0] < 0.05
+    assert recorder.stages['items'][1] == 4
+    assert recorder.counters == {'items': 3}
+    assert metrics.Metrics.from_dict(recorder.as_dict()).stages == \
+        recorder.stages
+
+
+# Files converted with metrics report their stages and byte counts, which are
+# written per file and in total as JSON lines, or as totals for Prometheus
+def test_write_metrics(tmp_path, write_csv):
+    files = []
+    for station in ['QCN08', 'QCN09']:
+        files.append(f'{tmp_path}/QW_{station}_9J_HNZ.csv')
+        write_csv(files[-1], f'QW.{station}.9J.HNZ')
+    files.append(f'{tmp_path}/QW_QCN08_TimingError.csv')
+
+    results = bulk_store.bulk_store(files, str(tmp_path), metrics=True)
+    assert results[2].metrics is None
+    for result in results[:2]:
+        assert {'load_csv', 'parse_data_latency', 'write_datasets',
+                'convert'} <= set(result.metrics['stages'])
+        assert result.metrics['counters']['bytes_written'] > 0
+    assert bulk_store.bulk_store(files[:1], str(tmp_path))[0].metrics is None
+
+    metrics.write_metrics(f'{tmp_path}/metrics.jsonl', results, 1.5)
+    with open(f'{tmp_path}/metrics.jsonl') as metrics_file:
+        records = [json.loads(line) for line in metrics_file]
+    assert [record['type'] for record in records] == ['file', 'file',
+                                                      'total']
+    assert records[2]['files'] == {'converted': 2, 'skipped': 1}
+    assert records[2]['rows'] == 4
+    assert records[2]['counters']['channels'] == 2
+
+    metrics.write_metrics(f'{tmp_path}/metrics.prom', results, 1.5)
+    with open(f'{tmp_path}/metrics.prom') as metrics_file:
+        lines = metrics_file.read().splitlines()
+    assert 'latencyconverter_rows 4' in lines
+    assert 'latencyconverter_files{status="skipped"} 1' in lines
+    assert 'latencyconverter_run_seconds 1.5' in lines
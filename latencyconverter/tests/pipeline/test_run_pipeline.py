@@ -0,0 +1,70 @@
+from latencyconverter.utilities import bulk_store, pipeline
+import h5py
+import json
+import numpy as np
+
+
+def make_files(tmp_path, write_csv) -> list:
+    files = []
+    for station in ['QCN08', 'QCN09']:
+        files.append(f'{tmp_path}/QW_{station}_9J_HNZ.csv')
+        write_csv(files[-1], f'QW.{station}.9J.HNZ')
+
+    files.append(f'{tmp_path}/availability.json')
+    with open(files[-1], 'w') as json_file:
+        json.dump({'availability': [{
+            'id': 'QW.QCC02.HNZ',
+            'intervals': [{'startTime': '2022-02-13T00:00:05.000Z',
+                           'latency': {'maximum': 1.5}}]}]}, json_file)
+
+    bad_file = f'{tmp_path}/QW_QCN10_9J_HNZ.csv'
+    with open(bad_file, 'w') as f:
+        f.write('not,a,latency\nfile,at,all\n')
+    files.append(bad_file)
+    files.append(f'{tmp_path}/QW_QCN08_TimingError.csv')
+    files.append(f'{tmp_path}/missing.csv')
+    return files
+
+
+# The pipeline should write the same files as converting one at a time, and
+# report failures in file order
+def test_run_pipeline(tmp_path, write_csv):
+    files = make_files(tmp_path, write_csv)
+    (tmp_path / 'serial').mkdir()
+    (tmp_path / 'pipelined').mkdir()
+    serial = bulk_store.bulk_store(files, f'{tmp_path}/serial')
+    pipelined, stats = pipeline.run_pipeline(files, f'{tmp_path}/pipelined',
+                                             workers=2, prefetch=2)
+
+    assert [result.status for result in pipelined] == [
+        'converted', 'converted', 'converted', 'failed', 'skipped', 'failed']
+    assert ([result.status for result in pipelined] ==
+            [result.status for result in serial])
+    assert [result.rows for result in pipelined] == [2, 2, 1, 0, 0, 0]
+
+    for name, group in [('QW_QCN08_9J_HNZ.csv.hdf5', 'QW.QCN08.9J.HNZ'),
+                        ('availability.json.hdf5', 'QW.QCC02.HNZ')]:
+        with h5py.File(f'{tmp_path}/serial/{name}', 'r') as s, \
+                h5py.File(f'{tmp_path}/pipelined/{name}', 'r') as p:
+            for dataset in ['timestamp', 'network latency', 'samples']:
+                assert np.array_equal(s[group][dataset][()],
+                                      p[group][dataset][()])
+            assert set(s[group].attrs) == set(p[group].attrs)
+
+    assert stats.stages['read'].items == 4
+    assert stats.stages['encode'].items == 3
+    assert stats.stages['write'].items == 3
+    assert stats.queues['read'].peak <= 2
+    assert stats.as_dict()['queues']['write']['maxsize'] == 4
+
+
+def test_bulk_store_pipelined_archive(tmp_path, write_csv):
+    files = make_files(tmp_path, write_csv)[:3]
+    results = bulk_store.bulk_store(files, str(tmp_path), workers=2,
+                                    archive=f'{tmp_path}/latency.hdf5',
+                                    pipelined=True)
+
+    assert bulk_store.summarize(results) == 0
+    with h5py.File(f'{tmp_path}/latency.hdf5', 'r') as f:
+        assert len(f['index']) == 3
+        assert len(f['QW/QCN09/9J.HNZ/timestamp']) == 2
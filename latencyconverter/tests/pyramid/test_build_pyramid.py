@@ -0,0 +1,64 @@
+from latencyconverter.utilities import aggregate, pyramid, reader
+from latencyconverter.utilities.writer import channels_to_h5py
+from datetime import date
+import numpy as np
+import os
+
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+DAY = 86400 * 10**9
+
+
+# Coarser levels built from finer ones match levels built from the packets
+def test_build_pyramid(make_columns):
+    columns = make_columns(START, 8640, seconds=10,
+                           latency=np.arange(8640) % 60)
+    columns['network latency'][5] = np.nan
+    levels = pyramid.build_pyramid(columns['timestamp'],
+                                   columns['network latency'])
+
+    assert len(levels['1m']) == 1440
+    assert levels['1m']['count'][0] == 5
+    assert levels['1m']['count'][1] == 6
+    assert levels['1m']['max'][1] == 11
+    assert levels['1h']['start'][0] == 1613174400
+
+    direct = pyramid.downsample(columns['timestamp'],
+                                columns['network latency'], 3600)
+    for field in ['start', 'count', 'min', 'max']:
+        assert np.array_equal(levels['1h'][field], direct[field])
+    assert np.allclose(levels['1h']['mean'], direct['mean'])
+
+
+# Levels are read across days from the daily files, then from the aggregated
+# pyramid file once the days are aggregated
+def test_read_pyramid(tmp_path, make_columns):
+    for day in range(3):
+        folder = f'{tmp_path}/2021/02/{13 + day}'
+        os.makedirs(folder)
+        first = START + day * DAY
+        channels_to_h5py(f'{folder}/a.csv.hdf5', [
+            ('QW.QCN08.9J.HNZ', make_columns(first, 8640, seconds=10,
+                                             latency=np.arange(8640) % 60)),
+            ('QW.QCN08.9J.LHZ', make_columns(first, 10, seconds=10,
+                                             latency=np.arange(10)))])
+
+    daily = reader.read_pyramid(str(tmp_path), '*.HNZ', '2021-02-13',
+                                '2021-02-16', '1h')
+    assert list(daily) == ['QW.QCN08.9J.HNZ']
+    assert len(daily['QW.QCN08.9J.HNZ']) == 72
+
+    assert aggregate.aggregate_pyramid(str(tmp_path), date(2021, 2, 13),
+                                       date(2021, 2, 15), '*.HNZ') == 3
+    # Aggregating a day again replaces it
+    aggregate.aggregate_pyramid(str(tmp_path), date(2021, 2, 14))
+    os.remove(f'{tmp_path}/2021/02/14/a.csv.hdf5')
+
+    aggregated = reader.read_pyramid(str(tmp_path), '*.HNZ', '2021-02-13',
+                                     '2021-02-16', '1h')
+    assert np.array_equal(aggregated['QW.QCN08.9J.HNZ'],
+                          daily['QW.QCN08.9J.HNZ'])
+
+    window = reader.read_pyramid(str(tmp_path), '*', '2021-02-14T06:00',
+                                 '2021-02-14T08:00', '10m')
+    assert len(window['QW.QCN08.9J.HNZ']) == 12
+    assert 'QW.QCN08.9J.LHZ' not in window
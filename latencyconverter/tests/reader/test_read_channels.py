@@ -0,0 +1,61 @@
+from latencyconverter.utilities import reader
+from latencyconverter.utilities.archive import DailyArchive
+from latencyconverter.utilities.file_search import archive_path
+from latencyconverter.utilities.writer import channels_to_h5py
+from datetime import date
+import numpy as np
+import os
+
+DAY = 86400 * 10**9
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+
+
+# A window spanning midnight is read from both days, whether a day was stored
+# as per-file outputs, with either layout, or as a consolidated archive
+def test_read_channels(tmp_path, make_columns):
+    first_day = f'{tmp_path}/2021/02/13'
+    os.makedirs(first_day)
+    channels_to_h5py(f'{first_day}/a.csv.hdf5', [
+        ('QW.QCN08.9J.HNZ', make_columns(START + DAY - 100 * 10**9, 100)),
+        ('QW.QCN08.9J.LHZ', make_columns(START, 100))])
+    channels_to_h5py(f'{first_day}/b.csv.hdf5', [
+        ('QW.QCN09.9J.HNZ', make_columns(START + DAY - 100 * 10**9, 100))],
+        layout=2)
+
+    second_day = archive_path(str(tmp_path), date(2021, 2, 14))
+    os.makedirs(os.path.dirname(second_day))
+    with DailyArchive(second_day) as archive:
+        archive.append('QW.QCN08.9J.HNZ', make_columns(START + DAY, 100))
+
+    channels = reader.read_channels(str(tmp_path), 'QW.*.HNZ',
+                                    '2021-02-13T23:59:30',
+                                    '2021-02-14T00:00:10')
+
+    assert list(channels) == ['QW.QCN08.9J.HNZ', 'QW.QCN09.9J.HNZ']
+    assert len(channels['QW.QCN08.9J.HNZ']['timestamp']) == 40
+    assert len(channels['QW.QCN09.9J.HNZ']['timestamp']) == 30
+    assert np.all(np.diff(channels['QW.QCN08.9J.HNZ']['timestamp_ns']) > 0)
+    assert channels['QW.QCN08.9J.HNZ']['timestamp_ns'][0] == (
+        START + DAY - 30 * 10**9)
+
+    df = reader.read_dataframe(str(tmp_path), ['*.LHZ'], '2021-02-13',
+                               '2021-02-13T00:00:05')
+    assert list(df['samples']) == [0, 1, 2, 3, 4]
+    assert str(df['timestamp'][0]) == '2021-02-13 00:00:00+00:00'
+
+
+# Packets converted out of timestamp order are sorted when they are written,
+# so no rows of a window are lost to the binary search
+def test_read_channels_unsorted(tmp_path, make_columns):
+    directory = f'{tmp_path}/2021/02/13'
+    os.makedirs(directory)
+    columns = make_columns(START, 100)
+    order = np.random.default_rng(0).permutation(100)
+    columns = {name: value[order] if isinstance(value, np.ndarray) else value
+               for name, value in columns.items()}
+    channels_to_h5py(f'{directory}/a.csv.hdf5', [('QW.QCN08.9J.HNZ', columns)])
+
+    channels = reader.read_channels(str(tmp_path), '*',
+                                    '2021-02-13T00:00:10',
+                                    '2021-02-13T00:00:20')
+    assert list(channels['QW.QCN08.9J.HNZ']['samples']) == list(range(10, 20))
@@ -0,0 +1,55 @@
+from latencyconverter.utilities import source
+from latencyconverter.utilities.json_to_hdf5 import stream_json
+import pytest
+
+TEXT = '{"id": "QW.QCC01", "note": "épicentre à 12 km — 3σ"}\n' * 50
+
+
+# Reading in slices that split multibyte characters returns the whole text
+@pytest.mark.parametrize('size', [1, 3, 7, 4096, -1])
+def test_mapped_text(tmp_path, size):
+    filename = f'{tmp_path}/text.json'
+    with open(filename, 'w', encoding='utf-8') as text_file:
+        text_file.write(TEXT)
+
+    with source.map_file(filename) as mapped:
+        reader = source.MappedText(mapped, filename)
+        chunks = []
+        while True:
+            chunk = reader.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        reader.close()
+
+    assert ''.join(chunks) == TEXT
+    assert reader.pos == len(TEXT.encode('utf-8'))
+
+
+# Empty files can't be mapped, but read as empty
+def test_map_empty_file(tmp_path):
+    filename = f'{tmp_path}/empty.json'
+    open(filename, 'w').close()
+
+    with source.map_file(filename) as mapped:
+        assert len(mapped) == 0
+        reader = source.MappedText(mapped, filename)
+        assert reader.read(10) == ''
+        reader.close()
+
+    with pytest.raises(ValueError):
+        list(stream_json(filename))
+
+
+# The mapping is closed even when the stream isn't read to the end
+def test_stream_json_closed_early(tmp_path):
+    filename = f'{tmp_path}/availability.json'
+    with open(filename, 'w') as json_file:
+        json_file.write('{"availability": [{"id": "QW.QCC01.HNZ", ' +
+                        '"intervals": []}, {"id": "QW.QCC01.HNN", ' +
+                        '"intervals": []}]}')
+
+    stream = stream_json(filename)
+    channel, _ = next(stream)
+    stream.close()
+    assert channel == 'QW.QCC01.HNZ'
@@ -0,0 +1,24 @@
+import subprocess
+import sys
+import pytest
+
+
+# The conversion tools must be able to parse their arguments, and bulk_store
+# to check files against a manifest, without loading numpy, pandas or h5py
+@pytest.mark.parametrize('module', [
+    'latencyconverter.bin.lat_to_hdf5',
+    'latencyconverter.bin.lat_batch',
+    'latencyconverter.bin.daily_lat_storage',
+    'latencyconverter.bin.lat_pyramid',
+    'latencyconverter.bin.lat_catalog',
+    'latencyconverter.bin.lat_query',
+    'latencyconverter.bin.lat_follow',
+    'latencyconverter.utilities.daily_store'
+])
+def test_lazy_imports(module):
+    code = (f'import sys, {module}; ' +
+            'print(",".join(name for name in ("numpy", "pandas", "h5py") ' +
+            'if name in sys.modules))')
+    process = subprocess.run([sys.executable, '-c', code], check=True,
+                             capture_output=True, text=True)
+    assert process.stdout.strip() == ''
@@ -0,0 +1,74 @@
+from latencyconverter.utilities import reader, summary
+from latencyconverter.utilities.archive import DailyArchive
+from latencyconverter.utilities.file_search import archive_path
+from latencyconverter.utilities.writer import channels_to_h5py
+from datetime import date
+import numpy as np
+import os
+
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+
+
+def gapped_columns():
+    timestamps = START + np.arange(101, dtype='int64') * 10**8
+    # Two packets missing
+    timestamps = np.delete(timestamps, [10, 50])
+    return {
+        'timestamp': timestamps,
+        'network latency': np.arange(99, dtype='float64') / 10,
+        'samples': np.full(99, 10, dtype='uint16'),
+        'sample rate': 100,
+        'sample rates': np.array([100] * 90 + [200] * 9, dtype='uint16')
+    }
+
+
+def test_channel_summary():
+    attrs = summary.channel_summary(gapped_columns())
+
+    assert attrs['latency count'] == 99
+    assert attrs['latency min'] == 0
+    assert attrs['latency max'] == 9.8
+    assert np.isclose(attrs['latency mean'], 4.9)
+    assert np.isclose(attrs['latency p50'], 4.9)
+    assert np.isclose(attrs['latency p99'], np.percentile(
+        np.arange(99) / 10, 99))
+    assert attrs['gap count'] == 2
+    assert list(attrs['sample rate values']) == [100, 200]
+    assert list(attrs['sample rate counts']) == [90, 9]
+    assert attrs['first timestamp'] == 1613174400
+
+
+def test_channel_summary_empty():
+    attrs = summary.channel_summary({
+        'timestamp': np.empty(0, dtype='int64'),
+        'network latency': np.empty(0),
+        'sample rate': 100})
+
+    assert attrs['latency count'] == 0
+    assert np.isnan(attrs['latency p95'])
+    assert len(attrs['sample rate values']) == 0
+
+
+# Summaries are stored by the writer and the archive and read back without
+# touching the datasets
+def test_read_summary(tmp_path):
+    folder = f'{tmp_path}/2021/02/13'
+    os.makedirs(folder)
+    channels_to_h5py(f'{folder}/a.csv.hdf5',
+                     [('QW.QCN08.9J.HNZ', gapped_columns())])
+
+    archive = archive_path(str(tmp_path), date(2021, 2, 14))
+    os.makedirs(os.path.dirname(archive))
+    with DailyArchive(archive) as daily_archive:
+        daily_archive.append('QW.QCN08.9J.HNZ', gapped_columns())
+        daily_archive.append('QW.QCN08.9J.HNZ', gapped_columns())
+
+    df = reader.read_summary(str(tmp_path), 'QW.*', '2021-02-13',
+                             '2021-02-15')
+
+    assert list(df['date']) == [date(2021, 2, 13), date(2021, 2, 14)]
+    assert list(df['latency count']) == [99, 198]
+    # The archive stores latencies as float32
+    assert np.allclose(df['latency max'], 9.8)
+    assert df['sample rates'][0] == {100: 90, 200: 9}
+    assert df['sample rates'][1] == {100: 180, 200: 18}
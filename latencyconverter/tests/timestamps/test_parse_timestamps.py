@@ -0,0 +1,34 @@
+from latencyconverter.utilities import timestamps
+import datetime
+
+
+def test_parse_csv_timestamps():
+    parsed = timestamps.parse_csv_timestamps(
+        ['2022/02/13 00:00:05.430000', '2022/02/13 00:00:06.430000'])
+
+    expected = datetime.datetime(
+        2022, 2, 13, 0, 0, 5, tzinfo=datetime.timezone.utc).timestamp()
+
+    assert parsed.dtype == 'int64'
+    assert parsed[0] == int(expected) * 1_000_000_000 + 430_000_000
+    assert parsed[1] - parsed[0] == 1_000_000_000
+
+
+# The nanosecond field of Nanometrics timestamps must not be truncated
+def test_parse_json_timestamps():
+    parsed = timestamps.parse_json_timestamps(
+        ['2022-02-13T00:00:00.999988426Z'])
+
+    assert parsed[0] == 1644710400999988426
+
+
+def test_parse_timestamps_empty():
+    assert len(timestamps.parse_csv_timestamps([])) == 0
+
+
+def test_to_seconds():
+    seconds = timestamps.to_seconds(
+        timestamps.parse_json_timestamps(['2022-02-13T00:00:00.500000000Z']))
+
+    assert seconds.dtype == 'float64'
+    assert seconds[0] == 1644710400.5
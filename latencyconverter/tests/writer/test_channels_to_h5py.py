@@ -0,0 +1,45 @@
+from latencyconverter.utilities import writer
+from latencyconverter.utilities.encoding import decode_channel
+import h5py
+import numpy as np
+
+START = 1613174400 * 10**9  # 2021-02-13T00:00:00Z
+
+
+# A channel id repeated by the source is written once, with the rows of every
+# entry, and per-packet arrays only some of the entries have are filled in
+def test_channels_to_h5py_repeated(tmp_path, make_columns, monkeypatch):
+    written = []
+    write_channel = writer.write_channel
+
+    def record(hdf5file, channel, columns, *args):
+        written.append(channel)
+        return write_channel(hdf5file, channel, columns, *args)
+
+    monkeypatch.setattr(writer, 'write_channel', record)
+
+    later = make_columns(START + 10 * 10**9, 5, data_latency=3.5)
+    later['sample rates'] = np.array([100, 100, 200, 200, 200],
+                                     dtype='uint16')
+    filename = f'{tmp_path}/a.csv.hdf5'
+    assert writer.channels_to_h5py(filename, [
+        ('QW.QCN08.9J.HNZ', make_columns(START, 10)),
+        ('QW.QCN09.9J.HNZ', make_columns(START, 3)),
+        ('QW.QCN08.9J.HNZ', later),
+        ('QW.QCN08.9J.HNZ', make_columns(START + 15 * 10**9, 2))
+    ]) == 20
+
+    assert written == ['QW.QCN08.9J.HNZ', 'QW.QCN09.9J.HNZ',
+                       'QW.QCN08.9J.HNZ']
+    with h5py.File(filename, 'r') as f:
+        channel = decode_channel(f['QW.QCN08.9J.HNZ'])
+        assert len(channel['timestamp']) == 17
+        assert np.all(np.diff(channel['timestamp_ns']) > 0)
+        assert np.array_equal(np.isnan(channel['data latency']),
+                              [True] * 10 + [False] * 5 + [True] * 2)
+        assert np.all(channel['data latency'][10:15] == 3.5)
+        assert list(f['QW.QCN08.9J.HNZ'].attrs['sample rate values']) == [
+            100, 200]
+        assert list(f['QW.QCN08.9J.HNZ'].attrs['sample rate counts']) == [
+            14, 3]
+        assert f['QW.QCN08.9J.HNZ'].attrs['latency count'] == 17
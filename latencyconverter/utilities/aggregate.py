@@ -0,0 +1,176 @@
+'''
+Module for aggregating the downsampled levels of the network latency of many
+days into a single pyramid file at the root of a destination directory, so
+that long time ranges can be read from one file.
+
+The pyramid file holds one group per channel id, with the same
+'network latency <level>' datasets as the channel groups of the daily files
+(see the pyramid module), and a 'days' attribute listing the dates aggregated
+into the group. The 'days' attribute of the file itself lists the dates for
+which every channel was aggregated, so readers can skip the daily files of
+those dates entirely. Rows are attributed to the date their bucket starts on.
+
+Functions
+---------
+
+day_pyramid:
+    Collects the levels of the matching channels stored for a date.
+
+aggregate_pyramid:
+    Aggregates the levels of the matching channels for a range of dates into
+    the pyramid file.
+'''
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Union
+import logging
+import os
+import h5py
+import numpy as np
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.encoding import decode_channel
+from latencyconverter.utilities.pyramid import (
+    PYRAMID_DTYPE, PYRAMID_LEVELS, PYRAMID_NAME, build_pyramid, level_name,
+    merge_levels, pyramid_days, write_pyramid)
+from latencyconverter.utilities.reader import (
+    channel_groups, day_files, match_channel)
+
+SECONDS_PER_DAY = 86400
+
+
+def day_pyramid(
+    source: str,
+    working_date: date,
+    channels: Union[str, Iterable[str]] = '*'
+) -> Dict[str, Dict[str, np.ndarray]]:
+    '''
+    Collects the levels of the matching channels stored for a date, merging
+    the levels of channels stored in several files. Levels missing from files
+    written before levels were introduced are built from the datasets.
+
+    Parameters
+    ----------
+    source: str
+        The destination directory latency data was stored in by
+        daily_lat_store.
+    working_date: date
+        The date to collect the levels of.
+    channels: str or Iterable[str]
+        Shell-style patterns the channel ids must match. Default: every
+        channel
+
+    Returns
+    -------
+    Dict[str, Dict[str, np.ndarray]]
+        The levels of each channel, keyed by channel id and level name.
+    '''
+    pieces: Dict[str, Dict[str, List[np.ndarray]]] = {}
+    for filename in day_files(source, working_date):
+        with h5py.File(filename, 'r') as hdf5file:
+            for channel, channel_group in channel_groups(hdf5file):
+                if not match_channel(channel, channels):
+                    continue
+
+                if all(level_name(level) in channel_group
+                       for level in PYRAMID_LEVELS):
+                    levels = {level: channel_group[level_name(level)][()]
+                              for level in PYRAMID_LEVELS}
+                else:
+                    logging.debug(f'Building levels of {channel} from ' +
+                                  f'{filename}')
+                    decoded = decode_channel(channel_group)
+                    levels = build_pyramid(decoded['timestamp_ns'],
+                                           decoded['network latency'])
+
+                for level, data in levels.items():
+                    pieces.setdefault(channel, {}).setdefault(
+                        level, []).append(data)
+
+    return {channel: {level: merge_levels(data, PYRAMID_LEVELS[level])
+                      for level, data in levels.items()}
+            for channel, levels in pieces.items()}
+
+
+def aggregate_pyramid(
+    source: str,
+    start_date: date,
+    end_date: Optional[date] = None,
+    channels: Union[str, Iterable[str]] = '*',
+    profile: str = DEFAULT_PROFILE
+) -> int:
+    '''
+    Aggregates the levels of the matching channels for a range of dates into
+    the pyramid file at the root of a destination directory. Dates that were
+    aggregated before are replaced, so the pyramid can be brought up to date
+    after files are reconverted.
+
+    Parameters
+    ----------
+    source: str
+        The destination directory latency data was stored in by
+        daily_lat_store.
+    start_date: date
+        The first date to aggregate.
+    end_date: date
+        The last date to aggregate, inclusive. Defaults to start_date.
+    channels: str or Iterable[str]
+        Shell-style patterns the channel ids must match. Default: every
+        channel
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+
+    Returns
+    -------
+    int
+        The number of dates with latency data that were aggregated.
+    '''
+    if end_date is None:
+        end_date = start_date
+    channels = channels if isinstance(channels, str) else list(channels)
+
+    # Collect the levels of every date first, so each level of the pyramid
+    # file is only rewritten once
+    new_levels: Dict[str, Dict[str, List[np.ndarray]]] = {}
+    new_days: Dict[str, List[date]] = {}
+    aggregated = set()
+    working_date = start_date
+    while working_date <= end_date:
+        for channel, levels in day_pyramid(source, working_date,
+                                           channels).items():
+            for level, data in levels.items():
+                new_levels.setdefault(channel, {}).setdefault(
+                    level, []).append(data)
+            new_days.setdefault(channel, []).append(working_date)
+            aggregated.add(working_date)
+        logging.info(f'Collected levels for {working_date}')
+        working_date += timedelta(days=1)
+
+    with h5py.File(os.path.join(source, PYRAMID_NAME), 'a') as hdf5file:
+        for channel, days in new_days.items():
+            channel_group = hdf5file.require_group(channel)
+
+            # Drop the rows of the dates being replaced
+            day_numbers = [(day - date(1970, 1, 1)).days for day in days]
+            pyramid = {}
+            for level, width in PYRAMID_LEVELS.items():
+                name = level_name(level)
+                existing = (channel_group[name][()] if name in channel_group
+                            else np.empty(0, dtype=PYRAMID_DTYPE))
+                keep = ~np.isin(existing['start'] // SECONDS_PER_DAY,
+                                day_numbers)
+                pyramid[level] = merge_levels(
+                    [existing[keep]] + new_levels[channel].get(level, []),
+                    width)
+            write_pyramid(channel_group, pyramid, profile)
+
+            channel_group.attrs['days'] = sorted(
+                {day.isoformat()
+                 for day in pyramid_days(channel_group) + days})
+
+        if channels == '*':
+            hdf5file.attrs['days'] = sorted(
+                {day.isoformat()
+                 for day in pyramid_days(hdf5file) + sorted(aggregated)})
+
+    return len(aggregated)
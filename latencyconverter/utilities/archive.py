@@ -0,0 +1,769 @@
+'''
+Module for storing a day's worth of latency data from many source files in a
+single consolidated hdf5 archive.
+
+Channels are stored in groups nested by network and station, e.g. the channel
+QW.QCN08.9J.HNZ is stored in the group /QW/QCN08/9J.HNZ. Datasets are chunked
+and resizable so data from several source files can be appended to the same
+channel. A top-level 'index' dataset lists every channel in the archive along
+with its group, row count and time range. Channels are always stored with the
+raw layout (see the encoding module). Packets are appended in the order they
+arrive, and the packets of a channel appended out of timestamp order, e.g.
+from source files that overlap in time, are sorted when the index is written,
+so the timestamps of every channel can be binary searched. The summary
+statistics of each channel (see the summary module) and the downsampled
+levels of its network latency (see the pyramid module) are computed from its
+datasets when the index is written, for the channels appended to since the
+index was last written.
+
+A top-level 'sources' dataset records the rows of each channel appended from
+each source file, along with their time range, sample rate and latency range,
+for the catalog module to index.
+
+A BatchedArchive holds back the packets appended to each channel and writes
+them in appends of whole chunks, so converting many source files into an
+archive writes each chunk once, and resizes the datasets and updates the
+attributes of each channel once per flush rather than once per source file.
+
+Functions
+---------
+
+channel_group_name:
+    Returns the name of the group a channel is stored in.
+
+Classes
+-------
+
+DailyArchive:
+    An open daily archive that channel data can be appended to.
+
+BatchedArchive:
+    A daily archive that coalesces the packets appended to each channel into
+    chunk-aligned appends.
+'''
+
+from typing import Dict, List, Optional, Set
+import h5py
+import numpy as np
+from latencyconverter.utilities.channels import concatenate_channels
+from latencyconverter.utilities.compression import (
+    DEFAULT_PROFILE, dataset_options)
+from latencyconverter.utilities.data_latency import sample_rate_changes
+from latencyconverter.utilities.encoding import RAW_LAYOUT, decode_channel
+from latencyconverter.utilities.pyramid import build_pyramid, write_pyramid
+from latencyconverter.utilities.summary import (
+    channel_summary, sample_rate_histogram)
+from latencyconverter.utilities.timestamps import to_seconds
+
+# Number of rows in each chunk of the appendable datasets
+CHUNK_ROWS = 16384
+
+# Rows a BatchedArchive holds back for a channel before appending them, and
+# across every channel before appending all it can
+FLUSH_ROWS = 8 * CHUNK_ROWS
+BUFFER_ROWS = 64 * FLUSH_ROWS
+
+# Chunk cache of a BatchedArchive. The cache holds the last, partly filled
+# chunk of each dataset between flushes, so they aren't read back and
+# decompressed, for a few hundred channels. The number of slots is a prime
+# about a hundred times the number of chunks that fit, as the HDF5 docs
+# advise, and fully written chunks are evicted first.
+CACHE_BYTES = 64 * 2**20
+CACHE_SLOTS = 50021
+CACHE_W0 = 1.0
+
+# Storage type of each dataset in a channel group
+DATASETS = {
+    'timestamp': 'float64',
+    'network latency': 'float32',
+    'data latency': 'float32',
+    'samples': 'uint16'
+}
+
+INDEX_DTYPE = np.dtype([
+    ('channel', h5py.string_dtype()),
+    ('group', h5py.string_dtype()),
+    ('count', 'int64'),
+    ('first timestamp', 'float64'),
+    ('last timestamp', 'float64')
+])
+
+SOURCES_DTYPE = np.dtype([
+    ('channel', h5py.string_dtype()),
+    ('source', h5py.string_dtype()),
+    ('start', 'int64'),
+    ('count', 'int64'),
+    ('first timestamp', 'float64'),
+    ('last timestamp', 'float64'),
+    ('sample rate', 'uint16'),
+    ('latency min', 'float64'),
+    ('latency max', 'float64')
+])
+
+
+def channel_group_name(
+    channel: str
+) -> str:
+    '''
+    Returns the name of the group a channel is stored in within an archive.
+
+    Parameters
+    ----------
+    channel: str
+        The channel id, in NET.STA.LOC.CHA or NET.STA.CHA format.
+
+    Returns
+    -------
+    str
+        The group name, in NET/STA/LOC.CHA or NET/STA/CHA format.
+    '''
+    parts = channel.split('.')
+    if len(parts) < 3:
+        raise ValueError(f'Invalid channel id: {channel}')
+    return '/'.join(parts[:2] + ['.'.join(parts[2:])])
+
+
+class DailyArchive:
+    '''
+    A consolidated hdf5 archive of latency data for a single day.
+
+    Use as a context manager; the channel index is written when the archive
+    is closed.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the archive file.
+    mode: str
+        The mode to open the archive with. 'w' replaces any existing archive,
+        'a' appends to it. Default: 'w'
+    profile: str
+        The name of the compression profile to store new datasets with.
+        Default: 'gzip9'
+    libver: str
+        The HDF5 library version bounds to open the archive with, e.g.
+        'latest' for an archive that will be written in SWMR mode, or None
+        for the h5py default. Default: None
+    rdcc_nbytes, rdcc_nslots, rdcc_w0:
+        The size in bytes, number of hash slots and eviction policy of the
+        chunk cache of each dataset, as for h5py.File, or None for the h5py
+        defaults. Default: None
+    '''
+    def __init__(
+        self,
+        filename: str,
+        mode: str = 'w',
+        profile: str = DEFAULT_PROFILE,
+        libver: Optional[str] = None,
+        rdcc_nbytes: Optional[int] = None,
+        rdcc_nslots: Optional[int] = None,
+        rdcc_w0: Optional[float] = None
+    ):
+        self.filename = filename
+        self.profile = profile
+        self.hdf5file = h5py.File(filename, mode, libver=libver,
+                                  rdcc_nbytes=rdcc_nbytes,
+                                  rdcc_nslots=rdcc_nslots, rdcc_w0=rdcc_w0)
+        # The last timestamp appended to each channel group, and the groups
+        # appended to out of timestamp order, to sort when the index is
+        # written
+        self.last_timestamps: Dict[str, float] = {}
+        self.unsorted: Set[str] = set()
+        # The channel groups created or appended to since the index was last
+        # written, whose summaries are out of date
+        self.touched: Set[str] = set()
+        # The rows appended from each source file, kept from before when
+        # appending to an existing archive
+        self.sources: List[tuple] = []
+        if 'sources' in self.hdf5file:
+            self.sources = [
+                tuple(value.decode() if isinstance(value, bytes) else value
+                      for value in row)
+                for row in self.hdf5file['sources'][()]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def require_channel(
+        self,
+        channel: str,
+        columns: Dict
+    ) -> h5py.Group:
+        '''
+        Returns the group of a channel, creating it along with its empty,
+        resizable datasets if the channel isn't in the archive yet.
+
+        Parameters
+        ----------
+        channel: str
+            The channel id.
+        columns: Dict
+            The typed arrays of the channel, as produced by csv_channels or
+            json_channels. Only used to find which datasets the channel has
+            and its sample rate.
+
+        Returns
+        -------
+        h5py.Group
+            The channel group.
+        '''
+        channel_group = self.hdf5file.require_group(
+            channel_group_name(channel))
+        if 'channel' not in channel_group.attrs:
+            self.touched.add(channel_group.name)
+            channel_group.attrs['channel'] = channel
+            channel_group.attrs['layout version'] = RAW_LAYOUT
+        if 'sample rate' not in channel_group.attrs:
+            channel_group.attrs.create('sample rate',
+                                       data=columns['sample rate'],
+                                       dtype='uint16')
+
+        for name, dtype in DATASETS.items():
+            # Only channels from csv files have a data latency
+            if name not in columns or name in channel_group:
+                continue
+            # Resizable datasets must be chunked, even when the profile
+            # applies no filters, and are chunked by CHUNK_ROWS whatever the
+            # profile's own chunking, so appends can be chunk-aligned
+            options = dataset_options(self.profile, name)
+            options['chunks'] = (CHUNK_ROWS,)
+            channel_group.create_dataset(
+                name=name,
+                shape=(0,),
+                maxshape=(None,),
+                dtype=dtype,
+                **options)
+
+        return channel_group
+
+    def update_attrs(
+        self,
+        channel_group: h5py.Group,
+        columns: Dict
+    ):
+        '''
+        Merges the sample rates and time range of newly appended packets into
+        the attributes of a channel group.
+
+        Parameters
+        ----------
+        channel_group: h5py.Group
+            The channel group, as returned by require_channel.
+        columns: Dict
+            The typed arrays of the new packets. Only the 'timestamp' and
+            optional 'sample rates' arrays and the 'sample rate' are used.
+        '''
+        self.touched.add(channel_group.name)
+
+        # Merge the sample rates of the new packets into the histogram, which
+        # can't be recovered from the datasets later
+        values, counts = sample_rate_histogram(columns)
+        histogram = dict(zip(
+            channel_group.attrs.get('sample rate values', []),
+            channel_group.attrs.get('sample rate counts', [])))
+        for value, count in zip(values, counts):
+            histogram[value] = histogram.get(value, 0) + count
+        rates = sorted(histogram)
+        channel_group.attrs['sample rate values'] = np.array(
+            rates, dtype='uint16')
+        channel_group.attrs['sample rate counts'] = np.array(
+            [histogram[rate] for rate in rates], dtype='int64')
+
+        if 'sample rates' in columns and len(columns['sample rates']) > 0:
+            self._record_rate_changes(channel_group, columns)
+
+        # Keep the time range of the channel up to date for the index
+        timestamps = columns['timestamp']
+        if len(timestamps) > 0:
+            first = float(to_seconds(np.min(timestamps)))
+            last = float(to_seconds(np.max(timestamps)))
+            if 'first timestamp' in channel_group.attrs:
+                first = min(first, channel_group.attrs['first timestamp'])
+                last = max(last, channel_group.attrs['last timestamp'])
+            channel_group.attrs['first timestamp'] = first
+            channel_group.attrs['last timestamp'] = last
+
+    def append_datasets(
+        self,
+        channel_group: h5py.Group,
+        columns: Dict
+    ):
+        '''
+        Appends the packets of a channel to the datasets of its group,
+        without touching any attributes. Nothing but the datasets is
+        modified, so this is safe while the file is in SWMR mode.
+
+        Parameters
+        ----------
+        channel_group: h5py.Group
+            The channel group, as returned by require_channel.
+        columns: Dict
+            The typed arrays of the new packets.
+        '''
+        # The archive always uses the raw layout, so the sorted timestamps
+        # can be searched without decoding them first
+        columns = dict(columns, timestamp=to_seconds(columns['timestamp']))
+        self._check_order(channel_group, columns['timestamp'])
+        self.touched.add(channel_group.name)
+
+        for name, dtype in DATASETS.items():
+            if name not in columns:
+                continue
+            data = np.asarray(columns[name], dtype=dtype)
+            dataset = channel_group[name]
+            start = dataset.shape[0]
+            dataset.resize((start + len(data),))
+            dataset[start:] = data
+
+    def append(
+        self,
+        channel: str,
+        columns: Dict,
+        source: Optional[str] = None
+    ):
+        '''
+        Appends a channel's latency data to the archive.
+
+        Parameters
+        ----------
+        channel: str
+            The channel id.
+        columns: Dict
+            Dictionary containing the 'timestamp', 'network latency',
+            optional 'data latency' and 'sample rates', and 'samples' arrays
+            and the 'sample rate' of the channel, as produced by csv_channels
+            or json_channels.
+        source: str
+            The source file the data was read from, to record the rows
+            appended from it in the 'sources' dataset. Default: None
+        '''
+        channel_group = self.require_channel(channel, columns)
+        self.record_source(channel, columns, source,
+                           channel_group['timestamp'].shape[0])
+        self.update_attrs(channel_group, columns)
+        self.append_datasets(channel_group, columns)
+
+    def record_source(
+        self,
+        channel: str,
+        columns: Dict,
+        source: Optional[str],
+        start: int
+    ):
+        '''
+        Records the rows of a channel appended from a source file, to be
+        written to the 'sources' dataset along with the index. Nothing is
+        recorded without a source file or without any rows.
+
+        Parameters
+        ----------
+        channel: str
+            The channel id.
+        columns: Dict
+            The typed arrays of the appended packets.
+        source: str
+            The source file the packets were read from.
+        start: int
+            The row of the channel's datasets the first packet is stored at.
+        '''
+        timestamps = columns['timestamp']
+        if source is None or len(timestamps) == 0:
+            return
+
+        first, last = to_seconds(
+            np.array([np.min(timestamps), np.max(timestamps)]))
+        latencies = np.asarray(columns['network latency'], dtype='float64')
+        latencies = latencies[~np.isnan(latencies)]
+        self.sources.append((
+            channel, source, start, len(timestamps), first, last,
+            columns['sample rate'],
+            latencies.min() if len(latencies) > 0 else np.nan,
+            latencies.max() if len(latencies) > 0 else np.nan))
+
+    def _check_order(
+        self,
+        channel_group: h5py.Group,
+        timestamps: np.ndarray
+    ):
+        '''
+        Notes a channel group whose new packets, in seconds, are out of
+        timestamp order, or come before those appended to it already.
+        '''
+        if len(timestamps) == 0:
+            return
+        name = channel_group.name
+        last = self.last_timestamps.get(name)
+        if last is None and channel_group['timestamp'].shape[0] > 0:
+            last = channel_group['timestamp'][-1]
+        if ((last is not None and timestamps[0] < last) or
+                np.any(np.diff(timestamps) < 0)):
+            self.unsorted.add(name)
+        self.last_timestamps[name] = timestamps[-1]
+
+    def _sort_channel(
+        self,
+        channel_group: h5py.Group
+    ):
+        '''
+        Sorts the packets of a channel by timestamp, keeping packets with the
+        same timestamp in the order they were appended. The rows recorded
+        for each source file of the channel are widened to span the rows
+        its packets were moved to, and the sample rate changes are put in
+        time order.
+        '''
+        timestamps = channel_group['timestamp'][()]
+        order = np.argsort(timestamps, kind='stable')
+        rows = len(order)
+        for name in DATASETS:
+            # The empty samples of channels from json files are left alone
+            if name in channel_group and channel_group[name].shape[0] == rows:
+                dataset = channel_group[name]
+                dataset[...] = dataset[()][order]
+
+        positions = np.empty(rows, dtype='int64')
+        positions[order] = np.arange(rows)
+        channel = channel_group.attrs['channel']
+        for index, row in enumerate(self.sources):
+            if row[0] != channel or row[3] == 0:
+                continue
+            moved = positions[row[2]:row[2] + row[3]]
+            start = int(moved.min())
+            self.sources[index] = (
+                row[:2] + (start, int(moved.max()) + 1 - start) + row[4:])
+
+        times = channel_group.attrs.get('sample rate change times')
+        if times is not None and len(times) > 1:
+            changes = np.argsort(times, kind='stable')
+            times = times[changes]
+            values = channel_group.attrs['sample rate change values'][changes]
+            # Changes to the rate already in effect are dropped
+            previous = np.concatenate((
+                [channel_group.attrs['sample rate']], values[:-1]))
+            keep = values != previous
+            channel_group.attrs['sample rate change times'] = times[keep]
+            channel_group.attrs['sample rate change values'] = values[keep]
+
+    def _record_rate_changes(
+        self,
+        channel_group: h5py.Group,
+        columns: Dict
+    ):
+        '''
+        Appends the sample rate changes of newly appended packets, including
+        a change from the rate of the previously appended packets.
+        '''
+        times = channel_group.attrs.get('sample rate change times',
+                                        np.empty(0, dtype='float64'))
+        values = channel_group.attrs.get('sample rate change values',
+                                         np.empty(0, dtype='uint16'))
+        previous = (values[-1] if len(values) > 0
+                    else channel_group.attrs['sample rate'])
+
+        rates = np.asarray(columns['sample rates'], dtype='uint16')
+        timestamps = np.asarray(columns['timestamp'], dtype='int64')
+        new_times, new_values = sample_rate_changes(
+            np.concatenate(([0], timestamps)),
+            np.concatenate(([previous], rates)).astype('uint16'))
+
+        channel_group.attrs['sample rate change times'] = np.concatenate(
+            (times, to_seconds(new_times)))
+        channel_group.attrs['sample rate change values'] = np.concatenate(
+            (values, new_values)).astype('uint16')
+
+    def _summarize(
+        self,
+        channel_group: h5py.Group
+    ):
+        '''
+        Computes the summary statistics and downsampled levels of a channel
+        from its datasets.
+        '''
+        decoded = decode_channel(channel_group)
+        summary = channel_summary({
+            'timestamp': decoded['timestamp_ns'],
+            'network latency': decoded['network latency'],
+            'sample rate': channel_group.attrs['sample rate']})
+        for name, value in summary.items():
+            # Keep the histogram merged from every append
+            if not name.startswith('sample rate'):
+                channel_group.attrs[name] = value
+
+        write_pyramid(channel_group,
+                      build_pyramid(decoded['timestamp_ns'],
+                                    decoded['network latency']),
+                      self.profile)
+
+    def write_index(self):
+        '''
+        Sorts the channels appended to out of timestamp order, updates the
+        summary statistics and downsampled levels of each channel appended
+        to since the index was last written and rebuilds the top-level index
+        of the channels in the archive. The datasets of the other channels
+        aren't read.
+        '''
+        names = []
+
+        def collect(name, item):
+            if isinstance(item, h5py.Group) and 'channel' in item.attrs:
+                names.append(name)
+
+        # Groups can't safely be modified while they are being visited
+        self.hdf5file.visititems(collect)
+
+        stale = self.touched | self.unsorted
+        rows = []
+        for name in names:
+            channel_group = self.hdf5file[name]
+            if channel_group.name in self.unsorted:
+                self._sort_channel(channel_group)
+            if channel_group.name in stale:
+                self._summarize(channel_group)
+            rows.append((
+                channel_group.attrs['channel'],
+                name,
+                channel_group['timestamp'].shape[0],
+                channel_group.attrs.get('first timestamp', np.nan),
+                channel_group.attrs.get('last timestamp', np.nan)))
+
+        if 'index' in self.hdf5file:
+            del self.hdf5file['index']
+        self.hdf5file.create_dataset(
+            name='index',
+            data=np.array(rows, dtype=INDEX_DTYPE))
+        self.unsorted.clear()
+        self.touched.clear()
+
+        if self.sources:
+            if 'sources' in self.hdf5file:
+                del self.hdf5file['sources']
+            self.hdf5file.create_dataset(
+                name='sources',
+                data=np.array(self.sources, dtype=SOURCES_DTYPE))
+
+    def close(self):
+        '''
+        Writes the channel index and closes the archive.
+        '''
+        if self.hdf5file:
+            self.write_index()
+            self.hdf5file.close()
+
+
+class BatchedArchive(DailyArchive):
+    '''
+    A consolidated daily archive that holds back the packets appended to each
+    channel and writes them in appends of whole chunks, for converting many
+    source files into one archive.
+
+    Once a channel has FLUSH_ROWS packets held back, or the archive has
+    BUFFER_ROWS across every channel, the packets that complete chunks are
+    appended in one resize and write of each dataset, and the attributes of
+    the channel are updated once. The rest are held back until more packets
+    arrive, or the archive is flushed or closed. Packets are appended to each
+    channel in the order they were given, and sorted by timestamp when the
+    archive is closed if they were given out of order.
+
+    The archive is created with the latest HDF5 file format, whose compact
+    object headers and indexed groups and attributes take fewer metadata
+    writes to update, and which lets lat_follow switch it to SWMR mode. It
+    can only be read with HDF5 1.10 or later.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the archive file.
+    mode: str
+        The mode to open the archive with. 'w' replaces any existing archive,
+        'a' appends to it. Default: 'w'
+    profile: str
+        The name of the compression profile to store new datasets with.
+        Default: 'gzip9'
+    flush_rows: int
+        Packets to hold back for a channel before appending them. Rounded
+        up to whole chunks. Default: FLUSH_ROWS
+    buffer_rows: int
+        Packets to hold back across every channel before appending all that
+        complete chunks. Default: BUFFER_ROWS
+    '''
+    def __init__(
+        self,
+        filename: str,
+        mode: str = 'w',
+        profile: str = DEFAULT_PROFILE,
+        flush_rows: int = FLUSH_ROWS,
+        buffer_rows: int = BUFFER_ROWS
+    ):
+        super().__init__(filename, mode, profile, libver='latest',
+                         rdcc_nbytes=CACHE_BYTES, rdcc_nslots=CACHE_SLOTS,
+                         rdcc_w0=CACHE_W0)
+        self.flush_rows = max(-(-flush_rows // CHUNK_ROWS), 1) * CHUNK_ROWS
+        self.buffer_rows = buffer_rows
+        # The packets held back for each channel, and how many there are
+        self.pending: Dict[str, List[Dict]] = {}
+        self.pending_rows: Dict[str, int] = {}
+        # The rows stored in the datasets of each channel
+        self.stored_rows: Dict[str, int] = {}
+
+    def append(
+        self,
+        channel: str,
+        columns: Dict,
+        source: Optional[str] = None
+    ):
+        '''
+        Adds a channel's latency data to the packets held back for it,
+        appending those that complete chunks once enough are held back.
+
+        Parameters
+        ----------
+        channel: str
+            The channel id.
+        columns: Dict
+            Dictionary containing the 'timestamp', 'network latency',
+            optional 'data latency' and 'sample rates', and 'samples' arrays
+            and the 'sample rate' of the channel, as produced by csv_channels
+            or json_channels.
+        source: str
+            The source file the data was read from, to record the rows
+            appended from it in the 'sources' dataset. Default: None
+        '''
+        # Reject invalid channel ids now rather than when they are flushed
+        channel_group_name(channel)
+
+        # Packets are stored in the order they are given, after those stored
+        # and held back already
+        self.record_source(channel, columns, source,
+                           self._stored(channel) +
+                           self.pending_rows.get(channel, 0))
+
+        rows = len(columns['timestamp'])
+        if rows == 0 and self.pending.get(channel):
+            return
+
+        pending = self.pending.setdefault(channel, [])
+        # Packets can only be joined with those of the same columns and
+        # sample rate
+        if pending and not _compatible(pending[0], columns):
+            self._flush_channel(channel, complete=True)
+            pending = self.pending.setdefault(channel, [])
+        pending.append(columns)
+        self.pending_rows[channel] = self.pending_rows.get(channel, 0) + rows
+
+        if self.pending_rows[channel] >= self.flush_rows:
+            self._flush_channel(channel)
+        if sum(self.pending_rows.values()) >= self.buffer_rows:
+            for name in list(self.pending):
+                self._flush_channel(name)
+
+    def flush(self):
+        '''
+        Appends every packet held back to the archive.
+        '''
+        for channel in list(self.pending):
+            self._flush_channel(channel, complete=True)
+
+    def close(self):
+        '''
+        Appends every packet held back, writes the channel index and closes
+        the archive.
+        '''
+        if self.hdf5file:
+            self.flush()
+        super().close()
+
+    def _stored(
+        self,
+        channel: str
+    ) -> int:
+        '''
+        Returns the number of rows stored in the datasets of a channel.
+        '''
+        if channel not in self.stored_rows:
+            channel_group = self.hdf5file.get(channel_group_name(channel))
+            self.stored_rows[channel] = (
+                channel_group['timestamp'].shape[0]
+                if channel_group is not None and 'timestamp' in channel_group
+                else 0)
+        return self.stored_rows[channel]
+
+    def _flush_channel(
+        self,
+        channel: str,
+        complete: bool = False
+    ):
+        '''
+        Appends the packets held back for a channel that complete chunks of
+        its datasets, or all of them if complete is True.
+        '''
+        parts = self.pending.pop(channel, [])
+        rows = self.pending_rows.pop(channel, 0)
+        if not parts:
+            return
+
+        # Archives appended to may have been written with other chunks
+        stored = self._stored(channel)
+        chunk_rows = self.require_channel(
+            channel, parts[0])['timestamp'].chunks[0]
+        take = rows if complete else (
+            (stored + rows) // chunk_rows * chunk_rows - stored)
+        if take <= 0 and rows > 0:
+            self.pending[channel] = parts
+            self.pending_rows[channel] = rows
+            return
+
+        if len(parts) == 1:
+            columns = parts[0]
+        else:
+            _, columns = next(concatenate_channels(
+                [(channel, part)] for part in parts))
+        head, tail = _split_rows(columns, take)
+        super().append(channel, head)
+        self.stored_rows[channel] = stored + take
+
+        if take < rows:
+            self.pending[channel] = [tail]
+            self.pending_rows[channel] = rows - take
+
+
+def _compatible(
+    first: Dict,
+    columns: Dict
+) -> bool:
+    '''
+    Checks whether the packets of a channel can be joined with those held
+    back for it: they must have the same columns, with one value per packet
+    in the same ones, and the same sample rate.
+    '''
+    def shape(part: Dict) -> Dict:
+        rows = len(part['timestamp'])
+        return {name: len(value) == rows
+                for name, value in part.items()
+                if isinstance(value, np.ndarray)}
+
+    return (shape(first) == shape(columns) and
+            first['sample rate'] == columns['sample rate'])
+
+
+def _split_rows(
+    columns: Dict,
+    rows: int
+):
+    '''
+    Splits the arrays of a channel after a number of packets. Arrays without
+    one value per packet, such as the empty samples of channels from json
+    files, go to the first part whole and to the second part empty. The
+    second part is copied, so it doesn't keep the first alive.
+    '''
+    length = len(columns['timestamp'])
+    head, tail = {}, {}
+    for name, value in columns.items():
+        if not isinstance(value, np.ndarray):
+            head[name] = tail[name] = value
+        elif len(value) == length:
+            head[name], tail[name] = value[:rows], value[rows:].copy()
+        else:
+            head[name], tail[name] = value, value[:0]
+    return head, tail
@@ -1,37 +1,648 @@
 '''
-Module for converting a list of csv and json files to HDF5 format.
+Module for converting a list of csv and json files to HDF5 format, or to the
+partitioned parquet dataset of the columnar module.
+
+The converters, which import pandas and h5py, are only imported once a file
+is converted, so checking a list of files against a manifest and finding
+nothing to do stays fast.
 
 Functions
 ---------
 
+skip_file:
+    Checks whether a file in a list of latency files should be skipped
+    instead of converted.
+
+convert_file:
+    Converts a single json or csv file to hdf5 format and reports the outcome
+    instead of raising.
+
 bulk_store:
-    Accepts a list of json and csv files and converts them to an hdf5 format.
+    Accepts a list of json and csv files and converts them to an hdf5 format,
+    optionally across a pool of worker processes, either as one hdf5 file per
+    source file, as a single consolidated archive, or as a partitioned
+    parquet dataset.
+
+archive_result:
+    Appends the channels extracted from a file to a consolidated archive.
+
+columnar_result:
+    Stores the channels extracted from a file in a parquet dataset.
+
+invalid_result:
+    Returns the result of a file skipped because its lenient format rejected
+    it.
+
+collect_logs:
+    Calls a function in a worker process, collecting what it logs so the
+    parent process can replay it.
+
+replay_logs:
+    Logs the messages collected from a worker process.
+
+summarize:
+    Logs a summary of the outcome of a bulk conversion and returns the
+    matching exit code.
 '''
 
-from latencyconverter.utilities.csv_to_hdf5 import store_csv
-from latencyconverter.utilities.json_to_hdf5 import store_json
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    TYPE_CHECKING, Any, Callable, Dict, Iterable, List, NamedTuple, Optional,
+    Tuple)
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.file_search import columnar_path, output_path
+from latencyconverter.utilities.formats import (
+    SourceFormat, match_format, skip_invalid)
+from latencyconverter.utilities.manifest import Manifest, file_state
+from latencyconverter.utilities.metrics import Metrics, recording, stage
+from latencyconverter.utilities.options import (
+    DEFAULT_LAYOUT, DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, PARQUET_FORMAT)
+import functools
 import logging
+import os
+import time
 
+CONVERTED = 'converted'
+SKIPPED = 'skipped'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
 
-def bulk_store(
-    files: list,
+if TYPE_CHECKING:
+    from latencyconverter.utilities.archive import DailyArchive
+
+
+class ConversionResult(NamedTuple):
+    '''
+    The outcome of converting a single file.
+
+    Attributes
+    ----------
+    filename: str
+        The source file that was converted.
+    status: str
+        One of 'converted', 'skipped', 'unchanged' or 'failed'.
+    error: str
+        Description of the error for failed files, and for files skipped
+        because their lenient format rejected them, otherwise None.
+    records: tuple
+        (level, message) pairs logged while converting the file in a worker
+        process. Empty when the file was converted in the calling process.
+    channels: tuple
+        The (channel, columns) pairs extracted from the file when it was
+        converted with extract=True.
+    rows: int
+        The number of rows of latency data converted.
+    metrics: dict
+        The time spent in each stage of converting the file and its byte
+        counts, as returned by Metrics.as_dict, when it was converted with
+        metrics=True. None for skipped files or without metrics.
+    source_state: dict
+        The size, modification time and content hash of the source file from
+        before it was converted, as returned by file_state, when it was
+        converted with track_state=True. Otherwise None.
+    '''
+    filename: str
+    status: str
+    error: Optional[str] = None
+    records: Tuple[Tuple[int, str], ...] = ()
+    channels: Tuple[Tuple[str, Dict], ...] = ()
+    rows: int = 0
+    metrics: Optional[Dict] = None
+    source_state: Optional[Dict] = None
+
+
+class _RecordCollector(logging.Handler):
+    '''
+    Logging handler that keeps formatted messages so a worker process can
+    hand them back to the parent.
+    '''
+    def __init__(self):
+        super().__init__()
+        self.records: List[Tuple[int, str]] = []
+
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage()
+        if record.exc_info:
+            traceback = logging.Formatter().formatException(record.exc_info)
+            message = f'{message}\n{traceback}'
+        self.records.append((record.levelno, message))
+
+
+def skip_file(
+    filename: str
+) -> bool:
+    '''
+    Checks whether a file in a list of latency files should be skipped
+    instead of converted, logging why: files that don't belong to any
+    registered source format, and files their format excludes, such as those
+    flagged with timing errors.
+    '''
+    source_format = match_format(filename)
+    if source_format is None:
+        logging.warning('Unrecognised file format in list of files: ' +
+                        filename)
+        return True
+    if source_format.excludes(filename):
+        logging.warning(f'Skipping file {filename}')
+        return True
+    return False
+
+
+def convert_file(
+    filename: str,
+    destination: str,
+    extract: bool = False,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> ConversionResult:
+    '''
+    Converts a single csv or json latency file to hdf5 format, or stores it
+    in a parquet dataset. Errors are logged and reported in the returned
+    result rather than raised.
+
+    Parameters
+    ----------
+    filename: str
+        The json or csv file to convert.
     destination: str
+        The directory to store the compressed hdf5 file in, or the root folder
+        of the parquet dataset.
+    extract: bool
+        If True, the file's data is returned split by channel in the result
+        instead of being written to the destination. Default: False
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+    metrics: bool
+        Record the time spent in each stage of the conversion and the bytes
+        read and written in the result. Default: False
+    output_format: str
+        'hdf5', or 'parquet' to store the file's data in the columnar dataset
+        of the destination, as described in the columnar module. The
+        compression profile and layout only apply to hdf5. Default: 'hdf5'
+    track_state: bool
+        Take the state of the file before parsing it, to record in a
+        manifest, in the result's source_state. Default: False
+
+    Returns
+    -------
+    ConversionResult
+        The outcome of the conversion.
+    '''
+    if not metrics:
+        return _convert(filename, destination, extract, profile, layout,
+                        output_format, track_state)
+
+    recorder = Metrics()
+    with recording(recorder), stage('convert'):
+        result = _convert(filename, destination, extract, profile, layout,
+                          output_format, track_state)
+
+    if result.status == SKIPPED:
+        return result
+
+    # The columnar writer counts the bytes of the parquet files it writes
+    recorder.count('bytes_read', _file_size(filename))
+    if not extract and output_format != PARQUET_FORMAT:
+        recorder.count('bytes_written',
+                       _file_size(output_path(filename, destination)))
+    return result._replace(metrics=recorder.as_dict())
+
+
+def _file_size(
+    filename: str
+) -> int:
+    '''
+    Returns the size of a file, or 0 if it doesn't exist.
+    '''
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _convert(
+    filename: str,
+    destination: str,
+    extract: bool,
+    profile: str,
+    layout: int,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> ConversionResult:
+    '''
+    Converts a single file, as described in convert_file.
+    '''
+    channels: List[Tuple[str, Dict]] = []
+    rows = 0
+    source_format = None
+    source_state = None
+    try:
+        if skip_file(filename):
+            return ConversionResult(filename, SKIPPED)
+
+        if track_state:
+            source_state = file_state(filename)
+        source_format = match_format(filename)
+        if output_format == PARQUET_FORMAT and not extract:
+            from latencyconverter.utilities.columnar import store_columnar
+            rows = store_columnar(filename, destination, source_format)
+        elif extract:
+            channels = list(source_format.parse(filename))
+        elif source_format.fast_path is not None:
+            rows = source_format.store(filename, destination, profile, layout)
+        else:
+            rows = _store_parsed(source_format, filename, destination,
+                                 profile, layout)
+    except Exception as e:
+        if (source_format is not None and
+                skip_invalid(source_format, filename, e)):
+            return invalid_result(filename, e)
+        logging.exception(f'Failed to convert {filename}')
+        return ConversionResult(filename, FAILED, f'{type(e).__name__}: {e}',
+                                source_state=source_state)
+
+    if extract:
+        rows = sum(len(columns['timestamp']) for _, columns in channels)
+
+    return ConversionResult(filename, CONVERTED, channels=tuple(channels),
+                            rows=rows, source_state=source_state)
+
+
+def _store_parsed(
+    source_format: SourceFormat,
+    filename: str,
+    destination: str,
+    profile: str,
+    layout: int
+) -> int:
+    '''
+    Stores a file of a format without a fast path to hdf5, writing each
+    channel its parser yields as it is parsed. A file the parser rejects
+    doesn't leave a partly written file behind.
+    '''
+    from latencyconverter.utilities.writer import channels_to_h5py
+
+    dest_path = output_path(filename, destination)
+    try:
+        return channels_to_h5py(dest_path, source_format.parse(filename),
+                                profile, layout)
+    except ValueError:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+
+def invalid_result(
+    filename: str,
+    error: Exception
+) -> ConversionResult:
+    '''
+    Returns the result of a file skipped because its lenient format rejected
+    it. The file isn't recorded in the manifest, so it is tried again on the
+    next run.
+    '''
+    return ConversionResult(filename, SKIPPED,
+                            f'{type(error).__name__}: {error}')
+
+
+def collect_logs(
+    level: int,
+    function: Callable,
+    *args
+) -> Tuple[Any, Tuple[Tuple[int, str], ...]]:
+    '''
+    Calls a function in a worker process, collecting everything it logs
+    instead of emitting it, so the parent process can replay it with
+    replay_logs.
+
+    Parameters
+    ----------
+    level: int
+        The logging level of the parent process.
+    function: Callable
+        The function to call.
+    *args
+        The arguments to call the function with.
+
+    Returns
+    -------
+    Tuple[Any, tuple]
+        The return value of the function, and the (level, message) pairs it
+        logged.
+    '''
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    collector = _RecordCollector()
+
+    # Replace any inherited handlers so records are only reported once, by
+    # the parent
+    handlers = logger.handlers
+    logger.handlers = [collector]
+    try:
+        value = function(*args)
+    finally:
+        logger.handlers = handlers
+
+    return value, tuple(collector.records)
+
+
+def replay_logs(
+    records: Iterable[Tuple[int, str]]
 ):
     '''
-    Converts a list of csv and json latency files to a unified hdf5 format.
+    Logs the (level, message) pairs collected from a worker process.
+    '''
+    for level, message in records:
+        logging.log(level, message)
+
+
+def _convert_in_worker(
+    filename: str,
+    destination: str,
+    extract: bool,
+    profile: str,
+    layout: int,
+    level: int,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> ConversionResult:
+    '''
+    Runs convert_file in a worker process, attaching everything it logs to
+    the result.
+    '''
+    result, records = collect_logs(level, convert_file, filename,
+                                   destination, extract, profile, layout,
+                                   metrics, output_format, track_state)
+    return result._replace(records=records)
+
+
+def archive_result(
+    archive: 'DailyArchive',
+    result: ConversionResult
+) -> ConversionResult:
+    '''
+    Appends the channels extracted from a file to the archive, and returns the
+    result without them so they can be freed. The time taken is added to the
+    result's metrics as the 'archive' stage, if it has any.
+    '''
+    start = time.perf_counter()
+    try:
+        for channel, columns in result.channels:
+            archive.append(channel, columns, result.filename)
+    except Exception as e:
+        logging.exception(f'Failed to archive {result.filename}')
+        return ConversionResult(result.filename, FAILED,
+                                f'{type(e).__name__}: {e}', result.records,
+                                metrics=result.metrics,
+                                source_state=result.source_state)
+
+    if result.metrics is not None:
+        recorder = Metrics.from_dict(result.metrics)
+        recorder.add('archive', time.perf_counter() - start)
+        result = result._replace(metrics=recorder.as_dict())
+    return result._replace(channels=())
+
+
+def columnar_result(
+    destination: str,
+    result: ConversionResult
+) -> ConversionResult:
+    '''
+    Stores the channels extracted from a file in the parquet dataset of a
+    destination, and returns the result without them so they can be freed.
+    The time taken and bytes written are added to the result's metrics, if
+    it has any.
+    '''
+    from latencyconverter.utilities.columnar import write_columnar
+
+    recorder = (Metrics.from_dict(result.metrics)
+                if result.metrics is not None else None)
+    try:
+        with recording(recorder):
+            write_columnar(result.filename, result.channels, destination)
+    except Exception as e:
+        logging.exception(f'Failed to store {result.filename}')
+        return ConversionResult(result.filename, FAILED,
+                                f'{type(e).__name__}: {e}', result.records,
+                                metrics=result.metrics,
+                                source_state=result.source_state)
+
+    if recorder is not None:
+        result = result._replace(metrics=recorder.as_dict())
+    return result._replace(channels=())
+
+
+def bulk_store(
+    files: list,
+    destination: str,
+    workers: int = 1,
+    archive: Optional[str] = None,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    manifest: Optional[Manifest] = None,
+    force: bool = False,
+    pipelined: bool = False,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+) -> List[ConversionResult]:
+    '''
+    Converts a list of csv and json latency files to a unified hdf5 format,
+    or to a partitioned parquet dataset.
 
     Parameters
     ----------
     Files: list
         A list of json or csv files of latency data for Nanometrics and Guralp
         devices respectively.
+    destination: str
+        The directory to store the compressed hdf5 files in, or the root
+        folder of the parquet dataset.
+    workers: int
+        The number of worker processes to convert files with. A value of 1
+        converts the files one at a time in the calling process. Default: 1
+    archive: str
+        Path to a consolidated archive to store the data from every file in,
+        instead of writing one hdf5 file per source file. Files are still
+        parsed by the workers, but only the calling process writes to the
+        archive, coalescing the packets of each channel across files into
+        chunk-aligned appends (see BatchedArchive). Default: None
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets of per-file hdf5
+        files with. The archive always uses the raw layout. Default: 1
+    manifest: Manifest
+        Record of previously converted files. If given, files that are
+        unchanged since they were last converted are not converted again,
+        and the manifest is updated and saved afterwards. Default: None
+    force: bool
+        Convert every file even if the manifest shows it is unchanged.
+        Default: False
+    pipelined: bool
+        Convert the files with the pipelined engine of the pipeline module,
+        which overlaps reading, parsing and writing different files, instead
+        of converting them one at a time in each worker. Default: False
+    metrics: bool
+        Record the time spent in each stage of converting each file and the
+        bytes read and written in its result, to be written out with
+        write_metrics. Default: False
+    output_format: str
+        'hdf5', or 'parquet' to store the data of every file in the columnar
+        dataset of the destination instead, as described in the columnar
+        module. Needs the optional pyarrow package, and can't be combined
+        with archive. Default: 'hdf5'
+
+    Returns
+    -------
+    List[ConversionResult]
+        The outcome of each conversion, in the same order as files.
     '''
-    for filename in files:
-        if 'TimingError' in filename:
-            logging.warning(f'Skipping file {filename}')
-        elif '.csv' in filename:
-            store_csv(filename, destination)
-        elif '.json' in filename:
-            store_json(filename, destination)
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unknown output format: {output_format}. Must be ' +
+                         f'one of {", ".join(OUTPUT_FORMATS)}.')
+    if output_format == PARQUET_FORMAT and archive is not None:
+        raise ValueError('The parquet output format can\'t be combined ' +
+                         'with an archive.')
+
+    if manifest is None:
+        return _convert_files(files, destination, workers, archive, profile,
+                              layout, pipelined, metrics, output_format)
+
+    if output_format == PARQUET_FORMAT:
+        outputs = {filename: columnar_path(destination) for filename in files}
+    else:
+        outputs = {filename: archive or output_path(filename, destination)
+                   for filename in files}
+    pending = list(files) if force else manifest.pending(files, outputs)
+
+    # The archive is rewritten from scratch, so it must be rebuilt from every
+    # file as soon as any of them changed
+    if archive is not None and pending:
+        pending = list(files)
+
+    converted = _convert_files(pending, destination, workers, archive,
+                               profile, layout, pipelined, metrics,
+                               output_format, track_state=True)
+    for result in converted:
+        # Invalid files skipped by lenient formats aren't recorded, so that
+        # they are retried rather than counted as converted
+        if result.status == SKIPPED and result.error is not None:
+            manifest.discard(result.filename)
         else:
-            logging.warning(f'Non csv/json file in list of files: {filename}')
+            manifest.record(result.filename, outputs[result.filename],
+                            result.status, result.source_state)
+    manifest.save()
+
+    outcomes = {result.filename: result for result in converted}
+    return [outcomes.get(filename, ConversionResult(filename, UNCHANGED))
+            for filename in files]
+
+
+def _convert_files(
+    files: list,
+    destination: str,
+    workers: int,
+    archive: Optional[str],
+    profile: str,
+    layout: int,
+    pipelined: bool = False,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> List[ConversionResult]:
+    '''
+    Converts every file in a list, as described in bulk_store.
+    '''
+    if pipelined:
+        # The pipeline module builds on this one
+        from latencyconverter.utilities.pipeline import run_pipeline
+        results, stats = run_pipeline(files, destination, workers, archive,
+                                      profile, layout, metrics=metrics,
+                                      output_format=output_format,
+                                      track_state=track_state)
+        stats.log(logging.DEBUG)
+        return results
+
+    extract = archive is not None
+    daily_archive = None
+    if extract:
+        from latencyconverter.utilities.archive import BatchedArchive
+        daily_archive = BatchedArchive(archive, profile=profile)
+
+    executor = None
+    if workers <= 1:
+        outcomes = map(functools.partial(convert_file,
+                                         destination=destination,
+                                         extract=extract,
+                                         profile=profile,
+                                         layout=layout,
+                                         metrics=metrics,
+                                         output_format=output_format,
+                                         track_state=track_state), files)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        outcomes = executor.map(functools.partial(
+            _convert_in_worker,
+            destination=destination,
+            extract=extract,
+            profile=profile,
+            layout=layout,
+            level=logging.getLogger().getEffectiveLevel(),
+            metrics=metrics,
+            output_format=output_format,
+            track_state=track_state), files)
+
+    results: List[ConversionResult] = []
+    try:
+        for result in outcomes:
+            # Replay any log output from a worker process in the parent
+            replay_logs(result.records)
+            if daily_archive is not None:
+                result = archive_result(daily_archive, result)
+            results.append(result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if daily_archive is not None:
+            daily_archive.close()
+
+    return results
+
+
+def summarize(
+    results: List[ConversionResult]
+) -> int:
+    '''
+    Logs a summary of a bulk conversion.
+
+    Parameters
+    ----------
+    results: List[ConversionResult]
+        The results returned by bulk_store.
+
+    Returns
+    -------
+    int
+        Exit code for the conversion: 0 if every file was converted, skipped
+        or unchanged, 1 if any file failed.
+    '''
+    counts = {status: 0 for status in (CONVERTED, SKIPPED, UNCHANGED, FAILED)}
+    for result in results:
+        counts[result.status] += 1
+
+    logging.info(f'{counts[CONVERTED]} files converted, {counts[SKIPPED]} ' +
+                 f'skipped, {counts[UNCHANGED]} unchanged since they were ' +
+                 f'last converted, {counts[FAILED]} failed.')
+    for result in results:
+        if result.status == FAILED:
+            logging.error(f'{result.filename}: {result.error}')
+
+    return 1 if counts[FAILED] else 0
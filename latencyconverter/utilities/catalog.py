@@ -0,0 +1,496 @@
+'''
+Module for the catalog of the latency data stored by daily_lat_store: a SQLite
+database in the destination folder recording which hdf5 files hold each
+channel, and over which rows and times, so that reads only open the files,
+and only search the rows, that cover a time window.
+
+The catalog holds one extent per channel of each source file converted,
+along with its row count, time range, sample rate and latency range. The
+extent of a per-file output covers every row of the channel in the file. The
+extents of a consolidated archive are the rows appended from each source
+file, as recorded in the archive's 'sources' dataset. Each run of rows of an
+archive not covered by a source file, such as those lat_follow appends, is
+cataloged as an extent of its own without one, wherever sorting the channel
+put it.
+
+Output files are recorded relative to the folder of the catalog, so the
+destination folder can be moved along with its catalog. Several processes
+can update the catalog at once, each waiting for the others' transactions
+to complete.
+
+The module only imports the standard library, so the command line tools stay
+quick to start. h5py is imported once files are indexed.
+
+Functions
+---------
+
+catalog_path:
+    Returns the path of the catalog of a destination folder.
+
+file_extents:
+    Reads the extents of the channels stored in an hdf5 file.
+
+index_destination:
+    Indexes every hdf5 file of a destination folder into its catalog.
+
+Classes
+-------
+
+Extent:
+    The rows of a channel stored in an hdf5 file from one source file.
+
+Catalog:
+    An open catalog database.
+'''
+
+from datetime import date
+from typing import (
+    Dict, Iterable, List, NamedTuple, Optional, Tuple, Union)
+import glob
+import logging
+import math
+import os
+import sqlite3
+from latencyconverter.utilities.file_search import archive_path
+from latencyconverter.utilities.manifest import Manifest, manifest_path
+
+CATALOG_NAME = 'catalog.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS extents (
+    channel TEXT NOT NULL,
+    source TEXT,
+    output TEXT NOT NULL,
+    start_row INTEGER NOT NULL,
+    stop_row INTEGER NOT NULL,
+    first_timestamp REAL,
+    last_timestamp REAL,
+    sample_rate REAL,
+    latency_min REAL,
+    latency_max REAL
+);
+CREATE INDEX IF NOT EXISTS extents_by_channel
+    ON extents (channel, last_timestamp);
+CREATE INDEX IF NOT EXISTS extents_by_output ON extents (output);
+'''
+
+
+class Extent(NamedTuple):
+    '''
+    The rows of a channel stored in an hdf5 file from one source file.
+
+    Attributes
+    ----------
+    channel: str
+        The channel id.
+    source: str
+        The source file the rows were converted from, or None if it isn't
+        known.
+    output: str
+        The hdf5 file the rows are stored in.
+    start_row: int
+        The first row of the channel's datasets in the extent.
+    stop_row: int
+        The row after the last row of the extent.
+    first_timestamp, last_timestamp: float
+        Unix timestamps of the first and last packets, in seconds.
+    sample_rate: float
+        The sample rate of the channel.
+    latency_min, latency_max: float
+        The minimum and maximum network latency, in seconds, or None if the
+        extent has no latencies or they weren't recorded.
+    '''
+    channel: str
+    source: Optional[str]
+    output: str
+    start_row: int
+    stop_row: int
+    first_timestamp: Optional[float]
+    last_timestamp: Optional[float]
+    sample_rate: Optional[float]
+    latency_min: Optional[float] = None
+    latency_max: Optional[float] = None
+
+
+def catalog_path(
+    destination: str
+) -> str:
+    '''
+    Returns the path of the catalog of a destination folder.
+    '''
+    return os.path.join(destination, CATALOG_NAME)
+
+
+def _value(
+    value
+) -> Optional[float]:
+    '''
+    Converts a stored attribute to a float, or None if it is missing or NaN.
+    '''
+    if value is None or math.isnan(value):
+        return None
+    return float(value)
+
+
+def _text(
+    value: Union[str, bytes]
+) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def file_extents(
+    filename: str,
+    source: Optional[str] = None
+) -> List[Extent]:
+    '''
+    Reads the extents of the channels stored in an hdf5 file. Only the
+    attributes and the 'sources' dataset of the file are read, along with
+    two timestamps for each run of archive rows without a source file.
+
+    Parameters
+    ----------
+    filename: str
+        The per-file output or consolidated archive to read.
+    source: str
+        The source file a per-file output was converted from. Default: None
+
+    Returns
+    -------
+    List[Extent]
+        The extents of every channel in the file.
+    '''
+    import h5py
+    from latencyconverter.utilities.reader import channel_groups
+
+    extents: List[Extent] = []
+    with h5py.File(filename, 'r', swmr=True) as hdf5file:
+        covered: Dict[str, List[Tuple[int, int]]] = {}
+        if 'sources' in hdf5file:
+            for row in hdf5file['sources'][()]:
+                extents.append(Extent(
+                    _text(row['channel']), _text(row['source']), filename,
+                    int(row['start']), int(row['start'] + row['count']),
+                    _value(row['first timestamp']),
+                    _value(row['last timestamp']),
+                    _value(row['sample rate']), _value(row['latency min']),
+                    _value(row['latency max'])))
+                covered.setdefault(extents[-1].channel, []).append(
+                    (extents[-1].start_row, extents[-1].stop_row))
+
+        for channel, channel_group in channel_groups(hdf5file):
+            attrs = channel_group.attrs
+            timestamps = channel_group['timestamp']
+            rows = timestamps.shape[0]
+            if channel not in covered:
+                if rows > 0:
+                    extents.append(Extent(
+                        channel, source, filename, 0, rows,
+                        _value(attrs.get('first timestamp')),
+                        _value(attrs.get('last timestamp')),
+                        _value(attrs.get('sample rate')),
+                        _value(attrs.get('latency min')),
+                        _value(attrs.get('latency max'))))
+                continue
+
+            for start, stop in _uncovered(covered[channel], rows):
+                # Archives always use the raw layout, whose timestamps are
+                # stored in seconds
+                extents.append(Extent(
+                    channel, None, filename, start, stop,
+                    _value(timestamps[start]), _value(timestamps[stop - 1]),
+                    _value(attrs.get('sample rate'))))
+
+    return extents
+
+
+def _uncovered(
+    ranges: List[Tuple[int, int]],
+    rows: int
+) -> List[Tuple[int, int]]:
+    '''
+    Returns the runs of rows from 0 to rows that none of the given ranges of
+    rows cover.
+    '''
+    gaps = []
+    position = 0
+    for start, stop in sorted(ranges):
+        if start > position:
+            gaps.append((position, min(start, rows)))
+        position = max(position, stop)
+    if position < rows:
+        gaps.append((position, rows))
+    return [(start, stop) for start, stop in gaps if start < stop]
+
+
+def _glob_pattern(
+    pattern: str
+) -> str:
+    '''
+    Converts a shell-style pattern to an SQLite GLOB pattern.
+    '''
+    return pattern.replace('[!', '[^')
+
+
+class Catalog:
+    '''
+    An open catalog database, created if it doesn't exist yet. Use as a
+    context manager.
+
+    Parameters
+    ----------
+    path: str
+        The path of the catalog file.
+    timeout: float
+        Seconds to wait for other processes updating the catalog.
+        Default: 60
+    '''
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 60.0
+    ):
+        self.path = path
+        self.base = os.path.dirname(os.path.abspath(path))
+        self.connection = sqlite3.connect(path, timeout=timeout)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _relative(
+        self,
+        output: str
+    ) -> str:
+        return os.path.relpath(os.path.abspath(output), self.base)
+
+    def contains(
+        self,
+        output: str
+    ) -> bool:
+        '''
+        Checks whether an hdf5 file has been indexed.
+        '''
+        return self.connection.execute(
+            'SELECT 1 FROM extents WHERE output = ? LIMIT 1',
+            (self._relative(output),)).fetchone() is not None
+
+    def replace(
+        self,
+        output: str,
+        extents: Iterable[Extent]
+    ):
+        '''
+        Replaces the extents of an hdf5 file in a single transaction.
+
+        Parameters
+        ----------
+        output: str
+            The hdf5 file.
+        extents: Iterable[Extent]
+            The extents of the channels stored in the file.
+        '''
+        relative = self._relative(output)
+        with self.connection:
+            self.connection.execute('DELETE FROM extents WHERE output = ?',
+                                    (relative,))
+            self.connection.executemany(
+                'INSERT INTO extents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [extent._replace(output=relative) for extent in extents])
+
+    def remove(
+        self,
+        output: str
+    ):
+        '''
+        Removes the extents of an hdf5 file.
+        '''
+        self.replace(output, [])
+
+    def index_file(
+        self,
+        output: str,
+        source: Optional[str] = None
+    ) -> int:
+        '''
+        Reads the extents of the channels stored in an hdf5 file and replaces
+        those recorded for it.
+
+        Parameters
+        ----------
+        output: str
+            The hdf5 file.
+        source: str
+            The source file a per-file output was converted from.
+            Default: None
+
+        Returns
+        -------
+        int
+            The number of extents recorded.
+        '''
+        extents = file_extents(output, source)
+        self.replace(output, extents)
+        return len(extents)
+
+    def index_archive(
+        self,
+        archive: str
+    ) -> int:
+        '''
+        Indexes a consolidated archive, removing the per-file outputs of its
+        date folder, which are no longer read once the folder has an archive.
+
+        Parameters
+        ----------
+        archive: str
+            The archive file.
+
+        Returns
+        -------
+        int
+            The number of extents recorded.
+        '''
+        archive = os.path.normpath(os.path.abspath(archive))
+        for output in self.outputs():
+            if (os.path.dirname(output) == os.path.dirname(archive) and
+                    output != archive):
+                self.remove(output)
+        return self.index_file(archive)
+
+    def outputs(self) -> List[str]:
+        '''
+        Lists the hdf5 files that have been indexed.
+        '''
+        return [os.path.normpath(os.path.join(self.base, output))
+                for output, in self.connection.execute(
+                    'SELECT DISTINCT output FROM extents ORDER BY output')]
+
+    def find(
+        self,
+        channels: Union[str, Iterable[str]] = '*',
+        start: Optional[float] = None,
+        end: Optional[float] = None
+    ) -> List[Extent]:
+        '''
+        Finds the extents of the matching channels that overlap a time
+        window.
+
+        Parameters
+        ----------
+        channels: str or Iterable[str]
+            Shell-style patterns the channel ids must match, e.g. 'QW.*.HN?'.
+            Default: every channel
+        start: float
+            The start of the window as a unix timestamp, inclusive, or None
+            for no lower bound. Default: None
+        end: float
+            The end of the window as a unix timestamp, exclusive, or None for
+            no upper bound. Default: None
+
+        Returns
+        -------
+        List[Extent]
+            The extents, sorted by channel, file and row, with the paths of
+            the files resolved against the folder of the catalog.
+        '''
+        patterns = [channels] if isinstance(channels, str) else list(channels)
+        if not patterns:
+            return []
+
+        conditions = ['(' + ' OR '.join(['channel GLOB ?'] * len(patterns)) +
+                      ')']
+        parameters: List = [_glob_pattern(pattern) for pattern in patterns]
+        if start is not None:
+            conditions.append('last_timestamp >= ?')
+            parameters.append(start)
+        if end is not None:
+            conditions.append('first_timestamp < ?')
+            parameters.append(end)
+
+        rows = self.connection.execute(
+            'SELECT * FROM extents WHERE ' + ' AND '.join(conditions) +
+            ' ORDER BY channel, output, start_row', parameters)
+        return [extent._replace(output=os.path.normpath(
+                    os.path.join(self.base, extent.output)))
+                for extent in map(Extent._make, rows)]
+
+    def close(self):
+        '''
+        Closes the catalog.
+        '''
+        self.connection.close()
+
+
+def _date_folders(
+    destination: str
+) -> Iterable[date]:
+    '''
+    Lists the dates of the YYYY/MM/DD folders of a destination folder.
+    '''
+    for folder in sorted(glob.glob(f'{glob.escape(destination)}/' +
+                                   '[0-9][0-9][0-9][0-9]/[0-9][0-9]/' +
+                                   '[0-9][0-9]')):
+        year, month, day = folder.split(os.sep)[-3:]
+        try:
+            yield date(int(year), int(month), int(day))
+        except ValueError:
+            continue
+
+
+def index_destination(
+    destination: str,
+    path: Optional[str] = None
+) -> int:
+    '''
+    Indexes every hdf5 file of a destination folder into its catalog: the
+    consolidated archive of each date folder that has one, and its per-file
+    outputs otherwise, as the reader reads them. The source file of each
+    per-file output is looked up in the manifest of its date folder. Files
+    that no longer exist are removed from the catalog.
+
+    Parameters
+    ----------
+    destination: str
+        The destination folder daily_lat_store stored the hdf5 files in.
+    path: str
+        The path of the catalog. Default: catalog.sqlite in the destination
+
+    Returns
+    -------
+    int
+        The number of files indexed.
+    '''
+    indexed = 0
+    with Catalog(path or catalog_path(destination)) as catalog:
+        for output in catalog.outputs():
+            if not os.path.exists(output):
+                logging.info(f'Removing {output} from the catalog')
+                catalog.remove(output)
+
+        for working_date in _date_folders(destination):
+            archive = archive_path(destination, working_date)
+            folder = os.path.dirname(archive)
+            if os.path.exists(archive):
+                files = [archive]
+            else:
+                files = sorted(glob.glob(f'{glob.escape(folder)}/*.hdf5'))
+
+            manifest = Manifest.load(manifest_path(folder))
+            sources = {os.path.basename(entry['output']): source
+                       for source, entry in manifest.entries.items()}
+            for output in files:
+                try:
+                    if output == archive:
+                        catalog.index_archive(archive)
+                    else:
+                        catalog.index_file(
+                            output, sources.get(os.path.basename(output)))
+                except OSError as e:
+                    logging.error(f'Failed to index {output}: {e}')
+                    continue
+                indexed += 1
+
+    return indexed
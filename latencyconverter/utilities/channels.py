@@ -0,0 +1,105 @@
+'''
+Module for splitting a table of latency data into per-channel column slices.
+
+Functions
+---------
+
+partition_channels:
+    Groups the rows of a DataFrame by channel in a single pass and yields each
+    channel's columns as contiguous array slices.
+
+concatenate_channels:
+    Joins the per-channel arrays produced from consecutive chunks of a file.
+'''
+
+from typing import Dict, Iterable, Iterator, List, Tuple
+import numpy as np
+import pandas as pd
+
+
+def partition_channels(
+    df: pd.DataFrame,
+    columns: List[str],
+    key: str = 'channel'
+) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+    '''
+    Groups the rows of a DataFrame by channel and yields the requested columns
+    for each channel.
+
+    The rows are stably sorted on the channel column once, so each channel's
+    rows form a contiguous run, and the arrays handed out are views into the
+    sorted columns rather than copies. Rows keep their original relative order
+    within a channel.
+
+    Parameters
+    ----------
+    df: DataFrame
+        The table of latency data to split.
+
+    columns: List[str]
+        The names of the columns to include for each channel.
+
+    key: str
+        The name of the column holding the channel id. Default: 'channel'
+
+    Yields
+    ------
+    Tuple[str, Dict[str, np.ndarray]]
+        The channel id, and a dictionary mapping each requested column name to
+        the channel's slice of that column.
+    '''
+    if len(df) == 0:
+        return
+
+    # Sort on integer codes rather than comparing the channel strings
+    codes, channels = pd.factorize(df[key], sort=True)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+
+    # Sort each column once; every channel slice below is a view into these
+    sorted_columns = {column: df[column].to_numpy()[order]
+                      for column in columns}
+
+    # Find where the channel id changes in the sorted keys
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [len(sorted_codes)]))
+
+    for start, stop in zip(starts, stops):
+        yield (str(channels[sorted_codes[start]]),
+               {column: values[start:stop]
+                for column, values in sorted_columns.items()})
+
+
+def concatenate_channels(
+    partitions: Iterable[Iterable[Tuple[str, Dict]]]
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    Joins the per-channel arrays produced from consecutive chunks of a file,
+    such as the output of csv_channels for each chunk of a csv file.
+
+    Parameters
+    ----------
+    partitions: Iterable[Iterable[Tuple[str, Dict]]]
+        The channel id and dictionary of arrays of each channel, for each
+        chunk in file order.
+
+    Yields
+    ------
+    Tuple[str, Dict]
+        The channel id, and a dictionary with each array concatenated across
+        the chunks. Values that aren't arrays, such as the sample rate, are
+        taken from the first chunk the channel appears in. Channels are
+        yielded in sorted order.
+    '''
+    pieces: Dict[str, List[Dict]] = {}
+    for partition in partitions:
+        for channel, columns in partition:
+            pieces.setdefault(channel, []).append(columns)
+
+    for channel in sorted(pieces):
+        parts = pieces.pop(channel)
+        yield channel, {
+            name: (np.concatenate([part[name] for part in parts])
+                   if isinstance(value, np.ndarray) else value)
+            for name, value in parts[0].items()}
@@ -0,0 +1,463 @@
+'''
+Module for storing latency data in a partitioned columnar dataset of parquet
+files, and scanning it back, as an alternative to hdf5 for analytics that
+read many channels over long periods.
+
+The dataset lives in the parquet folder of a destination (see columnar_path)
+and is partitioned by network, station and UTC date in hive-style folders,
+e.g. parquet/network=QW/station=QCN08/date=2022-02-13. Each source file adds
+one parquet file to every partition it has data for, named after the source
+file, so converting a file again replaces its data rather than duplicating
+it. Every file has one row per packet, with the columns of SCHEMA.
+
+Queries prune partitions on the network, station and date of the channels and
+time window asked for, and push the channel and time predicates down to the
+row groups of the files that are left, so only the data that can match is
+read.
+
+Requires the optional pyarrow package.
+
+Functions
+---------
+
+channel_table:
+    Converts the typed arrays of a channel to a table with the columns of the
+    dataset.
+
+partition_directory:
+    Returns the folder of the partition of a station and date.
+
+write_columnar:
+    Stores the latency data of the channels of a source file in the dataset.
+
+store_columnar:
+    Loads a latency file of any registered source format and stores its
+    latency data in the dataset.
+
+read_columnar:
+    Reads the latency data of the matching channels within a time window from
+    the dataset into a DataFrame.
+'''
+
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import functools
+import glob
+import hashlib
+import logging
+import operator
+import os
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError as e:
+    raise ImportError('The parquet output format needs the optional ' +
+                      'pyarrow package: pip install latencyconverter[arrow]'
+                      ) from e
+from latencyconverter.utilities.file_search import columnar_path
+from latencyconverter.utilities.formats import (
+    SourceFormat, match_format)
+from latencyconverter.utilities.metrics import count, stage
+from latencyconverter.utilities.reader import (
+    TimeLike, match_channel, to_timestamp)
+
+# Columns of the parquet files. The data latency and samples are null for
+# channels converted from json files. The sample rate is that of each packet.
+SCHEMA = pa.schema([
+    ('channel', pa.string()),
+    ('timestamp', pa.timestamp('ns', tz='UTC')),
+    ('network latency', pa.float32()),
+    ('data latency', pa.float32()),
+    ('samples', pa.uint16()),
+    ('sample rate', pa.uint16())
+])
+
+# Partition keys, in folder order
+PARTITIONING = pa.schema([
+    ('network', pa.string()),
+    ('station', pa.string()),
+    ('date', pa.date32())
+])
+
+# Rows of each row group. Smaller groups let time windows skip more of a
+# file, at the cost of more statistics to read.
+ROW_GROUP_ROWS = 131072
+
+COMPRESSION = 'zstd'
+
+# Packet timestamps are evenly spaced, so their deltas pack far smaller than
+# a dictionary of distinct values. The other columns repeat few values.
+COLUMN_ENCODING = {'timestamp': 'DELTA_BINARY_PACKED'}
+DICTIONARY_COLUMNS = [name for name in SCHEMA.names
+                      if name not in COLUMN_ENCODING]
+
+NS_PER_DAY = 86400 * 10**9
+
+
+def channel_table(
+    channel: str,
+    columns: Dict,
+    rows: Union[slice, np.ndarray] = slice(None)
+) -> pa.Table:
+    '''
+    Converts the typed arrays of a channel to a table with the columns of
+    SCHEMA.
+
+    Parameters
+    ----------
+    channel: str
+        The channel id.
+    columns: Dict
+        The typed arrays of the channel, as produced by csv_channels or
+        stream_json.
+    rows: slice or np.ndarray
+        The rows of the arrays to include. Default: every row
+
+    Returns
+    -------
+    pa.Table
+        The rows of the channel.
+    '''
+    timestamps = np.asarray(columns['timestamp'])[rows]
+    length = len(timestamps)
+
+    if 'sample rates' in columns:
+        sample_rates = np.asarray(columns['sample rates'])[rows]
+    else:
+        sample_rates = np.full(length, columns['sample rate'])
+
+    # Channels from json files have no data latency, and no samples
+    def optional(name: str, dtype: pa.DataType) -> pa.Array:
+        values = np.asarray(columns.get(name, []))
+        if len(values) != len(columns['timestamp']):
+            return pa.nulls(length, dtype)
+        return pa.array(values[rows], dtype)
+
+    return pa.table([
+        pa.repeat(pa.scalar(channel, pa.string()), length),
+        pa.array(timestamps, SCHEMA.field('timestamp').type),
+        pa.array(np.asarray(columns['network latency'])[rows], pa.float32()),
+        optional('data latency', pa.float32()),
+        optional('samples', pa.uint16()),
+        pa.array(sample_rates, pa.uint16())
+    ], schema=SCHEMA)
+
+
+def _day_tables(
+    channel: str,
+    columns: Dict
+) -> Iterator[Tuple[date, pa.Table]]:
+    '''
+    Splits the rows of a channel by UTC date, yielding the table of each day.
+    '''
+    days = np.asarray(columns['timestamp']) // NS_PER_DAY
+    if len(days) == 0:
+        return
+
+    unique = np.unique(days)
+    for day in unique:
+        rows = (slice(None) if len(unique) == 1 else
+                np.flatnonzero(days == day))
+        yield (date.fromordinal(date(1970, 1, 1).toordinal() + int(day)),
+               channel_table(channel, columns, rows))
+
+
+def partition_directory(
+    destination: str,
+    network: str,
+    station: str,
+    working_date: date
+) -> str:
+    '''
+    Returns the folder of the partition of a station and date.
+
+    Parameters
+    ----------
+    destination: str
+        The root folder of the converted latency data.
+    network, station: str
+        The network and station codes.
+    working_date: date
+        The UTC date of the partition.
+
+    Returns
+    -------
+    str
+        The path to the partition folder, in the dataset of the destination.
+    '''
+    return (f'{columnar_path(destination)}/network={network}/' +
+            f'station={station}/date={working_date.isoformat()}')
+
+
+def _file_name(
+    filename: str
+) -> str:
+    '''
+    Returns the name of the parquet files a source file is stored in. The
+    path of the source is hashed into the name, as files with the same name
+    from different days, such as json availability files, can share a
+    partition.
+    '''
+    digest = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()
+    return f'{os.path.basename(filename)}.{digest[:10]}.parquet'
+
+
+def write_columnar(
+    filename: str,
+    channels: Iterable[Tuple[str, Dict]],
+    destination: str
+) -> int:
+    '''
+    Stores the latency data of the channels of a source file in the columnar
+    dataset of a destination, replacing any data stored from the same file
+    before.
+
+    Parameters
+    ----------
+    filename: str
+        The source file the channels were read from, which names the parquet
+        files.
+    channels: Iterable[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        csv_channels or stream_json.
+    destination: str
+        The root folder of the converted latency data.
+
+    Returns
+    -------
+    int
+        The number of rows stored.
+    '''
+    partitions: Dict[Tuple[str, str, date], List[pa.Table]] = {}
+    rows = 0
+    for channel, columns in channels:
+        parts = channel.split('.')
+        if len(parts) < 3:
+            raise ValueError(f'Invalid channel id: {channel}')
+        for day, table in _day_tables(channel, columns):
+            partitions.setdefault((parts[0], parts[1], day), []).append(table)
+            rows += table.num_rows
+
+    # Data a previous conversion of the file stored in other partitions would
+    # otherwise be left behind
+    name = _file_name(filename)
+    for stale in glob.glob(
+            f'{glob.escape(columnar_path(destination))}/*/*/*/{name}'):
+        os.remove(stale)
+
+    for (network, station, day), tables in sorted(partitions.items()):
+        directory = partition_directory(destination, network, station, day)
+        os.makedirs(directory, exist_ok=True)
+        path = f'{directory}/{name}'
+
+        # Written under a hidden temporary name and renamed, so a scan never
+        # reads a partly written file
+        temporary = f'{directory}/.{name}.tmp'
+        with stage('write_parquet'):
+            pq.write_table(pa.concat_tables(tables), temporary,
+                           row_group_size=ROW_GROUP_ROWS,
+                           compression=COMPRESSION,
+                           use_dictionary=DICTIONARY_COLUMNS,
+                           column_encoding=COLUMN_ENCODING)
+            os.replace(temporary, path)
+        count('bytes_written', os.path.getsize(path))
+
+    return rows
+
+
+def store_columnar(
+    filename: str,
+    destination: str,
+    source_format: Optional[SourceFormat] = None
+) -> int:
+    '''
+    Loads a latency file of any registered source format and stores its
+    latency data in the columnar dataset of a destination.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the csv or json file to convert.
+    destination: str
+        The root folder of the converted latency data.
+    source_format: SourceFormat
+        The format of the file. Default: the format matching its name
+
+    Returns
+    -------
+    int
+        The number of rows stored, or 0 if the file was skipped.
+    '''
+    if source_format is None:
+        source_format = match_format(filename)
+    if source_format is None:
+        raise ValueError(f'Unrecognised latency file format: {filename}')
+
+    # Nothing is written until the whole file is parsed, so a file the
+    # parser rejects leaves the dataset untouched
+    return write_columnar(filename, source_format.parse(filename),
+                          destination)
+
+
+def _is_pattern(
+    text: str
+) -> bool:
+    return any(character in text for character in '*?[')
+
+
+def _like(
+    pattern: str
+) -> str:
+    '''
+    Converts a shell-style pattern without character sets to a SQL LIKE
+    pattern.
+    '''
+    escaped = (pattern.replace('\\', '\\\\').replace('%', '\\%')
+               .replace('_', '\\_'))
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def _channel_filter(
+    channels: Union[str, Iterable[str]]
+) -> Optional[ds.Expression]:
+    '''
+    Builds the filter selecting the channels matching any of a set of
+    shell-style patterns: the network and station of a pattern prune
+    partitions when they are given literally, and the pattern is matched
+    against the channel column unless it has character sets, which LIKE
+    patterns can't express. Returns None if every channel can match.
+    '''
+    patterns = [channels] if isinstance(channels, str) else list(channels)
+    expressions = []
+    for pattern in patterns:
+        terms = []
+        # '*' also matches dots, so only the literal parts before the first
+        # wildcard are known to be the network and station
+        for key, part in zip(('network', 'station'),
+                             pattern.split('.')[:-1]):
+            if _is_pattern(part):
+                break
+            terms.append(ds.field(key) == part)
+
+        if not _is_pattern(pattern):
+            terms.append(ds.field('channel') == pattern)
+        elif '[' not in pattern:
+            terms.append(pc.match_like(ds.field('channel'), _like(pattern)))
+
+        if not terms:
+            return None
+        expressions.append(functools.reduce(operator.and_, terms))
+
+    if not expressions:
+        return None
+    return functools.reduce(operator.or_, expressions)
+
+
+def _time_filter(
+    start: Optional[float],
+    end: Optional[float]
+) -> List[ds.Expression]:
+    '''
+    Builds the filters selecting the rows of a time window, on the date
+    partitions and on the timestamp column.
+    '''
+    timestamp_type = SCHEMA.field('timestamp').type
+    terms = []
+    if start is not None:
+        start_ns = int(round(start * 1e9))
+        terms.append(ds.field('date') >= _utc_date(start_ns))
+        terms.append(ds.field('timestamp') >=
+                     pa.scalar(start_ns, timestamp_type))
+    if end is not None:
+        end_ns = int(round(end * 1e9))
+        terms.append(ds.field('date') <= _utc_date(end_ns - 1))
+        terms.append(ds.field('timestamp') <
+                     pa.scalar(end_ns, timestamp_type))
+    return terms
+
+
+def _utc_date(
+    timestamp_ns: int
+) -> date:
+    return datetime.fromtimestamp(timestamp_ns // 10**9, timezone.utc).date()
+
+
+def read_columnar(
+    source: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    '''
+    Reads the latency data of the matching channels within a time window from
+    the columnar dataset of a destination into a DataFrame. Without a time
+    window, the whole dataset is scanned.
+
+    Parameters
+    ----------
+    source: str
+        The destination folder latency data was stored in as parquet.
+    channels: str or Iterable[str]
+        Shell-style patterns the channel ids must match, e.g. 'QW.*.HN?'.
+        Default: every channel
+    start: date, datetime, str, float or int
+        The start of the time window, inclusive. Default: None
+    end: date, datetime, str, float or int
+        The end of the time window, exclusive. Default: None
+    columns: List[str]
+        The columns of SCHEMA to read besides the channel and timestamp.
+        Default: every column
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'channel' (categorical), 'timestamp' (UTC datetimes) and the
+        requested columns of each packet, sorted by channel and time. The
+        data latency and samples of channels converted from json files are
+        NaN.
+    '''
+    names = ['channel', 'timestamp'] + [
+        name for name in (columns or SCHEMA.names)
+        if name not in ('channel', 'timestamp')]
+    unknown = set(names) - set(SCHEMA.names)
+    if unknown:
+        raise ValueError(f'Unknown columns: {", ".join(sorted(unknown))}. ' +
+                         f'Must be in {", ".join(SCHEMA.names)}.')
+
+    root = columnar_path(source)
+    if not os.path.isdir(root):
+        return SCHEMA.empty_table().select(names).to_pandas(
+            strings_to_categorical=True)
+
+    terms = _time_filter(to_timestamp(start), to_timestamp(end))
+    channel_filter = _channel_filter(channels)
+    if channel_filter is not None:
+        terms.append(channel_filter)
+
+    dataset = ds.dataset(
+        root, schema=pa.unify_schemas([SCHEMA, PARTITIONING]),
+        format='parquet',
+        partitioning=ds.partitioning(PARTITIONING, flavor='hive'))
+    table = dataset.to_table(
+        columns=names,
+        filter=functools.reduce(operator.and_, terms) if terms else None)
+    logging.debug(f'Read {table.num_rows} rows from {root}')
+
+    # Sorting the Arrow table is several times faster than sorting the
+    # DataFrame, whose categorical channels pandas would factorize again
+    table = table.sort_by([('channel', 'ascending'),
+                           ('timestamp', 'ascending')])
+    df = table.to_pandas(strings_to_categorical=True)
+
+    # Patterns with character sets are only matched here
+    found = df['channel'].cat.categories
+    matching = sorted(channel for channel in found
+                      if match_channel(channel, channels))
+    if len(matching) < len(found):
+        df = df[df['channel'].isin(matching)].reset_index(drop=True)
+    return df.assign(channel=df['channel'].cat.set_categories(matching))
@@ -0,0 +1,184 @@
+'''
+Module defining the compression and filter profiles the hdf5 writers can
+store datasets with.
+
+Each profile is a dictionary with the following keys:
+
+compression:
+    'gzip', 'lzf' or None for no compression.
+level:
+    The gzip compression level, from 0 to 9. Ignored for other compressors.
+shuffle:
+    Whether to apply the byte shuffle filter before compressing.
+timestamp_scaleoffset:
+    Number of decimal digits of float timestamp datasets to keep with the
+    scale-offset filter, or None to not apply the filter. Digits past this
+    are discarded, so this is only suitable when the timestamps carry no more
+    precision than that. Integer timestamp datasets are always packed
+    losslessly.
+chunk_rows:
+    Number of rows in each chunk, or None to let h5py choose.
+
+Functions
+---------
+
+get_profile:
+    Looks up a compression profile by name.
+
+dataset_options:
+    Returns the keyword arguments for h5py's create_dataset that apply a
+    compression profile to a dataset.
+'''
+
+from typing import TYPE_CHECKING, Dict, Optional
+
+# Only imported for type hints, so the command line tools can list the
+# profiles without importing numpy
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_PROFILE = 'gzip9'
+
+PROFILES: Dict[str, Dict] = {
+    # Slowest, smallest gzip setting. This is what every dataset was written
+    # with before profiles were introduced.
+    'gzip9': {
+        'compression': 'gzip',
+        'level': 9,
+        'shuffle': False,
+        'timestamp_scaleoffset': None,
+        'chunk_rows': None
+    },
+    'gzip6': {
+        'compression': 'gzip',
+        'level': 6,
+        'shuffle': True,
+        'timestamp_scaleoffset': None,
+        'chunk_rows': 65536
+    },
+    'gzip4': {
+        'compression': 'gzip',
+        'level': 4,
+        'shuffle': True,
+        'timestamp_scaleoffset': None,
+        'chunk_rows': 65536
+    },
+    'lzf': {
+        'compression': 'lzf',
+        'level': None,
+        'shuffle': True,
+        'timestamp_scaleoffset': None,
+        'chunk_rows': 65536
+    },
+    # Keeps timestamps to the microsecond, which is all the precision a
+    # float64 unix timestamp can hold anyway
+    'gzip4-scaleoffset': {
+        'compression': 'gzip',
+        'level': 4,
+        'shuffle': True,
+        'timestamp_scaleoffset': 6,
+        'chunk_rows': 65536
+    },
+    'none': {
+        'compression': None,
+        'level': None,
+        'shuffle': False,
+        'timestamp_scaleoffset': None,
+        'chunk_rows': None
+    }
+}
+
+
+def get_profile(
+    name: str
+) -> Dict:
+    '''
+    Looks up a compression profile by name.
+
+    Parameters
+    ----------
+    name: str
+        The name of the profile, one of the keys of PROFILES.
+
+    Returns
+    -------
+    Dict
+        The compression profile.
+    '''
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f'Unknown compression profile: {name}. Must be ' +
+                         f'one of {", ".join(PROFILES)}.')
+
+
+def _is_integer(
+    dtype
+) -> bool:
+    '''
+    Checks whether a dtype, or the name of one, is an integer type.
+    '''
+    import numpy as np
+    return np.dtype(dtype).kind in 'iu'
+
+
+def dataset_options(
+    profile: str,
+    name: str,
+    rows: Optional[int] = None,
+    dtype: Optional['np.dtype'] = None
+) -> Dict:
+    '''
+    Returns the keyword arguments for h5py's create_dataset that store a
+    dataset with a compression profile.
+
+    Parameters
+    ----------
+    profile: str
+        The name of the compression profile.
+    name: str
+        The name of the dataset, e.g. 'timestamp'. Used to decide whether
+        timestamp-specific filters apply.
+    rows: int
+        The number of rows the dataset is created with, or None for a
+        resizable dataset. Chunks are never made larger than a fixed-size
+        dataset. Default: None
+    dtype: np.dtype
+        The type the dataset is stored as, or None for a float dataset.
+        Default: None
+
+    Returns
+    -------
+    Dict
+        Keyword arguments for create_dataset.
+    '''
+    settings = get_profile(profile)
+
+    # Filters need a chunked layout, which can't be given to an empty
+    # fixed-size dataset
+    if rows == 0:
+        return {}
+
+    options: Dict = {}
+    if settings['compression'] is not None:
+        options['compression'] = settings['compression']
+        if settings['compression'] == 'gzip':
+            options['compression_opts'] = settings['level']
+    if settings['shuffle']:
+        options['shuffle'] = True
+    if (name == 'timestamp' and
+            settings['timestamp_scaleoffset'] is not None):
+        if dtype is not None and _is_integer(dtype):
+            # Let HDF5 work out the number of bits needed to store integers
+            # without loss
+            options['scaleoffset'] = 0
+        else:
+            options['scaleoffset'] = settings['timestamp_scaleoffset']
+
+    chunk_rows = settings['chunk_rows']
+    if chunk_rows is not None and options:
+        if rows is not None:
+            chunk_rows = min(chunk_rows, rows)
+        options['chunks'] = (chunk_rows,)
+
+    return options
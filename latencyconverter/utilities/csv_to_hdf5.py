@@ -1,34 +1,200 @@
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 import pandas as pd
 from pandas.core.frame import DataFrame
-import h5py
-import datetime
 import logging
+from latencyconverter.utilities.channels import (
+    concatenate_channels, partition_channels)
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.data_latency import (
+    DATA_LATENCY_DTYPES, parse_arrow_data_latency, parse_data_latency)
+from latencyconverter.utilities.encoding import DEFAULT_LAYOUT
+from latencyconverter.utilities.metrics import timed, timed_iter
+from latencyconverter.utilities.options import CSV_ENGINES, DEFAULT_CSV_ENGINE
+from latencyconverter.utilities.timestamps import (
+    CSV_FORMAT, parse_csv_timestamps)
+from latencyconverter.utilities.file_search import output_path
+from latencyconverter.utilities.source import map_arrow
+from latencyconverter.utilities.writer import channels_to_h5py
 
+# Columns read from Guralp latency csv files. Timestamps are parsed as
+# datetimes while reading, the other columns are read as CSV_DTYPES.
+CSV_COLUMNS = ['timestamp', 'channel', 'network latency', 'data latency']
+CSV_DTYPES = {
+    'channel': 'category',
+    'network latency': 'float32',
+    'data latency': 'object'
+}
 
+
+def _load_mapped_csv(
+    source: str
+) -> DataFrame:
+    '''
+    Parses a csv file with pyarrow straight from a memory mapping of it, for
+    the mmap engine of load_csv. The timestamps and 'data latency' values are
+    parsed from the strings pyarrow holds, without a Python string being
+    created for each value as the other engines do, and each column of
+    strings is dropped as soon as it is parsed.
+    '''
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    # Channel ids are dictionary encoded while parsing, so each is only
+    # stored once
+    convert_options = pacsv.ConvertOptions(
+        include_columns=CSV_COLUMNS,
+        column_types={'timestamp': pa.string(),
+                      'channel': pa.dictionary(pa.int32(), pa.string()),
+                      'network latency': pa.float32(),
+                      'data latency': pa.string()})
+
+    if isinstance(source, str):
+        with map_arrow(source) as mapped:
+            table = pacsv.read_csv(mapped, convert_options=convert_options)
+    else:
+        table = pacsv.read_csv(source, convert_options=convert_options)
+
+    # Arrow parses ISO 8601 timestamps, so only the date separators need
+    # rewriting. Chunks are rewritten and parsed one at a time, so the
+    # rewritten strings only exist for a single chunk at once.
+    timestamps = pa.chunked_array(
+        [pc.replace_substring(chunk, '/', '-').cast(pa.timestamp('ns'))
+         for chunk in table['timestamp'].chunks],
+        pa.timestamp('ns')).to_numpy()
+    table = table.drop_columns(['timestamp'])
+    samples, sample_rates, data_latency = parse_arrow_data_latency(
+        table['data latency'])
+    table = table.drop_columns(['data latency'])
+
+    # Categories in sorted order, as the other engines read them
+    channels = table['channel'].to_pandas()
+    channels = channels.cat.reorder_categories(
+        sorted(channels.cat.categories))
+
+    return DataFrame({
+        'timestamp': timestamps,
+        'channel': channels,
+        'network latency': table['network latency'].to_numpy(),
+        'data latency': data_latency,
+        'samples': samples,
+        'sample rates': sample_rates
+    })
+
+
+@timed('load_csv')
 def load_csv(
     source: str,
-) -> DataFrame:
+    engine: str = DEFAULT_CSV_ENGINE,
+    chunksize: Optional[int] = None
+) -> Union[DataFrame, Iterator[DataFrame]]:
     '''
     This function loads a CSV file of latency data from Guralp into a DataFrame
 
+    Only the columns in CSV_COLUMNS are read, with the types in CSV_DTYPES,
+    and the timestamps are parsed as datetimes while the file is read.
+
+    The mmap engine memory-maps the file and parses it with pyarrow, which
+    reads the mapped pages in place instead of copying the file into read
+    buffers. It also parses the 'data latency' values, so the DataFrame has
+    float64 'data latency', 'samples' and 'sample rates' columns instead of
+    the strings.
+
     Parameters
     ----------
     source: Str
-        The path the CSV file to load
+        The path the CSV file to load, or an open binary file
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. The pyarrow and mmap
+        parsers are multithreaded but need the optional pyarrow package.
+        Default: 'c'
+    chunksize: int
+        Read the file this many rows at a time instead of all at once.
+        Only supported by the c parser. Default: None
 
     Returns
     -------
-    DataFrame
-        A Pandas DataFrame containing the loaded latency information.
+    DataFrame or Iterator[DataFrame]
+        A Pandas DataFrame containing the loaded latency information, or an
+        iterator over DataFrames of at most chunksize rows.
     '''
-    csvDF = pd.read_csv(source)
+    if engine not in CSV_ENGINES:
+        raise ValueError(f'Unknown csv engine: {engine}. Must be one of ' +
+                         f'{", ".join(CSV_ENGINES)}.')
+    if chunksize is not None and engine != 'c':
+        raise ValueError(f'The {engine} csv engine can\'t read in chunks.')
+    if engine == 'mmap':
+        return _load_mapped_csv(source)
+
+    csvDF = pd.read_csv(source,
+                        usecols=CSV_COLUMNS,
+                        dtype=CSV_DTYPES,
+                        parse_dates=['timestamp'],
+                        date_format=CSV_FORMAT,
+                        engine=engine,
+                        chunksize=chunksize)
     return csvDF
 
 
+def csv_channels(
+    df: DataFrame
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    This function splits the latency data from a DataFrame by channel and
+    converts each channel's columns to the typed arrays that are stored in
+    hdf5 format.
+
+    Parameters
+    ----------
+    df: DataFrame
+        Pandas DataFrame object containing data loaded from a Guralp latency
+        csv file.
+
+    Yields
+    ------
+    Tuple[str, Dict]
+        The channel id, and a dictionary containing the 'timestamp' (int64
+        nanoseconds since the unix epoch), 'network latency' and
+        'data latency' (float64 seconds), 'samples' and per-packet
+        'sample rates' arrays and the 'sample rate' of the channel.
+    '''
+    # The mmap engine of load_csv has already parsed the data latency values
+    parsed = 'samples' in df.columns
+    names = ['timestamp', 'network latency', 'data latency']
+    if parsed:
+        names += ['samples', 'sample rates']
+
+    # Loop through each channel's slice of the dataframe
+    for channel, columns in timed_iter('partition', partition_channels(
+            df, names)):
+
+        if parsed:
+            samples, sample_rates, data_latency = (
+                columns[name] for name in DATA_LATENCY_DTYPES)
+        else:
+            samples, sample_rates, data_latency = parse_data_latency(
+                columns['data latency'])
+        timestamps = parse_csv_timestamps(columns['timestamp'])
+
+        yield channel, {
+            # Timestamps in nanoseconds since the unix epoch
+            'timestamp': timestamps,
+            'network latency': columns['network latency'].astype('float64'),
+            'data latency': data_latency,
+            'samples': samples,
+            # The channel's sample rate is that of its first packet. Changes
+            # are recorded from the per-packet sample rates.
+            'sample rate': int(sample_rates[0]),
+            'sample rates': sample_rates
+        }
+
+
 def csv_to_h5py(
     filename: str,
-    df: DataFrame
-):
+    df: DataFrame,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> int:
     '''
     This function takes the latency data from a DataFrame and stores it as an
     HDF5 file
@@ -40,62 +206,96 @@ def csv_to_h5py(
         This is the location and filename to save the data in hdf5 format
 
     df: DataFrame
-        Pandas DataFrame object containing data extracted from a
-        json-formatted Nanometrics Availability API query.
+        Pandas DataFrame object containing data loaded from a Guralp latency
+        csv file.
+
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+
+    Returns
+    -------
+    int
+        The number of rows stored.
+    '''
+    return channels_to_h5py(filename, csv_channels(df), profile, layout)
+
+
+def read_csv_channels(
+    filename: Union[str, BinaryIO],
+    engine: str = DEFAULT_CSV_ENGINE,
+    chunksize: Optional[int] = None
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    This function loads a specified csv file and splits its latency data by
+    channel. In chunked mode only the typed arrays of each chunk are kept,
+    not the DataFrames. It is the parser of the csv source format.
+
+    Parameters
+    ----------
+    filename: str or BinaryIO
+        Path to the csv file to load, or an open binary file, which the mmap
+        engine can't read.
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+    chunksize: int
+        Read the file this many rows at a time instead of all at once.
+        Default: None
+
+    Returns
+    -------
+    Iterator[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        csv_channels.
     '''
-    # Open the HDF5 file
-    with h5py.File(filename, 'w') as hdf5file:
-
-        # Loop through each channel in the dataframe
-        for channel in df['channel'].unique():
-            channel_df = df.loc[df['channel'] == channel]
-
-            channel_group = hdf5file.create_group(channel)
-
-            # Convert the timestamps to unix timestamps
-            timestamps = channel_df['timestamp'].tolist()
-            timestamps = list(map(lambda item: datetime.datetime.strptime(
-                item, "%Y/%m/%d %H:%M:%S.%f").timestamp(), timestamps))
-
-            # Create a compressed dataset containing timestamps
-            channel_group.create_dataset(
-                name='timestamp',
-                data=timestamps,
-                dtype='float64',
-                compression='gzip',
-                compression_opts=9)
-
-            # Create a compressed dataset for network latency
-            channel_group.create_dataset(name='network latency',
-                                         data=df['network latency'].tolist(),
-                                         dtype='float32',
-                                         compression='gzip',
-                                         compression_opts=9)
-
-            # Try sample rate as property instead?
-            sample_rates = list(map(
-                lambda item: item.strip('=').split('/')[1].split('+')[0],
-                channel_df['data latency']))
-
-            channel_group.attrs.create('sample rate',
-                                       data=sample_rates[0],
-                                       dtype='uint16')
-
-            # Create a compressed dataset for number of samples
-            samples = list(map(
-                lambda item: item.strip('=').split('/')[0],
-                channel_df['data latency']))
-            channel_group.create_dataset(name='samples',
-                                         data=samples,
-                                         dtype='uint16',
-                                         compression='gzip',
-                                         compression_opts=9)
+    logging.debug(f'Loading {filename}')
+    if chunksize is None:
+        return csv_channels(load_csv(filename, engine))
+    return concatenate_channels(
+        csv_channels(chunk)
+        for chunk in timed_iter('load_csv',
+                                load_csv(filename, engine, chunksize)))
+
+
+def extract_csv(
+    filename: str,
+    engine: str = DEFAULT_CSV_ENGINE,
+    chunksize: Optional[int] = None
+) -> List[Tuple[str, Dict]]:
+    '''
+    This function loads a specified csv file and returns its latency data
+    split by channel, without writing it anywhere.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the csv file to load.
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+    chunksize: int
+        Read the file this many rows at a time instead of all at once.
+        Default: None
+
+    Returns
+    -------
+    List[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        csv_channels.
+    '''
+    return list(read_csv_channels(filename, engine, chunksize))
 
 
 def store_csv(
     filename: str,
-    destination_dir: str
-):
+    destination_dir: str,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    engine: str = DEFAULT_CSV_ENGINE,
+    chunksize: Optional[int] = None
+) -> int:
     '''
     This function loads a specified csv file, and then converts the data
     inside to compressed hdf5 format for long term sorage.
@@ -106,10 +306,22 @@ def store_csv(
         Path to the csv file to load and convert to hdf5 format.
     destination_dir: str
         The directory to store the compressed hdf5 files in.
-    '''
-    file_name_parts = filename.split('/')
-    dest_file = f'{file_name_parts[len(file_name_parts) - 1]}.hdf5'
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+    chunksize: int
+        Read the file this many rows at a time instead of all at once, to
+        bound the memory used for very large files. Default: None
 
-    logging.debug(f'Loading {filename}')
-    csvDF = load_csv(filename)
-    csv_to_h5py(f'{destination_dir}/{dest_file}', csvDF)
+    Returns
+    -------
+    int
+        The number of rows stored.
+    '''
+    return channels_to_h5py(output_path(filename, destination_dir),
+                            read_csv_channels(filename, engine, chunksize),
+                            profile, layout)
@@ -0,0 +1,319 @@
+'''
+Module for converting the latency files of one or many days, as run by
+daily_lat_store.
+
+Functions
+---------
+
+store_day:
+    Finds and converts the latency files for a single date.
+
+store_days:
+    Converts the latency files for every date in a range, spreading the days
+    across a pool of worker processes and reporting progress as each day
+    completes.
+'''
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+from latencyconverter.utilities.bulk_store import (
+    CONVERTED, UNCHANGED, ConversionResult, bulk_store, collect_logs,
+    replay_logs)
+from latencyconverter.utilities.catalog import Catalog, catalog_path
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.file_search import (
+    archive_path, get_files, output_path)
+from latencyconverter.utilities.manifest import Manifest, manifest_path
+from latencyconverter.utilities.options import (
+    DEFAULT_LAYOUT, DEFAULT_OUTPUT_FORMAT, PARQUET_FORMAT)
+import logging
+import os
+import time
+
+
+class DayResult(NamedTuple):
+    '''
+    The outcome of converting the files for a single date.
+
+    Attributes
+    ----------
+    working_date: date
+        The date the files were converted for.
+    results: list
+        The outcome of converting each file.
+    missing: bool
+        True if no latency files were found for the date.
+    elapsed: float
+        Wall time taken to convert the day, in seconds.
+    records: tuple
+        (level, message) pairs logged while converting the day in a worker
+        process.
+    '''
+    working_date: date
+    results: List[ConversionResult]
+    missing: bool = False
+    elapsed: float = 0.0
+    records: Tuple[Tuple[int, str], ...] = ()
+
+
+def store_day(
+    working_date: date,
+    source: str,
+    destination: str,
+    workers: int = 1,
+    archive: bool = False,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    force: bool = False,
+    pipelined: bool = False,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    catalog: bool = False
+) -> DayResult:
+    '''
+    Finds and converts the latency files for a single date.
+
+    Parameters
+    ----------
+    working_date: date
+        The date to convert latency files for.
+    source: str
+        Source directory to search for latency files in.
+    destination: str
+        The root folder in which to store compressed hdf5 files. Files are
+        stored in a YYYY/MM/DD subdirectory for the date.
+    workers: int
+        The number of worker processes to convert files with. Default: 1
+    archive: bool
+        Store the day's data in a single consolidated archive instead of one
+        hdf5 file per source file. Default: False
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+    force: bool
+        Convert every file even if the manifest shows it is unchanged.
+        Default: False
+    pipelined: bool
+        Convert the files with the pipelined engine, which overlaps reading,
+        parsing and writing different files. Default: False
+    metrics: bool
+        Record the time spent in each stage of converting each file and the
+        bytes read and written in its result. Default: False
+    output_format: str
+        'hdf5', or 'parquet' to store the data in the columnar dataset of the
+        destination, which is partitioned by date itself, instead of the
+        date's subdirectory. The manifest is kept in the date's subdirectory
+        either way. Default: 'hdf5'
+    catalog: bool
+        Record the channels of the hdf5 files converted, and of those
+        unchanged but not recorded yet, in the catalog of the destination
+        (see the catalog module). Can't be combined with the parquet output
+        format. Default: False
+
+    Returns
+    -------
+    DayResult
+        The outcome of converting the day's files. A date without any
+        latency files is reported as missing rather than raising.
+    '''
+    if catalog and output_format == PARQUET_FORMAT:
+        raise ValueError('The parquet output format can\'t be cataloged.')
+
+    start = time.perf_counter()
+
+    # Collect files that need to be stored in hdf5 format
+    try:
+        files = get_files(working_date, source)
+    except FileNotFoundError as e:
+        logging.warning(f'Skipping {working_date}: {e}')
+        return DayResult(working_date, [], missing=True)
+
+    # Create subdirectory structure for date
+    destination_folder = (f'{destination}/' +
+                          f'{working_date.strftime("%Y/%m/%d/")}')
+
+    os.makedirs(destination_folder, mode=0o775, exist_ok=True)
+
+    # Convert the files
+    results = bulk_store(
+        files,
+        destination if output_format == PARQUET_FORMAT else
+        destination_folder,
+        workers=workers,
+        archive=archive_path(destination, working_date) if archive else None,
+        profile=profile, layout=layout,
+        manifest=Manifest.load(manifest_path(destination_folder)),
+        force=force, pipelined=pipelined, metrics=metrics,
+        output_format=output_format)
+
+    if catalog:
+        _update_catalog(catalog_path(destination), results,
+                        destination_folder,
+                        archive_path(destination, working_date) if archive
+                        else None)
+
+    return DayResult(working_date, results,
+                     elapsed=time.perf_counter() - start)
+
+
+def _update_catalog(
+    path: str,
+    results: List[ConversionResult],
+    destination_folder: str,
+    archive: Optional[str] = None
+):
+    '''
+    Records the channels of the hdf5 files a day's files were converted to in
+    a catalog. Files that were converted are indexed again, as are those that
+    are unchanged but missing from the catalog. The outputs of files that
+    were skipped or failed are removed.
+    '''
+    with Catalog(path) as day_catalog:
+        if archive is not None:
+            if os.path.exists(archive) and (
+                    any(result.status == CONVERTED for result in results) or
+                    not day_catalog.contains(archive)):
+                day_catalog.index_archive(archive)
+            return
+
+        for result in results:
+            output = output_path(result.filename, destination_folder)
+            if not os.path.exists(output):
+                day_catalog.remove(output)
+            elif result.status == CONVERTED or (
+                    result.status == UNCHANGED and
+                    not day_catalog.contains(output)):
+                day_catalog.index_file(output, result.filename)
+
+
+def _store_day_in_worker(
+    working_date: date,
+    level: int,
+    *args
+) -> DayResult:
+    '''
+    Runs store_day in a worker process, attaching everything it logs to the
+    result.
+    '''
+    result, records = collect_logs(level, store_day, working_date, *args)
+    return result._replace(records=records)
+
+
+def store_days(
+    start_date: date,
+    end_date: Optional[date] = None,
+    source: str = '.',
+    destination: str = '.',
+    workers: int = 1,
+    archive: bool = False,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    force: bool = False,
+    pipelined: bool = False,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    catalog: bool = False
+) -> List[DayResult]:
+    '''
+    Converts the latency files for every date in a range within a single
+    process, logging progress and throughput as each day completes.
+
+    With more than one worker and more than one day, whole days are handed
+    out to the worker processes. A single day is instead converted with its
+    files spread across the workers.
+
+    Parameters
+    ----------
+    start_date: date
+        The first date to convert latency files for.
+    end_date: date
+        The last date to convert latency files for, inclusive. Defaults to
+        start_date.
+    source, destination, workers, archive, profile, layout, force, pipelined,
+    metrics, output_format, catalog:
+        As for store_day. Days converted by several worker processes update
+        the catalog in turn.
+
+    Returns
+    -------
+    List[DayResult]
+        The outcome of each day, in date order.
+    '''
+    if end_date is None:
+        end_date = start_date
+    if end_date < start_date:
+        raise ValueError(f'End date {end_date} is before start date ' +
+                         f'{start_date}.')
+
+    days = [start_date + timedelta(days=offset)
+            for offset in range((end_date - start_date).days + 1)]
+    progress = _Progress(len(days))
+
+    if workers <= 1 or len(days) == 1:
+        day_results = []
+        for working_date in days:
+            day_results.append(store_day(working_date, source, destination,
+                                         workers, archive, profile, layout,
+                                         force, pipelined, metrics,
+                                         output_format, catalog))
+            progress.update(day_results[-1])
+        return day_results
+
+    by_date = {}
+    level = logging.getLogger().getEffectiveLevel()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_store_day_in_worker, working_date, level,
+                            source, destination, 1, archive, profile, layout,
+                            force, pipelined, metrics, output_format,
+                            catalog)
+            for working_date in days]
+        for future in as_completed(futures):
+            day_result = future.result()
+            replay_logs(day_result.records)
+            progress.update(day_result)
+            by_date[day_result.working_date] = day_result._replace(
+                records=())
+
+    return [by_date[working_date] for working_date in days]
+
+
+class _Progress:
+    '''
+    Tracks and logs progress through a range of days.
+    '''
+    def __init__(
+        self,
+        total: int
+    ):
+        self.total = total
+        self.done = 0
+        self.files = 0
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def update(
+        self,
+        day_result: DayResult
+    ):
+        self.done += 1
+        if day_result.missing:
+            logging.info(f'[{self.done}/{self.total}] ' +
+                         f'{day_result.working_date}: no files found')
+            return
+
+        files = sum(1 for result in day_result.results
+                    if result.status == CONVERTED)
+        rows = sum(result.rows for result in day_result.results)
+        self.files += files
+        self.rows += rows
+
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        logging.info(f'[{self.done}/{self.total}] ' +
+                     f'{day_result.working_date}: {files} files, {rows} ' +
+                     f'rows in {day_result.elapsed:.1f}s. Overall ' +
+                     f'{self.files / elapsed:.1f} files/s, ' +
+                     f'{self.rows / elapsed:.0f} rows/s')
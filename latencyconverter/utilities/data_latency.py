@@ -0,0 +1,190 @@
+'''
+Module for parsing the 'data latency' field of Guralp latency csv files.
+
+Each value has the form '=<samples>/<sample rate>+<data latency>', e.g.
+'=556/100+2.3' for a packet of 556 samples at 100 samples/s with a data
+latency of 2.3 seconds.
+
+Functions
+---------
+
+parse_data_latency:
+    Converts an array of 'data latency' strings into typed samples, sample
+    rate and data latency arrays.
+
+parse_arrow_data_latency:
+    Converts a pyarrow array of 'data latency' strings into the same typed
+    arrays, without converting the strings to Python objects.
+
+sample_rate_changes:
+    Finds the packets at which the sample rate of a channel changes.
+'''
+
+from typing import Iterable, Tuple
+import io
+import numpy as np
+import pandas as pd
+from latencyconverter.utilities.metrics import timed
+
+DATA_LATENCY_PATTERN = (r'^=?(?P<samples>\d+)/(?P<rate>\d+)' +
+                        r'(?P<latency>[+-][0-9.]+(?:[eE][+-]?\d+)?)$')
+
+DATA_LATENCY_DTYPES = {
+    'samples': 'uint16',
+    'sample rates': 'uint16',
+    'data latency': 'float64'
+}
+
+
+def _parse_csv(
+    values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Parses well-formed values by rewriting them as a single csv table for the
+    pandas C parser. Raises TypeError or ValueError for anything else.
+    '''
+    text = ('\n'.join(values).replace('=', '').replace('/', ',')
+            .replace('+', ',').replace('-', ',-'))
+    table = pd.read_csv(io.StringIO(text), header=None,
+                        names=list(DATA_LATENCY_DTYPES),
+                        dtype=DATA_LATENCY_DTYPES)
+    if len(table) != len(values) or table['data latency'].isna().any():
+        raise ValueError('Malformed data latency values')
+    return tuple(table[name].to_numpy() for name in DATA_LATENCY_DTYPES)
+
+
+def _parse_pattern(
+    values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Parses values with a regular expression, reporting the first value that
+    doesn't match.
+    '''
+    fields = pd.Series(values, dtype=object).str.extract(
+        DATA_LATENCY_PATTERN)
+    invalid = fields.isna().any(axis=1).to_numpy()
+    if invalid.any():
+        raise ValueError('Malformed data latency value: ' +
+                         f'{values[np.argmax(invalid)]!r}')
+    return tuple(fields[column].to_numpy().astype(dtype)
+                 for column, dtype in zip(fields.columns,
+                                          DATA_LATENCY_DTYPES.values()))
+
+
+@timed('parse_data_latency')
+def parse_data_latency(
+    values: Iterable[str]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Converts an array of 'data latency' strings into typed arrays in a single
+    pass.
+
+    Parameters
+    ----------
+    values: Iterable[str]
+        The 'data latency' values, e.g. '=556/100+2.3'.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        The number of samples (uint16) and sample rate (uint16) of each
+        packet, and its data latency in seconds (float64).
+
+    Raises
+    ------
+    ValueError
+        If a value isn't in the '=<samples>/<sample rate>+<latency>' form.
+    '''
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return tuple(np.empty(0, dtype=dtype)
+                     for dtype in DATA_LATENCY_DTYPES.values())
+
+    try:
+        return _parse_csv(values)
+    except (TypeError, ValueError):
+        # Malformed values, and latencies in exponent notation, take the
+        # slower path, which reports the offending value
+        return _parse_pattern(values)
+
+
+@timed('parse_data_latency')
+def parse_arrow_data_latency(
+    values
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Converts a pyarrow array of 'data latency' strings into typed arrays with
+    pyarrow compute functions, which work on the strings where pyarrow
+    stores them instead of creating a Python object for each. Requires the
+    optional pyarrow package.
+
+    Parameters
+    ----------
+    values: pyarrow.Array or pyarrow.ChunkedArray
+        The 'data latency' values, e.g. '=556/100+2.3'.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        The number of samples (uint16) and sample rate (uint16) of each
+        packet, and its data latency in seconds (float64), as returned by
+        parse_data_latency.
+
+    Raises
+    ------
+    ValueError
+        If a value isn't in the '=<samples>/<sample rate>+<latency>' form.
+    '''
+    # Converted a chunk at a time, so the strings extracted from the values
+    # only exist for one chunk at once
+    parsed = [_parse_arrow_chunk(chunk)
+              for chunk in getattr(values, 'chunks', [values])]
+    if not parsed:
+        return tuple(np.empty(0, dtype=dtype)
+                     for dtype in DATA_LATENCY_DTYPES.values())
+    return tuple(np.concatenate(arrays) for arrays in zip(*parsed))
+
+
+def _parse_arrow_chunk(
+    values
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Parses a single pyarrow array of values for parse_arrow_data_latency.
+    '''
+    import pyarrow.compute as pc
+
+    fields = pc.extract_regex(values, DATA_LATENCY_PATTERN)
+    invalid = pc.is_null(fields).to_numpy(zero_copy_only=False)
+    if invalid.any():
+        raise ValueError('Malformed data latency value: ' +
+                         f'{values[int(np.argmax(invalid))].as_py()!r}')
+
+    return tuple(
+        pc.struct_field(fields, field).cast(dtype).to_numpy()
+        for field, dtype in zip(('samples', 'rate', 'latency'),
+                                DATA_LATENCY_DTYPES.values()))
+
+
+def sample_rate_changes(
+    timestamps: np.ndarray,
+    sample_rates: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Finds the packets at which the sample rate of a channel changes.
+
+    Parameters
+    ----------
+    timestamps: np.ndarray
+        The timestamps of the packets.
+    sample_rates: np.ndarray
+        The sample rate of each packet.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The timestamp of the first packet at each new sample rate, and the
+        new sample rate.
+    '''
+    sample_rates = np.asarray(sample_rates)
+    changes = np.flatnonzero(sample_rates[1:] != sample_rates[:-1]) + 1
+    return np.asarray(timestamps)[changes], sample_rates[changes]
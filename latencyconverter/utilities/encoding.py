@@ -0,0 +1,163 @@
+'''
+Module for encoding the datasets of a channel group according to a storage
+layout version, and for decoding them back into NumPy arrays.
+
+Layouts
+-------
+
+1 (raw):
+    'timestamp' holds float64 unix timestamps in seconds and
+    'network latency' and 'data latency' hold float32 latencies in seconds.
+
+2 (encoded):
+    'timestamp' holds int64 nanoseconds since the unix epoch, delta encoded:
+    the first element is the first timestamp and every following element is
+    the difference from the previous timestamp. 'network latency' and
+    'data latency' hold int64 fixed-point latencies in microseconds. Packets
+    arrive at nearly regular intervals, so the deltas compress far better
+    than the raw values, and no precision is lost on any dataset.
+
+'data latency' is only stored for channels that have one, i.e. those
+converted from Guralp csv files.
+
+Every group written records its layout in the 'layout version' attribute. The
+encoding of each dataset is recorded in the '<dataset> encoding' attribute,
+along with '<dataset> units'. Groups without a 'layout version' attribute
+were written before layouts were introduced and use the raw layout.
+
+Functions
+---------
+
+encode_channel:
+    Converts the typed arrays of a channel into the datasets and attributes
+    stored for a layout version.
+
+decode_channel:
+    Reads the datasets of a channel group back into NumPy arrays, whatever
+    layout they were stored with.
+'''
+
+from typing import Dict, Tuple
+import numpy as np
+from latencyconverter.utilities.options import (
+    DEFAULT_LAYOUT, ENCODED_LAYOUT, LAYOUTS, RAW_LAYOUT)
+from latencyconverter.utilities.timestamps import to_seconds
+
+# Resolution of the fixed-point latencies, in seconds
+LATENCY_RESOLUTION = 1e-6
+
+# Datasets holding latencies in seconds
+LATENCY_DATASETS = ('network latency', 'data latency')
+
+
+def encode_channel(
+    columns: Dict,
+    layout: int = DEFAULT_LAYOUT
+) -> Tuple[Dict[str, np.ndarray], Dict]:
+    '''
+    Converts the typed arrays of a channel into the datasets and attributes to
+    store for a layout version.
+
+    Parameters
+    ----------
+    columns: Dict
+        Dictionary containing the 'timestamp' (int64 nanoseconds),
+        'network latency' (seconds), optional 'data latency' (seconds) and
+        'samples' arrays and the 'sample rate' of a channel, as produced by
+        csv_channels or json_channels.
+    layout: int
+        The storage layout version to encode the channel with. Default: 1
+
+    Returns
+    -------
+    Tuple[Dict[str, np.ndarray], Dict]
+        The arrays to store in each dataset, and the attributes to set on the
+        channel group.
+    '''
+    timestamps = np.asarray(columns['timestamp'], dtype='int64')
+    latencies = {name: np.asarray(columns[name], dtype='float64')
+                 for name in LATENCY_DATASETS if name in columns}
+
+    attrs: Dict = {'layout version': layout}
+    if layout == RAW_LAYOUT:
+        datasets = {'timestamp': to_seconds(timestamps)}
+        attrs.update({
+            'timestamp encoding': 'raw',
+            'timestamp units': 's'
+        })
+        for name, values in latencies.items():
+            datasets[name] = values.astype('float32')
+            attrs[f'{name} encoding'] = 'raw'
+            attrs[f'{name} units'] = 's'
+    elif layout == ENCODED_LAYOUT:
+        deltas = np.empty_like(timestamps)
+        if len(timestamps) > 0:
+            deltas[0] = timestamps[0]
+            np.subtract(timestamps[1:], timestamps[:-1], out=deltas[1:])
+        datasets = {'timestamp': deltas}
+        attrs.update({
+            'timestamp encoding': 'delta',
+            'timestamp units': 'ns'
+        })
+        for name, values in latencies.items():
+            datasets[name] = np.round(
+                values / LATENCY_RESOLUTION).astype('int64')
+            attrs[f'{name} encoding'] = 'fixed-point'
+            attrs[f'{name} units'] = 'us'
+    else:
+        raise ValueError(f'Unknown layout version: {layout}. Must be one of ' +
+                         f'{", ".join(str(version) for version in LAYOUTS)}.')
+
+    datasets['samples'] = np.asarray(columns['samples'], dtype='uint16')
+    return datasets, attrs
+
+
+def decode_channel(
+    channel_group,
+    rows: slice = slice(None)
+) -> Dict[str, np.ndarray]:
+    '''
+    Reads the datasets of a channel group back into NumPy arrays, whatever
+    layout they were stored with.
+
+    Parameters
+    ----------
+    channel_group: h5py.Group
+        The channel group to read.
+    rows: slice
+        The rows to read. Only these rows are read from the raw layout, while
+        the delta encoded timestamps of the encoded layout have to be read in
+        full to be decoded. Default: every row
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Dictionary containing 'timestamp' as float64 unix timestamps in
+        seconds, 'timestamp_ns' as int64 nanoseconds since the unix epoch,
+        'network latency' and, if stored, 'data latency' as float64 seconds
+        and 'samples'.
+    '''
+    layout = int(channel_group.attrs.get('layout version', RAW_LAYOUT))
+
+    if layout == RAW_LAYOUT:
+        seconds = channel_group['timestamp'][rows].astype('float64')
+        nanoseconds = np.round(seconds * 1e9).astype('int64')
+        scale = 1.0
+    elif layout == ENCODED_LAYOUT:
+        nanoseconds = np.cumsum(channel_group['timestamp'][()],
+                                dtype='int64')[rows]
+        seconds = to_seconds(nanoseconds)
+        scale = LATENCY_RESOLUTION
+    else:
+        raise ValueError(f'Unknown layout version: {layout}')
+
+    decoded = {
+        'timestamp': seconds,
+        'timestamp_ns': nanoseconds
+    }
+    for name in LATENCY_DATASETS:
+        if name in channel_group:
+            decoded[name] = (channel_group[name][rows].astype('float64') *
+                             scale)
+    decoded['samples'] = channel_group['samples'][rows]
+    return decoded
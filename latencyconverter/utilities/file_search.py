@@ -1,6 +1,9 @@
 '''
 Module for finding a list of json and csv files of latency data for a specific
-date.
+date, and the paths of the hdf5 files they are converted to. The files of
+every source format in the registry of the formats module are found. It only
+imports the standard library, so the command line tools can find out whether
+there is anything to convert before loading the converters.
 
 Functions
 ---------
@@ -9,13 +12,39 @@ get_date:
     Converts the supplied date string into a datetime.date object. If none is
     supplied, yesterday's date is returned.
 
+file_patterns:
+    Returns the filename patterns of each registered source format.
+
+scan_directory:
+    Lists the latency files in a single directory, along with their size and
+    modification time.
+
+find_files:
+    Finds the latency files for every date in a range.
+
+count_by_type:
+    Counts the files of each family in a list of latency files.
+
 get_files:
     Finds all csv and json files in a specified folder and returns them as a
     list.
+
+output_path:
+    Returns the path of the hdf5 file a source file is converted to.
+
+archive_path:
+    Returns the path of the daily archive for a date.
+
+columnar_path:
+    Returns the path of the columnar dataset of a destination folder.
 '''
 from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Union
+from latencyconverter.utilities.formats import source_formats
+import fnmatch
 import logging
-import subprocess
+import os
+import re
 
 
 def get_date(
@@ -51,13 +80,157 @@ def get_date(
         return selected_date
 
 
+class LatencyFile(NamedTuple):
+    '''
+    A latency file found in the source directory.
+
+    Attributes
+    ----------
+    path: str
+        The path to the file.
+    file_type: str
+        The name of the source format the file belongs to, e.g. 'csv'.
+    size: int
+        The size of the file in bytes.
+    mtime: float
+        The modification time of the file as a unix timestamp.
+    date: date
+        The date of the subdirectory the file was found in.
+    '''
+    path: str
+    file_type: str
+    size: int
+    mtime: float
+    date: date
+
+
+def day_directory(
+    source: str,
+    working_date: date
+) -> str:
+    '''
+    Returns the subdirectory of the source directory holding the latency files
+    for a date, in YYYY/MM/DD format.
+    '''
+    return f'{source}/{working_date.strftime("%Y/%m/%d")}'
+
+
+def file_patterns() -> Dict[str, Sequence[str]]:
+    '''
+    Returns the shell-style filename patterns of each registered source
+    format, by format name, in the order the formats were registered in.
+    '''
+    return {source_format.name: source_format.patterns
+            for source_format in source_formats()}
+
+
+def scan_directory(
+    directory: str,
+    working_date: date,
+    patterns: Optional[Dict[str, Union[str, Sequence[str]]]] = None
+) -> List[LatencyFile]:
+    '''
+    Lists the latency files in a single directory.
+
+    Parameters
+    ----------
+    directory: str
+        The directory to list.
+    working_date: date
+        The date the files in the directory are for.
+    patterns: Dict[str, str or Sequence[str]]
+        Shell-style filename patterns of each family of files to find.
+        Default: the patterns of every registered source format
+
+    Returns
+    -------
+    List[LatencyFile]
+        The matching files, ordered by family in the order of patterns and
+        then by name. Empty if the directory does not exist.
+    '''
+    if patterns is None:
+        patterns = file_patterns()
+    matchers = [(file_type, re.compile(fnmatch.translate(pattern)).match)
+                for file_type, family in patterns.items()
+                for pattern in ([family] if isinstance(family, str)
+                                else family)]
+    found: Dict[str, List[LatencyFile]] = {
+        file_type: [] for file_type in patterns}
+
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                for file_type, match in matchers:
+                    if match(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        found[file_type].append(LatencyFile(
+                            entry.path, file_type, stat.st_size,
+                            stat.st_mtime, working_date))
+                        break
+    except FileNotFoundError:
+        logging.warning(f'Directory {directory} does not exist.')
+
+    files: List[LatencyFile] = []
+    for file_type in patterns:
+        files.extend(sorted(found[file_type]))
+    return files
+
+
+def find_files(
+    start_date: date,
+    end_date: Optional[date] = None,
+    source: str = '.'
+) -> List[LatencyFile]:
+    '''
+    Finds the latency files for every date in a range.
+
+    Parameters
+    ----------
+    start_date: date
+        The first date to find files for.
+    end_date: date
+        The last date to find files for, inclusive. Defaults to start_date.
+    source: str
+        The parent directory to start searching for latency files in.
+
+    Returns
+    -------
+    List[LatencyFile]
+        The files found, ordered by date. Dates without a subdirectory are
+        skipped.
+    '''
+    if end_date is None:
+        end_date = start_date
+
+    files: List[LatencyFile] = []
+    working_date = start_date
+    while working_date <= end_date:
+        files.extend(scan_directory(day_directory(source, working_date),
+                                    working_date))
+        working_date += timedelta(days=1)
+    return files
+
+
+def count_by_type(
+    files: List[LatencyFile]
+) -> Dict[str, int]:
+    '''
+    Counts the files of each family in a list of latency files.
+    '''
+    counts = {file_type: 0 for file_type in file_patterns()}
+    for latency_file in files:
+        counts[latency_file.file_type] = (
+            counts.get(latency_file.file_type, 0) + 1)
+    return counts
+
+
 def get_files(
     working_date: date,
     source: str = '.'
 ) -> list:
     '''
-    Finds all csv and json files in a specified folder and returns them as a
-    list.
+    Finds all csv and json files in a specified folder, along with the files
+    of any other registered source format, and returns them as a list.
 
     Parameters
     ----------
@@ -75,34 +248,90 @@ def get_files(
     list:
         A list containing the path to all json and csv files found
     '''
-    # Initialize list of files
-    files: list = []
-
-    # Try to find csv files in the specified directory
-    cmd = (f'ls {source}/' +
-           f'{working_date.strftime("%Y/%m/%d")}/*_HN*.csv 2>/dev/null')
-    output: list = (subprocess.getoutput(cmd)).split('\n')
-    logging.info(output)
-    if '' not in output:
-        files.extend(output)
-        logging.info(f'{len(output)} csv files found.')
-    else:
-        logging.warning('No CSV files found.')
-
-    # Try to find json files in the specified directory
-    cmd = f'ls {source}/{working_date.strftime("%Y/%m/%d")}/*.json 2>/dev/null'
-    output = (subprocess.getoutput(cmd)).split('\n')
-    logging.info(output)
-    if '' not in output:
-        files.extend(output)
-        logging.info(f'{len(output)} json files found.')
-    else:
-        logging.warning('No json files found.')
+    directory = day_directory(source, working_date)
+    files = scan_directory(directory, working_date)
+
+    for file_type, count in count_by_type(files).items():
+        if count > 0:
+            logging.info(f'{count} {file_type} files found.')
+        else:
+            logging.warning(f'No {file_type} files found.')
 
     # Raise an error if no files are loaded
     if len(files) == 0:
-        raise FileNotFoundError(f'No csv or json files found in {source}/' +
-                                f'{working_date.strftime("%Y/%m/%d")}/')
+        raise FileNotFoundError(
+            f'No {" or ".join(file_patterns())} files found in {directory}/')
 
-    logging.debug(files)
-    return files
+    paths = [latency_file.path for latency_file in files]
+    logging.debug(paths)
+    return paths
+
+
+def output_path(
+    filename: str,
+    destination_dir: str
+) -> str:
+    '''
+    Returns the path of the hdf5 file a source file is converted to: the name
+    of the source file with a .hdf5 extension appended, in the destination
+    directory.
+
+    Parameters
+    ----------
+    filename: str
+        Path to the source csv or json file.
+    destination_dir: str
+        The directory the hdf5 files are stored in.
+
+    Returns
+    -------
+    str
+        The path to the hdf5 file.
+    '''
+    file_name_parts = filename.split('/')
+    dest_file = f'{file_name_parts[len(file_name_parts) - 1]}.hdf5'
+    return f'{destination_dir}/{dest_file}'
+
+
+def archive_path(
+    destination: str,
+    working_date: date
+) -> str:
+    '''
+    Returns the path of the consolidated archive for a date.
+
+    Parameters
+    ----------
+    destination: str
+        The root folder of the hdf5 archive.
+    working_date: date
+        The date the archive holds latency data for.
+
+    Returns
+    -------
+    str
+        The path to the archive file, in a YYYY/MM/DD subdirectory of the
+        destination.
+    '''
+    return (f'{destination}/{working_date.strftime("%Y/%m/%d")}/' +
+            f'latency_{working_date.strftime("%Y%m%d")}.hdf5')
+
+
+def columnar_path(
+    destination: str
+) -> str:
+    '''
+    Returns the path of the partitioned columnar dataset latency data is
+    stored in when it is converted to parquet rather than hdf5.
+
+    Parameters
+    ----------
+    destination: str
+        The root folder of the converted latency data.
+
+    Returns
+    -------
+    str
+        The path to the root directory of the dataset, in the destination.
+    '''
+    return f'{destination}/parquet'
@@ -0,0 +1,573 @@
+'''
+Module for following the latency files of a day while they are still being
+written, appending the new rows to the day's consolidated archive every few
+minutes instead of converting the files once the day is over.
+
+Csv files are tailed: only the bytes written since the previous poll are
+parsed, up to the last complete line. Json files are only valid documents
+once they are written in full, so they are read again whenever they change,
+and only the intervals newer than those already appended are kept.
+
+The archive is held open in SWMR (single writer, multiple reader) mode, so
+readers that open it with swmr=True see consistent data while it is being
+appended to. No objects or attributes may be created in SWMR mode, so new
+channels are only added, and the attributes, index, summary statistics and
+downsampled levels of the archive only updated, at checkpoints, when the
+archive is briefly reopened in normal mode.
+
+The read position in each source file is saved in follow_state.json next to
+the archive after every poll, so following resumes where it left off after a
+restart.
+
+Functions
+---------
+
+state_path:
+    Returns the path of the follow state for an archive.
+
+tail_csv:
+    Parses the complete lines appended to a csv file since an offset.
+
+reread_json:
+    Reads a json file again, keeping only the intervals newer than those
+    already appended.
+
+poll_day:
+    Appends the rows written to the latency files of a date since the
+    previous poll.
+
+follow:
+    Polls the latency files of the current day until stopped.
+
+Classes
+-------
+
+FollowState:
+    The read position in each source file followed for a day.
+
+LiveArchive:
+    A daily archive kept open in SWMR mode while rows are appended to it.
+'''
+
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import io
+import json
+import logging
+import os
+import time
+import numpy as np
+from latencyconverter.utilities.archive import (
+    DailyArchive, channel_group_name)
+from latencyconverter.utilities.channels import concatenate_channels
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.csv_to_hdf5 import (
+    DEFAULT_CSV_ENGINE, csv_channels, load_csv)
+from latencyconverter.utilities.file_search import (
+    LatencyFile, archive_path, day_directory, scan_directory)
+from latencyconverter.utilities.formats import CSV_SOURCE, JSON_SOURCE
+from latencyconverter.utilities.json_to_hdf5 import stream_json
+from latencyconverter.utilities.options import (
+    DEFAULT_CHECKPOINT, DEFAULT_INTERVAL)
+
+FOLLOW_STATE_NAME = 'follow_state.json'
+
+# Only the built-in source formats can be read incrementally
+FOLLOW_PATTERNS = {source_format.name: source_format.patterns
+                   for source_format in (CSV_SOURCE, JSON_SOURCE)}
+
+# Columns kept from each appended batch until the next checkpoint, to update
+# the attributes of the channel groups with
+ATTR_COLUMNS = ('timestamp', 'sample rates', 'sample rate')
+
+
+def state_path(
+    archive: str
+) -> str:
+    '''
+    Returns the path of the follow state for an archive, in the same folder.
+    '''
+    return os.path.join(os.path.dirname(archive), FOLLOW_STATE_NAME)
+
+
+class FollowState:
+    '''
+    The read position in each source file followed for a day.
+
+    Each entry holds the 'size' and 'mtime' of the file when it was last
+    read. Csv entries also hold the byte 'offset' parsing stopped at and the
+    'header' line of the file, and json entries the 'last' timestamp
+    appended for each channel, in nanoseconds.
+
+    Parameters
+    ----------
+    path: str
+        The path of the state file.
+    entries: Dict[str, Dict]
+        The entry of each source file, keyed by source path.
+    '''
+    def __init__(
+        self,
+        path: str,
+        entries: Optional[Dict[str, Dict]] = None
+    ):
+        self.path = path
+        self.entries: Dict[str, Dict] = entries or {}
+
+    @classmethod
+    def load(
+        cls,
+        path: str
+    ) -> 'FollowState':
+        '''
+        Loads the follow state, or starts an empty one if the file does not
+        exist or can't be read.
+        '''
+        try:
+            with open(path) as state_file:
+                entries = json.load(state_file)['files']
+        except FileNotFoundError:
+            entries = {}
+        except (ValueError, KeyError, TypeError):
+            logging.warning(f'Ignoring unreadable follow state {path}')
+            entries = {}
+        return cls(path, entries)
+
+    def save(self):
+        '''
+        Writes the follow state, replacing the previous one atomically.
+        '''
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as state_file:
+            json.dump({'files': self.entries}, state_file, indent=1,
+                      sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def is_unchanged(
+        self,
+        latency_file: LatencyFile
+    ) -> bool:
+        '''
+        Checks whether a source file is unchanged since it was last read.
+        '''
+        entry = self.entries.get(latency_file.path)
+        return (entry is not None and
+                entry['size'] == latency_file.size and
+                entry['mtime'] == latency_file.mtime)
+
+
+def tail_csv(
+    filename: str,
+    offset: int = 0,
+    header: Optional[str] = None,
+    engine: str = DEFAULT_CSV_ENGINE
+) -> Tuple[List[Tuple[str, Dict]], int, Optional[str]]:
+    '''
+    Parses the complete lines appended to a Guralp latency csv file since an
+    offset. A line still being written is left for the next call.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the csv file.
+    offset: int
+        The byte offset to start reading from, as returned by the previous
+        call, or 0 to read the file from the start. Default: 0
+    header: str
+        The header line of the file, as returned by the previous call, or
+        None when reading from the start. Default: None
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+
+    Returns
+    -------
+    Tuple[List[Tuple[str, Dict]], int, str]
+        The channel id and typed arrays of each channel in the new lines, as
+        produced by csv_channels, the offset to continue reading from, and
+        the header line of the file.
+    '''
+    with open(filename, 'rb') as source:
+        source.seek(offset)
+        data = source.read()
+
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return [], offset, header
+    data = data[:end]
+
+    if offset == 0:
+        split = data.index(b'\n') + 1
+        header, data = data[:split].decode(), data[split:]
+    if not data:
+        return [], offset + end, header
+
+    df = load_csv(io.BytesIO(header.encode() + data), engine)
+    return list(csv_channels(df)), offset + end, header
+
+
+def _select(
+    columns: Dict,
+    rows: np.ndarray
+) -> Dict:
+    '''
+    Selects rows of the per-packet arrays of a channel. Arrays that don't
+    have a value per packet, such as the empty samples of json channels, are
+    kept as they are.
+    '''
+    packets = len(columns['timestamp'])
+    return {name: (value[rows]
+                   if isinstance(value, np.ndarray) and len(value) == packets
+                   else value)
+            for name, value in columns.items()}
+
+
+def reread_json(
+    filename: str,
+    last: Dict[str, int]
+) -> Tuple[List[Tuple[str, Dict]], Dict[str, int]]:
+    '''
+    Reads a Nanometrics availability json file again, keeping only the
+    intervals newer than those already appended. Files that aren't valid
+    json yet, e.g. because they are still being written, yield nothing.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the json file.
+    last: Dict[str, int]
+        The last timestamp appended for each channel, in nanoseconds.
+
+    Returns
+    -------
+    Tuple[List[Tuple[str, Dict]], Dict[str, int]]
+        The channel id and typed arrays of the new intervals of each channel,
+        as produced by stream_json, and the updated last timestamps.
+    '''
+    try:
+        # Entries repeating a channel id are merged, so the intervals of
+        # each channel are compared against its last timestamp at once
+        channels = list(concatenate_channels([stream_json(filename)]))
+    except ValueError as e:
+        logging.debug(f'Not reading {filename} yet: {e}')
+        return [], last
+
+    last = dict(last)
+    new_channels = []
+    for channel, columns in channels:
+        newer = columns['timestamp'] > last.get(channel,
+                                                np.iinfo('int64').min)
+        if not newer.any():
+            continue
+        columns = _select(columns, newer)
+        last[channel] = int(columns['timestamp'].max())
+        new_channels.append((channel, columns))
+    return new_channels, last
+
+
+class LiveArchive:
+    '''
+    A consolidated daily archive kept open in SWMR mode while rows are
+    appended to it. Rows are appended to the resizable datasets of each
+    channel group and flushed once per batch.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the archive file. It is created if it doesn't exist.
+    profile: str
+        The name of the compression profile to store new datasets with.
+        Default: 'gzip9'
+    '''
+    def __init__(
+        self,
+        filename: str,
+        profile: str = DEFAULT_PROFILE
+    ):
+        self.filename = filename
+        self.profile = profile
+        # The columns needed to update the attributes of each channel group
+        # at the next checkpoint
+        self.pending: Dict[str, List[Dict]] = {}
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        '''
+        Opens the archive and switches it to SWMR mode.
+        '''
+        self.archive = DailyArchive(self.filename, 'a', self.profile,
+                                    libver='latest')
+        try:
+            self.archive.hdf5file.swmr_mode = True
+        except RuntimeError:
+            # Archives written by daily_lat_store don't have a recent enough
+            # superblock
+            logging.warning(f'{self.filename} can\'t be written in SWMR ' +
+                            'mode; readers won\'t see new rows until it is ' +
+                            'closed.')
+
+    def checkpoint(
+        self,
+        new_channels: Optional[Dict[str, Dict]] = None,
+        reopen: bool = True
+    ):
+        '''
+        Reopens the archive in normal mode to add new channels, update the
+        attributes of the channel groups and rebuild the index, summary
+        statistics and downsampled levels.
+
+        Parameters
+        ----------
+        new_channels: Dict[str, Dict]
+            The typed arrays of channels to create groups and datasets for,
+            keyed by channel id. Default: None
+        reopen: bool
+            Whether to switch the archive back to SWMR mode afterwards.
+            Default: True
+        '''
+        # Leaving SWMR mode requires closing the file. The index is written
+        # by the archive opened in normal mode below.
+        self.archive.hdf5file.close()
+
+        with DailyArchive(self.filename, 'a', self.profile,
+                          libver='latest') as archive:
+            for channel, columns in (new_channels or {}).items():
+                archive.require_channel(channel, columns)
+            for channel, batches in self.pending.items():
+                channel_group = archive.hdf5file[channel_group_name(channel)]
+                for columns in batches:
+                    archive.update_attrs(channel_group, columns)
+            # Channels appended to out of order in SWMR mode are sorted along
+            # with the index
+            archive.unsorted |= self.archive.unsorted
+        self.pending = {}
+
+        if reopen:
+            self._open()
+
+    def write(
+        self,
+        channels: List[Tuple[str, Dict]]
+    ) -> int:
+        '''
+        Appends a batch of rows to the archive and flushes them, so readers
+        in SWMR mode see the whole batch at once.
+
+        Parameters
+        ----------
+        channels: List[Tuple[str, Dict]]
+            The channel id and typed arrays of each channel, as produced by
+            csv_channels or stream_json.
+
+        Returns
+        -------
+        int
+            The number of rows appended.
+        '''
+        hdf5file = self.archive.hdf5file
+        new_channels = {}
+        for channel, columns in channels:
+            name = channel_group_name(channel)
+            if (name not in hdf5file or
+                    ('data latency' in columns and
+                     'data latency' not in hdf5file[name])):
+                new_channels[channel] = columns
+        if new_channels:
+            self.checkpoint(new_channels)
+            hdf5file = self.archive.hdf5file
+
+        rows = 0
+        for channel, columns in channels:
+            channel_group = hdf5file[channel_group_name(channel)]
+            self.archive.append_datasets(channel_group, columns)
+            self.pending.setdefault(channel, []).append(
+                {name: columns[name] for name in ATTR_COLUMNS
+                 if name in columns})
+            rows += len(columns['timestamp'])
+
+        hdf5file.flush()
+        return rows
+
+    def close(self):
+        '''
+        Checkpoints and closes the archive.
+        '''
+        if self.archive.hdf5file:
+            self.checkpoint(reopen=False)
+
+
+def _read_updates(
+    latency_file: LatencyFile,
+    entry: Dict,
+    engine: str
+) -> Tuple[List[Tuple[str, Dict]], Dict]:
+    '''
+    Reads the rows written to a source file since it was last read, and
+    returns them with the file's updated state entry.
+    '''
+    entry = dict(entry, size=latency_file.size, mtime=latency_file.mtime)
+
+    if latency_file.file_type == 'json':
+        channels, entry['last'] = reread_json(latency_file.path,
+                                              entry.get('last', {}))
+        return channels, entry
+
+    offset = entry.get('offset', 0)
+    if latency_file.size < offset:
+        logging.warning(f'{latency_file.path} was truncated; reading it ' +
+                        'again from the start.')
+        offset = 0
+    channels, entry['offset'], entry['header'] = tail_csv(
+        latency_file.path, offset, entry.get('header'), engine)
+    return channels, entry
+
+
+def poll_day(
+    source: str,
+    working_date: date,
+    live: LiveArchive,
+    state: FollowState,
+    engine: str = DEFAULT_CSV_ENGINE
+) -> int:
+    '''
+    Appends the rows written to the latency files of a date since the
+    previous poll to a live archive, as a single batch.
+
+    Parameters
+    ----------
+    source: str
+        Source directory to search for latency files in.
+    working_date: date
+        The date to poll the latency files of.
+    live: LiveArchive
+        The archive to append to.
+    state: FollowState
+        The read position in each source file. Updated and saved once the
+        batch is flushed.
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+
+    Returns
+    -------
+    int
+        The number of rows appended.
+    '''
+    updates = {}
+    partitions = []
+    for latency_file in scan_directory(day_directory(source, working_date),
+                                       working_date, FOLLOW_PATTERNS):
+        if state.is_unchanged(latency_file):
+            continue
+        channels, updates[latency_file.path] = _read_updates(
+            latency_file, state.entries.get(latency_file.path, {}), engine)
+        partitions.append(channels)
+
+    rows = 0
+    if partitions:
+        rows = live.write(list(concatenate_channels(partitions)))
+
+    # Only advance past rows that have been flushed to the archive
+    if updates:
+        state.entries.update(updates)
+        state.save()
+    return rows
+
+
+def _today() -> date:
+    '''
+    Returns the current date in UTC, which the source folders are named by.
+    '''
+    return datetime.now(timezone.utc).date()
+
+
+def follow(
+    source: str,
+    destination: str,
+    working_date: Optional[date] = None,
+    interval: float = DEFAULT_INTERVAL,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT,
+    profile: str = DEFAULT_PROFILE,
+    engine: str = DEFAULT_CSV_ENGINE,
+    polls: Optional[int] = None
+) -> int:
+    '''
+    Polls the latency files of a day and appends their new rows to the day's
+    consolidated archive, until stopped or the number of polls is reached.
+
+    Without a fixed date, the current UTC day is followed. When the day
+    changes, the files of the previous day are polled one last time and its
+    archive is closed before following the new day.
+
+    Parameters
+    ----------
+    source: str
+        Source directory to search for latency files in.
+    destination: str
+        The root folder of the hdf5 archive. Archives are stored in the
+        YYYY/MM/DD subdirectory for their date.
+    working_date: date
+        The date to follow, or None to follow the current day.
+        Default: None
+    interval: float
+        Seconds to wait between polls. Default: 60
+    checkpoint_interval: float
+        Seconds between checkpoints of the archive's attributes, index,
+        summary statistics and downsampled levels. Default: 900
+    profile: str
+        The name of the compression profile to store new datasets with.
+        Default: 'gzip9'
+    engine: str
+        The csv parser to use, 'c', 'pyarrow' or 'mmap'. Default: 'c'
+    polls: int
+        The number of polls after which to stop, or None to poll until
+        interrupted. Default: None
+
+    Returns
+    -------
+    int
+        The number of rows appended.
+    '''
+    rows = 0
+    count = 0
+    current = None
+    live = None
+    state = None
+    try:
+        while True:
+            day = working_date or _today()
+            if day != current:
+                if live is not None:
+                    rows += poll_day(source, current, live, state, engine)
+                    live.close()
+                    logging.info(f'Closed the archive for {current}')
+                current = day
+                filename = archive_path(destination, day)
+                live = LiveArchive(filename, profile)
+                state = FollowState.load(state_path(filename))
+                last_checkpoint = time.monotonic()
+                logging.info(f'Following {day_directory(source, day)} into ' +
+                             f'{filename}')
+
+            appended = poll_day(source, day, live, state, engine)
+            rows += appended
+            logging.debug(f'Appended {appended} rows')
+
+            if time.monotonic() - last_checkpoint >= checkpoint_interval:
+                live.checkpoint()
+                last_checkpoint = time.monotonic()
+
+            count += 1
+            if polls is not None and count >= polls:
+                break
+            time.sleep(interval)
+    finally:
+        if live is not None:
+            live.close()
+
+    return rows
@@ -0,0 +1,322 @@
+'''
+Module providing the registry of the source formats latency files are
+converted from. Each format declares the names of its files and the parser
+that reads them, so that file_search finds, and bulk_store and the pipelined
+engine convert, the files of every registered format without knowing about
+any of them in particular.
+
+The Guralp csv and Nanometrics json formats are built in. Other packages add
+formats through the latencyconverter.formats entry point group, each entry
+point naming a SourceFormat, e.g. in their setup.py:
+
+    entry_points={
+        'latencyconverter.formats': [
+            'centaur = centaur_latency.formats:CENTAUR_FORMAT'
+        ]
+    }
+
+Entry points are loaded the first time the registry is used. Parsers are
+named by their import path rather than imported, so the registry only
+imports the standard library and the command line tools stay quick to start.
+
+Functions
+---------
+
+register_format:
+    Adds a source format to the registry.
+
+source_formats:
+    Returns every registered source format, in the order files are listed in.
+
+get_format:
+    Returns the registered source format with a name.
+
+match_format:
+    Returns the source format a file belongs to, judging by its name.
+
+skip_invalid:
+    Checks whether a file its parser rejected should be skipped instead of
+    failing its conversion.
+
+Classes
+-------
+
+SourceFormat:
+    Describes a format of latency file and how to read it.
+'''
+
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+from typing import Tuple
+import fnmatch
+import functools
+import logging
+import os
+
+# Entry point group other packages register source formats under
+ENTRY_POINT_GROUP = 'latencyconverter.formats'
+
+
+class SourceFormat(NamedTuple):
+    '''
+    Describes a format of latency file and how to read it.
+
+    Attributes
+    ----------
+    name: str
+        The name of the format, e.g. 'csv', which is also the file type of
+        the LatencyFile records of its files.
+    patterns: tuple
+        Shell-style patterns of the names of the files of the format that
+        get_files searches source folders for.
+    extensions: tuple
+        The extensions of the files of the format, by which the files in a
+        list given to bulk_store are recognised.
+    parser: str
+        Import path of the parser, as 'module:function'. The parser is called
+        with the path to a file, or a binary file object holding its
+        contents, and yields the channel id and typed arrays of each channel
+        of the file, as csv_channels does.
+    exclude: tuple
+        Shell-style patterns of the names of files of the format that are
+        skipped instead of converted. Default: ()
+    lenient: bool
+        Whether a file the parser rejects with a ValueError is skipped, with
+        the error logged, instead of failing its conversion. Default: False
+    fast_path: str
+        Import path of a function that stores a file given by its path
+        straight to an hdf5 file, called as
+        store(filename, destination_dir, profile, layout) and returning the
+        number of rows stored, for formats that can do better than writing
+        the channels their parser yields. Files it can't read are rejected
+        with a ValueError, without leaving a partly written file behind, so
+        that lenient formats can skip them. Default: None
+    '''
+    name: str
+    patterns: Tuple[str, ...]
+    extensions: Tuple[str, ...]
+    parser: str
+    exclude: Tuple[str, ...] = ()
+    lenient: bool = False
+    fast_path: Optional[str] = None
+
+    def parse(
+        self,
+        source: Any
+    ) -> Iterator[Tuple[str, Dict]]:
+        '''
+        Parses a file given by its path, or a binary file object holding its
+        contents, yielding the channel id and typed arrays of each channel.
+        '''
+        return _load(self.parser)(source)
+
+    def store(
+        self,
+        filename: str,
+        destination_dir: str,
+        profile: str,
+        layout: int
+    ) -> int:
+        '''
+        Stores a file straight to hdf5 with the fast path of the format,
+        returning the number of rows stored.
+        '''
+        if self.fast_path is None:
+            raise ValueError(f'The {self.name} format has no fast path.')
+        return _load(self.fast_path)(filename, destination_dir, profile,
+                                     layout)
+
+    def excludes(
+        self,
+        filename: str
+    ) -> bool:
+        '''
+        Checks whether a file of the format should be skipped instead of
+        converted.
+        '''
+        name = os.path.basename(filename)
+        return any(fnmatch.fnmatchcase(name, pattern)
+                   for pattern in self.exclude)
+
+
+CSV_SOURCE = SourceFormat(
+    name='csv',
+    patterns=('*_HN*.csv',),
+    extensions=('.csv',),
+    parser='latencyconverter.utilities.csv_to_hdf5:read_csv_channels',
+    exclude=('*TimingError*',),
+    fast_path='latencyconverter.utilities.csv_to_hdf5:store_csv')
+
+JSON_SOURCE = SourceFormat(
+    name='json',
+    patterns=('*.json',),
+    extensions=('.json',),
+    parser='latencyconverter.utilities.json_to_hdf5:read_json_channels',
+    exclude=('*TimingError*',),
+    lenient=True,
+    fast_path='latencyconverter.utilities.json_to_hdf5:write_json')
+
+_REGISTRY: Dict[str, SourceFormat] = {
+    CSV_SOURCE.name: CSV_SOURCE,
+    JSON_SOURCE.name: JSON_SOURCE
+}
+_entry_points_loaded = False
+
+
+def register_format(
+    source_format: SourceFormat,
+    replace: bool = False
+):
+    '''
+    Adds a source format to the registry. Files are listed, and matched to
+    formats, in the order the formats were registered in.
+
+    Parameters
+    ----------
+    source_format: SourceFormat
+        The format to add.
+    replace: bool
+        Replace a registered format with the same name instead of raising.
+        Default: False
+
+    Raises
+    ------
+    ValueError
+        If a format with the same name is already registered.
+    '''
+    if source_format.name in _REGISTRY and not replace:
+        raise ValueError(f'A source format named {source_format.name} is ' +
+                         'already registered.')
+    _REGISTRY[source_format.name] = source_format
+
+
+def _load_entry_points():
+    '''
+    Registers the source formats of the latencyconverter.formats entry
+    points of the installed packages, once. Entry points that fail to load,
+    or that clash with a registered format, are logged and ignored.
+    '''
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+
+    from importlib.metadata import entry_points
+
+    found = entry_points()
+    if hasattr(found, 'select'):
+        group = found.select(group=ENTRY_POINT_GROUP)
+    else:
+        group = found.get(ENTRY_POINT_GROUP, [])
+
+    for entry_point in group:
+        try:
+            source_format = entry_point.load()
+        except Exception:
+            logging.exception('Failed to load source format ' +
+                              f'{entry_point.name} from {entry_point.value}')
+            continue
+        if not isinstance(source_format, SourceFormat):
+            logging.warning(f'Ignoring source format {entry_point.name}: ' +
+                            f'{entry_point.value} is not a SourceFormat')
+            continue
+        if source_format.name in _REGISTRY:
+            logging.warning(f'Ignoring source format {entry_point.name}: ' +
+                            f'{source_format.name} is already registered')
+            continue
+        _REGISTRY[source_format.name] = source_format
+
+
+def source_formats() -> List[SourceFormat]:
+    '''
+    Returns every registered source format, in the order they were
+    registered in, which is the order their files are listed in.
+    '''
+    _load_entry_points()
+    return list(_REGISTRY.values())
+
+
+def get_format(
+    name: str
+) -> SourceFormat:
+    '''
+    Returns the registered source format with a name.
+
+    Raises
+    ------
+    KeyError
+        If no format with the name is registered.
+    '''
+    _load_entry_points()
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise KeyError(f'Unknown source format: {name}. Must be one of ' +
+                       f'{", ".join(_REGISTRY)}.') from None
+
+
+def match_format(
+    filename: str
+) -> Optional[SourceFormat]:
+    '''
+    Returns the source format a file belongs to, judging by its extension.
+
+    Parameters
+    ----------
+    filename: str
+        The path to the file.
+
+    Returns
+    -------
+    SourceFormat
+        The first registered format with a matching extension, or None if
+        the file doesn't belong to any.
+    '''
+    name = os.path.basename(filename)
+    for source_format in source_formats():
+        if name.endswith(source_format.extensions):
+            return source_format
+    return None
+
+
+def skip_invalid(
+    source_format: SourceFormat,
+    filename: str,
+    error: Exception
+) -> bool:
+    '''
+    Checks whether a file its parser rejected should be skipped instead of
+    failing its conversion, logging why it is skipped. Only files of lenient
+    formats rejected with a ValueError are skipped.
+
+    Parameters
+    ----------
+    source_format: SourceFormat
+        The format of the file.
+    filename: str
+        The path to the file.
+    error: Exception
+        The error raised while parsing the file.
+
+    Returns
+    -------
+    bool
+        True if the file should be skipped, in which case the error should
+        be suppressed.
+    '''
+    if not source_format.lenient or not isinstance(error, ValueError):
+        return False
+    logging.error(f'Skipping invalid {source_format.name} file ' +
+                  f'{filename}: {error}')
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def _load(
+    path: str
+) -> Callable:
+    '''
+    Imports the function named by a 'module:function' import path.
+    '''
+    module, _, name = path.partition(':')
+    return getattr(import_module(module), name)
@@ -0,0 +1,173 @@
+'''
+Module for reading a json document incrementally from a file, one value at a
+time, so that large documents never have to be held in memory in full.
+
+Classes
+-------
+
+JsonStream:
+    Incremental reader over a json file that can walk objects and arrays
+    member by member and decode individual values.
+'''
+
+from typing import Any, Iterator, TextIO
+import json
+
+WHITESPACE = ' \t\n\r'
+NUMBER = '0123456789.eE+-'
+
+
+class JsonStream:
+    '''
+    Incremental reader over a json document.
+
+    Only the unread part of the document is buffered, plus at most one chunk
+    of read-ahead. Containers are walked with members() and elements(), which
+    stop at each member or element and leave it to the caller to either
+    descend into it or decode it in full with value().
+
+    Parameters
+    ----------
+    json_file: TextIO
+        The open json file to read from.
+    chunk_size: int
+        The number of characters to read from the file at a time.
+        Default: 65536
+    '''
+    def __init__(
+        self,
+        json_file: TextIO,
+        chunk_size: int = 65536
+    ):
+        self.json_file = json_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        '''
+        Reads the next chunk of the file into the buffer, discarding the part
+        that has already been consumed. Returns False at the end of the file.
+        '''
+        if self.eof:
+            return False
+
+        chunk = self.json_file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        '''
+        Skips whitespace and returns the next character without consuming it,
+        or an empty string at the end of the document.
+        '''
+        while True:
+            while (self.pos < len(self.buffer) and
+                   self.buffer[self.pos] in WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(
+        self,
+        characters: str
+    ) -> str:
+        '''
+        Consumes the next character, which must be one of characters, and
+        returns it.
+
+        Raises
+        ------
+        json.JSONDecodeError
+            If the next character is not one of the expected characters.
+        '''
+        character = self.peek()
+        if character == '' or character not in characters:
+            raise json.JSONDecodeError(
+                f'Expecting one of {characters!r}', self.buffer, self.pos)
+        self.pos += 1
+        return character
+
+    def value(self) -> Any:
+        '''
+        Decodes and returns the next complete json value.
+        '''
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may just be cut off at the end of the buffer
+                if self._fill():
+                    continue
+                raise
+
+            # A number followed by nothing but number characters may continue
+            # in the next chunk, even if it decoded, e.g. '2' from '2.'
+            if self._may_continue(value, end) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def _may_continue(
+        self,
+        value: Any,
+        end: int
+    ) -> bool:
+        '''
+        Returns whether a value decoded up to end may be cut off at the end
+        of the buffer, which is the case for a number when the rest of the
+        buffer holds only number characters.
+        '''
+        if end == len(self.buffer):
+            return True
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return all(character in NUMBER for character in self.buffer[end:])
+
+    def members(self) -> Iterator[str]:
+        '''
+        Walks the members of the object starting at the current position,
+        yielding each key. The caller must consume the member's value before
+        advancing to the next key.
+        '''
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError(
+                    'Expecting property name', self.buffer, self.pos)
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self) -> Iterator[None]:
+        '''
+        Walks the elements of the array starting at the current position,
+        yielding once per element. The caller must consume each element before
+        advancing to the next one.
+        '''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield None
+            if self.expect(',]') == ']':
+                return
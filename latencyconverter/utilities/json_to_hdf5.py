@@ -12,22 +12,57 @@ json_to_table:
     This function parses through json formatted data and extracts the values
     that we wish to store, rearranging them into a pandas dataframe.
 
+stream_json:
+    This function reads a Nanometrics availability json file incrementally
+    and yields the latency data of each channel as typed arrays.
+
+json_channels:
+    This function splits the latency data from a DataFrame by channel into
+    the typed arrays that are stored in hdf5 format.
+
 json_to_hdf5:
     This function takes the latency data from a DataFrame and stores it as an
     HDF5 file.
+
+read_json_channels:
+    This function reads a Nanometrics availability json file, given by its
+    path or as a file object, and yields its latency data split by channel.
+
+extract_json:
+    This function loads a Nanometrics availability json file and returns its
+    latency data split by channel.
+
+write_json:
+    This function stores the latency information of a Nanometrics
+    availability json file in a compressed hdf5 format, raising if the file
+    is invalid.
+
 store_json:
     This function loads a Nanometrics availability json file, extracts latency
     information from it and stores it in a compressed hdf5 format.
 '''
 
-from typing import Dict
+from array import array
+from typing import (
+    BinaryIO, Dict, Iterator, List, Optional, TextIO, Tuple, Union)
+import io
 import json
+import os
+import numpy as np
 import pandas as pd
-import h5py
-import datetime
 import logging
-
-
+from latencyconverter.utilities.channels import partition_channels
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.encoding import DEFAULT_LAYOUT
+from latencyconverter.utilities.json_stream import JsonStream
+from latencyconverter.utilities.metrics import timed, timed_iter
+from latencyconverter.utilities.timestamps import parse_json_timestamps
+from latencyconverter.utilities.file_search import output_path
+from latencyconverter.utilities.source import MappedText, map_file
+from latencyconverter.utilities.writer import channels_to_h5py
+
+
+@timed('load_json')
 def load_json(
     source: str
 ) -> Dict:
@@ -47,9 +82,14 @@ def load_json(
         Dictionary object containing the json format data.
     '''
 
-    # Open the json file and load it into a dictionary
-    with open(source) as json_file:
-        availability = json.load(json_file)
+    # Map the json file and decode it into a dictionary straight from the
+    # mapped pages
+    with map_file(source) as mapped:
+        json_file = MappedText(mapped, source)
+        try:
+            availability = json.load(json_file)
+        finally:
+            json_file.close()
 
         if 'availability' not in availability:
             raise ValueError(f'Invalid json file: {source} does not contain \
@@ -57,6 +97,7 @@ def load_json(
     return availability
 
 
+@timed('json_to_table')
 def json_to_table(
     latency_dict: Dict
 ) -> pd.DataFrame:
@@ -106,10 +147,193 @@ def json_to_table(
     return latency_df
 
 
+def stream_json(
+    source: Union[str, TextIO],
+    batch_size: int = 65536,
+    chunk_size: int = 65536
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    Reads a Nanometrics availability json file incrementally and yields the
+    latency data of each channel as typed arrays, without loading the whole
+    document into memory.
+
+    Intervals are decoded one at a time and their values accumulated in
+    typed arrays, and each channel is yielded as soon as its entry has been
+    read, so memory use is bounded by the size of a single channel rather
+    than by the size of the document. An entry repeating a channel id is
+    yielded again, and is merged into the channel by the writers. A file
+    given by its path is memory-mapped and decoded from the mapped pages,
+    which are released as the stream moves past them.
+
+    Parameters
+    ----------
+    source: str or TextIO
+        The path to the Nanometrics json file that should be read, or the
+        file already opened in text mode.
+
+    batch_size: int
+        The number of interval start times to collect before converting them
+        to unix timestamps. Default: 65536
+
+    chunk_size: int
+        The number of characters to read from the file at a time.
+        Default: 65536
+
+    Yields
+    ------
+    Tuple[str, Dict]
+        The channel id, and a dictionary containing the 'timestamp',
+        'network latency' and 'samples' arrays and the 'sample rate' of the
+        channel, as produced by json_channels.
+    '''
+    if not isinstance(source, str):
+        yield from _stream_availability(
+            source, getattr(source, 'name', 'json stream'), batch_size,
+            chunk_size)
+        return
+
+    with map_file(source) as mapped:
+        json_file = MappedText(mapped, source)
+        try:
+            yield from _stream_availability(json_file, source, batch_size,
+                                            chunk_size)
+        finally:
+            json_file.close()
+
+
+def _stream_availability(
+    json_file: TextIO,
+    source: str,
+    batch_size: int,
+    chunk_size: int
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    Reads the availability list of an open json file, yielding each channel
+    as soon as its entry has been read. Entries without a channel id are
+    logged and skipped.
+    '''
+    stream = JsonStream(json_file, chunk_size)
+
+    found = False
+    for key in stream.members():
+        if key != 'availability':
+            stream.value()
+            continue
+
+        found = True
+        for index, _ in enumerate(stream.elements()):
+            channel, timestamps, latencies = _stream_channel(stream,
+                                                             batch_size)
+            if channel is None:
+                logging.warning(f'Skipping availability entry {index} of ' +
+                                f'{source}: missing a channel id.')
+                continue
+            yield channel, {
+                'timestamp': np.frombuffer(timestamps, dtype='int64'),
+                'network latency': np.frombuffer(latencies, dtype='float64'),
+                # The Nanometrics Availability API doesn't return these
+                # values
+                'samples': np.empty(0, dtype='uint16'),
+                'sample rate': 100
+            }
+
+    if not found:
+        raise ValueError(f'Invalid json file: {source} does not contain \
+                           availability information.')
+
+
+def _stream_channel(
+    stream: JsonStream,
+    batch_size: int
+) -> Tuple[Optional[str], array, array]:
+    '''
+    Reads a single channel object of an availability list from the stream,
+    returning its id, or None if it has none, and the timestamps and
+    latencies of its intervals.
+    '''
+    channel = None
+    timestamps = array('q')
+    latencies = array('d')
+    starttimes: List[str] = []
+
+    for key in stream.members():
+        if key == 'id':
+            channel = stream.value()
+        elif key == 'intervals':
+            for _ in stream.elements():
+                interval = stream.value()
+                starttimes.append(interval['startTime'])
+                latencies.append(interval['latency']['maximum'])
+
+                # Convert start times in batches so the strings don't pile up
+                if len(starttimes) >= batch_size:
+                    timestamps.frombytes(
+                        parse_json_timestamps(starttimes).tobytes())
+                    starttimes = []
+        else:
+            stream.value()
+
+    timestamps.frombytes(parse_json_timestamps(starttimes).tobytes())
+    return channel, timestamps, latencies
+
+
+def json_channels(
+    df: pd.DataFrame
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    This function splits the latency data from a DataFrame by channel and
+    converts each channel's columns to the typed arrays that are stored in
+    hdf5 format.
+
+    Parameters
+    ----------
+    df: DataFrame
+        Pandas DataFrame object containing data extracted from a
+        json-formatted Nanometrics Availability API query.
+
+    Yields
+    ------
+    Tuple[str, Dict]
+        The channel id, and a dictionary containing the 'timestamp' (int64
+        nanoseconds since the unix epoch), 'network latency' (float64
+        seconds) and 'samples' arrays and the 'sample rate' of the channel.
+    '''
+    # Only the columns present in the dataframe can be split by channel
+    names = [name for name in ['starttime', 'latency', 'sample rate',
+                               'samples'] if name in df]
+
+    # Loop through each channel's slice of the dataframe
+    for channel, columns in timed_iter('partition',
+                                       partition_channels(df, names)):
+
+        # Default to 100 if no sample rate present
+        if 'sample rate' in columns:
+            sample_rate = int(columns['sample rate'][0])
+        else:
+            sample_rate = 100
+
+        # The Nanometrics Availability API doesn't return the number of
+        # samples in each packet, so default to an empty dataset
+        if 'samples' in columns:
+            samples = columns['samples'].astype('uint16')
+        else:
+            samples = np.empty(0, dtype='uint16')
+
+        yield channel, {
+            # Convert the timestamps to nanoseconds since the unix epoch
+            'timestamp': parse_json_timestamps(columns['starttime']),
+            'network latency': columns['latency'].astype('float64'),
+            'samples': samples,
+            'sample rate': sample_rate
+        }
+
+
 def json_to_h5py(
     filename: str,
-    df: pd.DataFrame
-):
+    df: pd.DataFrame,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> int:
     '''
     This function takes the latency data from a DataFrame and stores it as an
     HDF5 file
@@ -123,64 +347,115 @@ def json_to_h5py(
     df: DataFrame
         Pandas DataFrame object containing data extracted from a
         json-formatted Nanometrics Availability API query.
+
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+
+    Returns
+    -------
+    int
+        The number of rows stored.
+    '''
+    return channels_to_h5py(filename, json_channels(df), profile, layout)
+
+
+def read_json_channels(
+    source: Union[str, BinaryIO, TextIO]
+) -> Iterator[Tuple[str, Dict]]:
+    '''
+    This function reads a Nanometrics availability json file incrementally
+    and yields its latency data split by channel, timing the parsing. It is
+    the parser of the json source format.
+
+    Parameters
+    ----------
+    source: str, BinaryIO or TextIO
+        The path to the json file, or the file already opened in binary or
+        text mode. Binary files are decoded as utf-8.
+
+    Returns
+    -------
+    Iterator[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        stream_json.
+    '''
+    logging.debug(f'Loading {getattr(source, "name", source)}')
+    if not isinstance(source, (str, io.TextIOBase)):
+        source = io.TextIOWrapper(source, encoding='utf-8')
+    return timed_iter('parse_json', stream_json(source))
+
+
+def extract_json(
+    filename: str
+) -> List[Tuple[str, Dict]]:
+    '''
+    This function loads a Nanometrics availability json file and returns its
+    latency data split by channel, without writing it anywhere.
+
+    Parameters
+    ----------
+    filename: str
+        The file to extract station latency information from.
+
+    Returns
+    -------
+    List[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        stream_json.
     '''
-    # Open the HDF5 file
-    with h5py.File(filename, 'w') as hdf5file:
-
-        # Loop through each channel in the dataframe
-        for channel in df['channel'].unique():
-            channel_df = df.loc[df['channel'] == channel]
-
-            channel_group = hdf5file.create_group(channel)
-
-            # Add the sample rate attribue
-            if 'sample rate' in df:
-                channel_group.attrs.create('sample rate',
-                                           data=df['sample rate'][0],
-                                           dtype='uint16')
-            else:
-                # Default to 100 if no sample rate present
-                channel_group.attrs.create('sample rate', data='100',
-                                           dtype='uint16')
-
-            # Convert the timestamps to unix timestamps
-            end_timestamps = channel_df['starttime'].tolist()
-            end_timestamps = list(map(
-                lambda item: datetime.datetime.strptime(
-                    item[:26], "%Y-%m-%dT%H:%M:%S.%f").timestamp(),
-                end_timestamps))
-
-            # Create a compressed dataset containing timestamps
-            channel_group.create_dataset(
-                name='timestamp',
-                data=end_timestamps,
-                dtype='float64',
-                compression='gzip',
-                compression_opts=9)
-
-            # Create a compressed dataset for network latency
-            channel_group.create_dataset(name='network latency',
-                                         data=df['latency'].tolist(),
-                                         dtype='int32',
-                                         compression='gzip',
-                                         compression_opts=9)
-
-            # Create a dataset for the number of samples in each packet
-            if 'samples' in df:
-                channel_group.create_dataset(name='samples',
-                                             data=df['samples'].tolist(),
-                                             dtype='uint16')
-            # The Nanometrics Availability API doesn't return this value so
-            # generate an empty dataset
-            else:
-                channel_group.create_dataset(name='samples', data=[],
-                                             dtype='uint16')
+    return list(read_json_channels(filename))
+
+
+def write_json(
+    filename: str,
+    destination_dir: str,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> int:
+    '''
+    This function stores the latency information of a Nanometrics
+    availability json file in a compressed hdf5 format. It is the fast path
+    of the json source format.
+
+    Parameters
+    ----------
+
+    filename, destination_dir, profile, layout:
+        As for store_json.
+
+    Returns
+    -------
+    int
+        The number of rows stored.
+
+    Raises
+    ------
+    ValueError
+        If the file isn't a valid availability json file, in which case the
+        partly written hdf5 file is removed.
+    '''
+    dest_path = output_path(filename, destination_dir)
+
+    try:
+        # The file is parsed while the hdf5 file is being written, so that
+        # only one channel entry is held in memory at a time
+        return channels_to_h5py(dest_path, read_json_channels(filename),
+                                profile, layout)
+    except ValueError:
+        _remove_partial(dest_path)
+        raise
 
 
 def store_json(
     filename: str,
-    destination_dir: str
-):
+    destination_dir: str,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> int:
     '''
     This function loads a Nanometrics availability json file, extracts latency
     information from it and stores it in a compressed hdf5 format.
@@ -193,18 +468,33 @@ def store_json(
 
     destination_dir: str
         The directory to store the compressed hdf5 file in.
-    '''
-    logging.debug(f'Loading {filename}')
 
-    try:
-        availability = load_json(filename)
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
 
-        latency_df = json_to_table(availability)
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
 
-        file_name_parts = filename.split('/')
-        dest_file = f'{file_name_parts[len(file_name_parts) - 1]}.hdf5'
-        json_to_h5py(f'{destination_dir}/{dest_file}', latency_df)
+    Returns
+    -------
+    int
+        The number of rows stored, or 0 if the file was skipped.
+    '''
+    try:
+        return write_json(filename, destination_dir, profile, layout)
     except json.decoder.JSONDecodeError:
         logging.error(f'Skipping invalid json file: {filename}')
     except ValueError as e:
         logging.error(f'Skipping {filename} due to ValueError: {e}')
+    return 0
+
+
+def _remove_partial(
+    dest_path: str
+):
+    '''
+    Removes an hdf5 file left incomplete by a failed conversion.
+    '''
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
@@ -0,0 +1,253 @@
+'''
+Module for keeping track of which source files have already been converted,
+so that re-running a conversion only converts new or modified files.
+
+The manifest is a json file in the destination folder, holding one entry per
+source file with its size, modification time and content hash, the hdf5 file
+it was converted to and the status of the conversion.
+
+Functions
+---------
+
+manifest_path:
+    Returns the path of the manifest for a destination folder.
+
+file_hash:
+    Computes the content hash of a file.
+
+file_state:
+    Returns the size, modification time and content hash of a file, as
+    recorded in the manifest.
+
+Classes
+-------
+
+Manifest:
+    The record of previously converted source files for a destination folder.
+'''
+
+from typing import Dict, Iterable, List, Optional
+import hashlib
+import json
+import logging
+import os
+
+MANIFEST_NAME = 'manifest.json'
+
+# Statuses for which a source file does not need to be converted again
+COMPLETE_STATUSES = ('converted', 'skipped')
+
+
+def manifest_path(
+    destination_folder: str
+) -> str:
+    '''
+    Returns the path of the manifest for a destination folder.
+    '''
+    return os.path.join(destination_folder, MANIFEST_NAME)
+
+
+def file_hash(
+    filename: str,
+    block_size: int = 1 << 20
+) -> str:
+    '''
+    Computes the sha256 hash of the contents of a file.
+
+    Parameters
+    ----------
+    filename: str
+        The file to hash.
+    block_size: int
+        The number of bytes to read at a time. Default: 1 MiB
+
+    Returns
+    -------
+    str
+        The hex digest of the file's contents.
+    '''
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as source:
+        for block in iter(lambda: source.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_state(
+    filename: str
+) -> Optional[Dict]:
+    '''
+    Returns the size, modification time and content hash of a file, as
+    recorded in its manifest entry, or None if the file doesn't exist.
+    Converters take it before parsing a file, so a file modified while it is
+    converted is recorded as it was, and converted again on the next run.
+    '''
+    try:
+        stat = os.stat(filename)
+        return {'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'hash': file_hash(filename)}
+    except FileNotFoundError:
+        return None
+
+
+class Manifest:
+    '''
+    The record of previously converted source files for a destination folder.
+
+    Parameters
+    ----------
+    path: str
+        The path of the manifest file.
+    entries: Dict[str, Dict]
+        The entry of each source file, keyed by source path.
+    '''
+    def __init__(
+        self,
+        path: str,
+        entries: Optional[Dict[str, Dict]] = None
+    ):
+        self.path = path
+        self.entries: Dict[str, Dict] = entries or {}
+
+    @classmethod
+    def load(
+        cls,
+        path: str
+    ) -> 'Manifest':
+        '''
+        Loads a manifest, or starts an empty one if the file does not exist
+        or can't be read.
+        '''
+        try:
+            with open(path) as manifest_file:
+                entries = json.load(manifest_file)['files']
+        except FileNotFoundError:
+            entries = {}
+        except (ValueError, KeyError, TypeError):
+            logging.warning(f'Ignoring unreadable manifest {path}')
+            entries = {}
+        return cls(path, entries)
+
+    def save(self):
+        '''
+        Writes the manifest, replacing the previous one atomically.
+        '''
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as manifest_file:
+            json.dump({'files': self.entries}, manifest_file, indent=1,
+                      sort_keys=True)
+        os.replace(temporary, self.path)
+
+    def is_current(
+        self,
+        filename: str,
+        output: str
+    ) -> bool:
+        '''
+        Checks whether a source file has already been converted to an output
+        file, and is unchanged since.
+
+        The size and modification time are compared first. The content hash
+        is only computed when those differ, so a file that was merely touched
+        is still recognized as unchanged.
+
+        Parameters
+        ----------
+        filename: str
+            The source file.
+        output: str
+            The hdf5 file the source file would be converted to.
+
+        Returns
+        -------
+        bool
+            True if the file doesn't need to be converted again.
+        '''
+        entry = self.entries.get(filename)
+        if (entry is None or entry['status'] not in COMPLETE_STATUSES or
+                entry['output'] != output):
+            return False
+        if entry['status'] == 'converted' and not os.path.exists(output):
+            return False
+
+        stat = os.stat(filename)
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime == entry['mtime']:
+            return True
+
+        if file_hash(filename) != entry['hash']:
+            return False
+
+        entry['mtime'] = stat.st_mtime
+        return True
+
+    def pending(
+        self,
+        files: Iterable[str],
+        outputs: Dict[str, str]
+    ) -> List[str]:
+        '''
+        Returns the files that are new or modified since they were last
+        converted.
+
+        Parameters
+        ----------
+        files: Iterable[str]
+            The source files.
+        outputs: Dict[str, str]
+            The hdf5 file each source file would be converted to.
+
+        Returns
+        -------
+        List[str]
+            The files that need to be converted, in their original order.
+        '''
+        return [filename for filename in files
+                if not self.is_current(filename, outputs[filename])]
+
+    def record(
+        self,
+        filename: str,
+        output: str,
+        status: str,
+        state: Optional[Dict] = None
+    ):
+        '''
+        Records the outcome of converting a source file.
+
+        Parameters
+        ----------
+        filename: str
+            The source file.
+        output: str
+            The hdf5 file the source file was converted to.
+        status: str
+            The status of the conversion, e.g. 'converted' or 'failed'.
+        state: Dict
+            The state of the source file from before it was converted, as
+            returned by file_state. If None, the file's current state is
+            recorded. Default: None
+        '''
+        if state is None:
+            state = file_state(filename)
+        if state is None or not os.path.exists(filename):
+            self.entries.pop(filename, None)
+            return
+
+        self.entries[filename] = dict(state, output=output, status=status)
+
+    def discard(
+        self,
+        filename: str
+    ):
+        '''
+        Forgets a source file, so that it is converted again on the next run.
+
+        Parameters
+        ----------
+        filename: str
+            The source file.
+        '''
+        self.entries.pop(filename, None)
@@ -0,0 +1,476 @@
+'''
+Module for instrumenting conversions: timing each stage of converting a file,
+counting the rows and bytes converted, and writing the results to a metrics
+file as JSON lines or in the Prometheus textfile format.
+
+Instrumentation is off unless a Metrics recorder is active in the current
+context. When none is, stage and timed_iter do nothing but look that up, so
+the converters are instrumented unconditionally at next to no cost.
+
+Stages can nest, and each records only its own time, excluding the time of
+the stages nested inside it. The stages of a file therefore add up to the
+time taken to convert it.
+
+Functions
+---------
+
+recording:
+    Context manager making a Metrics recorder active for the code it wraps.
+
+stage:
+    Context manager timing a stage of a conversion.
+
+timed:
+    Decorator timing every call of a function as a stage.
+
+timed_iter:
+    Times the production of each item of an iterator as a stage.
+
+count:
+    Adds to a counter of the active recorder.
+
+metrics_format:
+    Returns the format to write a metrics file in, based on its name.
+
+write_metrics:
+    Writes the metrics of each file of a conversion and their totals to a
+    metrics file.
+
+Classes
+-------
+
+Metrics:
+    The time spent in each stage and the counters of a conversion.
+'''
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import (
+    Callable, ContextManager, Dict, Iterable, Iterator, List, Optional)
+import functools
+import json
+import os
+import time
+
+METRICS_FORMATS = ('jsonl', 'prometheus')
+
+# Prefix of the names of the metrics written in the Prometheus format
+PROMETHEUS_PREFIX = 'latencyconverter'
+
+_active: ContextVar[Optional['Metrics']] = ContextVar('metrics',
+                                                      default=None)
+
+# Shared by every stage timed while instrumentation is off
+_NOT_TIMED = nullcontext()
+
+
+class Metrics:
+    '''
+    The time spent in each stage and the counters of a conversion.
+
+    Attributes
+    ----------
+    stages: Dict[str, List]
+        The seconds spent in each stage, excluding nested stages, and the
+        number of times it was entered, as [seconds, calls] pairs.
+    counters: Dict[str, int]
+        Counts such as 'bytes_read', 'bytes_written' and 'channels'.
+    '''
+    def __init__(self):
+        self.stages: Dict[str, List] = {}
+        self.counters: Dict[str, int] = {}
+        # [start, seconds of nested stages] of each stage being timed
+        self._open: List[List[float]] = []
+
+    def start(self):
+        '''
+        Starts timing a stage, nested in any stage already being timed.
+        '''
+        self._open.append([time.perf_counter(), 0.0])
+
+    def stop(
+        self,
+        name: str
+    ):
+        '''
+        Stops timing the most recently started stage, recording it as name.
+        '''
+        start, nested = self._open.pop()
+        elapsed = time.perf_counter() - start
+        if self._open:
+            self._open[-1][1] += elapsed
+        self.add(name, elapsed - nested)
+
+    def add(
+        self,
+        name: str,
+        seconds: float,
+        calls: int = 1
+    ):
+        '''
+        Adds time spent in a stage.
+        '''
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    def count(
+        self,
+        name: str,
+        value: int = 1
+    ):
+        '''
+        Adds to a counter.
+        '''
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def merge(
+        self,
+        other: 'Metrics'
+    ):
+        '''
+        Adds the stages and counters of another recorder to this one.
+        '''
+        for name, (seconds, calls) in other.stages.items():
+            self.add(name, seconds, calls)
+        for name, value in other.counters.items():
+            self.count(name, value)
+
+    @property
+    def seconds(self) -> float:
+        '''
+        The total time recorded across every stage.
+        '''
+        return sum(seconds for seconds, _ in self.stages.values())
+
+    def as_dict(self) -> Dict:
+        '''
+        Returns the stages and counters as a dictionary that can be pickled
+        or saved as json.
+        '''
+        return {
+            'seconds': self.seconds,
+            'stages': {name: {'seconds': seconds, 'calls': calls}
+                       for name, (seconds, calls) in self.stages.items()},
+            'counters': dict(self.counters)
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        values: Dict
+    ) -> 'Metrics':
+        '''
+        Creates a recorder from a dictionary returned by as_dict.
+        '''
+        metrics = cls()
+        for name, stage_values in values['stages'].items():
+            metrics.add(name, stage_values['seconds'],
+                        stage_values['calls'])
+        for name, value in values['counters'].items():
+            metrics.count(name, value)
+        return metrics
+
+
+class _Stage:
+    '''
+    Context manager timing a stage with an active recorder.
+    '''
+    __slots__ = ('metrics', 'name')
+
+    def __init__(
+        self,
+        metrics: Metrics,
+        name: str
+    ):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.metrics.start()
+
+    def __exit__(self, *exc_info):
+        self.metrics.stop(self.name)
+
+
+@contextmanager
+def recording(
+    metrics: Optional[Metrics]
+) -> Iterator[Optional[Metrics]]:
+    '''
+    Makes a recorder active for the code in the with block, so the stages
+    and counters it reaches are recorded in it. Passing None turns
+    instrumentation off for the block.
+    '''
+    token = _active.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _active.reset(token)
+
+
+def stage(
+    name: str
+) -> ContextManager:
+    '''
+    Returns a context manager timing the code in its with block as a stage
+    of the active recorder, or doing nothing if there isn't one.
+
+    Parameters
+    ----------
+    name: str
+        The name of the stage.
+    '''
+    metrics = _active.get()
+    if metrics is None:
+        return _NOT_TIMED
+    return _Stage(metrics, name)
+
+
+def timed(
+    name: str
+) -> Callable[[Callable], Callable]:
+    '''
+    Decorator timing every call of a function as a stage of the active
+    recorder. Only suitable for functions that do their work when called,
+    not generators: see timed_iter for those.
+
+    Parameters
+    ----------
+    name: str
+        The name of the stage.
+    '''
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            metrics = _active.get()
+            if metrics is None:
+                return function(*args, **kwargs)
+            metrics.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.stop(name)
+        return wrapper
+    return decorator
+
+
+def timed_iter(
+    name: str,
+    iterable: Iterable
+) -> Iterable:
+    '''
+    Times the production of each item of an iterable as a stage of the
+    active recorder, such as a generator that parses a file as it is read.
+    The iterable is returned as it is if there is no active recorder.
+
+    Parameters
+    ----------
+    name: str
+        The name of the stage.
+    iterable: Iterable
+        The iterable to time.
+    '''
+    metrics = _active.get()
+    if metrics is None:
+        return iterable
+    return _timed_items(metrics, name, iter(iterable))
+
+
+def _timed_items(
+    metrics: Metrics,
+    name: str,
+    iterator: Iterator
+) -> Iterator:
+    '''
+    Yields the items of an iterator, timing each call for the next one.
+    '''
+    while True:
+        metrics.start()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            metrics.stop(name)
+        yield item
+
+
+def count(
+    name: str,
+    value: int = 1
+):
+    '''
+    Adds to a counter of the active recorder, if there is one.
+    '''
+    metrics = _active.get()
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+def metrics_format(
+    filename: str
+) -> str:
+    '''
+    Returns the format a metrics file is written in when none is given:
+    'prometheus' for files with a .prom extension, as read by the textfile
+    collector of the Prometheus node exporter, and 'jsonl' otherwise.
+    '''
+    return 'prometheus' if filename.endswith('.prom') else 'jsonl'
+
+
+def _file_record(
+    result,
+    now: str
+) -> Dict:
+    '''
+    Returns the JSON lines record of a single converted file.
+    '''
+    record = {'type': 'file', 'time': now, 'file': result.filename,
+              'status': result.status, 'rows': result.rows}
+    record.update(result.metrics)
+    return record
+
+
+def _totals(
+    results: List
+) -> Metrics:
+    '''
+    Adds up the metrics of every file.
+    '''
+    totals = Metrics()
+    for result in results:
+        if result.metrics is not None:
+            totals.merge(Metrics.from_dict(result.metrics))
+    return totals
+
+
+def _status_counts(
+    results: List
+) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return counts
+
+
+def _write_jsonl(
+    filename: str,
+    results: List,
+    elapsed: float
+):
+    '''
+    Appends a record for each file and a record of the totals to a JSON
+    lines file, so the records of successive runs accumulate.
+    '''
+    now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    totals = {'type': 'total', 'time': now, 'elapsed': elapsed,
+              'files': _status_counts(results),
+              'rows': sum(result.rows for result in results)}
+    totals.update(_totals(results).as_dict())
+
+    with open(filename, 'a') as metrics_file:
+        for result in results:
+            if result.metrics is not None:
+                metrics_file.write(json.dumps(_file_record(result, now)) +
+                                   '\n')
+        metrics_file.write(json.dumps(totals) + '\n')
+
+
+def _prometheus_lines(
+    name: str,
+    description: str,
+    samples: Dict[str, float],
+    label: Optional[str] = None
+) -> List[str]:
+    '''
+    Returns the lines of a gauge in the Prometheus text format, with a
+    sample for each label value, or a single unlabelled sample.
+    '''
+    name = f'{PROMETHEUS_PREFIX}_{name}'
+    lines = [f'# HELP {name} {description}', f'# TYPE {name} gauge']
+    for value, sample in samples.items():
+        labels = f'{{{label}="{value}"}}' if label is not None else ''
+        lines.append(f'{name}{labels} {sample}')
+    return lines
+
+
+def _write_prometheus(
+    filename: str,
+    results: List,
+    elapsed: float
+):
+    '''
+    Writes the totals of a run in the Prometheus text format, replacing the
+    previous run's. Per-file metrics aren't written, to keep the number of
+    series bounded.
+    '''
+    totals = _totals(results)
+    lines = []
+    lines += _prometheus_lines(
+        'stage_seconds', 'Seconds spent in each stage of the last run.',
+        {name: seconds for name, (seconds, _) in totals.stages.items()},
+        'stage')
+    lines += _prometheus_lines(
+        'stage_calls', 'Times each stage was entered in the last run.',
+        {name: calls for name, (_, calls) in totals.stages.items()},
+        'stage')
+    lines += _prometheus_lines(
+        'files', 'Files of the last run, by outcome.',
+        _status_counts(results), 'status')
+    lines += _prometheus_lines(
+        'rows', 'Rows of latency data converted in the last run.',
+        {'': sum(result.rows for result in results)})
+    for name, value in sorted(totals.counters.items()):
+        lines += _prometheus_lines(
+            name, f'Total {name.replace("_", " ")} in the last run.',
+            {'': value})
+    lines += _prometheus_lines(
+        'run_seconds', 'Wall time of the last run.', {'': elapsed})
+    lines += _prometheus_lines(
+        'last_run_timestamp_seconds', 'Unix time the last run finished.',
+        {'': time.time()})
+
+    # The textfile collector may read the file at any time, so it is
+    # replaced in one step
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'w') as metrics_file:
+        metrics_file.write('\n'.join(lines) + '\n')
+    os.replace(temporary, filename)
+
+
+def write_metrics(
+    filename: str,
+    results: List,
+    elapsed: float,
+    output_format: Optional[str] = None
+):
+    '''
+    Writes the metrics of each file of a conversion and their totals to a
+    metrics file.
+
+    Parameters
+    ----------
+    filename: str
+        The metrics file to write.
+    results: List[ConversionResult]
+        The outcome of each file, as returned by bulk_store with metrics
+        enabled.
+    elapsed: float
+        The wall time of the whole conversion, in seconds.
+    output_format: str
+        'jsonl' to append a JSON record for each file and one for the totals,
+        or 'prometheus' to replace the file with the totals in the Prometheus
+        textfile format. Default: chosen by metrics_format
+    '''
+    if output_format is None:
+        output_format = metrics_format(filename)
+    if output_format not in METRICS_FORMATS:
+        raise ValueError(f'Unknown metrics format: {output_format}. Must be ' +
+                         f'one of {", ".join(METRICS_FORMATS)}.')
+
+    if output_format == 'prometheus':
+        _write_prometheus(filename, results, elapsed)
+    else:
+        _write_jsonl(filename, results, elapsed)
@@ -0,0 +1,46 @@
+'''
+Module defining the options of the converters that the command line tools
+offer, apart from the modules that implement them, so the tools can build
+their argument parsers and print their help without importing numpy, pandas
+or h5py. The converters import these from here, and they can still be
+imported from encoding, csv_to_hdf5, pyramid and follow.
+
+Storage layouts are described in the encoding module, csv parsers in
+load_csv of the csv_to_hdf5 module, the parquet output format in the
+columnar module, downsampled levels in the pyramid module and following
+files as they are written in the follow module.
+'''
+
+# Storage layout versions of the hdf5 datasets
+RAW_LAYOUT = 1
+ENCODED_LAYOUT = 2
+DEFAULT_LAYOUT = RAW_LAYOUT
+LAYOUTS = (RAW_LAYOUT, ENCODED_LAYOUT)
+
+# Parsers Guralp csv files can be read with: the pandas c and pyarrow
+# parsers, or mmap, which parses the memory-mapped file with pyarrow
+CSV_ENGINES = ('c', 'pyarrow', 'mmap')
+DEFAULT_CSV_ENGINE = 'c'
+
+# Formats latency files can be converted to: an hdf5 file per source file or
+# a consolidated archive, or a partitioned parquet dataset
+HDF5_FORMAT = 'hdf5'
+PARQUET_FORMAT = 'parquet'
+DEFAULT_OUTPUT_FORMAT = HDF5_FORMAT
+OUTPUT_FORMATS = (HDF5_FORMAT, PARQUET_FORMAT)
+
+# Width of the buckets of each downsampled level in seconds, from finest to
+# coarsest. Each width is a multiple of the previous one so levels can be
+# built from each other.
+PYRAMID_LEVELS = {
+    '1m': 60,
+    '10m': 600,
+    '1h': 3600
+}
+
+# Seconds between polls of the source files followed by lat_follow
+DEFAULT_INTERVAL = 60
+
+# Seconds between checkpoints of the archive's attributes, index, summary
+# statistics and downsampled levels while following
+DEFAULT_CHECKPOINT = 900
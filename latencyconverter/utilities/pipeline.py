@@ -0,0 +1,557 @@
+'''
+Module for converting a list of csv and json files to hdf5 format, or to a
+parquet dataset, with a pipelined engine, as an alternative to the
+file-at-a-time conversion of bulk_store, so that reading, parsing and writing
+overlap.
+
+Each file passes through three stages, connected by bounded queues so only a
+few files are held in memory at once:
+
+read:
+    Source files are read ahead asynchronously by a pool of threads, so slow
+    network reads overlap with the other stages.
+parse:
+    A pool of worker processes parses each file into typed arrays. When one
+    hdf5 file is written per source file, the worker also encodes and
+    compresses the channels into a complete hdf5 file in memory.
+write:
+    A single thread writes the in-memory hdf5 files to the destination,
+    appends the parsed channels to the consolidated archive, or stores them
+    in the parquet dataset. h5py isn't thread safe, so the archive is only
+    ever touched from this thread.
+
+Files are written in the order they are listed. The time each stage spends
+working and waiting on its queues, and the depth of the queues, are reported
+in a PipelineStats.
+
+Functions
+---------
+
+run_pipeline:
+    Converts a list of latency files with the pipelined engine.
+
+Classes
+-------
+
+StageStats:
+    The work done by a single stage of the pipeline.
+
+PipelineStats:
+    The work done by each stage and the depth of each queue of a pipeline
+    run.
+'''
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import io
+import logging
+import time
+from latencyconverter.utilities.archive import BatchedArchive
+from latencyconverter.utilities.bulk_store import (
+    CONVERTED, FAILED, SKIPPED, ConversionResult, archive_result,
+    collect_logs, columnar_result, invalid_result, replay_logs, skip_file)
+from latencyconverter.utilities.compression import DEFAULT_PROFILE
+from latencyconverter.utilities.encoding import DEFAULT_LAYOUT
+from latencyconverter.utilities.metrics import Metrics, recording, stage
+from latencyconverter.utilities.file_search import output_path
+from latencyconverter.utilities.formats import match_format, skip_invalid
+from latencyconverter.utilities.manifest import file_state
+from latencyconverter.utilities.options import (
+    DEFAULT_OUTPUT_FORMAT, PARQUET_FORMAT)
+from latencyconverter.utilities.writer import channels_to_h5py
+
+# Number of source files read ahead of the parse stage
+DEFAULT_PREFETCH = 4
+
+# Number of parsed files waiting for the write stage, per worker process
+WRITE_DEPTH = 2
+
+STAGES = ('read', 'parse', 'encode', 'write')
+
+
+class StageStats:
+    '''
+    The work done by a single stage of the pipeline.
+
+    Attributes
+    ----------
+    items: int
+        The number of files the stage handled.
+    busy: float
+        Seconds spent working. Summed across the workers of stages that run
+        in a pool, so it can exceed the elapsed time.
+    waiting: float
+        Seconds the stage spent blocked on its input or output queue.
+    '''
+    def __init__(self):
+        self.items = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+
+
+class QueueStats:
+    '''
+    The depth of a queue between two stages, sampled every time an item is
+    taken off it.
+    '''
+    def __init__(
+        self,
+        maxsize: int
+    ):
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total = 0
+        self.peak = 0
+
+    def sample(
+        self,
+        depth: int
+    ):
+        self.samples += 1
+        self.total += depth
+        self.peak = max(self.peak, depth)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.samples if self.samples else 0.0
+
+
+class PipelineStats:
+    '''
+    The work done by each stage and the depth of each queue of a pipeline
+    run.
+
+    Attributes
+    ----------
+    stages: Dict[str, StageStats]
+        The stats of the 'read', 'parse', 'encode' and 'write' stages.
+    queues: Dict[str, QueueStats]
+        The depth of the 'read' queue, of files read but not yet parsed, and
+        of the 'write' queue, of files handed to the workers but not yet
+        written.
+    elapsed: float
+        Wall time of the whole run, in seconds.
+    '''
+    def __init__(
+        self,
+        prefetch: int,
+        write_depth: int
+    ):
+        self.stages = {name: StageStats() for name in STAGES}
+        self.queues = {'read': QueueStats(prefetch),
+                       'write': QueueStats(write_depth)}
+        self.elapsed = 0.0
+
+    def as_dict(self) -> Dict:
+        '''
+        Returns the stats as a dictionary of plain values.
+        '''
+        return {
+            'elapsed': self.elapsed,
+            'stages': {name: {'items': stage.items,
+                              'busy': stage.busy,
+                              'waiting': stage.waiting}
+                       for name, stage in self.stages.items()},
+            'queues': {name: {'maxsize': queue.maxsize,
+                              'peak': queue.peak,
+                              'mean': queue.mean}
+                       for name, queue in self.queues.items()}
+        }
+
+    def log(
+        self,
+        level: int = logging.INFO
+    ):
+        '''
+        Logs the time spent in each stage and the depth of each queue.
+        '''
+        for name, stats in self.stages.items():
+            logging.log(level, f'Pipeline {name}: {stats.items} files, ' +
+                        f'{stats.busy:.2f}s busy, {stats.waiting:.2f}s ' +
+                        'waiting')
+        for name, queue in self.queues.items():
+            logging.log(level, f'Pipeline {name} queue: peak {queue.peak}/' +
+                        f'{queue.maxsize}, mean {queue.mean:.1f}')
+        logging.log(level, f'Pipeline finished in {self.elapsed:.2f}s')
+
+
+def _read_source(
+    filename: str,
+    track_state: bool = False
+) -> Tuple[bytes, float, Optional[Dict]]:
+    '''
+    Reads a source file, returning its contents, the time taken and, if
+    tracking it, the state of the file from before it was read.
+    '''
+    start = time.perf_counter()
+    source_state = file_state(filename) if track_state else None
+    with open(filename, 'rb') as source:
+        data = source.read()
+    return data, time.perf_counter() - start, source_state
+
+
+def _parse_source(
+    filename: str,
+    data: bytes,
+    extract: bool,
+    profile: str,
+    layout: int,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+) -> Tuple[ConversionResult, Optional[bytes], Dict[str, float]]:
+    '''
+    Parses the contents of a source file and, unless extracting or storing
+    them as parquet, encodes them into an hdf5 file in memory. Mirrors
+    convert_file, including skipping invalid files of lenient formats, and
+    recording metrics in the result. Files of every registered source format
+    are parsed from their contents in memory.
+    '''
+    if not metrics:
+        return _parse_data(filename, data, extract, profile, layout,
+                           output_format)
+
+    recorder = Metrics()
+    with recording(recorder), stage('convert'):
+        result, image, timings = _parse_data(filename, data, extract,
+                                             profile, layout, output_format)
+    recorder.count('bytes_read', len(data))
+    return result._replace(metrics=recorder.as_dict()), image, timings
+
+
+def _parse_data(
+    filename: str,
+    data: bytes,
+    extract: bool,
+    profile: str,
+    layout: int,
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+) -> Tuple[ConversionResult, Optional[bytes], Dict[str, float]]:
+    '''
+    Parses the contents of a source file, as described in _parse_source.
+    '''
+    timings: Dict[str, float] = {}
+    logging.debug(f'Loading {filename}')
+    try:
+        source_format = match_format(filename)
+        start = time.perf_counter()
+        try:
+            channels = list(source_format.parse(io.BytesIO(data)))
+        except ValueError as e:
+            if not skip_invalid(source_format, filename, e):
+                raise
+            return invalid_result(filename, e), None, timings
+        timings['parse'] = time.perf_counter() - start
+
+        rows = sum(len(columns['timestamp']) for _, columns in channels)
+        # Parquet datasets are written from the parsed channels, by the
+        # write stage
+        if extract or output_format == PARQUET_FORMAT:
+            return (ConversionResult(filename, CONVERTED,
+                                     channels=tuple(channels), rows=rows),
+                    None, timings)
+
+        start = time.perf_counter()
+        image = io.BytesIO()
+        channels_to_h5py(image, channels, profile, layout)
+        timings['encode'] = time.perf_counter() - start
+        return (ConversionResult(filename, CONVERTED, rows=rows),
+                image.getvalue(), timings)
+    except Exception as e:
+        logging.exception(f'Failed to convert {filename}')
+        return (ConversionResult(filename, FAILED, f'{type(e).__name__}: {e}'),
+                None, timings)
+
+
+def _parse_in_worker(
+    filename: str,
+    data: bytes,
+    extract: bool,
+    profile: str,
+    layout: int,
+    level: int,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT
+) -> Tuple[ConversionResult, Optional[bytes], Dict[str, float]]:
+    '''
+    Runs _parse_source in a worker process, attaching everything it logs to
+    the result.
+    '''
+    (result, image, timings), records = collect_logs(
+        level, _parse_source, filename, data, extract, profile, layout,
+        metrics, output_format)
+    return result._replace(records=records), image, timings
+
+
+def _add_io_metrics(
+    result: ConversionResult,
+    read_seconds: float,
+    image: Optional[bytes],
+    write_seconds: float
+) -> ConversionResult:
+    '''
+    Adds the time spent reading and writing a file in the parent process to
+    the metrics recorded by its worker.
+    '''
+    recorder = Metrics.from_dict(result.metrics)
+    recorder.add('read', read_seconds)
+    if image is not None:
+        recorder.add('write', write_seconds)
+        recorder.count('bytes_written', len(image))
+    return result._replace(metrics=recorder.as_dict())
+
+
+def _write_image(
+    filename: str,
+    image: bytes
+):
+    '''
+    Writes an hdf5 file built in memory to disk.
+    '''
+    with open(filename, 'wb') as hdf5file:
+        hdf5file.write(image)
+
+
+def _done(
+    loop: asyncio.AbstractEventLoop,
+    value
+) -> asyncio.Future:
+    '''
+    Returns a future that already holds a value, to pass through a queue of
+    futures.
+    '''
+    future = loop.create_future()
+    future.set_result(value)
+    return future
+
+
+async def _get(
+    queue: asyncio.Queue,
+    stage: StageStats,
+    depth: QueueStats
+):
+    '''
+    Takes the next item off a queue, recording its depth and the time spent
+    waiting for it.
+    '''
+    depth.sample(queue.qsize())
+    start = time.perf_counter()
+    item = await queue.get()
+    stage.waiting += time.perf_counter() - start
+    return item
+
+
+async def _put(
+    queue: asyncio.Queue,
+    item,
+    stage: StageStats
+):
+    '''
+    Puts an item on a queue, recording the time spent waiting for room.
+    '''
+    start = time.perf_counter()
+    await queue.put(item)
+    stage.waiting += time.perf_counter() - start
+
+
+async def _convert(
+    files: list,
+    destination: str,
+    workers: int,
+    archive: Optional[str],
+    profile: str,
+    layout: int,
+    prefetch: int,
+    stats: PipelineStats,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> List[ConversionResult]:
+    '''
+    Runs the stages of the pipeline concurrently, as described in
+    run_pipeline.
+    '''
+    loop = asyncio.get_running_loop()
+    extract = archive is not None
+    level = logging.getLogger().getEffectiveLevel()
+    stages, queues = stats.stages, stats.queues
+
+    # Both queues hold (filename, future) pairs in file order, so the number
+    # of files in flight is bounded by the queue sizes
+    read_queue: asyncio.Queue = asyncio.Queue(queues['read'].maxsize)
+    write_queue: asyncio.Queue = asyncio.Queue(queues['write'].maxsize)
+    results: List[ConversionResult] = []
+
+    readers = ThreadPoolExecutor(prefetch, thread_name_prefix='read')
+    writer = ThreadPoolExecutor(1, thread_name_prefix='write')
+    parsers = ProcessPoolExecutor(max_workers=workers)
+    daily_archive = None
+    # Time taken to read each file, to add to its metrics once it is written
+    reads: Dict[str, float] = {}
+    # State of each file from before it was read, to add to its result
+    states: Dict[str, Optional[Dict]] = {}
+
+    async def read():
+        for filename in files:
+            if skip_file(filename):
+                reading = _done(loop, None)
+            else:
+                reading = loop.run_in_executor(readers, _read_source,
+                                               filename, track_state)
+            await _put(read_queue, (filename, reading), stages['read'])
+        await read_queue.put(None)
+
+    async def parse():
+        while True:
+            item = await _get(read_queue, stages['parse'], queues['read'])
+            if item is None:
+                break
+            filename, reading = item
+            try:
+                read_result = await reading
+            except Exception as e:
+                logging.exception(f'Failed to read {filename}')
+                parsing = _done(loop, (ConversionResult(
+                    filename, FAILED, f'{type(e).__name__}: {e}'), None, {}))
+            else:
+                if read_result is None:
+                    parsing = _done(loop, (ConversionResult(
+                        filename, SKIPPED), None, {}))
+                else:
+                    data, seconds, states[filename] = read_result
+                    stages['read'].items += 1
+                    stages['read'].busy += seconds
+                    reads[filename] = seconds
+                    parsing = loop.run_in_executor(
+                        parsers, _parse_in_worker, filename, data, extract,
+                        profile, layout, level, metrics, output_format)
+                    del data
+            await _put(write_queue, (filename, parsing), stages['parse'])
+        await write_queue.put(None)
+
+    async def write():
+        while True:
+            item = await _get(write_queue, stages['write'], queues['write'])
+            if item is None:
+                break
+            filename, parsing = item
+            start = time.perf_counter()
+            result, image, timings = await parsing
+            stages['write'].waiting += time.perf_counter() - start
+            result = result._replace(source_state=states.pop(filename, None))
+
+            # Replay any log output from a worker process in the parent
+            replay_logs(result.records)
+            for name, seconds in timings.items():
+                stages[name].items += 1
+                stages[name].busy += seconds
+
+            start = time.perf_counter()
+            if image is not None:
+                try:
+                    await loop.run_in_executor(
+                        writer, _write_image,
+                        output_path(filename, destination), image)
+                except Exception as e:
+                    logging.exception(f'Failed to write {filename}')
+                    result = ConversionResult(filename, FAILED,
+                                              f'{type(e).__name__}: {e}',
+                                              result.records,
+                                              source_state=result.source_state)
+            elif daily_archive is not None and result.status == CONVERTED:
+                result = await loop.run_in_executor(
+                    writer, archive_result, daily_archive, result)
+            elif (output_format == PARQUET_FORMAT and
+                  result.status == CONVERTED):
+                result = await loop.run_in_executor(
+                    writer, columnar_result, destination, result)
+            if result.status == CONVERTED:
+                stages['write'].items += 1
+                stages['write'].busy += time.perf_counter() - start
+            if result.metrics is not None:
+                result = _add_io_metrics(result, reads.pop(filename, 0.0),
+                                         image, time.perf_counter() - start)
+            results.append(result)
+
+    try:
+        if extract:
+            daily_archive = await loop.run_in_executor(
+                writer, lambda: BatchedArchive(archive, profile=profile))
+        await asyncio.gather(read(), parse(), write())
+    finally:
+        if daily_archive is not None:
+            await loop.run_in_executor(writer, daily_archive.close)
+        parsers.shutdown()
+        readers.shutdown()
+        writer.shutdown()
+
+    return results
+
+
+def run_pipeline(
+    files: list,
+    destination: str,
+    workers: int = 1,
+    archive: Optional[str] = None,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT,
+    prefetch: int = DEFAULT_PREFETCH,
+    metrics: bool = False,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    track_state: bool = False
+) -> Tuple[List[ConversionResult], PipelineStats]:
+    '''
+    Converts a list of csv and json latency files to hdf5 format, or to a
+    parquet dataset, overlapping the reading, parsing and writing of
+    different files.
+
+    Parameters
+    ----------
+    files: list
+        A list of json or csv files of latency data for Nanometrics and Guralp
+        devices respectively.
+    destination: str
+        The directory to store the compressed hdf5 files in, or the root
+        folder of the parquet dataset.
+    workers: int
+        The number of worker processes to parse and compress files with.
+        Default: 1
+    archive: str
+        Path to a consolidated archive to store the data from every file in,
+        instead of writing one hdf5 file per source file. Default: None
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets of per-file hdf5
+        files with. The archive always uses the raw layout. Default: 1
+    prefetch: int
+        The number of source files to read ahead of the parse stage.
+        Default: 4
+    metrics: bool
+        Record the time spent in each stage of converting each file and the
+        bytes read and written in its result, as bulk_store does.
+        Default: False
+    output_format: str
+        'hdf5', or 'parquet' to store the data of every file in the columnar
+        dataset of the destination. Default: 'hdf5'
+    track_state: bool
+        Take the state of each file before reading it, to record in a
+        manifest, in its result's source_state, as bulk_store does.
+        Default: False
+
+    Returns
+    -------
+    Tuple[List[ConversionResult], PipelineStats]
+        The outcome of each conversion, in the same order as files, and the
+        work done by each stage.
+    '''
+    workers = max(workers, 1)
+    stats = PipelineStats(max(prefetch, 1), workers * WRITE_DEPTH)
+
+    start = time.perf_counter()
+    results = asyncio.run(_convert(files, destination, workers, archive,
+                                   profile, layout, max(prefetch, 1), stats,
+                                   metrics, output_format, track_state))
+    stats.elapsed = time.perf_counter() - start
+    return results, stats
@@ -0,0 +1,272 @@
+'''
+Module for building downsampled levels of a channel's network latency, so
+that long time ranges can be plotted without reading every packet.
+
+Each level holds one row per time bucket with data, with the 'start' of the
+bucket as a unix timestamp in seconds, and the 'count', 'min', 'mean' and
+'max' of the network latencies of the packets in the bucket. Levels are
+stored as the 'network latency <level>' datasets of a channel group, next to
+the raw 'network latency' dataset, e.g. 'network latency 10m'. The levels of
+many days can be aggregated into a single file with lat_pyramid.
+
+Functions
+---------
+
+level_width:
+    Returns the width of the buckets of a level.
+
+level_name:
+    Returns the name of the dataset a level is stored in.
+
+downsample:
+    Buckets the network latencies of a channel into a level.
+
+coarsen:
+    Buckets a level into a coarser level.
+
+merge_levels:
+    Combines levels built from separate sets of packets.
+
+build_pyramid:
+    Builds every level from the network latencies of a channel.
+
+write_pyramid:
+    Stores the levels of a channel as datasets of its group.
+
+pyramid_days:
+    Returns the dates aggregated into a group of the pyramid file.
+'''
+
+from datetime import date
+from typing import Dict, List
+import h5py
+import numpy as np
+from latencyconverter.utilities.compression import (
+    DEFAULT_PROFILE, dataset_options)
+from latencyconverter.utilities.options import PYRAMID_LEVELS
+
+# Name of the file in the root of a destination directory holding the levels
+# aggregated across days
+PYRAMID_NAME = 'latency_pyramid.hdf5'
+
+PYRAMID_DTYPE = np.dtype([
+    ('start', 'float64'),
+    ('count', 'int64'),
+    ('min', 'float64'),
+    ('mean', 'float64'),
+    ('max', 'float64')
+])
+
+
+def level_width(
+    level: str
+) -> int:
+    '''
+    Returns the width of the buckets of a level, in seconds.
+    '''
+    try:
+        return PYRAMID_LEVELS[level]
+    except KeyError:
+        raise ValueError(f'Unknown pyramid level: {level}. Must be one of ' +
+                         f'{", ".join(PYRAMID_LEVELS)}.')
+
+
+def level_name(
+    level: str
+) -> str:
+    '''
+    Returns the name of the dataset a level is stored in, e.g.
+    'network latency 1m'.
+    '''
+    level_width(level)
+    return f'network latency {level}'
+
+
+def _combine(
+    buckets: np.ndarray,
+    width: int,
+    counts: np.ndarray,
+    minimums: np.ndarray,
+    means: np.ndarray,
+    maximums: np.ndarray
+) -> np.ndarray:
+    '''
+    Combines the rows falling into the same bucket. The bucket numbers must be
+    sorted.
+    '''
+    if len(buckets) == 0:
+        return np.empty(0, dtype=PYRAMID_DTYPE)
+
+    firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    level = np.empty(len(firsts), dtype=PYRAMID_DTYPE)
+    level['start'] = buckets[firsts] * width
+    level['count'] = np.add.reduceat(counts, firsts)
+    level['min'] = np.minimum.reduceat(minimums, firsts)
+    level['mean'] = (np.add.reduceat(means * counts, firsts) /
+                     level['count'])
+    level['max'] = np.maximum.reduceat(maximums, firsts)
+    return level
+
+
+def downsample(
+    timestamps: np.ndarray,
+    latencies: np.ndarray,
+    width: int
+) -> np.ndarray:
+    '''
+    Buckets the network latencies of a channel into a level.
+
+    Parameters
+    ----------
+    timestamps: np.ndarray
+        The timestamps of the packets, in int64 nanoseconds since the unix
+        epoch.
+    latencies: np.ndarray
+        The network latencies of the packets, in seconds. Packets without a
+        latency are ignored.
+    width: int
+        The width of the buckets, in seconds.
+
+    Returns
+    -------
+    np.ndarray
+        The level, with one PYRAMID_DTYPE row per bucket with data.
+    '''
+    latencies = np.asarray(latencies, dtype='float64')
+    valid = ~np.isnan(latencies)
+    buckets = np.asarray(timestamps, dtype='int64')[valid] // (width * 10**9)
+    latencies = latencies[valid]
+
+    if np.any(buckets[1:] < buckets[:-1]):
+        order = np.argsort(buckets, kind='stable')
+        buckets, latencies = buckets[order], latencies[order]
+
+    return _combine(buckets, width, np.ones(len(buckets), dtype='int64'),
+                    latencies, latencies, latencies)
+
+
+def coarsen(
+    level: np.ndarray,
+    width: int
+) -> np.ndarray:
+    '''
+    Buckets a level into a coarser level.
+
+    Parameters
+    ----------
+    level: np.ndarray
+        The finer level, sorted by start.
+    width: int
+        The width of the coarser buckets, in seconds. Must be a multiple of
+        the width of the finer level.
+
+    Returns
+    -------
+    np.ndarray
+        The coarser level.
+    '''
+    buckets = (level['start'] // width).astype('int64')
+    return _combine(buckets, width, level['count'], level['min'],
+                    level['mean'], level['max'])
+
+
+def merge_levels(
+    levels: List[np.ndarray],
+    width: int
+) -> np.ndarray:
+    '''
+    Combines levels of the same width built from separate sets of packets,
+    such as different files or days, into a single level.
+
+    Parameters
+    ----------
+    levels: List[np.ndarray]
+        The levels to merge.
+    width: int
+        The width of the buckets of the levels, in seconds.
+
+    Returns
+    -------
+    np.ndarray
+        The merged level, sorted by start.
+    '''
+    if not levels:
+        return np.empty(0, dtype=PYRAMID_DTYPE)
+
+    level = np.concatenate(levels)
+    level = level[np.argsort(level['start'], kind='stable')]
+    return coarsen(level, width)
+
+
+def build_pyramid(
+    timestamps: np.ndarray,
+    latencies: np.ndarray
+) -> Dict[str, np.ndarray]:
+    '''
+    Builds every level of PYRAMID_LEVELS from the network latencies of a
+    channel. Only the finest level is built from the packets, every other
+    level is built from the level before it.
+
+    Parameters
+    ----------
+    timestamps: np.ndarray
+        The timestamps of the packets, in int64 nanoseconds since the unix
+        epoch.
+    latencies: np.ndarray
+        The network latencies of the packets, in seconds.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Each level, keyed by its name in PYRAMID_LEVELS.
+    '''
+    pyramid: Dict[str, np.ndarray] = {}
+    level = None
+    for name, width in PYRAMID_LEVELS.items():
+        if level is None:
+            level = downsample(timestamps, latencies, width)
+        else:
+            level = coarsen(level, width)
+        pyramid[name] = level
+    return pyramid
+
+
+def write_pyramid(
+    channel_group: h5py.Group,
+    pyramid: Dict[str, np.ndarray],
+    profile: str = DEFAULT_PROFILE
+):
+    '''
+    Stores the levels of a channel as datasets of its group, replacing any
+    levels already stored.
+
+    Parameters
+    ----------
+    channel_group: h5py.Group
+        The channel group to store the levels in.
+    pyramid: Dict[str, np.ndarray]
+        The levels to store, as returned by build_pyramid.
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    '''
+    for level, data in pyramid.items():
+        name = level_name(level)
+        if name in channel_group:
+            del channel_group[name]
+        channel_group.create_dataset(
+            name=name,
+            data=data,
+            **dataset_options(profile, name, len(data), data.dtype))
+
+
+def pyramid_days(
+    group: h5py.Group
+) -> List[date]:
+    '''
+    Returns the dates aggregated into a channel group of the pyramid file, or
+    into the whole file, from the 'days' attribute of the group.
+    '''
+    return [date.fromisoformat(day.decode() if isinstance(day, bytes)
+                               else day)
+            for day in group.attrs.get('days', [])]
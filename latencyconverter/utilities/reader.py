@@ -0,0 +1,690 @@
+'''
+Module for reading latency data back out of the hdf5 files written by
+lat_to_hdf5 and daily_lat_store.
+
+Data is looked up by channel pattern and time window across the YYYY/MM/DD
+date folders of a destination directory. Each date folder is read from its
+consolidated archive when it has one, and from the per-file hdf5 outputs
+otherwise. The timestamps of each channel are assumed to be sorted, so the
+rows of the time window are found by binary search over the timestamp dataset
+and only the chunks holding those rows are read. Files are opened in SWMR
+mode, so the archive lat_follow is appending to can be read consistently.
+When the destination directory has a catalog, the files and rows to read can
+be looked up in it instead of opening every file of each date folder.
+
+Functions
+---------
+
+to_timestamp:
+    Converts a date, datetime, string or number to a unix timestamp in
+    seconds.
+
+match_channel:
+    Checks whether a channel id matches a set of shell-style patterns.
+
+search_window:
+    Finds the rows of a sorted timestamp dataset that fall within a time
+    window.
+
+channel_groups:
+    Lists the channel groups of an open hdf5 file.
+
+day_files:
+    Lists the hdf5 files holding the latency data of a date.
+
+read_file:
+    Reads the latency data of the matching channels within a time window from
+    a single hdf5 file.
+
+read_extents:
+    Reads the rows of a set of catalog extents that fall within a time window.
+
+read_channels:
+    Reads the latency data of the matching channels within a time window from
+    every date folder of a destination directory, or from the files its
+    catalog lists.
+
+read_dataframe:
+    Reads the latency data of the matching channels within a time window into
+    a DataFrame.
+
+read_summary:
+    Reads the stored summary statistics of the matching channels for each day
+    of a time window, without reading any datasets.
+
+read_level:
+    Reads the rows of a downsampled level of a channel group within a time
+    window.
+
+read_pyramid:
+    Reads a downsampled level of the network latency of the matching channels
+    within a time window.
+'''
+
+from datetime import date, datetime, timedelta, timezone
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import glob
+import logging
+import os
+import h5py
+import numpy as np
+import pandas as pd
+from latencyconverter.utilities.catalog import Catalog, Extent, catalog_path
+from latencyconverter.utilities.file_search import archive_path
+from latencyconverter.utilities.encoding import RAW_LAYOUT, decode_channel
+from latencyconverter.utilities.pyramid import (
+    PYRAMID_NAME, build_pyramid, level_name, level_width, merge_levels,
+    pyramid_days)
+from latencyconverter.utilities.summary import SUMMARY_ATTRS
+
+TimeLike = Union[date, datetime, str, float, int, None]
+
+
+def to_timestamp(
+    value: TimeLike
+) -> Optional[float]:
+    '''
+    Converts a date, datetime, string or number to a unix timestamp in
+    seconds. Dates and times without a timezone are taken to be in UTC.
+
+    Parameters
+    ----------
+    value: date, datetime, str, float, int or None
+        The time to convert. Numbers are returned unchanged, and strings are
+        parsed by pandas, e.g. '2022-02-13' or '2022-02-13T00:30:00'.
+
+    Returns
+    -------
+    float or None
+        The unix timestamp, or None if no value was given.
+    '''
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return timestamp.value / 1e9
+
+
+def _bisect(
+    dataset: h5py.Dataset,
+    value: float,
+    field: Optional[str] = None
+) -> int:
+    '''
+    Binary search of a sorted one-dimensional dataset, or of a field of a
+    compound dataset, reading a single element per step. Returns the same
+    index as np.searchsorted.
+    '''
+    if field is not None:
+        dataset = dataset.fields(field)
+    low, high = 0, dataset.shape[0]
+    while low < high:
+        middle = (low + high) // 2
+        if dataset[middle] < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def search_window(
+    channel_group: h5py.Group,
+    start: Optional[float] = None,
+    end: Optional[float] = None
+) -> slice:
+    '''
+    Finds the rows of a channel group whose timestamps fall within a time
+    window.
+
+    Raw layout timestamps are binary searched in place, reading a single
+    element per step. Delta encoded timestamps have to be read and decoded in
+    full first.
+
+    Parameters
+    ----------
+    channel_group: h5py.Group
+        The channel group to search.
+    start: float
+        The start of the window as a unix timestamp, inclusive, or None for
+        no lower bound. Default: None
+    end: float
+        The end of the window as a unix timestamp, exclusive, or None for no
+        upper bound. Default: None
+
+    Returns
+    -------
+    slice
+        The rows within the window.
+    '''
+    dataset = channel_group['timestamp']
+    layout = int(channel_group.attrs.get('layout version', RAW_LAYOUT))
+
+    if layout == RAW_LAYOUT:
+        first = 0 if start is None else _bisect(dataset, start)
+        last = dataset.shape[0] if end is None else _bisect(dataset, end)
+    else:
+        seconds = decode_channel(channel_group)['timestamp']
+        first = 0 if start is None else int(np.searchsorted(seconds, start))
+        last = (len(seconds) if end is None
+                else int(np.searchsorted(seconds, end)))
+
+    return slice(first, max(first, last))
+
+
+def channel_groups(
+    hdf5file: h5py.File
+) -> Iterator[Tuple[str, h5py.Group]]:
+    '''
+    Lists the channel groups of an open hdf5 file, whether it is a per-file
+    output with one top-level group per channel or a consolidated archive.
+
+    Parameters
+    ----------
+    hdf5file: h5py.File
+        The open hdf5 file.
+
+    Returns
+    -------
+    Iterator[Tuple[str, h5py.Group]]
+        The channel id and group of each channel.
+    '''
+    if 'index' in hdf5file:
+        for row in hdf5file['index'][()]:
+            channel, group = (name.decode() if isinstance(name, bytes)
+                              else name
+                              for name in (row['channel'], row['group']))
+            yield channel, hdf5file[group]
+        return
+
+    for name, item in hdf5file.items():
+        if isinstance(item, h5py.Group) and 'timestamp' in item:
+            yield name, item
+
+
+def day_files(
+    source: str,
+    working_date: date
+) -> List[str]:
+    '''
+    Lists the hdf5 files holding the latency data of a date: the consolidated
+    archive of the date if there is one, the per-file outputs otherwise.
+
+    Parameters
+    ----------
+    source: str
+        The destination directory latency data was stored in.
+    working_date: date
+        The date to list the files of.
+
+    Returns
+    -------
+    List[str]
+        The paths to the hdf5 files, sorted by name.
+    '''
+    archive = archive_path(source, working_date)
+    if os.path.exists(archive):
+        return [archive]
+    folder = os.path.dirname(archive)
+    return sorted(glob.glob(f'{glob.escape(folder)}/*.hdf5'))
+
+
+def read_file(
+    filename: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None
+) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+    '''
+    Reads the latency data of the matching channels within a time window from
+    a single hdf5 file.
+
+    Parameters
+    ----------
+    filename: str
+        The hdf5 file to read.
+    channels: str or Iterable[str]
+        Shell-style patterns the channel ids must match, e.g. 'QW.*.HN?'.
+        Default: every channel
+    start: date, datetime, str, float or int
+        The start of the time window, inclusive. Default: None
+    end: date, datetime, str, float or int
+        The end of the time window, exclusive. Default: None
+
+    Returns
+    -------
+    Iterator[Tuple[str, Dict[str, np.ndarray]]]
+        The channel id and data of each matching channel with rows in the
+        window, as returned by decode_channel.
+    '''
+    channels = channels if isinstance(channels, str) else list(channels)
+    start, end = to_timestamp(start), to_timestamp(end)
+
+    with h5py.File(filename, 'r', swmr=True) as hdf5file:
+        for channel, channel_group in channel_groups(hdf5file):
+            if not match_channel(channel, channels):
+                continue
+
+            rows = search_window(channel_group, start, end)
+            if rows.stop > rows.start:
+                yield channel, decode_channel(channel_group, rows)
+
+
+def _window_days(
+    start: TimeLike,
+    end: TimeLike
+) -> Tuple[float, float, List[date]]:
+    '''
+    Converts the bounds of a time window to unix timestamps, defaulting the
+    end to the end of the first day, and lists the dates the window spans.
+    '''
+    start = to_timestamp(start)
+    if start is None:
+        raise ValueError('A start time is required to read a date range.')
+    first_day = datetime.fromtimestamp(start, timezone.utc).date()
+    end = to_timestamp(end)
+    if end is None:
+        end = to_timestamp(first_day + timedelta(days=1))
+
+    # The last day only needs to be read if the window extends into it
+    last_day = datetime.fromtimestamp(end, timezone.utc).date()
+    if to_timestamp(last_day) == end and last_day > first_day:
+        last_day -= timedelta(days=1)
+
+    days = [first_day + timedelta(days=offset)
+            for offset in range((last_day - first_day).days + 1)]
+    return start, end, days
+
+
+def match_channel(
+    channel: str,
+    channels: Union[str, Iterable[str]]
+) -> bool:
+    '''
+    Checks whether a channel id matches a shell-style pattern, or any of a set
+    of patterns, e.g. 'QW.*.HN?'.
+    '''
+    patterns = [channels] if isinstance(channels, str) else channels
+    return any(fnmatchcase(channel, pattern) for pattern in patterns)
+
+
+def _merge_rows(
+    extents: List[Extent]
+) -> List[slice]:
+    '''
+    Merges the row ranges of a channel's extents in a file where they touch
+    or overlap.
+    '''
+    merged: List[slice] = []
+    for extent in sorted(extents, key=lambda extent: extent.start_row):
+        if merged and extent.start_row <= merged[-1].stop:
+            merged[-1] = slice(merged[-1].start,
+                               max(merged[-1].stop, extent.stop_row))
+        else:
+            merged.append(slice(extent.start_row, extent.stop_row))
+    return merged
+
+
+def read_extents(
+    extents: Iterable[Extent],
+    start: Optional[float] = None,
+    end: Optional[float] = None
+) -> Dict[str, List[Dict[str, np.ndarray]]]:
+    '''
+    Reads the rows of a set of catalog extents that fall within a time
+    window. Only the files of the extents are opened, and only the rows of
+    the extents are read. Files that no longer exist, and channels no longer
+    in their file, are logged and skipped.
+
+    Parameters
+    ----------
+    extents: Iterable[Extent]
+        The extents to read, as returned by Catalog.find.
+    start: float
+        The start of the window as a unix timestamp, inclusive, or None for
+        no lower bound. Default: None
+    end: float
+        The end of the window as a unix timestamp, exclusive, or None for no
+        upper bound. Default: None
+
+    Returns
+    -------
+    Dict[str, List[Dict[str, np.ndarray]]]
+        The pieces of data of each channel, keyed by channel id, as returned
+        by decode_channel, in the order of the files they were read from.
+    '''
+    by_file: Dict[str, Dict[str, List[Extent]]] = {}
+    for extent in extents:
+        by_file.setdefault(extent.output, {}).setdefault(
+            extent.channel, []).append(extent)
+
+    pieces: Dict[str, List[Dict[str, np.ndarray]]] = {}
+    for filename, file_extents in sorted(by_file.items()):
+        logging.debug(f'Reading {filename}')
+        try:
+            hdf5file = h5py.File(filename, 'r', swmr=True)
+        except OSError as e:
+            logging.warning(f'Skipping {filename} listed in the catalog: {e}')
+            continue
+
+        with hdf5file:
+            groups = dict(channel_groups(hdf5file))
+            for channel, channel_extents in file_extents.items():
+                if channel not in groups:
+                    logging.warning(f'Skipping {channel} listed in the ' +
+                                    f'catalog: not found in {filename}')
+                    continue
+                window = search_window(groups[channel], start, end)
+                for extent_rows in _merge_rows(channel_extents):
+                    rows = slice(max(window.start, extent_rows.start),
+                                 min(window.stop, extent_rows.stop))
+                    if rows.stop > rows.start:
+                        pieces.setdefault(channel, []).append(
+                            decode_channel(groups[channel], rows))
+
+    return pieces
+
+
+def read_channels(
+    source: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None,
+    catalog: bool = False
+) -> Dict[str, Dict[str, np.ndarray]]:
+    '''
+    Reads the latency data of the matching channels within a time window from
+    every date folder of a destination directory the window spans.
+
+    Parameters
+    ----------
+    source: str
+        The destination directory latency data was stored in by
+        daily_lat_store.
+    channels: str or Iterable[str]
+        Shell-style patterns the channel ids must match, e.g. 'QW.*.HN?'.
+        Default: every channel
+    start: date, datetime, str, float or int
+        The start of the time window, inclusive.
+    end: date, datetime, str, float or int
+        The end of the time window, exclusive. Defaults to the end of the day
+        the window starts on.
+    catalog: bool
+        Look up the files and rows holding the channels within the window in
+        the catalog of the destination directory (see the catalog module),
+        instead of opening every hdf5 file of each date folder.
+        Default: False
+
+    Returns
+    -------
+    Dict[str, Dict[str, np.ndarray]]
+        The data of each matching channel, keyed by channel id, as returned by
+        decode_channel. Data from several files is concatenated in time
+        order.
+    '''
+    start, end, days = _window_days(start, end)
+
+    if catalog:
+        path = catalog_path(source)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'No catalog found at {path}')
+        with Catalog(path) as source_catalog:
+            extents = source_catalog.find(channels, start, end)
+        return {channel: _concatenate(columns)
+                for channel, columns in sorted(
+                    read_extents(extents, start, end).items())}
+
+    pieces: Dict[str, List[Dict[str, np.ndarray]]] = {}
+    for working_date in days:
+        for filename in day_files(source, working_date):
+            logging.debug(f'Reading {filename}')
+            for channel, columns in read_file(filename, channels, start,
+                                              end):
+                pieces.setdefault(channel, []).append(columns)
+
+    return {channel: _concatenate(columns)
+            for channel, columns in sorted(pieces.items())}
+
+
+def _concatenate(
+    pieces: List[Dict[str, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    '''
+    Concatenates the data of a channel read from several files, sorting it by
+    time if the files overlap.
+    '''
+    if len(pieces) == 1:
+        return pieces[0]
+
+    columns = {name: np.concatenate([piece[name] for piece in pieces])
+               for name in pieces[0]}
+    if np.any(np.diff(columns['timestamp_ns']) < 0):
+        order = np.argsort(columns['timestamp_ns'], kind='stable')
+        columns = {name: values[order] for name, values in columns.items()}
+    return columns
+
+
+def read_dataframe(
+    source: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None,
+    catalog: bool = False
+) -> pd.DataFrame:
+    '''
+    Reads the latency data of the matching channels within a time window into
+    a DataFrame, with one row per packet.
+
+    Parameters
+    ----------
+    source, channels, start, end, catalog:
+        As for read_channels.
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'channel', 'timestamp' (UTC datetimes), 'network latency',
+        'data latency' and 'samples' of each packet, sorted by channel and
+        time. The data latency and samples of channels converted from json
+        files are NaN.
+    '''
+    frames = []
+    for channel, columns in read_channels(source, channels, start, end,
+                                          catalog).items():
+        frame = {
+            'channel': channel,
+            'timestamp': pd.to_datetime(columns['timestamp_ns'], utc=True),
+            'network latency': columns['network latency']
+        }
+        # Channels from json files have no data latency or samples
+        for name in ['data latency', 'samples']:
+            if name in columns and len(columns[name]) == len(
+                    columns['timestamp']):
+                frame[name] = columns[name]
+        frames.append(pd.DataFrame(frame))
+
+    if not frames:
+        return pd.DataFrame({
+            'channel': pd.Series(dtype='object'),
+            'timestamp': pd.Series(dtype='datetime64[ns, UTC]'),
+            'network latency': pd.Series(dtype='float64'),
+            'data latency': pd.Series(dtype='float64'),
+            'samples': pd.Series(dtype='uint16')
+        })
+    return pd.concat(frames, ignore_index=True).reindex(
+        columns=['channel', 'timestamp', 'network latency', 'data latency',
+                 'samples'])
+
+
+def read_summary(
+    source: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None
+) -> pd.DataFrame:
+    '''
+    Reads the summary statistics stored with each matching channel for every
+    date folder of a destination directory a time window spans. Only the
+    attributes of the channel groups are read, never their datasets.
+
+    Parameters
+    ----------
+    source, channels, start, end:
+        As for read_channels. Summaries cover whole files, so the window only
+        selects which date folders are read.
+
+    Returns
+    -------
+    pd.DataFrame
+        The 'date', 'channel' and 'file' of each channel group, its summary
+        attributes (see the summary module) and a 'sample rates' column
+        mapping each sample rate to its number of packets. Channels stored
+        before summaries were introduced have NaN statistics.
+    '''
+    channels = channels if isinstance(channels, str) else list(channels)
+    _, _, days = _window_days(start, end)
+
+    rows = []
+    for working_date in days:
+        for filename in day_files(source, working_date):
+            with h5py.File(filename, 'r', swmr=True) as hdf5file:
+                for channel, channel_group in channel_groups(hdf5file):
+                    if not match_channel(channel, channels):
+                        continue
+
+                    attrs = channel_group.attrs
+                    row = {'date': working_date, 'channel': channel,
+                           'file': os.path.basename(filename)}
+                    for name in SUMMARY_ATTRS:
+                        row[name] = attrs.get(name, np.nan)
+                    row['sample rates'] = {
+                        int(value): int(count) for value, count in zip(
+                            attrs.get('sample rate values', []),
+                            attrs.get('sample rate counts', []))}
+                    rows.append(row)
+
+    return pd.DataFrame(
+        rows, columns=['date', 'channel', 'file'] + SUMMARY_ATTRS +
+        ['sample rates'])
+
+
+def read_level(
+    channel_group: h5py.Group,
+    level: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None
+) -> np.ndarray:
+    '''
+    Reads the rows of a downsampled level of a channel group whose buckets
+    start within a time window. Levels missing from groups written before
+    levels were introduced are built from the group's datasets.
+
+    Parameters
+    ----------
+    channel_group: h5py.Group
+        The channel group to read.
+    level: str
+        The name of the level, one of the keys of PYRAMID_LEVELS of the
+        pyramid module.
+    start: float
+        The start of the window as a unix timestamp, inclusive, or None for
+        no lower bound. Default: None
+    end: float
+        The end of the window as a unix timestamp, exclusive, or None for no
+        upper bound. Default: None
+
+    Returns
+    -------
+    np.ndarray
+        The rows of the level, as PYRAMID_DTYPE records.
+    '''
+    name = level_name(level)
+    if name not in channel_group:
+        logging.debug(f'Building {name} of {channel_group.name}')
+        decoded = decode_channel(channel_group)
+        data = build_pyramid(decoded['timestamp_ns'],
+                             decoded['network latency'])[level]
+        first = 0 if start is None else int(
+            np.searchsorted(data['start'], start))
+        last = len(data) if end is None else int(
+            np.searchsorted(data['start'], end))
+        return data[first:max(first, last)]
+
+    dataset = channel_group[name]
+    first = 0 if start is None else _bisect(dataset, start, 'start')
+    last = dataset.shape[0] if end is None else _bisect(dataset, end, 'start')
+    return dataset[first:max(first, last)]
+
+
+def read_pyramid(
+    source: str,
+    channels: Union[str, Iterable[str]] = '*',
+    start: TimeLike = None,
+    end: TimeLike = None,
+    level: str = '1h'
+) -> Dict[str, np.ndarray]:
+    '''
+    Reads a downsampled level of the network latency of the matching channels
+    within a time window.
+
+    Days aggregated into the pyramid file at the root of the destination
+    directory (see lat_pyramid) are read from it with a single binary search
+    per channel, and their daily files are not opened, so the time taken does
+    not grow with the length of the window. Other days are read from the
+    levels stored in their date folders.
+
+    Parameters
+    ----------
+    source, channels, start, end:
+        As for read_channels.
+    level: str
+        The name of the level to read, one of the keys of PYRAMID_LEVELS of
+        the pyramid module. Default: '1h'
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        The rows of the level for each matching channel, keyed by channel id,
+        as PYRAMID_DTYPE records sorted by bucket start.
+    '''
+    width = level_width(level)
+    channels = channels if isinstance(channels, str) else list(channels)
+    start, end, days = _window_days(start, end)
+
+    pieces: Dict[str, List[np.ndarray]] = {}
+    covered: Dict[str, List[date]] = {}
+
+    complete: List[date] = []
+    aggregate = os.path.join(source, PYRAMID_NAME)
+    if os.path.exists(aggregate):
+        with h5py.File(aggregate, 'r') as hdf5file:
+            complete = pyramid_days(hdf5file)
+            for channel, channel_group in hdf5file.items():
+                if not match_channel(channel, channels):
+                    continue
+                covered[channel] = pyramid_days(channel_group)
+                pieces.setdefault(channel, []).append(
+                    read_level(channel_group, level, start, end))
+
+    for working_date in days:
+        # Every channel of the date is in the pyramid file
+        if working_date in complete:
+            continue
+
+        for filename in day_files(source, working_date):
+            with h5py.File(filename, 'r', swmr=True) as hdf5file:
+                for channel, channel_group in channel_groups(hdf5file):
+                    if (not match_channel(channel, channels) or
+                            working_date in covered.get(channel, ())):
+                        continue
+                    logging.debug(f'Reading {channel} from {filename}')
+                    pieces.setdefault(channel, []).append(
+                        read_level(channel_group, level, start, end))
+
+    levels = {channel: merge_levels(piece, width)
+              for channel, piece in sorted(pieces.items())}
+    return {channel: data for channel, data in levels.items() if len(data)}
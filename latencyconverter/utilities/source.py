@@ -0,0 +1,158 @@
+'''
+Module providing the input layer source files are read through. Files are
+memory-mapped rather than read through buffered file objects, and the parsers
+are handed the mapping, or slices of it, rather than copies of its contents.
+
+Mapped pages of a file count towards the resident memory of the process while
+they stay mapped, although they are clean and the kernel can drop them at any
+time. Readers that go through a file once release the pages they are done
+with, so a large file never becomes resident all at once.
+
+Functions
+---------
+
+map_file:
+    Memory-maps a file read-only for the duration of a with block.
+
+map_arrow:
+    Memory-maps a file as a pyarrow input stream.
+
+Classes
+-------
+
+MappedText:
+    Reads a memory-mapped file as text, decoding one slice of the mapping at
+    a time.
+'''
+
+from contextlib import contextmanager
+from typing import Iterator, Union
+import codecs
+import mmap
+import os
+
+
+@contextmanager
+def map_file(
+    filename: str
+) -> Iterator[Union[mmap.mmap, bytes]]:
+    '''
+    Memory-maps a file read-only for the duration of a with block.
+
+    Parameters
+    ----------
+    filename: str
+        The file to map.
+
+    Yields
+    ------
+    mmap.mmap or bytes
+        The mapped file, or an empty bytes object for an empty file, which
+        can't be mapped. Either supports the buffer protocol, so it can be
+        sliced with a memoryview without copying. Any memoryview of it must
+        be released before the with block ends.
+    '''
+    with open(filename, 'rb') as source:
+        if os.fstat(source.fileno()).st_size == 0:
+            yield b''
+            return
+        mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        yield mapped
+    finally:
+        mapped.close()
+
+
+def map_arrow(
+    filename: str
+):
+    '''
+    Memory-maps a file as a pyarrow input stream, for the pyarrow readers to
+    parse in place. Unlike a mapping made by map_file, it stays mapped for as
+    long as any buffer pyarrow made from it, which pyarrow may release from
+    its own threads after a reader returns. Requires the optional pyarrow
+    package.
+
+    Parameters
+    ----------
+    filename: str
+        The file to map.
+
+    Returns
+    -------
+    pyarrow.MemoryMappedFile
+        The mapped file, which can be used as a context manager.
+    '''
+    import pyarrow as pa
+
+    return pa.memory_map(filename, 'r')
+
+
+class MappedText:
+    '''
+    Reads a memory-mapped file as text, decoding one slice of the mapping at
+    a time straight from the mapped pages. Pages that have been decoded are
+    released, so a file read from start to end is never resident in full.
+
+    Parameters
+    ----------
+    mapped: mmap.mmap or bytes
+        The mapped file, as yielded by map_file.
+    name: str
+        The name of the file, used in error messages.
+    encoding: str
+        The encoding of the file. Default: 'utf-8'
+    '''
+    def __init__(
+        self,
+        mapped: Union[mmap.mmap, bytes],
+        name: str = 'mapped file',
+        encoding: str = 'utf-8'
+    ):
+        self.mapped = mapped
+        self.name = name
+        self.view = memoryview(mapped)
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.pos = 0
+        self.released = 0
+
+    def read(
+        self,
+        size: int = -1
+    ) -> str:
+        '''
+        Decodes the next size bytes of the file, or the rest of it if size is
+        negative. Returns an empty string at the end of the file.
+        '''
+        length = len(self.view)
+        text = ''
+        # A slice ending inside a multibyte character only decodes up to it,
+        # so keep reading until there is text, or the file ends
+        while not text and self.pos < length:
+            end = length if size < 0 else min(self.pos + size, length)
+            text = self.decoder.decode(self.view[self.pos:end],
+                                       final=end == length)
+            self.pos = end
+        self._release()
+        return text
+
+    def _release(self):
+        '''
+        Tells the kernel the whole pages before the read position won't be
+        needed again, so they stop counting towards resident memory.
+        '''
+        if not isinstance(self.mapped, mmap.mmap) or \
+                not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        end = self.pos - self.pos % mmap.PAGESIZE
+        if end > self.released:
+            self.mapped.madvise(mmap.MADV_DONTNEED, self.released,
+                                end - self.released)
+            self.released = end
+
+    def close(self):
+        '''
+        Releases the view of the mapping, so the mapping can be closed.
+        '''
+        self.view.release()
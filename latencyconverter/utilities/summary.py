@@ -0,0 +1,173 @@
+'''
+Module for computing the summary statistics of a channel's latency data that
+are stored as attributes of its group, so that daily summaries can be queried
+without reading the datasets.
+
+Attributes
+----------
+
+latency count:
+    Number of packets with a network latency.
+latency min, latency max, latency mean:
+    Minimum, maximum and mean network latency, in seconds.
+latency p50, latency p95, latency p99:
+    Percentiles of the network latency, in seconds.
+gap count:
+    Number of intervals between consecutive packets longer than GAP_FACTOR
+    times the median interval.
+sample rate values, sample rate counts:
+    Histogram of the sample rates of the packets.
+sample rate change times, sample rate change values:
+    Unix timestamps, in seconds, of the packets at which the sample rate
+    changes, and the new sample rates. Only recorded for channels with
+    per-packet sample rates.
+first timestamp, last timestamp:
+    Unix timestamps of the first and last packets, in seconds.
+
+Functions
+---------
+
+count_gaps:
+    Counts the gaps between consecutive packets.
+
+sample_rate_histogram:
+    Counts the packets at each sample rate.
+
+channel_summary:
+    Computes the summary attributes of a channel.
+'''
+
+from typing import Dict, Tuple
+import numpy as np
+from latencyconverter.utilities.data_latency import sample_rate_changes
+from latencyconverter.utilities.timestamps import to_seconds
+
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+# An interval between packets longer than this many times the median interval
+# is counted as a gap
+GAP_FACTOR = 1.5
+
+SUMMARY_ATTRS = (
+    ['latency count', 'latency min', 'latency max', 'latency mean'] +
+    [f'latency p{percentile}' for percentile in SUMMARY_PERCENTILES] +
+    ['gap count', 'first timestamp', 'last timestamp']
+)
+
+
+def count_gaps(
+    timestamps: np.ndarray
+) -> int:
+    '''
+    Counts the intervals between consecutive packets longer than GAP_FACTOR
+    times the median interval.
+
+    Parameters
+    ----------
+    timestamps: np.ndarray
+        The sorted timestamps of the packets, in any unit.
+
+    Returns
+    -------
+    int
+        The number of gaps.
+    '''
+    if len(timestamps) < 3:
+        return 0
+    intervals = np.diff(timestamps)
+    return int(np.count_nonzero(
+        intervals > GAP_FACTOR * np.median(intervals)))
+
+
+def sample_rate_histogram(
+    columns: Dict
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''
+    Counts the packets at each sample rate.
+
+    Parameters
+    ----------
+    columns: Dict
+        The typed arrays of a channel. The per-packet 'sample rates' array is
+        used if present, otherwise every packet is counted at the channel's
+        'sample rate'.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The sample rates seen, in increasing order, and the number of packets
+        at each.
+    '''
+    rates = columns.get('sample rates')
+    if rates is None:
+        packets = len(columns['timestamp'])
+        if packets == 0:
+            return np.empty(0, dtype='uint16'), np.empty(0, dtype='int64')
+        return (np.array([columns['sample rate']], dtype='uint16'),
+                np.array([packets], dtype='int64'))
+
+    counts = np.bincount(np.asarray(rates, dtype='int64'))
+    values = np.flatnonzero(counts)
+    return values.astype('uint16'), counts[values]
+
+
+def channel_summary(
+    columns: Dict
+) -> Dict:
+    '''
+    Computes the summary attributes of a channel from its typed arrays.
+
+    Parameters
+    ----------
+    columns: Dict
+        Dictionary containing the 'timestamp' (int64 nanoseconds) and
+        'network latency' (seconds) arrays and the 'sample rate' of a
+        channel, as produced by csv_channels or json_channels.
+
+    Returns
+    -------
+    Dict
+        The summary attributes to set on the channel group. Statistics of a
+        channel without any latencies are NaN.
+    '''
+    timestamps = np.asarray(columns['timestamp'], dtype='int64')
+    latencies = np.asarray(columns['network latency'], dtype='float64')
+    latencies = latencies[~np.isnan(latencies)]
+
+    attrs: Dict = {'latency count': len(latencies)}
+    if len(latencies) > 0:
+        percentiles = np.percentile(latencies, SUMMARY_PERCENTILES)
+        attrs.update({
+            'latency min': latencies.min(),
+            'latency max': latencies.max(),
+            'latency mean': latencies.mean()
+        })
+    else:
+        percentiles = [np.nan] * len(SUMMARY_PERCENTILES)
+        attrs.update({
+            'latency min': np.nan,
+            'latency max': np.nan,
+            'latency mean': np.nan
+        })
+    for percentile, value in zip(SUMMARY_PERCENTILES, percentiles):
+        attrs[f'latency p{percentile}'] = value
+
+    attrs['gap count'] = count_gaps(timestamps)
+
+    values, counts = sample_rate_histogram(columns)
+    attrs['sample rate values'] = values
+    attrs['sample rate counts'] = counts
+
+    if 'sample rates' in columns:
+        times, rates = sample_rate_changes(timestamps,
+                                           columns['sample rates'])
+        attrs['sample rate change times'] = to_seconds(times)
+        attrs['sample rate change values'] = rates.astype('uint16')
+
+    if len(timestamps) > 0:
+        first, last = to_seconds(
+            np.array([timestamps.min(), timestamps.max()]))
+        attrs['first timestamp'] = first
+        attrs['last timestamp'] = last
+
+    return attrs
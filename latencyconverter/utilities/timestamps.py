@@ -0,0 +1,153 @@
+'''
+Module for converting whole columns of latency timestamps to unix time in a
+single vectorized pass.
+
+All timestamps are interpreted as UTC. Guralp csv timestamps carry no zone
+designator and Nanometrics timestamps are suffixed with 'Z'; both are treated
+as UTC regardless of the local timezone of the machine doing the conversion.
+
+Functions
+---------
+
+parse_timestamps:
+    Parses a column of timestamp strings into int64 nanoseconds since the
+    unix epoch.
+
+parse_csv_timestamps:
+    Parses a column of Guralp csv timestamps into int64 nanoseconds.
+
+parse_json_timestamps:
+    Parses a column of Nanometrics availability timestamps into int64
+    nanoseconds.
+
+to_seconds:
+    Converts int64 nanoseconds since the unix epoch to float64 seconds.
+'''
+
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from latencyconverter.utilities.metrics import timed
+
+# Timestamp format used in Guralp latency csv files
+CSV_FORMAT = '%Y/%m/%d %H:%M:%S.%f'
+
+
+def parse_timestamps(
+    values: Iterable[str],
+    fmt: str
+) -> np.ndarray:
+    '''
+    Parses a column of timestamp strings into nanoseconds since the unix
+    epoch. The timestamps are interpreted as UTC.
+
+    Parameters
+    ----------
+    values: Iterable[str]
+        The timestamp strings to parse. Datetimes that were already parsed,
+        e.g. while reading a csv file, are taken to be in UTC and only
+        converted.
+
+    fmt: str
+        The strptime-style format the timestamps are written in. A fractional
+        second field (%f) is parsed to full nanosecond precision.
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of nanoseconds since the unix epoch.
+    '''
+    if not isinstance(values, (pd.Series, pd.Index, np.ndarray)):
+        values = np.asarray(list(values), dtype=object)
+
+    if len(values) == 0:
+        return np.empty(0, dtype='int64')
+
+    if values.dtype.kind == 'M':
+        parsed = pd.DatetimeIndex(values)
+        if parsed.tz is not None:
+            parsed = parsed.tz_convert(None)
+        return parsed.values.astype('datetime64[ns]').view('int64')
+
+    parsed = pd.DatetimeIndex(pd.to_datetime(values, format=fmt, utc=True))
+
+    # Drop the timezone (now UTC) and normalize the unit before exposing the
+    # underlying integers
+    naive = parsed.tz_convert(None).values.astype('datetime64[ns]')
+    return naive.view('int64')
+
+
+@timed('parse_timestamps')
+def parse_csv_timestamps(
+    values: Iterable[str]
+) -> np.ndarray:
+    '''
+    Parses a column of Guralp csv timestamps (YYYY/MM/DD HH:MM:SS.ffffff) into
+    int64 nanoseconds since the unix epoch.
+
+    Parameters
+    ----------
+    values: Iterable[str]
+        The timestamp strings to parse.
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of nanoseconds since the unix epoch.
+    '''
+    return parse_timestamps(values, CSV_FORMAT)
+
+
+@timed('parse_timestamps')
+def parse_json_timestamps(
+    values: Iterable[str]
+) -> np.ndarray:
+    '''
+    Parses a column of Nanometrics availability timestamps
+    (YYYY-MM-DDTHH:MM:SS.fffffffffZ) into int64 nanoseconds since the unix
+    epoch, without truncating the nanosecond field.
+
+    Parameters
+    ----------
+    values: Iterable[str]
+        The timestamp strings to parse.
+
+    Returns
+    -------
+    np.ndarray
+        An int64 array of nanoseconds since the unix epoch.
+    '''
+    if not isinstance(values, np.ndarray):
+        values = np.asarray(list(values), dtype=str)
+
+    if len(values) == 0:
+        return np.empty(0, dtype='int64')
+
+    # These are plain ISO 8601 timestamps, which numpy parses natively and
+    # considerably faster than a strptime format. Numpy treats zone-less
+    # timestamps as UTC, so the 'Z' designator is dropped first.
+    iso = np.char.rstrip(values.astype(str), 'Z')
+    return iso.astype('datetime64[ns]').view('int64')
+
+
+def to_seconds(
+    nanoseconds: np.ndarray
+) -> np.ndarray:
+    '''
+    Converts int64 nanoseconds since the unix epoch to float64 seconds.
+
+    Parameters
+    ----------
+    nanoseconds: np.ndarray
+        An int64 array of nanoseconds since the unix epoch.
+
+    Returns
+    -------
+    np.ndarray
+        A float64 array of seconds since the unix epoch.
+    '''
+    # Split into whole seconds and remainder so the integer part is exact
+    # before the two are combined in floating point
+    seconds, remainder = np.divmod(np.asarray(nanoseconds, dtype='int64'),
+                                   1_000_000_000)
+    return seconds.astype('float64') + remainder.astype('float64') / 1e9
@@ -0,0 +1,251 @@
+'''
+Module for writing the per-channel latency data produced by the csv and json
+converters to an hdf5 file, with one group per channel.
+
+Functions
+---------
+
+write_channel:
+    Stores the latency data, summary statistics and downsampled levels of a
+    single channel as a group of an open hdf5 file.
+
+channels_to_h5py:
+    Stores the latency data of each channel as an HDF5 file.
+'''
+
+from typing import Dict, Iterable, List, Set, Tuple
+import h5py
+import numpy as np
+from latencyconverter.utilities.channels import concatenate_channels
+from latencyconverter.utilities.compression import (
+    DEFAULT_PROFILE, dataset_options)
+from latencyconverter.utilities.encoding import (
+    DEFAULT_LAYOUT, decode_channel, encode_channel)
+from latencyconverter.utilities.metrics import count, stage
+from latencyconverter.utilities.pyramid import build_pyramid, write_pyramid
+from latencyconverter.utilities.summary import channel_summary
+
+
+def write_channel(
+    hdf5file: h5py.File,
+    channel: str,
+    columns: Dict,
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> h5py.Group:
+    '''
+    Stores the latency data of a single channel as a group of an open hdf5
+    file, along with its summary statistics as attributes of the group and
+    the downsampled levels of its network latency. Packets out of timestamp
+    order are sorted, keeping packets with the same timestamp in their
+    original order, so the timestamps can be binary searched.
+
+    Parameters
+    ----------
+    hdf5file: h5py.File
+        The open hdf5 file to create the channel group in.
+    channel: str
+        The channel id, used as the name of the group.
+    columns: Dict
+        Dictionary containing the 'timestamp', 'network latency',
+        optional 'data latency' and 'sample rates', and 'samples' arrays and
+        the 'sample rate' of the channel, as produced by csv_channels or
+        json_channels.
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+
+    Returns
+    -------
+    h5py.Group
+        The channel group.
+    '''
+    columns = _sort_columns(columns)
+    channel_group = hdf5file.create_group(channel)
+
+    channel_group.attrs.create('sample rate',
+                               data=columns['sample rate'],
+                               dtype='uint16')
+
+    # Summarize the channel while its arrays are still in memory
+    with stage('summary'):
+        for name, value in channel_summary(columns).items():
+            channel_group.attrs[name] = value
+
+    with stage('encode'):
+        datasets, attrs = encode_channel(columns, layout)
+    for name, value in attrs.items():
+        channel_group.attrs[name] = value
+
+    # Create a compressed dataset for the timestamps, network latency and
+    # number of samples in each packet
+    with stage('write_datasets'):
+        for name, data in datasets.items():
+            channel_group.create_dataset(
+                name=name,
+                data=data,
+                dtype=data.dtype,
+                **dataset_options(profile, name, len(data), data.dtype))
+
+    with stage('pyramid'):
+        write_pyramid(channel_group,
+                      build_pyramid(columns['timestamp'],
+                                    columns['network latency']),
+                      profile)
+    count('channels')
+
+    return channel_group
+
+
+def channels_to_h5py(
+    filename: str,
+    channels: Iterable[Tuple[str, Dict]],
+    profile: str = DEFAULT_PROFILE,
+    layout: int = DEFAULT_LAYOUT
+) -> int:
+    '''
+    This function stores the latency data of each channel as an HDF5 file
+
+    Parameters
+    ----------
+
+    filename: Str
+        This is the location and filename to save the data in hdf5 format
+
+    channels: Iterable[Tuple[str, Dict]]
+        The channel id and typed arrays of each channel, as produced by
+        csv_channels, json_channels or stream_json.
+
+    profile: str
+        The name of the compression profile to store the datasets with.
+        Default: 'gzip9'
+
+    layout: int
+        The storage layout version to encode the datasets with. Default: 1
+
+    Returns
+    -------
+    int
+        The number of rows stored across all channels.
+    '''
+    rows = 0
+    # The parts of each channel id the source repeated, written once every
+    # channel has been read
+    repeated: Dict[str, List[Dict]] = {}
+
+    # Open the HDF5 file
+    with h5py.File(filename, 'w') as hdf5file:
+
+        # Loop through each channel
+        for channel, columns in channels:
+            rows += len(columns['timestamp'])
+
+            # A channel id repeated by the source, e.g. by several entries of
+            # a json availability list, is held back along with the group
+            # written for it before, which is only read back once
+            if channel in repeated:
+                repeated[channel].append(columns)
+            elif channel in hdf5file:
+                repeated[channel] = [_read_group(hdf5file[channel]),
+                                     columns]
+                del hdf5file[channel]
+            else:
+                write_channel(hdf5file, channel, columns, profile, layout)
+
+        for channel, parts in repeated.items():
+            write_channel(hdf5file, channel, _join_parts(channel, parts),
+                          profile, layout)
+
+    return rows
+
+
+def _read_group(
+    channel_group: h5py.Group
+) -> Dict:
+    '''
+    Reads the datasets of a channel group back into the typed arrays it was
+    written from. The per-packet sample rates of channels that had them are
+    rebuilt from the recorded sample rate changes.
+    '''
+    stored = decode_channel(channel_group)
+    columns = {
+        'timestamp': stored['timestamp_ns'],
+        'network latency': stored['network latency'],
+        'samples': stored['samples'],
+        'sample rate': int(channel_group.attrs['sample rate'])
+    }
+    if 'data latency' in stored:
+        columns['data latency'] = stored['data latency']
+
+    times = channel_group.attrs.get('sample rate change times')
+    if times is not None:
+        rates = np.full(len(stored['timestamp']), columns['sample rate'],
+                        dtype='uint16')
+        # The stored packets are in timestamp order
+        for time, rate in zip(
+                times, channel_group.attrs['sample rate change values']):
+            rates[np.searchsorted(stored['timestamp'], time):] = rate
+        columns['sample rates'] = rates
+    return columns
+
+
+def _join_parts(
+    channel: str,
+    parts: List[Dict]
+) -> Dict:
+    '''
+    Joins the typed arrays of the parts of a channel. A per-packet array only
+    some of the parts have is filled in for the others: latencies with NaN,
+    sample rates with the part's sample rate and samples with 0.
+    '''
+    # Every array of a part without packets has one value per packet
+    names = {name for part in parts if len(part['timestamp']) > 0
+             for name in _packet_arrays(part)}
+    filled = []
+    for part in parts:
+        part = dict(part)
+        packets = len(part['timestamp'])
+        for name in names - _packet_arrays(part):
+            if name == 'sample rates':
+                part[name] = np.full(packets, part['sample rate'],
+                                     dtype='uint16')
+            elif name == 'samples':
+                part[name] = np.zeros(packets, dtype='uint16')
+            else:
+                part[name] = np.full(packets, np.nan)
+        filled.append(part)
+
+    _, columns = next(concatenate_channels(
+        [(channel, part)] for part in filled))
+    return columns
+
+
+def _packet_arrays(
+    columns: Dict
+) -> Set[str]:
+    '''
+    Returns the names of the arrays of a channel with one value per packet.
+    '''
+    packets = len(columns['timestamp'])
+    return {name for name, value in columns.items()
+            if isinstance(value, np.ndarray) and len(value) == packets}
+
+
+def _sort_columns(
+    columns: Dict
+) -> Dict:
+    '''
+    Stably sorts the packets of a channel by timestamp, if they are out of
+    order. Arrays without one value per packet, such as the empty samples of
+    channels from json files, are left alone.
+    '''
+    timestamps = np.asarray(columns['timestamp'])
+    if not np.any(np.diff(timestamps) < 0):
+        return columns
+
+    order = np.argsort(timestamps, kind='stable')
+    return {name: (value[order] if isinstance(value, np.ndarray) and
+                   len(value) == len(order) else value)
+            for name, value in columns.items()}
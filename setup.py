@@ -9,12 +9,15 @@ setup(
                 storage.',
     author='Jonathan Gosset',
     author_email='jonathan.gosset@nrcan-rncan.gc.ca',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     install_requires=[
         'pandas',
         'h5py'
     ],
     extras_require={
+        'arrow': [
+            'pyarrow'
+        ],
         'dev': [
             'pytest',
             'mypy',
@@ -32,8 +35,13 @@ setup(
 
     entry_points={
         'console_scripts': [
-            'lat_to_hdf5 = latencyconverter.bin.lat_to_hdf5: main',
-            'daily_lat_store = latencyconverter.bin.daily_lat_storage: main'
+            'lat_to_hdf5 = latencyconverter.bin.lat_to_hdf5:main',
+            'lat_query = latencyconverter.bin.lat_query:main',
+            'lat_pyramid = latencyconverter.bin.lat_pyramid:main',
+            'lat_follow = latencyconverter.bin.lat_follow:main',
+            'lat_batch = latencyconverter.bin.lat_batch:main',
+            'lat_catalog = latencyconverter.bin.lat_catalog:main',
+            'daily_lat_store = latencyconverter.bin.daily_lat_storage:main'
         ]
     }
 )